@@ -7,133 +7,304 @@ Created: October 26, 2025
 Critical: Araya told beta tester "WE NEED persistent memory"
 """
 
+import atexit
 import json
-import sqlite3
-from datetime import datetime
-from pathlib import Path
 import os
+import sys
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / 'BACKEND'))
+from sqlite_pool import SQLitePool
 
 # Memory database location
 MEMORY_DB = r"C:\Users\dwrek\100X_DEPLOYMENT\ARAYA_MEMORY.db"
 MEMORY_JSON = r"C:\Users\dwrek\100X_DEPLOYMENT\ARAYA_MEMORY.json"
 
+# Conversation turns are written in batches by a background writer
+WRITE_INTERVAL = float(os.getenv('ARAYA_MEMORY_WRITE_INTERVAL', '0.2'))
+WRITE_BATCH_SIZE = int(os.getenv('ARAYA_MEMORY_WRITE_BATCH', '500'))
+USER_CONTEXT_CACHE_SIZE = int(os.getenv('ARAYA_USER_CONTEXT_CACHE', '1024'))
+
+INSERT_CONVERSATION_SQL = """
+    INSERT INTO conversations
+    (user_id, timestamp, user_message, araya_response, context, tokens_used, session_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+UPSERT_PROFILE_SQL = """
+    INSERT INTO user_profiles (user_id, total_conversations, total_tokens, last_seen, first_seen)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET
+        total_conversations = total_conversations + excluded.total_conversations,
+        total_tokens = total_tokens + excluded.total_tokens,
+        last_seen = excluded.last_seen
+"""
+
+PROFILE_SQL = """
+    SELECT name, classification, total_conversations, total_tokens,
+           builder_score, first_seen, last_seen, preferences, notes
+    FROM user_profiles
+    WHERE user_id = ?
+"""
+
+# Queue sequence number of the last turn written (batches commit in queue order)
+GET_WRITTEN_SEQ_SQL = "SELECT value FROM memory_meta WHERE key = 'written_seq'"
+SET_WRITTEN_SEQ_SQL = "INSERT OR REPLACE INTO memory_meta (key, value) VALUES ('written_seq', ?)"
+
+HISTORY_SQL = """
+    SELECT user_message, araya_response, timestamp, context
+    FROM conversations
+    WHERE user_id = ?
+    ORDER BY timestamp DESC, id DESC
+    LIMIT ?
+"""
+
 class ArayaMemory:
-    """Persistent memory system for Araya"""
+    """
+    Persistent memory system for Araya
+
+    - kept-open WAL connections (BACKEND/sqlite_pool) instead of a connect per call
+    - save_conversation() queues the turn; a writer thread inserts queued
+      turns and their profile totals in one transaction every
+      WRITE_INTERVAL seconds (or once WRITE_BATCH_SIZE are queued).
+      Reads merge in turns that are still queued or being written, so
+      nothing is missed. Every queued turn gets a sequence number and each
+      batch records the last one it wrote (memory_meta.written_seq) in its
+      transaction, so a reader's snapshot tells which queued turns it
+      already contains. Readers never wait for the writer.
+    - get_user_context() is served from a per-user LRU, dropped on writes
+    """
+
+    def __init__(self, db_path=MEMORY_DB, json_path=MEMORY_JSON):
+        self.db_path = db_path
+        self.json_path = json_path
+        self.db = SQLitePool(self.db_path, size=4)
+
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()  # one batch write at a time
+        self.wake = threading.Event()
+        self.pending = []  # queued (seq, row); row in INSERT_CONVERSATION_SQL order
+        self.inflight = []  # batch being written (still merged by readers)
+        self.context_cache = OrderedDict()  # user_id -> context
+        self.versions = {}  # user_id -> write count (a read racing a write is not cached)
 
-    def __init__(self):
-        self.db_path = MEMORY_DB
-        self.json_path = MEMORY_JSON
         self.init_database()
+        with self.db.borrow() as conn:
+            row = conn.execute(GET_WRITTEN_SEQ_SQL).fetchone()
+        self.seq = row[0] if row else 0
+
+        self._stop = threading.Event()
+        self._writer = threading.Thread(target=self._write_loop, name='araya-memory-writer', daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
 
     def init_database(self):
         """Initialize SQLite database for memory"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # Conversations table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS conversations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT NOT NULL,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                user_message TEXT NOT NULL,
-                araya_response TEXT NOT NULL,
-                context TEXT,
-                tokens_used INTEGER DEFAULT 0,
-                session_id TEXT
-            )
-        """)
-
-        # User profiles table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_profiles (
-                user_id TEXT PRIMARY KEY,
-                name TEXT,
-                classification TEXT,
-                total_conversations INTEGER DEFAULT 0,
-                total_tokens INTEGER DEFAULT 0,
-                builder_score INTEGER DEFAULT 0,
-                first_seen DATETIME,
-                last_seen DATETIME,
-                preferences TEXT,
-                notes TEXT
-            )
-        """)
-
-        # Long-term facts table (things Araya learns)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS learned_facts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                fact_type TEXT NOT NULL,
-                content TEXT NOT NULL,
-                source_user TEXT,
-                learned_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                importance INTEGER DEFAULT 5,
-                verified BOOLEAN DEFAULT 0
-            )
-        """)
-
-        # Session tracking
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS sessions (
-                session_id TEXT PRIMARY KEY,
-                user_id TEXT NOT NULL,
-                start_time DATETIME DEFAULT CURRENT_TIMESTAMP,
-                end_time DATETIME,
-                message_count INTEGER DEFAULT 0,
-                total_tokens INTEGER DEFAULT 0
-            )
-        """)
-
-        conn.commit()
-        conn.close()
+        with self.db.borrow() as conn:
+            cursor = conn.cursor()
+
+            # Conversations table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS conversations (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id TEXT NOT NULL,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    user_message TEXT NOT NULL,
+                    araya_response TEXT NOT NULL,
+                    context TEXT,
+                    tokens_used INTEGER DEFAULT 0,
+                    session_id TEXT
+                )
+            """)
+
+            # User profiles table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS user_profiles (
+                    user_id TEXT PRIMARY KEY,
+                    name TEXT,
+                    classification TEXT,
+                    total_conversations INTEGER DEFAULT 0,
+                    total_tokens INTEGER DEFAULT 0,
+                    builder_score INTEGER DEFAULT 0,
+                    first_seen DATETIME,
+                    last_seen DATETIME,
+                    preferences TEXT,
+                    notes TEXT
+                )
+            """)
+
+            # Long-term facts table (things Araya learns)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS learned_facts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    fact_type TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    source_user TEXT,
+                    learned_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    importance INTEGER DEFAULT 5,
+                    verified BOOLEAN DEFAULT 0
+                )
+            """)
+
+            # Session tracking
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    start_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    end_time DATETIME,
+                    message_count INTEGER DEFAULT 0,
+                    total_tokens INTEGER DEFAULT 0
+                )
+            """)
+
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS memory_meta (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                )
+            """)
+
+            # A user's latest turns: index range, newest first, no sort
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_conversations_user_time
+                ON conversations (user_id, timestamp)
+            """)
+
+            # Fact recall in ORDER BY order, covering the selected columns
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_facts_type_rank
+                ON learned_facts (fact_type, importance DESC, learned_at DESC, source_user, content)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_facts_rank
+                ON learned_facts (importance DESC, learned_at DESC, fact_type, source_user, content)
+            """)
+
+            # Most active users (covering)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_profiles_activity
+                ON user_profiles (total_conversations DESC, user_id)
+            """)
 
         print(f"✅ Memory database initialized at {self.db_path}")
 
+    # ========================================================================
+    # BATCHED CONVERSATION WRITES
+    # ========================================================================
+
     def save_conversation(self, user_id, user_message, araya_response,
                          context=None, tokens_used=0, session_id=None):
-        """Save a conversation to memory"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            INSERT INTO conversations
-            (user_id, user_message, araya_response, context, tokens_used, session_id)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (user_id, user_message, araya_response, context, tokens_used, session_id))
-
-        # Update user profile
-        cursor.execute("""
-            INSERT INTO user_profiles (user_id, total_conversations, total_tokens, last_seen, first_seen)
-            VALUES (?, 1, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-            ON CONFLICT(user_id) DO UPDATE SET
-                total_conversations = total_conversations + 1,
-                total_tokens = total_tokens + ?,
-                last_seen = CURRENT_TIMESTAMP
-        """, (user_id, tokens_used, tokens_used))
-
-        conn.commit()
-        conn.close()
+        """Save a conversation to memory (queued; written by the batch writer)"""
+        # Same format as CURRENT_TIMESTAMP (UTC, second precision)
+        timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        row = (user_id, timestamp, user_message, araya_response, context, tokens_used or 0, session_id)
+
+        with self.lock:
+            self.seq += 1
+            self.pending.append((self.seq, row))
+            self._invalidate(user_id)
+            if len(self.pending) >= WRITE_BATCH_SIZE:
+                self.wake.set()
 
         return True
 
+    def flush(self):
+        """Write queued turns and profile totals in one transaction; returns turns written"""
+        with self.flush_lock:
+            with self.lock:
+                batch, self.pending = self.pending, []
+                self.inflight = batch
+            if not batch:
+                return 0
+            rows = [row for _, row in batch]
+
+            # One profile upsert per user in the batch
+            profiles = {}
+            for user_id, timestamp, _, _, _, tokens_used, _ in rows:
+                count, tokens, first, last = profiles.get(user_id, (0, 0, timestamp, timestamp))
+                profiles[user_id] = (count + 1, tokens + tokens_used, first, timestamp)
+
+            try:
+                with self.db.borrow():
+                    with self.db.transaction() as conn:
+                        conn.executemany(INSERT_CONVERSATION_SQL, rows)
+                        conn.executemany(UPSERT_PROFILE_SQL, [
+                            (user_id, count, tokens, last, first)
+                            for user_id, (count, tokens, first, last) in profiles.items()
+                        ])
+                        conn.execute(SET_WRITTEN_SEQ_SQL, (batch[-1][0],))
+            except Exception as e:
+                with self.lock:
+                    self.pending[:0] = batch
+                    self.inflight = []
+                print(f"❌ Memory write failed ({len(batch)} turns): {e}")
+                return 0
+
+            with self.lock:
+                self.inflight = []
+            return len(batch)
+
+    def _write_loop(self):
+        while not self._stop.is_set():
+            self.wake.wait(WRITE_INTERVAL)
+            self.wake.clear()
+            self.flush()
+
+    def close(self):
+        """Stop the writer and write whatever is still queued"""
+        self._stop.set()
+        self.wake.set()
+        self._writer.join(timeout=5)
+        self.flush()
+
+    def _invalidate(self, user_id):
+        """Drop a user's cached context (caller holds self.lock)"""
+        self.versions[user_id] = self.versions.get(user_id, 0) + 1
+        self.context_cache.pop(user_id, None)
+
+    def _queued_for(self, user_id):
+        """A user's queued and in-flight turns as (seq, row), newest first"""
+        with self.lock:
+            return [entry for entry in reversed(self.inflight + self.pending) if entry[1][0] == user_id]
+
+    @staticmethod
+    def _unwritten(conn, queued):
+        """Queued turns not yet in this read transaction's snapshot"""
+        row = conn.execute(GET_WRITTEN_SEQ_SQL).fetchone()
+        written = row[0] if row else 0
+        return [entry_row for seq, entry_row in queued if seq > written]
+
+    # ========================================================================
+    # READS
+    # ========================================================================
+
     def get_conversation_history(self, user_id, limit=10):
         """Get recent conversations with a user"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT user_message, araya_response, timestamp, context
-            FROM conversations
-            WHERE user_id = ?
-            ORDER BY timestamp DESC
-            LIMIT ?
-        """, (user_id, limit))
-
-        results = cursor.fetchall()
-        conn.close()
+        queued = self._queued_for(user_id)
+        with self.db.borrow() as conn:
+            # One read transaction: written_seq and the rows come from the same snapshot
+            conn.execute("BEGIN")
+            try:
+                pending = self._unwritten(conn, queued)[:limit]
+                results = []
+                if len(pending) < limit:
+                    results = conn.execute(HISTORY_SQL, (user_id, limit - len(pending))).fetchall()
+            finally:
+                conn.execute("COMMIT")
 
         return [
+            {
+                'user_message': r[2],
+                'araya_response': r[3],
+                'timestamp': r[1],
+                'context': r[4]
+            }
+            for r in pending
+        ] + [
             {
                 'user_message': r[0],
                 'araya_response': r[1],
@@ -145,36 +316,42 @@ class ArayaMemory:
 
     def get_user_context(self, user_id):
         """Get complete context about a user"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # Get profile
-        cursor.execute("""
-            SELECT name, classification, total_conversations, total_tokens,
-                   builder_score, first_seen, last_seen, preferences, notes
-            FROM user_profiles
-            WHERE user_id = ?
-        """, (user_id,))
-
-        profile = cursor.fetchone()
-
-        # Get recent conversations
-        cursor.execute("""
-            SELECT user_message, araya_response, timestamp
-            FROM conversations
-            WHERE user_id = ?
-            ORDER BY timestamp DESC
-            LIMIT 5
-        """, (user_id,))
-
-        recent_convos = cursor.fetchall()
-
-        conn.close()
-
-        if not profile:
+        with self.lock:
+            cached = self.context_cache.get(user_id)
+            if cached is not None:
+                self.context_cache.move_to_end(user_id)
+                return _copy_context(cached)
+            version = self.versions.get(user_id, 0)
+
+        queued = self._queued_for(user_id)
+        with self.db.borrow() as conn:
+            conn.execute("BEGIN")
+            try:
+                pending = self._unwritten(conn, queued)
+
+                # Get profile
+                profile = conn.execute(PROFILE_SQL, (user_id,)).fetchone()
+
+                # Get recent conversations
+                recent_convos = [(r[2], r[3], r[1]) for r in pending[:5]]
+                if len(recent_convos) < 5:
+                    recent_convos += [
+                        r[:3] for r in conn.execute(HISTORY_SQL, (user_id, 5 - len(recent_convos))).fetchall()
+                    ]
+            finally:
+                conn.execute("COMMIT")
+
+        if not profile and not pending:
             return None
 
-        return {
+        profile = list(profile or (None, None, 0, 0, 0, pending[-1][1], None, None, None))
+        if pending:
+            # Totals the batch writer has not added yet
+            profile[2] += len(pending)
+            profile[3] += sum(row[5] for row in pending)
+            profile[6] = pending[0][1]
+
+        context = {
             'user_id': user_id,
             'name': profile[0],
             'classification': profile[1],
@@ -195,45 +372,51 @@ class ArayaMemory:
             ]
         }
 
-    def learn_fact(self, fact_type, content, source_user=None, importance=5):
-        """Store a learned fact for long-term memory"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self.lock:
+            # Skip caching if a write for this user arrived meanwhile
+            if self.versions.get(user_id, 0) == version:
+                self.context_cache[user_id] = context
+                self.context_cache.move_to_end(user_id)
+                while len(self.context_cache) > USER_CONTEXT_CACHE_SIZE:
+                    self.context_cache.popitem(last=False)
 
-        cursor.execute("""
-            INSERT INTO learned_facts (fact_type, content, source_user, importance)
-            VALUES (?, ?, ?, ?)
-        """, (fact_type, content, source_user, importance))
+        # Callers get their own copy; the cached one must not change
+        return _copy_context(context)
 
-        conn.commit()
-        conn.close()
+    def learn_fact(self, fact_type, content, source_user=None, importance=5):
+        """Store a learned fact for long-term memory"""
+        with self.db.borrow():
+            with self.db.transaction() as conn:
+                conn.execute("""
+                    INSERT INTO learned_facts (fact_type, content, source_user, importance)
+                    VALUES (?, ?, ?, ?)
+                """, (fact_type, content, source_user, importance))
 
         return True
 
     def recall_facts(self, fact_type=None, min_importance=0, limit=20):
         """Recall learned facts"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        if fact_type:
-            cursor.execute("""
-                SELECT fact_type, content, source_user, learned_at, importance
-                FROM learned_facts
-                WHERE fact_type = ? AND importance >= ?
-                ORDER BY importance DESC, learned_at DESC
-                LIMIT ?
-            """, (fact_type, min_importance, limit))
-        else:
-            cursor.execute("""
-                SELECT fact_type, content, source_user, learned_at, importance
-                FROM learned_facts
-                WHERE importance >= ?
-                ORDER BY importance DESC, learned_at DESC
-                LIMIT ?
-            """, (min_importance, limit))
-
-        results = cursor.fetchall()
-        conn.close()
+        with self.db.borrow() as conn:
+            cursor = conn.cursor()
+
+            if fact_type:
+                cursor.execute("""
+                    SELECT fact_type, content, source_user, learned_at, importance
+                    FROM learned_facts
+                    WHERE fact_type = ? AND importance >= ?
+                    ORDER BY importance DESC, learned_at DESC
+                    LIMIT ?
+                """, (fact_type, min_importance, limit))
+            else:
+                cursor.execute("""
+                    SELECT fact_type, content, source_user, learned_at, importance
+                    FROM learned_facts
+                    WHERE importance >= ?
+                    ORDER BY importance DESC, learned_at DESC
+                    LIMIT ?
+                """, (min_importance, limit))
+
+            results = cursor.fetchall()
 
         return [
             {
@@ -248,31 +431,30 @@ class ArayaMemory:
 
     def get_memory_summary(self):
         """Get overview of Araya's memory"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        self.flush()
+        with self.db.borrow() as conn:
+            cursor = conn.cursor()
 
-        # Total conversations
-        cursor.execute("SELECT COUNT(*) FROM conversations")
-        total_convos = cursor.fetchone()[0]
+            # Total conversations
+            cursor.execute("SELECT COUNT(*) FROM conversations")
+            total_convos = cursor.fetchone()[0]
 
-        # Total users
-        cursor.execute("SELECT COUNT(*) FROM user_profiles")
-        total_users = cursor.fetchone()[0]
+            # Total users
+            cursor.execute("SELECT COUNT(*) FROM user_profiles")
+            total_users = cursor.fetchone()[0]
 
-        # Total facts learned
-        cursor.execute("SELECT COUNT(*) FROM learned_facts")
-        total_facts = cursor.fetchone()[0]
+            # Total facts learned
+            cursor.execute("SELECT COUNT(*) FROM learned_facts")
+            total_facts = cursor.fetchone()[0]
 
-        # Most active users
-        cursor.execute("""
-            SELECT user_id, total_conversations
-            FROM user_profiles
-            ORDER BY total_conversations DESC
-            LIMIT 5
-        """)
-        top_users = cursor.fetchall()
-
-        conn.close()
+            # Most active users
+            cursor.execute("""
+                SELECT user_id, total_conversations
+                FROM user_profiles
+                ORDER BY total_conversations DESC
+                LIMIT 5
+            """)
+            top_users = cursor.fetchall()
 
         return {
             'total_conversations': total_convos,
@@ -286,9 +468,6 @@ class ArayaMemory:
 
     def update_user_profile(self, user_id, **kwargs):
         """Update user profile fields"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
         # Build update query dynamically
         fields = []
         values = []
@@ -308,23 +487,26 @@ class ArayaMemory:
             WHERE user_id = ?
         """
 
-        cursor.execute(query, values)
-        conn.commit()
-        conn.close()
+        # Queued turns may still have to create the profile row
+        self.flush()
+        with self.db.borrow():
+            with self.db.transaction() as conn:
+                conn.execute(query, values)
+
+        with self.lock:
+            self._invalidate(user_id)
 
         return True
 
     def export_memory_json(self):
         """Export entire memory to JSON for backup"""
-        conn = sqlite3.connect(self.db_path)
-
-        # Get all data
-        conversations = conn.execute("SELECT * FROM conversations").fetchall()
-        users = conn.execute("SELECT * FROM user_profiles").fetchall()
-        facts = conn.execute("SELECT * FROM learned_facts").fetchall()
-        sessions = conn.execute("SELECT * FROM sessions").fetchall()
-
-        conn.close()
+        self.flush()
+        with self.db.borrow() as conn:
+            # Get all data
+            conversations = conn.execute("SELECT * FROM conversations").fetchall()
+            users = conn.execute("SELECT * FROM user_profiles").fetchall()
+            facts = conn.execute("SELECT * FROM learned_facts").fetchall()
+            sessions = conn.execute("SELECT * FROM sessions").fetchall()
 
         memory_export = {
             'export_date': datetime.now().isoformat(),
@@ -344,6 +526,10 @@ class ArayaMemory:
 # INTEGRATION WITH ARAYA V2
 # ============================================================================
 
+def _copy_context(context):
+    return dict(context, recent_conversations=[dict(c) for c in context['recent_conversations']])
+
+
 def enhance_araya_with_memory():
     """Add memory hooks to Araya V2"""
 
@@ -385,7 +571,99 @@ def enhance_araya_with_memory():
     """)
 
 
+def bench_memory(turns=1_000_000, users=10_000):
+    """get_user_context latency at `turns` stored turns (scratch database)"""
+    import random
+    import tempfile
+    import time
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'araya_bench.db')
+    memory = ArayaMemory(db_path=db_path, json_path=db_path + '.json')
+
+    print(f"🌱 Seeding {turns:,} turns for {users:,} users...")
+    started = time.perf_counter()
+    with memory.db.borrow():
+        with memory.db.transaction() as conn:
+            conn.executemany(INSERT_CONVERSATION_SQL, (
+                (f'user_{i % users}', f'2025-10-{1 + i * 30 // turns:02d} 12:00:00',
+                 f'message {i}', f'response {i}', None, 50, None)
+                for i in range(turns)
+            ))
+            conn.executemany(UPSERT_PROFILE_SQL, (
+                (f'user_{u}', turns // users, turns // users * 50, '2025-10-30 12:00:00', '2025-10-01 12:00:00')
+                for u in range(users)
+            ))
+        memory.db.connection().execute("ANALYZE")
+    print(f"   seeded in {time.perf_counter() - started:.1f}s")
+
+    def timed(label, fn, runs=2000):
+        samples = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - started) * 1000)
+        samples.sort()
+        print(f"   {label:<38} p50 {samples[runs // 2]:.3f} ms  p99 {samples[int(runs * 0.99)]:.3f} ms")
+
+    def cold_context():
+        user_id = f'user_{random.randrange(users)}'
+        with memory.lock:
+            memory.context_cache.pop(user_id, None)
+        assert memory.get_user_context(user_id)['total_conversations'] == turns // users
+
+    with memory.db.borrow():
+        timed('get_user_context (uncached)', cold_context)
+        timed('get_user_context (cached)', lambda: memory.get_user_context('user_1'))
+        timed('get_conversation_history(10)', lambda: memory.get_conversation_history(f'user_{random.randrange(users)}'))
+        timed('recall_facts', lambda: memory.recall_facts(fact_type='platform_feature'))
+
+    started = time.perf_counter()
+    for i in range(10000):
+        memory.save_conversation(f'user_{i % users}', 'hi', 'hello', tokens_used=10)
+    memory.flush()
+    print(f"   save_conversation x10,000 (+ flush)     {(time.perf_counter() - started) * 1000:.0f} ms total")
+
+    context = memory.get_user_context('user_7')
+    assert context['recent_conversations'][0]['user'] == 'hi'
+    context['recent_conversations'].clear()
+    assert memory.get_user_context('user_7')['recent_conversations'], "cached context was mutated"
+
+    # Readers alongside the batch writer: a turn is never counted twice or missed
+    base = memory.get_user_context('user_3')['total_conversations']
+    saves = 20000
+    stop = threading.Event()
+    errors = []
+
+    def reader():
+        last = base
+        while not stop.is_set():
+            total = memory.get_user_context('user_3')['total_conversations']
+            history = memory.get_conversation_history('user_3', 5)
+            if not last <= total <= base + saves or len(history) != 5:
+                errors.append((last, total, len(history)))
+            last = total
+
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    for i in range(saves):
+        memory.save_conversation('user_3', f'turn {i}', 'ok', tokens_used=1)
+    time.sleep(WRITE_INTERVAL * 3)
+    stop.set()
+    for thread in readers:
+        thread.join()
+    assert not errors, errors[:5]
+    assert memory.get_user_context('user_3')['total_conversations'] == base + saves
+    print(f"   {saves:,} saves under 4 concurrent readers: counts consistent")
+    memory.close()
+    print("✅ Benchmark complete")
+
+
 if __name__ == "__main__":
+    if '--bench' in sys.argv:
+        bench_memory()
+        sys.exit(0)
+
     print("🧠 ARAYA PERSISTENT MEMORY SYSTEM")
     print("="*60)
 
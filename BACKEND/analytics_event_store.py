@@ -0,0 +1,325 @@
+"""
+Analytics Event Store
+Segmented, append-only event log with a persisted running summary
+
+Layout (inside data_dir):
+- segment_000001.jsonl, segment_000002.jsonl, ...  one event per line
+- sessions.jsonl  every distinct session id, appended when first seen
+                  (exact mode; approximate mode checkpoints the HLL instead)
+- summary.json  checkpoint of the running summary plus the log and session
+                file positions it covers; anything after them is replayed
+                on start
+
+Appending an event is O(1): one buffered line write and an in-memory
+summary update. The summary is checkpointed every N events and on close,
+so a crash only costs replaying the tail written since the last checkpoint.
+A checkpoint never rewrites the session set, only its file position.
+"""
+
+import json
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from approx_counting import HyperLogLog
+
+SEGMENT_PREFIX = 'segment_'
+SEGMENT_SUFFIX = '.jsonl'
+SUMMARY_FILE = 'summary.json'
+SESSIONS_FILE = 'sessions.jsonl'
+
+
+class AnalyticsEventStore:
+    """
+    Append-only analytics event log
+    """
+
+    def __init__(self, data_dir: str, segment_max_events: int = 100000,
+                 checkpoint_every: int = 1000, recent_size: int = 50,
+                 approximate: bool = False):
+        self.data_dir = data_dir
+        self.approximate = approximate
+        self.segment_max_events = segment_max_events
+        self.checkpoint_every = checkpoint_every
+        self.lock = threading.RLock()
+
+        os.makedirs(self.data_dir, exist_ok=True)
+
+        self.summary = {
+            'total_events': 0,
+            'event_types': {},
+            'first_event': None,
+            'last_event': None
+        }
+        # Exact set, or a fixed-size HyperLogLog (~0.8% error) when approximate
+        self.sessions = HyperLogLog() if approximate else set()
+        self.recent = deque(maxlen=recent_size)
+        self.listeners = []
+
+        self.segment = 1
+        self.segment_events = 0
+        self.since_checkpoint = 0
+        self._checkpoint_offset = 0
+        self._handle = None
+        self._sessions_handle = None
+
+        self._load_checkpoint()
+        self._replay_tail()
+        self._open_segment()
+
+    # =====================================================
+    # SEGMENTS
+    # =====================================================
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.data_dir, f"{SEGMENT_PREFIX}{number:06d}{SEGMENT_SUFFIX}")
+
+    def segment_numbers(self) -> List[int]:
+        """Existing segment numbers, oldest first"""
+        numbers = []
+        for name in os.listdir(self.data_dir):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                numbers.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+        return sorted(numbers)
+
+    def _open_segment(self):
+        self._handle = open(self._segment_path(self.segment), 'a', encoding='utf-8')
+
+    def _rotate_segment(self):
+        self._handle.close()
+        self.segment += 1
+        self.segment_events = 0
+        self._open_segment()
+        # A checkpoint at every segment boundary keeps replay within one segment
+        self.checkpoint()
+
+    # =====================================================
+    # SUMMARY / CHECKPOINTS
+    # =====================================================
+
+    def _apply(self, event: Dict):
+        """Fold one event into the running summary"""
+        summary = self.summary
+        summary['total_events'] += 1
+
+        event_type = event.get('event_type') or 'unknown'
+        summary['event_types'][event_type] = summary['event_types'].get(event_type, 0) + 1
+
+        received = event.get('server_received')
+        if summary['first_event'] is None:
+            summary['first_event'] = received
+        summary['last_event'] = received
+
+        session_id = event.get('session_id')
+        if session_id:
+            if self.approximate:
+                self.sessions.add(session_id)
+            elif session_id not in self.sessions:
+                self.sessions.add(session_id)
+                self._sessions_handle.write(json.dumps(session_id) + '\n')
+
+        self.recent.append(event)
+
+    def _load_checkpoint(self):
+        path = os.path.join(self.data_dir, SUMMARY_FILE)
+        checkpoint = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                checkpoint = json.load(f)
+
+        sketch = checkpoint.get('sessions')
+        if sketch is not None:
+            if not self.approximate:
+                # Switching back to exact needs a full replay of the log
+                raise ValueError('Checkpoint holds an approximate session count; delete summary.json to rebuild exactly')
+            self.sessions = HyperLogLog.from_dict(sketch)
+        else:
+            self.sessions.update(self._read_sessions(checkpoint.get('sessions_offset', 0)))
+
+        if not self.approximate:
+            self._sessions_handle = open(self._sessions_path(), 'a', encoding='utf-8')
+
+        if not checkpoint:
+            return
+        self.summary.update(checkpoint['summary'])
+        self.recent.extend(checkpoint.get('recent', []))
+        self.segment = checkpoint['segment']
+        self.segment_events = checkpoint['segment_events']
+        self._checkpoint_offset = checkpoint['offset']
+
+    def _sessions_path(self) -> str:
+        return os.path.join(self.data_dir, SESSIONS_FILE)
+
+    def _read_sessions(self, offset: int) -> List[str]:
+        """
+        Session ids the checkpoint covers
+        In exact mode anything past them is cut off; the tail replay re-adds it
+        """
+        path = self._sessions_path()
+        if not os.path.exists(path):
+            return []
+        with open(path, 'r+b') as f:
+            data = f.read(offset)
+            if not self.approximate:
+                f.truncate(offset)
+        return [json.loads(line) for line in data.splitlines()]
+
+    def _replay_tail(self):
+        """Replay events written after the last checkpoint"""
+        offset = self._checkpoint_offset
+
+        for number in self.segment_numbers():
+            if number < self.segment:
+                continue
+
+            if number > self.segment:
+                self.segment = number
+                self.segment_events = 0
+                offset = 0
+
+            with open(self._segment_path(number), 'r+b') as f:
+                f.seek(offset)
+                position = offset
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        # Torn write from a crash; drop it so the next append starts clean
+                        f.truncate(position)
+                        break
+                    self._apply(json.loads(line))
+                    self.segment_events += 1
+                    position += len(line)
+            offset = 0
+
+    def checkpoint(self):
+        """Persist the running summary and the log position it covers"""
+        with self.lock:
+            if self._handle:
+                self._handle.flush()
+                offset = self._handle.tell()
+            else:
+                offset = 0
+
+            checkpoint = {
+                'summary': self.summary,
+                'recent': list(self.recent),
+                'segment': self.segment,
+                'segment_events': self.segment_events,
+                'offset': offset,
+                'saved_at': datetime.now().isoformat()
+            }
+            if self.approximate:
+                checkpoint['sessions'] = self.sessions.to_dict()
+            else:
+                self._sessions_handle.flush()
+                checkpoint['sessions_offset'] = self._sessions_handle.tell()
+
+            path = os.path.join(self.data_dir, SUMMARY_FILE)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(checkpoint, f)
+            os.replace(tmp_path, path)
+
+            self.since_checkpoint = 0
+
+    # =====================================================
+    # WRITE PATH
+    # =====================================================
+
+    def append(self, event: Dict):
+        """Append one event to the log (O(1))"""
+        self.append_many([event])
+
+    def append_many(self, events: List[Dict]):
+        """Append a batch of events with one buffered write"""
+        if not events:
+            return
+
+        with self.lock:
+            # Split at the segment boundary so rotation still happens on size
+            room = self.segment_max_events - self.segment_events
+            head, tail = events[:room], events[room:]
+
+            self._handle.write(''.join(json.dumps(event) + '\n' for event in head))
+            self._handle.flush()
+            self.segment_events += len(head)
+
+            for event in head:
+                self._apply(event)
+                for listener in self.listeners:
+                    listener(event)
+
+            self.since_checkpoint += len(head)
+            if self.segment_events >= self.segment_max_events:
+                self._rotate_segment()
+            elif self.since_checkpoint >= self.checkpoint_every:
+                self.checkpoint()
+
+            if tail:
+                self.append_many(tail)
+
+    def add_listener(self, callback):
+        """Call callback(event) for every appended event (e.g. rollups)"""
+        with self.lock:
+            self.listeners.append(callback)
+
+    def import_legacy(self, legacy_file: str) -> int:
+        """
+        One-time import of the old single-file analytics_data.json
+        Only runs into an empty store; the legacy file is renamed afterwards
+        """
+        if not os.path.exists(legacy_file) or self.summary['total_events']:
+            return 0
+
+        with open(legacy_file, 'r') as f:
+            events = json.load(f).get('events', [])
+
+        self.append_many(events)
+        self.checkpoint()
+
+        os.replace(legacy_file, legacy_file + '.imported')
+        return len(events)
+
+    def close(self):
+        """Flush and checkpoint (call at shutdown)"""
+        with self.lock:
+            self.checkpoint()
+            self._handle.close()
+            self._handle = None
+            if self._sessions_handle:
+                self._sessions_handle.close()
+                self._sessions_handle = None
+
+    # =====================================================
+    # READ PATH
+    # =====================================================
+
+    def get_summary(self) -> Dict:
+        """Running summary (no log scan)"""
+        with self.lock:
+            summary = dict(self.summary)
+            summary['event_types'] = dict(self.summary['event_types'])
+            summary['unique_visitors'] = len(self.sessions)
+            return summary
+
+    def get_recent(self, limit: int = 50) -> List[Dict]:
+        """Most recent events, oldest first, served from the segment tail"""
+        with self.lock:
+            recent = list(self.recent)
+        return recent[-limit:] if limit else recent
+
+    def iter_events(self, from_segment: Optional[int] = None) -> Iterator[Dict]:
+        """Stream every event in log order (used for rebuilds and exports)"""
+        with self.lock:
+            if self._handle:
+                self._handle.flush()
+            numbers = self.segment_numbers()
+
+        for number in numbers:
+            if from_segment and number < from_segment:
+                continue
+            with open(self._segment_path(number), 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.endswith('\n'):
+                        yield json.loads(line)
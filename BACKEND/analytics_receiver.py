@@ -2,91 +2,115 @@
 """
 Simple Analytics Receiver
 Receives analytics data from the website and stores it
+in an append-only event log (see analytics_event_store.py)
 """
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import json
 from datetime import datetime
 import os
+import atexit
 
 app = Flask(__name__)
 CORS(app)  # Allow requests from website
 
-ANALYTICS_FILE = 'analytics_data.json'
+ANALYTICS_FILE = 'analytics_data.json'  # Legacy single-file store (imported once)
+EVENTS_DIR = 'analytics_events'
 
-def load_analytics():
-    """Load existing analytics"""
-    if os.path.exists(ANALYTICS_FILE):
-        with open(ANALYTICS_FILE, 'r') as f:
-            return json.load(f)
-    return {'events': [], 'sessions': [], 'summary': {'total_events': 0, 'unique_visitors': 0}}
+# Count unique visitors with HyperLogLog sketches instead of exact session sets
+APPROX_COUNTING = os.getenv('APPROX_COUNTING', '').lower() in ('1', 'true', 'yes')
 
-def save_analytics(data):
-    """Save analytics to file"""
-    with open(ANALYTICS_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+# Import event store
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from analytics_event_store import AnalyticsEventStore
+from analytics_rollups import AnalyticsRollups
+from batch_ingest import read_batch, batch_response
+
+store = AnalyticsEventStore(EVENTS_DIR, approximate=APPROX_COUNTING)
+store.import_legacy(ANALYTICS_FILE)
+atexit.register(store.close)
+
+# Rollups are rebuilt from the log once, then kept current on every append
+rollups = AnalyticsRollups(approximate=APPROX_COUNTING)
+rollups.rebuild(store.iter_events())
+store.add_listener(rollups.ingest)
+rollups.start_rotation()
 
 @app.route('/track', methods=['POST'])
 def track_event():
     """Receive analytics event"""
     try:
         event = request.json
-        analytics = load_analytics()
-        
+
         # Add timestamp
         event['server_received'] = datetime.now().isoformat()
-        
-        # Store event
-        analytics['events'].append(event)
-        analytics['summary']['total_events'] += 1
-        
-        # Update summary
-        if event.get('event_type') == 'page_view':
-            session_ids = set(e.get('session_id') for e in analytics['events'] if e.get('session_id'))
-            analytics['summary']['unique_visitors'] = len(session_ids)
-        
-        save_analytics(analytics)
-        
+
+        # Append to the event log (summary is updated in place)
+        store.append(event)
+
         return jsonify({'success': True, 'message': 'Event tracked'}), 200
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/batch', methods=['POST'])
+def track_batch():
+    """
+    Receive many analytics events in one request
+    Body: JSON array, {"events": [...]}, or NDJSON
+    """
+    try:
+        accepted, results = read_batch(request)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    try:
+        received = datetime.now().isoformat()
+        events = []
+        for _, event in accepted:
+            event['server_received'] = received
+            events.append(event)
+
+        # One buffered append for the whole batch
+        store.append_many(events)
+
+        return jsonify(batch_response(results)), 200
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/stats', methods=['GET'])
 def get_stats():
     """Get analytics summary"""
     try:
-        analytics = load_analytics()
-        
-        # Calculate stats
-        events = analytics['events']
-        page_views = [e for e in events if e.get('event_type') == 'page_view']
-        button_clicks = [e for e in events if e.get('event_type') == 'button_click']
-        
-        # Today's visitors
-        today = datetime.now().date().isoformat()
-        today_events = [e for e in events if e.get('server_received', '').startswith(today)]
-        today_sessions = set(e.get('session_id') for e in today_events if e.get('session_id'))
-        
+        rollup = rollups.get_stats()
+        event_types = rollup['event_types']
+
         stats = {
-            'total_events': len(events),
-            'total_page_views': len(page_views),
-            'total_button_clicks': len(button_clicks),
-            'unique_visitors': analytics['summary']['unique_visitors'],
-            'today_visitors': len(today_sessions),
-            'today_events': len(today_events),
+            'total_events': rollup['total_events'],
+            'total_page_views': event_types.get('page_view', 0),
+            'total_button_clicks': event_types.get('button_click', 0),
+            'unique_visitors': store.get_summary()['unique_visitors'],
+            'today_visitors': rollup['today_visitors'],
+            'today_events': rollup['today_events'],
             'last_updated': datetime.now().isoformat()
         }
-        
+
         return jsonify(stats), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/sketch/<day>', methods=['GET'])
+def get_day_sketch(day):
+    """Serialized day rollup (HLL of sessions) for merging across machines"""
+    bucket = rollups.export_day(day)
+    if not bucket:
+        return jsonify({'error': 'No data for that day'}), 404
+    return jsonify(bucket), 200
+
 @app.route('/recent', methods=['GET'])
 def get_recent():
     """Get recent events"""
     try:
-        analytics = load_analytics()
-        recent = analytics['events'][-50:]  # Last 50 events
+        recent = store.get_recent(50)  # Last 50 events
         return jsonify({'events': recent}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -95,4 +119,9 @@ if __name__ == '__main__':
     print("\n📊 Analytics Receiver Starting...")
     print("📡 Listening for analytics from website")
     print("🌐 Stats available at http://localhost:5002/stats\n")
-    app.run(host='0.0.0.0', port=5002, debug=True)
+    app.run(
+        host='0.0.0.0',
+        port=5002,
+        debug=True,
+        use_reloader=False  # one process owns the event store and its checkpoints
+    )
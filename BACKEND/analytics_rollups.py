@@ -0,0 +1,216 @@
+"""
+Analytics Rollups
+In-process counters that answer /stats in constant time
+
+Maintained on ingest:
+- per-event-type totals
+- per-day buckets (event count, event types, session set or HyperLogLog)
+
+Daily buckets rotate at midnight (older days beyond retention are dropped)
+and the whole engine is rebuilt from the event log on startup.
+
+Run this file for /stats latency on 1M events (full scan vs rollups).
+"""
+
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+
+from approx_counting import HyperLogLog
+
+
+class AnalyticsRollups:
+    """
+    Incrementally maintained analytics rollups
+    """
+
+    def __init__(self, retention_days: int = 30, approximate: bool = False):
+        self.retention_days = retention_days
+        self.approximate = approximate
+        self.lock = threading.Lock()
+        self.total_events = 0
+        self.event_types = {}
+        self.days = {}  # 'YYYY-MM-DD' -> {'events', 'event_types', 'sessions'}
+        self._timer = None
+
+    def _bucket(self, day: str) -> Dict:
+        bucket = self.days.get(day)
+        if bucket is None:
+            sessions = HyperLogLog() if self.approximate else set()
+            bucket = self.days[day] = {'events': 0, 'event_types': {}, 'sessions': sessions}
+        return bucket
+
+    def ingest(self, event: Dict):
+        """Fold one event into the counters (O(1))"""
+        event_type = event.get('event_type') or 'unknown'
+        day = (event.get('server_received') or datetime.now().isoformat())[:10]
+
+        with self.lock:
+            self.total_events += 1
+            self.event_types[event_type] = self.event_types.get(event_type, 0) + 1
+
+            bucket = self._bucket(day)
+            bucket['events'] += 1
+            bucket['event_types'][event_type] = bucket['event_types'].get(event_type, 0) + 1
+
+            session_id = event.get('session_id')
+            if session_id:
+                bucket['sessions'].add(session_id)
+
+    def rebuild(self, events: Iterable[Dict]):
+        """Reset and replay the full event log"""
+        with self.lock:
+            self.total_events = 0
+            self.event_types = {}
+            self.days = {}
+
+        for event in events:
+            self.ingest(event)
+
+        self.rotate()
+
+    # =====================================================
+    # DAILY ROTATION
+    # =====================================================
+
+    def rotate(self, now: Optional[datetime] = None):
+        """Open today's bucket and drop buckets past retention"""
+        now = now or datetime.now()
+        cutoff = (now - timedelta(days=self.retention_days)).date().isoformat()
+
+        with self.lock:
+            self._bucket(now.date().isoformat())
+            for day in [d for d in self.days if d < cutoff]:
+                del self.days[day]
+
+    def start_rotation(self):
+        """Rotate at every local midnight (daemon timer)"""
+        now = datetime.now()
+        next_midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+
+        def _run():
+            self.rotate()
+            self.start_rotation()
+
+        self._timer = threading.Timer((next_midnight - now).total_seconds(), _run)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def stop_rotation(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+    # =====================================================
+    # READ PATH
+    # =====================================================
+
+    def get_day(self, day: str) -> Dict:
+        """Counters for one day"""
+        with self.lock:
+            bucket = self.days.get(day)
+            if not bucket:
+                return {'date': day, 'events': 0, 'visitors': 0, 'event_types': {}}
+            return {
+                'date': day,
+                'events': bucket['events'],
+                'visitors': len(bucket['sessions']),
+                'event_types': dict(bucket['event_types'])
+            }
+
+    def get_visitors(self, start: str, end: str) -> int:
+        """Distinct sessions across a day range (merges the per-day sketches)"""
+        with self.lock:
+            buckets = [b for day, b in self.days.items() if start <= day <= end]
+            if self.approximate:
+                merged = HyperLogLog()
+                for bucket in buckets:
+                    merged.merge(bucket['sessions'])
+                return merged.count()
+            return len(set().union(*(b['sessions'] for b in buckets)))
+
+    def export_day(self, day: str) -> Optional[Dict]:
+        """Serializable day bucket (sessions as an HLL sketch) for cross-machine merging"""
+        with self.lock:
+            bucket = self.days.get(day)
+            if not bucket:
+                return None
+            sessions = bucket['sessions']
+            if not self.approximate:
+                sessions = HyperLogLog()
+                sessions.update(bucket['sessions'])
+            return {
+                'date': day,
+                'events': bucket['events'],
+                'event_types': dict(bucket['event_types']),
+                'sessions': sessions.to_dict()
+            }
+
+    def get_stats(self) -> Dict:
+        """Totals plus today's bucket (constant time)"""
+        today = self.get_day(datetime.now().date().isoformat())
+
+        with self.lock:
+            return {
+                'total_events': self.total_events,
+                'event_types': dict(self.event_types),
+                'today_events': today['events'],
+                'today_visitors': today['visitors']
+            }
+
+
+if __name__ == '__main__':
+    # /stats latency on 1M synthetic events: full scan (the old handler) vs rollups
+    import random
+    import time
+
+    N = 1_000_000
+    now = datetime.now()
+    types = ['page_view'] * 6 + ['button_click'] * 3 + ['form_submit']
+    days = [(now - timedelta(days=d)).date().isoformat() for d in range(30)]
+    events = [{
+        'event_type': random.choice(types),
+        'session_id': f"s{random.randrange(200000)}",
+        'server_received': f"{random.choice(days)}T12:00:00"
+    } for _ in range(N)]
+
+    def scan_stats(events):
+        # The old /stats: list comprehensions over every event (JSON load not counted)
+        page_views = [e for e in events if e.get('event_type') == 'page_view']
+        button_clicks = [e for e in events if e.get('event_type') == 'button_click']
+        today = datetime.now().date().isoformat()
+        today_events = [e for e in events if e.get('server_received', '').startswith(today)]
+        today_sessions = set(e.get('session_id') for e in today_events if e.get('session_id'))
+        return {
+            'total_events': len(events),
+            'total_page_views': len(page_views),
+            'total_button_clicks': len(button_clicks),
+            'today_events': len(today_events),
+            'today_visitors': len(today_sessions)
+        }
+
+    rollups = AnalyticsRollups()
+    started = time.perf_counter()
+    rollups.rebuild(events)
+    ingest_ns = (time.perf_counter() - started) / N * 1e9
+
+    started = time.perf_counter()
+    before = scan_stats(events)
+    scan_ms = (time.perf_counter() - started) * 1000
+
+    runs = 10000
+    started = time.perf_counter()
+    for _ in range(runs):
+        after = rollups.get_stats()
+    rollup_us = (time.perf_counter() - started) / runs * 1e6
+
+    assert after['total_events'] == before['total_events']
+    assert after['event_types']['page_view'] == before['total_page_views']
+    assert after['event_types']['button_click'] == before['total_button_clicks']
+    assert after['today_events'] == before['today_events']
+    assert after['today_visitors'] == before['today_visitors']
+
+    print(f"   ingest: {ingest_ns:.0f} ns/event")
+    print(f"   /stats full scan: {scan_ms:.0f} ms")
+    print(f"   /stats rollups:   {rollup_us:.1f} µs")
+    print(f"✅ {N:,} events, same answers, {scan_ms * 1000 / rollup_us:,.0f}x faster")
@@ -0,0 +1,311 @@
+"""
+API Key Usage
+In-memory API key registry and write-behind usage accounting for
+file-backed API servers (CONSCIOUSNESS_API_SERVER.py)
+
+- KeyRegistry keeps the key file in memory and reloads it only when the
+  file changes (mtime/size, checked at most every KEY_CHECK_INTERVAL
+  seconds), so verifying a key is a dict lookup
+- UsageRecorder.record() only bumps in-memory counters and buffers one log
+  line. A background thread flushes every USAGE_FLUSH_INTERVAL seconds:
+  buffered lines are appended to the day's log (api_usage_YYYY-MM-DD.jsonl)
+  and the per-key deltas are merged into the key file in one rewrite
+- usage() returns persisted counts plus this process's pending deltas;
+  per-day counts are kept for USAGE_DAYS_KEPT days (window_days() and
+  window_count() read them for rolling quotas)
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+KEY_CHECK_INTERVAL = float(os.getenv('API_KEY_CHECK_INTERVAL', '1.0'))
+USAGE_FLUSH_INTERVAL = float(os.getenv('API_USAGE_FLUSH_INTERVAL', '2.0'))
+USAGE_FLUSH_THRESHOLD = int(os.getenv('API_USAGE_FLUSH_THRESHOLD', '10000'))
+USAGE_DAYS_KEPT = 62
+
+
+def _write_json_atomic(path: Path, data):
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class KeyRegistry:
+    """
+    Hashed key -> metadata, reloaded when the key file changes
+    """
+
+    def __init__(self, path: Path, check_interval: float = KEY_CHECK_INTERVAL):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.keys = {}
+        self._stat = None
+        self._checked_at = 0.0
+        self.reloads = 0
+        self._reload()
+
+    def _file_stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _reload(self):
+        stat = self._file_stat()
+        if stat is None:
+            self.keys = {}
+        else:
+            with open(self.path, 'r') as f:
+                self.keys = json.load(f)
+        self._stat = stat
+        self._checked_at = time.monotonic()
+        self.reloads += 1
+
+    def _refresh(self):
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return
+        with self.lock:
+            if time.monotonic() - self._checked_at < self.check_interval:
+                return
+            if self._file_stat() != self._stat:
+                self._reload()
+            else:
+                self._checked_at = time.monotonic()
+
+    def get(self, hashed_key: str) -> Optional[Dict]:
+        self._refresh()
+        return self.keys.get(hashed_key)
+
+    def __contains__(self, hashed_key: str) -> bool:
+        return self.get(hashed_key) is not None
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def update(self, mutate):
+        """
+        Read-modify-write of the key file under the lock
+        mutate(keys) edits the freshly read dict in place
+        """
+        with self.lock:
+            keys = {}
+            if self.path.exists():
+                with open(self.path, 'r') as f:
+                    keys = json.load(f)
+            mutate(keys)
+            _write_json_atomic(self.path, keys)
+            self.keys = keys
+            self._stat = self._file_stat()
+            self._checked_at = time.monotonic()
+
+    def add(self, hashed_key: str, info: Dict):
+        self.update(lambda keys: keys.__setitem__(hashed_key, info))
+
+
+class UsageRecorder:
+    """
+    Per-key usage counters and a buffered, day-rotated usage log
+    """
+
+    def __init__(self, registry: KeyRegistry, log_dir: Path,
+                 flush_interval: float = USAGE_FLUSH_INTERVAL,
+                 flush_threshold: int = USAGE_FLUSH_THRESHOLD):
+        self.registry = registry
+        self.log_dir = Path(log_dir)
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.pending = {}  # hashed key -> {'count', 'success', 'failure', 'last_used', 'endpoints', 'days'}
+        self.inflight = {}  # batch being flushed (still counted by readers)
+        self.lines = []  # (day, json line) not yet written
+        self.stats = {'recorded': 0, 'flushes': 0, 'errors': 0}
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    # =====================================================
+    # WRITE PATH
+    # =====================================================
+
+    def record(self, hashed_key: str, endpoint: str, success: bool = True):
+        """Count one call (no file I/O)"""
+        now = datetime.now()
+        timestamp = now.isoformat()
+        day = timestamp[:10]
+        line = json.dumps({
+            'timestamp': timestamp,
+            'api_key_hash': hashed_key,
+            'endpoint': endpoint,
+            'success': success
+        })
+        with self.lock:
+            usage = self.pending.get(hashed_key)
+            if usage is None:
+                usage = self.pending[hashed_key] = _empty_usage()
+            usage['count'] += 1
+            usage['success' if success else 'failure'] += 1
+            usage['last_used'] = timestamp
+            usage['endpoints'][endpoint] = usage['endpoints'].get(endpoint, 0) + 1
+            usage['days'][day] = usage['days'].get(day, 0) + 1
+            self.lines.append((day, line))
+            self.stats['recorded'] += 1
+            if len(self.lines) >= self.flush_threshold:
+                self.wake.set()
+
+    def flush(self) -> int:
+        """Append buffered log lines and merge counters into the key file; returns calls flushed"""
+        with self.flush_lock:
+            with self.lock:
+                batch, self.pending = self.pending, {}
+                lines, self.lines = self.lines, []
+                self.inflight = batch
+            if not batch and not lines:
+                return 0
+
+            try:
+                self._append_lines(lines)
+                lines = []
+                if batch:
+                    self.registry.update(lambda keys: _merge(keys, batch))
+            except Exception as e:
+                self._restore(batch, lines)
+                self.stats['errors'] += 1
+                print(f"❌ API usage flush failed: {e}")
+                return 0
+
+            with self.lock:
+                self.inflight = {}
+            self.stats['flushes'] += 1
+            return sum(usage['count'] for usage in batch.values())
+
+    def _append_lines(self, lines: List):
+        if not lines:
+            return
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        by_day = {}
+        for day, line in lines:
+            by_day.setdefault(day, []).append(line)
+        for day, day_lines in by_day.items():
+            with open(self.log_path(day), 'a') as f:
+                f.write('\n'.join(day_lines) + '\n')
+
+    def _restore(self, batch: Dict, lines: List):
+        with self.lock:
+            self.inflight = {}
+            self.lines[:0] = lines
+            for hashed_key, usage in batch.items():
+                pending = self.pending.setdefault(hashed_key, _empty_usage())
+                _add(pending, usage)
+
+    def log_path(self, day: str) -> Path:
+        return self.log_dir / f"api_usage_{day}.jsonl"
+
+    # =====================================================
+    # READ PATH
+    # =====================================================
+
+    def usage(self, hashed_key: str) -> Dict:
+        """Persisted usage from the key file plus pending (unflushed) calls"""
+        info = self.registry.get(hashed_key) or {}
+        usage = {
+            'count': info.get('usage_count', 0),
+            'success': info.get('success_count', 0),
+            'failure': info.get('failure_count', 0),
+            'last_used': info.get('last_used'),
+            'endpoints': dict(info.get('usage_by_endpoint', {})),
+            'days': dict(info.get('usage_by_day', {}))
+        }
+        with self.lock:
+            for pending in (self.inflight.get(hashed_key), self.pending.get(hashed_key)):
+                if pending:
+                    _add(usage, pending)
+        return usage
+
+    def window_days(self, hashed_key: str, days: int) -> Dict[str, int]:
+        """Per-day calls in the last `days` days, today included"""
+        since = (date.today() - timedelta(days=days - 1)).isoformat()
+        return {day: count for day, count in self.usage(hashed_key)['days'].items() if day >= since}
+
+    def window_count(self, hashed_key: str, days: int) -> int:
+        """Calls in the last `days` days, today included"""
+        return sum(self.window_days(hashed_key, days).values())
+
+    # =====================================================
+    # BACKGROUND FLUSHER
+    # =====================================================
+
+    def start(self):
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name='api-usage', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            self.flush()
+
+    def close(self):
+        """Stop the flusher and write whatever is still pending"""
+        self._stop.set()
+        self.wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return dict(self.stats, pending_keys=len(self.pending), pending_lines=len(self.lines))
+
+
+def _empty_usage() -> Dict:
+    return {'count': 0, 'success': 0, 'failure': 0, 'last_used': None, 'endpoints': {}, 'days': {}}
+
+
+def _add(usage: Dict, delta: Dict):
+    usage['count'] += delta['count']
+    usage['success'] += delta['success']
+    usage['failure'] += delta['failure']
+    if delta['last_used'] and (usage['last_used'] or '') < delta['last_used']:
+        usage['last_used'] = delta['last_used']
+    for endpoint, count in delta['endpoints'].items():
+        usage['endpoints'][endpoint] = usage['endpoints'].get(endpoint, 0) + count
+    for day, count in delta['days'].items():
+        usage['days'][day] = usage['days'].get(day, 0) + count
+
+
+def _merge(keys: Dict, batch: Dict):
+    """Add flushed deltas to the key file's counters (deleted keys are skipped)"""
+    oldest_day = (date.today() - timedelta(days=USAGE_DAYS_KEPT - 1)).isoformat()
+    for hashed_key, usage in batch.items():
+        info = keys.get(hashed_key)
+        if info is None:
+            continue
+        info['usage_count'] = info.get('usage_count', 0) + usage['count']
+        info['success_count'] = info.get('success_count', 0) + usage['success']
+        info['failure_count'] = info.get('failure_count', 0) + usage['failure']
+        if (info.get('last_used') or '') < usage['last_used']:
+            info['last_used'] = usage['last_used']
+        by_endpoint = info.setdefault('usage_by_endpoint', {})
+        for endpoint, count in usage['endpoints'].items():
+            by_endpoint[endpoint] = by_endpoint.get(endpoint, 0) + count
+        by_day = info.setdefault('usage_by_day', {})
+        for day, count in usage['days'].items():
+            by_day[day] = by_day.get(day, 0) + count
+        for day in [day for day in by_day if day < oldest_day]:
+            del by_day[day]
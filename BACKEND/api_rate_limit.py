@@ -0,0 +1,247 @@
+"""
+API Rate Limit
+Per-key token buckets and rolling monthly quotas, by tier
+
+- every key gets a bucket of `burst` tokens refilled at `per_hour` / 3600
+  tokens a second; a call takes one token or is refused with the seconds
+  until the next token. The bucket is kept as the time it will be full
+  again (GCRA), so taking a token is one comparison and one add
+- the quota is calls in the last QUOTA_WINDOW_DAYS days (today included).
+  A key's per-day counts in the window are read from the usage aggregates
+  (UsageRecorder.window_days) once per key per day, then counted here per
+  admitted call, so a check never touches files or shared locks. A quota
+  refusal resets when enough of the oldest counted days have left the
+  window, not at midnight
+- check() is one dict lookup, one monotonic read and a few float ops,
+  with no lock: a lock round trip alone costs about as much as the rest of
+  the check. Two threads checking the same key at the same instant can
+  both take the last token, so a key may get one extra call per racing
+  thread; calls to different keys never interact. Tier changes and the
+  day rollover take the slow path (locked). headers() builds the response
+  headers only when a response needs them
+
+Run this file for the per-check cost.
+"""
+
+import math
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, NamedTuple, Optional
+
+QUOTA_WINDOW_DAYS = 30
+
+
+class TierLimits(NamedTuple):
+    per_hour: int
+    burst: int
+    monthly_quota: int
+
+
+# None = not limited
+TIER_LIMITS = {
+    'free': TierLimits(per_hour=100, burst=20, monthly_quota=1000),
+    'pro': TierLimits(per_hour=1000, burst=100, monthly_quota=50000),
+    'enterprise': TierLimits(per_hour=10000, burst=500, monthly_quota=1000000),
+    'unlimited': None
+}
+
+
+class RateLimiter:
+    """
+    In-memory token buckets + quota counters, keyed by hashed API key
+    """
+
+    def __init__(self, usage_recorder=None, tiers: Dict = None, clock=time.monotonic):
+        self.usage_recorder = usage_recorder  # seeds quota windows (None = start from 0)
+        self.tiers = TIER_LIMITS if tiers is None else tiers
+        self.clock = clock
+        self.lock = threading.Lock()  # slow path only
+        self.state = {}  # hashed key -> KeyState
+        self._day = 0
+        self._day_ends_at = 0.0
+
+    def _roll_day(self, now: float):
+        """Advance the day counter when the local date changes"""
+        current = datetime.now()
+        midnight = (current + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        self._day = current.toordinal()
+        self._day_ends_at = now + (midnight - current).total_seconds()
+
+    def _load(self, hashed_key: str, tier: Optional[str], now: float) -> Optional['KeyState']:
+        """Slow path: new key, tier change or first call of the day"""
+        if now >= self._day_ends_at:
+            self._roll_day(now)
+        limits = self.limits_for(tier)
+        if limits is None:
+            self.state.pop(hashed_key, None)
+            return None
+
+        days = {}
+        if self.usage_recorder is not None:
+            # Rolling window from the aggregates (this process's pending calls included)
+            days = self.usage_recorder.window_days(hashed_key, QUOTA_WINDOW_DAYS)
+        past = sorted(
+            (date.fromisoformat(day).toordinal(), count) for day, count in days.items()
+            if date.fromisoformat(day).toordinal() < self._day
+        )
+
+        with self.lock:
+            state = self.state.get(hashed_key)
+            if state is None or state.tier != tier:
+                state = self.state[hashed_key] = KeyState(tier, limits, now)
+            state.used = sum(days.values())
+            state.past_days = past
+            state.day = self._day
+            state.day_ends_at = self._day_ends_at
+        return state
+
+    def check(self, hashed_key: str, tier: Optional[str]) -> Optional[str]:
+        """
+        Take one call's token and quota
+        Returns None if allowed, else 'rate' or 'quota'; headers() describes the state
+        """
+        now = self.clock()
+        state = self.state.get(hashed_key)
+        if state is None or state.tier != tier or now >= state.day_ends_at:
+            state = self._load(hashed_key, tier, now)
+            if state is None:
+                return None
+
+        if state.used >= state.quota:
+            return 'quota'
+        full_at = state.full_at
+        if full_at < now:
+            full_at = now
+        elif full_at - now > state.tolerance:
+            return 'rate'
+        state.full_at = full_at + state.interval
+        state.used += 1
+        return None
+
+    def limits_for(self, tier: Optional[str]) -> Optional[TierLimits]:
+        return self.tiers.get(tier, self.tiers['free'])
+
+    def headers(self, hashed_key: str, refused: Optional[str] = None) -> Dict[str, str]:
+        """Rate-limit response headers for a key (after its check)"""
+        state = self.state.get(hashed_key)
+        if state is None:
+            return {}
+        now = self.clock()
+        debt = max(0.0, state.full_at - now)  # seconds until the bucket is full
+        if refused == 'quota':
+            reset = int(_quota_reset_in(state, now)) + 1
+        elif refused == 'rate':
+            reset = math.ceil(debt - state.tolerance)
+        else:
+            reset = int(debt)
+        out = {
+            'X-RateLimit-Limit': str(int(state.burst)),
+            'X-RateLimit-Remaining': str(max(0, int(state.burst - debt / state.interval))),
+            'X-RateLimit-Reset': str(reset),
+            'X-Quota-Limit': str(state.quota),
+            'X-Quota-Remaining': str(max(0, state.quota - state.used))
+        }
+        if refused:
+            out['Retry-After'] = str(reset)
+        return out
+
+    def quota_used(self, hashed_key: str) -> Optional[int]:
+        state = self.state.get(hashed_key)
+        return state.used if state else None
+
+
+class KeyState:
+    """One key's bucket and quota counter (limits copied in for the hot path)"""
+
+    __slots__ = ('tier', 'burst', 'interval', 'tolerance', 'quota', 'full_at',
+                 'used', 'past_days', 'day', 'day_ends_at')
+
+    def __init__(self, tier: Optional[str], limits: TierLimits, now: float):
+        self.tier = tier
+        self.burst = float(limits.burst)
+        self.interval = 3600.0 / limits.per_hour  # seconds per token
+        self.tolerance = (self.burst - 1.0) * self.interval  # how far full_at may run ahead
+        self.quota = limits.monthly_quota
+        self.full_at = now  # bucket is full from this time on
+        self.used = 0
+        self.past_days = []  # (date ordinal, calls) before today in the window, oldest first
+        self.day = 0
+        self.day_ends_at = 0.0
+
+
+def _quota_reset_in(state: KeyState, now: float) -> float:
+    """
+    Seconds until the window total drops below the quota, assuming no new calls
+    Day d leaves the window at the start of day d + QUOTA_WINDOW_DAYS
+    """
+    today = state.used - sum(count for _, count in state.past_days)
+    excess = state.used - state.quota + 1
+    for day, count in state.past_days + [(state.day, today)]:
+        excess -= count
+        if excess <= 0:
+            return state.day_ends_at - now + (day + QUOTA_WINDOW_DAYS - 1 - state.day) * 86400
+    return state.day_ends_at - now + (QUOTA_WINDOW_DAYS - 1) * 86400
+
+
+if __name__ == '__main__':
+    # Per-check cost with 10k keys, and bucket / quota behaviour on a fake clock
+    clock = [0.0]
+    limiter = RateLimiter(clock=lambda: clock[0])
+    limiter._roll_day = lambda now: setattr(limiter, '_day_ends_at', now + 86400.0)
+
+    results = [limiter.check('k', 'free') for _ in range(25)]
+    assert results.count(None) == 20 and results[-1] == 'rate'
+    assert limiter.headers('k', 'rate')['Retry-After'] == '36'
+    assert limiter.headers('k')['X-RateLimit-Remaining'] == '0'
+    clock[0] += 36.0  # one token at 100/hour
+    assert limiter.check('k', 'free') is None and limiter.check('k', 'free') == 'rate'
+    clock[0] += 720.0
+    assert limiter.headers('k')['X-RateLimit-Remaining'] == '20'
+
+    limiter.state['k'].used = 1000
+    clock[0] += 3600.0
+    assert limiter.check('k', 'free') == 'quota'
+    # Only today's calls count: they leave the window in 30 days
+    assert int(limiter.headers('k', 'quota')['Retry-After']) == int(limiter.state['k'].day_ends_at - clock[0]) + 1 + 29 * 86400
+    assert limiter.check('k', 'unlimited') is None and limiter.headers('k') == {}
+
+    class WindowDays:
+        # Stands in for UsageRecorder: 600 calls 29 days ago, 400 ten days ago
+        def window_days(self, hashed_key, days):
+            today = date.today()
+            return {(today - timedelta(days=29)).isoformat(): 600, (today - timedelta(days=10)).isoformat(): 400}
+
+    limiter = RateLimiter(WindowDays(), clock=lambda: clock[0])
+    assert limiter.check('k', 'free') == 'quota'
+    reset = int(limiter.headers('k', 'quota')['X-RateLimit-Reset'])
+    assert reset == int(limiter.state['k'].day_ends_at - clock[0]) + 1, reset  # the 600 leave at midnight
+
+    # Unlocked hot path: racing threads overshoot the bucket by at most one call each
+    limiter = RateLimiter(clock=lambda: clock[0])
+    limiter._roll_day = lambda now: setattr(limiter, '_day_ends_at', now + 86400.0)
+    admitted = []
+
+    def hammer():
+        admitted.append(sum(limiter.check('shared', 'free') is None for _ in range(5000)))
+
+    threads = [threading.Thread(target=hammer) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert 20 <= sum(admitted) <= 20 + len(threads), admitted
+
+    limiter = RateLimiter()
+    keys = [f'key{i}' for i in range(10000)]
+    for key in keys:
+        limiter.check(key, 'enterprise')
+
+    N = 1_000_000
+    order = [keys[i % 10000] for i in range(N)]
+    check = limiter.check
+    started = time.perf_counter()
+    for key in order:
+        check(key, 'enterprise')
+    per_check = (time.perf_counter() - started) / N * 1e9
+    print(f"✅ {N:,} checks over {len(keys):,} keys: {per_check:.0f} ns each")
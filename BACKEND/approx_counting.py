@@ -0,0 +1,263 @@
+"""
+Approximate Counting
+Mergeable, serializable sketches for distinct visitors and hot pages
+
+- HyperLogLog      distinct count in fixed memory (2^p one-byte registers)
+- CountMinSketch   per-item frequency in fixed memory (never undercounts)
+- HeavyHitters     count-min sketch + top-k candidate table ("hottest pages")
+
+Error bounds:
+- HyperLogLog: relative standard error 1.04 / sqrt(2^p).
+  p=14 (16 KB) -> ~0.81%; ~98% of estimates fall within 3 standard errors (2.4%).
+  Below 2.5 * 2^p items linear counting is used, which is near exact.
+- CountMinSketch: estimate <= true + eps * N with probability 1 - delta,
+  where N is the total count added, width = ceil(e / eps), depth = ceil(ln(1 / delta)).
+  Defaults eps=0.001, delta=0.01 -> 2719 x 5 counters (~109 KB).
+- HeavyHitters: any item with true count > eps * N is reported once it has
+  been seen after the table filled; reported counts carry the CMS bound above.
+
+All sketches merge with another sketch of the same shape (merge()) and round
+trip through to_dict()/from_dict(), so per-day sketches from several machines
+can be combined. Run this file to check the bounds against exact counting.
+"""
+
+import base64
+import hashlib
+import math
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def _hash64(item) -> int:
+    """Stable 64-bit hash (same on every machine and process, unlike hash())"""
+    return int.from_bytes(hashlib.blake2b(str(item).encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def _hash128(item) -> Tuple[int, int]:
+    digest = hashlib.blake2b(str(item).encode('utf-8'), digest_size=16).digest()
+    return int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big') | 1
+
+
+class HyperLogLog:
+    """
+    Distinct counter with relative error 1.04 / sqrt(2^p)
+    """
+
+    def __init__(self, p: int = 14):
+        if not 4 <= p <= 18:
+            raise ValueError('p must be between 4 and 18')
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+
+    def add(self, item):
+        x = _hash64(item)
+        bits = 64 - self.p
+        index = x >> bits
+        rest = x & ((1 << bits) - 1)
+        # Position of the leftmost 1-bit in the remaining bits
+        rank = bits - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, items: Iterable):
+        for item in items:
+            self.add(item)
+
+    def count(self) -> int:
+        m = self.m
+        if m >= 128:
+            alpha = 0.7213 / (1 + 1.079 / m)
+        else:
+            alpha = {16: 0.673, 32: 0.697, 64: 0.709}[m]
+
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small range: linear counting is far more accurate here
+            estimate = m * math.log(m / zeros)
+
+        return int(round(estimate))
+
+    def __len__(self):
+        return self.count()
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        """In-place union with another sketch of the same precision"""
+        if other.p != self.p:
+            raise ValueError('Cannot merge HyperLogLogs with different precision')
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+        return self
+
+    def to_dict(self) -> Dict:
+        return {'type': 'hll', 'p': self.p, 'registers': base64.b64encode(bytes(self.registers)).decode('ascii')}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'HyperLogLog':
+        sketch = cls(data['p'])
+        sketch.registers = bytearray(base64.b64decode(data['registers']))
+        return sketch
+
+
+class CountMinSketch:
+    """
+    Frequency estimates that overcount by at most eps * N (probability 1 - delta)
+    """
+
+    def __init__(self, eps: float = 0.001, delta: float = 0.01, width: int = None, depth: int = None):
+        self.width = width or int(math.ceil(math.e / eps))
+        self.depth = depth or int(math.ceil(math.log(1 / delta)))
+        self.total = 0
+        self.tables = [array('Q', [0]) * self.width for _ in range(self.depth)]
+
+    def _indexes(self, item) -> List[int]:
+        h1, h2 = _hash128(item)
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def add(self, item, count: int = 1) -> int:
+        """Add count for item; returns the new estimate"""
+        self.total += count
+        estimate = None
+        for table, index in zip(self.tables, self._indexes(item)):
+            table[index] += count
+            value = table[index]
+            estimate = value if estimate is None else min(estimate, value)
+        return estimate
+
+    def estimate(self, item) -> int:
+        return min(table[index] for table, index in zip(self.tables, self._indexes(item)))
+
+    def merge(self, other: 'CountMinSketch') -> 'CountMinSketch':
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError('Cannot merge CountMinSketches with different shapes')
+        for mine, theirs in zip(self.tables, other.tables):
+            for i, value in enumerate(theirs):
+                if value:
+                    mine[i] += value
+        self.total += other.total
+        return self
+
+    def to_dict(self) -> Dict:
+        return {
+            'type': 'cms',
+            'width': self.width,
+            'depth': self.depth,
+            'total': self.total,
+            'tables': [base64.b64encode(table.tobytes()).decode('ascii') for table in self.tables]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'CountMinSketch':
+        sketch = cls(width=data['width'], depth=data['depth'])
+        sketch.total = data['total']
+        for table, encoded in zip(sketch.tables, data['tables']):
+            table[:] = array('Q', base64.b64decode(encoded))
+        return sketch
+
+
+class HeavyHitters:
+    """
+    Top-k frequent items on top of a count-min sketch
+    """
+
+    def __init__(self, k: int = 20, eps: float = 0.001, delta: float = 0.01, sketch: CountMinSketch = None):
+        self.k = k
+        # Keep extra candidates so items near the cut-off are not lost to noise
+        self.capacity = k * 2
+        self.sketch = sketch or CountMinSketch(eps, delta)
+        self.candidates = {}  # item -> estimated count
+
+    def add(self, item, count: int = 1):
+        estimate = self.sketch.add(item, count)
+
+        if item in self.candidates or len(self.candidates) < self.capacity:
+            self.candidates[item] = estimate
+            return
+
+        weakest = min(self.candidates, key=self.candidates.get)
+        if estimate > self.candidates[weakest]:
+            del self.candidates[weakest]
+            self.candidates[item] = estimate
+
+    def estimate(self, item) -> int:
+        return self.sketch.estimate(item)
+
+    def top(self, n: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Most frequent items, highest first"""
+        ranked = sorted(self.candidates.items(), key=lambda x: x[1], reverse=True)
+        return ranked[:n or self.k]
+
+    @property
+    def total(self) -> int:
+        return self.sketch.total
+
+    def merge(self, other: 'HeavyHitters') -> 'HeavyHitters':
+        self.sketch.merge(other.sketch)
+        items = set(self.candidates) | set(other.candidates)
+        ranked = sorted(((item, self.sketch.estimate(item)) for item in items), key=lambda x: x[1], reverse=True)
+        self.candidates = dict(ranked[:self.capacity])
+        return self
+
+    def to_dict(self) -> Dict:
+        return {'type': 'heavy_hitters', 'k': self.k, 'sketch': self.sketch.to_dict(), 'candidates': self.candidates}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'HeavyHitters':
+        hitters = cls(k=data['k'], sketch=CountMinSketch.from_dict(data['sketch']))
+        hitters.candidates = dict(data['candidates'])
+        return hitters
+
+
+if __name__ == '__main__':
+    # Check the documented bounds against exact counting
+    import random
+    from collections import Counter
+
+    print("🧪 Approximate counting vs exact")
+
+    for n in (100, 10000, 200000):
+        hll = HyperLogLog()
+        exact = set()
+        for i in range(n):
+            session = f"session-{random.getrandbits(48)}"
+            hll.add(session)
+            exact.add(session)
+        error = abs(hll.count() - len(exact)) / len(exact)
+        print(f"   HLL n={len(exact):>7}: estimate={hll.count():>7} error={error:.2%} (bound 2.4% @3σ)")
+        assert error < 0.03
+
+    # Merge two halves == one sketch over both
+    left, right, both = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    for i in range(50000):
+        (left if i % 2 else right).add(i)
+        both.add(i)
+    merged = HyperLogLog.from_dict(left.to_dict()).merge(right)
+    assert merged.registers == both.registers
+    print(f"   HLL merge: {merged.count()} == {both.count()}")
+
+    # Zipf-ish page traffic
+    pages = [f"/page-{i}" for i in range(5000)]
+    weights = [1 / (i + 1) for i in range(len(pages))]
+    traffic = random.choices(pages, weights=weights, k=300000)
+
+    hitters = HeavyHitters(k=20)
+    exact_pages = Counter()
+    for page in traffic:
+        hitters.add(page)
+        exact_pages[page] += 1
+
+    bound = 0.001 * len(traffic)
+    worst = max(hitters.estimate(p) - c for p, c in exact_pages.items())
+    assert all(hitters.estimate(p) >= c for p, c in exact_pages.items())
+    print(f"   CMS worst overcount: {worst} (bound eps*N = {bound:.0f})")
+
+    exact_top = {p for p, _ in exact_pages.most_common(10)}
+    sketch_top = {p for p, _ in hitters.top(10)}
+    print(f"   Top-10 overlap: {len(exact_top & sketch_top)}/10")
+    assert len(exact_top & sketch_top) >= 9
+
+    restored = HeavyHitters.from_dict(hitters.to_dict())
+    assert restored.top(10) == hitters.top(10)
+
+    print("✅ All bounds hold")
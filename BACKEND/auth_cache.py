@@ -0,0 +1,139 @@
+"""
+Auth Cache
+In-process caches for the require_auth / check_access fast path
+
+- TokenCache   bounded LRU of verified JWTs (keyed by SHA-256 digest,
+               never the raw token), each valid until the token's own exp
+               (TOKEN_CACHE_TTL seconds for a token without one)
+- AccessCache  per-(user, domain) domain_access rows with a short TTL
+
+Tier changes call invalidate_access() so this process sees them at once.
+Other service processes pick them up when their entry expires
+(ACCESS_CACHE_TTL seconds, default 30).
+
+Every invalidation bumps AccessCache.generation. A reader takes the
+generation before its database read and passes it to put(); a row read
+before a later invalidation is not cached, so a read racing a write
+(e.g. a usage flush) cannot put the old row back after it was dropped.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', '10000'))
+TOKEN_CACHE_TTL = float(os.getenv('TOKEN_CACHE_TTL', '300'))
+ACCESS_CACHE_SIZE = int(os.getenv('ACCESS_CACHE_SIZE', '50000'))
+ACCESS_CACHE_TTL = float(os.getenv('ACCESS_CACHE_TTL', '30'))
+
+
+class TokenCache:
+    """
+    LRU of verified token payloads, valid until each token's exp
+    """
+
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # digest -> (exp, payload)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, token: str) -> Optional[Dict]:
+        digest = self._digest(token)
+        with self.lock:
+            entry = self.entries.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= time.time():
+                del self.entries[digest]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(digest)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, token: str, exp: Optional[float], payload: Dict):
+        """Cache until exp (epoch seconds), or TOKEN_CACHE_TTL from now if the token has none"""
+        if exp is None:
+            exp = time.time() + TOKEN_CACHE_TTL
+        digest = self._digest(token)
+        with self.lock:
+            self.entries[digest] = (exp, payload)
+            self.entries.move_to_end(digest)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return {'size': len(self.entries), 'hits': self.hits, 'misses': self.misses}
+
+
+class AccessCache:
+    """
+    domain_access rows per (user_id, domain) with a short TTL
+    """
+
+    def __init__(self, ttl: float = ACCESS_CACHE_TTL, max_size: int = ACCESS_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # (user_id, domain) -> (expires_at, row or None)
+        self.generation = 0  # bumped by every invalidate()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int, domain: str):
+        """(True, row) on a hit (row may be None = no access), (False, None) on a miss"""
+        key = (user_id, domain)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                self.entries.pop(key, None)
+                self.misses += 1
+                return False, None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def put(self, user_id: int, domain: str, row: Optional[Dict], generation: Optional[int] = None):
+        """Cache a row read at `generation` (skipped if anything was invalidated since)"""
+        key = (user_id, domain)
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return
+            self.entries[key] = (time.monotonic() + self.ttl, row)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, user_id: int, domain: str = None):
+        """Drop one (user, domain) entry, or every domain for the user"""
+        with self.lock:
+            self.generation += 1
+            if domain:
+                self.entries.pop((user_id, domain), None)
+            else:
+                for key in [k for k in self.entries if k[0] == user_id]:
+                    del self.entries[key]
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return {'size': len(self.entries), 'hits': self.hits, 'misses': self.misses, 'ttl': self.ttl}
+
+
+token_cache = TokenCache()
+access_cache = AccessCache()
+
+
+def invalidate_access(user_id: int, domain: str = None):
+    """Call after any domain_access tier/feature change"""
+    access_cache.invalidate(user_id, domain)
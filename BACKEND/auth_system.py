@@ -10,7 +10,12 @@ import secrets
 from datetime import datetime, timedelta
 from typing import Optional, Dict
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
+
+from auth_cache import token_cache, access_cache, invalidate_access
+from db_pool import get_connection, init_app
+from usage_meter import get_usage_meter
+from tier_catalog import get_catalog
 
 # Configuration
 SECRET_KEY = os.getenv('JWT_SECRET_KEY', secrets.token_urlsafe(32))
@@ -24,7 +29,7 @@ class AuthSystem:
     """
 
     def __init__(self):
-        self.db_conn = psycopg2.connect(DATABASE_URL)
+        self.db_conn = get_connection()
 
     def _get_cursor(self):
         return self.db_conn.cursor(cursor_factory=RealDictCursor)
@@ -154,12 +159,22 @@ class AuthSystem:
             } or None if invalid
         """
 
+        if not token:
+            return None
+
+        # Already verified and not yet expired: skip the signature check
+        cached = token_cache.get(token)
+        if cached:
+            return cached
+
         try:
             payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-            return {
+            user_data = {
                 'user_id': payload['user_id'],
                 'email': payload['email']
             }
+            token_cache.put(token, payload.get('exp'), user_data)  # exp is optional in a JWT
+            return user_data
         except jwt.ExpiredSignatureError:
             return None
         except jwt.InvalidTokenError:
@@ -178,14 +193,18 @@ class AuthSystem:
             }
         """
 
-        cursor = self._get_cursor()
-        cursor.execute("""
-            SELECT tier, feature_flags, usage_current_month, active
-            FROM domain_access
-            WHERE user_id = %s AND domain = %s AND active = TRUE
-        """, (user_id, domain))
+        generation = access_cache.generation  # before the read (see auth_cache)
+        hit, access = access_cache.get(user_id, domain)
+        if not hit:
+            cursor = self._get_cursor()
+            cursor.execute("""
+                SELECT tier, feature_flags, usage_current_month, usage_reset_date, active
+                FROM domain_access
+                WHERE user_id = %s AND domain = %s AND active = TRUE
+            """, (user_id, domain))
 
-        access = cursor.fetchone()
+            access = cursor.fetchone()
+            access_cache.put(user_id, domain, access, generation)
 
         if not access:
             return {'has_access': False, 'tier': None}
@@ -196,49 +215,21 @@ class AuthSystem:
         return {
             'has_access': True,
             'tier': access['tier'],
-            'usage_current_month': access['usage_current_month'] or {},
+            'usage_current_month': get_usage_meter().usage_for(
+                user_id, domain, access['usage_current_month'], access['usage_reset_date']
+            ),
             'limits': access['feature_flags'] or {}
         }
 
     def record_usage(self, user_id: int, domain: str, action: str, count: int = 1):
         """
         Track usage for freemium limits
+        Buffered in memory and flushed atomically (see usage_meter.py)
 
         Example: record_usage(123, 'intelligence', 'ai_actions', 1)
         """
 
-        cursor = self._get_cursor()
-
-        # Get current usage
-        cursor.execute("""
-            SELECT usage_current_month, usage_reset_date
-            FROM domain_access
-            WHERE user_id = %s AND domain = %s
-        """, (user_id, domain))
-
-        result = cursor.fetchone()
-        if not result:
-            return
-
-        usage = result['usage_current_month'] or {}
-        reset_date = result['usage_reset_date']
-
-        # Reset if month has passed
-        if not reset_date or datetime.now() > reset_date:
-            usage = {}
-            reset_date = datetime.now() + timedelta(days=30)
-
-        # Update usage count
-        usage[action] = usage.get(action, 0) + count
-
-        # Save
-        cursor.execute("""
-            UPDATE domain_access
-            SET usage_current_month = %s, usage_reset_date = %s
-            WHERE user_id = %s AND domain = %s
-        """, (psycopg2.extras.Json(usage), reset_date, user_id, domain))
-
-        self.db_conn.commit()
+        get_usage_meter().record(user_id, domain, action, count)
 
     def _generate_token(self, user_id: int, email: str) -> str:
         """Generate JWT token"""
@@ -250,79 +241,24 @@ class AuthSystem:
         return jwt.encode(payload, SECRET_KEY, algorithm='HS256')
 
     def _grant_free_tier_access(self, user_id: int):
-        """Grant free tier access to all 7 domains"""
+        """Grant free tier access to every domain (features from the tier catalog)"""
 
-        domains_config = [
-            {
-                'domain': 'music',
-                'tier': 'free',
-                'features': {
-                    'streams_tracking': True,
-                    'basic_analytics': True,
-                    'monthly_limit': 100
-                }
-            },
-            {
-                'domain': 'intelligence',
-                'tier': 'free',
-                'features': {
-                    'ai_actions_per_month': 25,
-                    'basic_models': True
-                }
-            },
-            {
-                'domain': 'tools',
-                'tier': 'free',
-                'features': {
-                    'modules_limit': 5,
-                    'basic_features': True
-                }
-            },
-            {
-                'domain': 'education',
-                'tier': 'free',
-                'features': {
-                    'courses_limit': 1,
-                    'basic_content': True
-                }
-            },
-            {
-                'domain': 'commerce',
-                'tier': 'free',
-                'features': {
-                    'store_access': True
-                }
-            },
-            {
-                'domain': 'communication',
-                'tier': 'free',
-                'features': {
-                    'oib_access': True
-                }
-            },
-            {
-                'domain': 'community',
-                'tier': 'free',
-                'features': {
-                    'forum_access': True
-                }
-            }
+        catalog = get_catalog()
+        reset_date = datetime.now() + timedelta(days=30)
+
+        rows = [
+            (user_id, domain, 'free', psycopg2.extras.Json(catalog.features(domain, 'free')), reset_date)
+            for domain in catalog.domains()
         ]
 
         cursor = self._get_cursor()
-        for config in domains_config:
-            cursor.execute("""
-                INSERT INTO domain_access (user_id, domain, tier, feature_flags, usage_reset_date)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (
-                user_id,
-                config['domain'],
-                config['tier'],
-                psycopg2.extras.Json(config['features']),
-                datetime.now() + timedelta(days=30)
-            ))
+        execute_values(cursor, """
+            INSERT INTO domain_access (user_id, domain, tier, feature_flags, usage_reset_date)
+            VALUES %s
+        """, rows)
 
         self.db_conn.commit()
+        invalidate_access(user_id)
 
     def _track_event(self, user_id: int, event_type: str, from_tier: str, to_tier: str, domain: str):
         """Track conversion events"""
@@ -343,6 +279,7 @@ from flask import Flask, request, jsonify
 from functools import wraps
 
 app = Flask(__name__)
+init_app(app)
 auth = AuthSystem()
 
 def require_auth(f):
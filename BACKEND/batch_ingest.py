@@ -0,0 +1,113 @@
+"""
+Batch Ingest
+Shared parsing/validation for the multi-event /batch endpoints
+
+Used by:
+- BACKEND/analytics_receiver.py   POST /batch
+- LOCAL_NERVE_COLLECTOR.py        POST /api/visitor/batch
+- UNIFIED_ANALYTICS_MASTER.py     POST /batch
+
+Accepted bodies:
+- JSON array:          [{...}, {...}]
+- JSON object:         {"events": [{...}, {...}]}
+- NDJSON:              one JSON object per line
+
+Each event gets its own status in the response so a tracker can retry only
+the ones that failed:
+    {"accepted": 2, "rejected": 1,
+     "results": [{"index": 0, "status": "ok"}, {"index": 1, "status": "error", "error": "..."}]}
+"""
+
+import json
+from typing import Callable, Dict, List, Optional, Tuple
+
+MAX_BATCH_EVENTS = 1000
+
+
+def parse_batch_body(raw: bytes, content_type: str = '') -> List[Tuple[Optional[Dict], Optional[str]]]:
+    """
+    Split a request body into (event, error) pairs, one per event
+    Raises ValueError if the body cannot be read as a batch at all
+    """
+    text = raw.decode('utf-8') if isinstance(raw, bytes) else raw
+    text = text.strip()
+    if not text:
+        return []
+
+    if 'ndjson' not in content_type and text[0] in '[{':
+        try:
+            body = json.loads(text)
+        except json.JSONDecodeError:
+            body = None
+
+        if isinstance(body, dict):
+            body = body.get('events', [body])
+        if isinstance(body, list):
+            return [(event, None) for event in body]
+
+    # NDJSON: a bad line only fails that event
+    items = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            items.append((json.loads(line), None))
+        except json.JSONDecodeError as e:
+            items.append((None, f"invalid JSON: {e.msg}"))
+
+    if items and all(event is None for event, _ in items):
+        raise ValueError('Body is neither a JSON array nor NDJSON')
+    return items
+
+
+def validate_batch(items: List[Tuple[Optional[Dict], Optional[str]]],
+                   validator: Optional[Callable[[Dict], Optional[str]]] = None) -> Tuple[List[Tuple[int, Dict]], List[Dict]]:
+    """
+    Validate every event in one pass
+
+    validator(event) returns an error message or None.
+    Returns (accepted [(index, event)], results [per-event status])
+    """
+    accepted = []
+    results = []
+
+    for index, (event, error) in enumerate(items):
+        if error is None and not isinstance(event, dict):
+            error = 'event must be a JSON object'
+        if error is None and validator:
+            error = validator(event)
+
+        if error:
+            results.append({'index': index, 'status': 'error', 'error': error})
+        else:
+            accepted.append((index, event))
+            results.append({'index': index, 'status': 'ok'})
+
+    return accepted, results
+
+
+def read_batch(request, validator: Optional[Callable[[Dict], Optional[str]]] = None) -> Tuple[List[Tuple[int, Dict]], List[Dict]]:
+    """
+    Parse and validate a Flask request body
+    Raises ValueError for unreadable or oversized batches (-> 400)
+    """
+    items = parse_batch_body(request.get_data(), request.content_type or '')
+
+    if len(items) > MAX_BATCH_EVENTS:
+        raise ValueError(f"Batch too large ({len(items)} events, max {MAX_BATCH_EVENTS})")
+
+    return validate_batch(items, validator)
+
+
+def batch_response(results: List[Dict], **extra) -> Dict:
+    """Response body with per-event status"""
+    accepted = sum(1 for r in results if r['status'] == 'ok')
+    response = {
+        'success': accepted == len(results),
+        'accepted': accepted,
+        'rejected': len(results) - accepted,
+        'results': results
+    }
+    response.update(extra)
+    return response
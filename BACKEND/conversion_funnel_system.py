@@ -11,24 +11,107 @@ Converts free users to paid subscriptions through:
 """
 
 import os
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from decimal import Decimal
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 from flask import Flask, request, jsonify
 import requests
 
+from db_pool import get_connection, init_app
+from email_sender import send_batch, send_email
+from usage_meter import get_usage_meter
+from tier_catalog import get_catalog
+
 # Configuration
 DATABASE_URL = os.getenv('DATABASE_URL', 'postgresql://localhost/consciousness_revolution')
-SMTP_HOST = os.getenv('SMTP_HOST', 'smtp.gmail.com')
-SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
-SMTP_USER = os.getenv('SMTP_USER')
-SMTP_PASSWORD = os.getenv('SMTP_PASSWORD')
-FROM_EMAIL = 'hello@conciousnessrevolution.io'
+EMAIL_BATCH_SIZE = int(os.getenv('EMAIL_BATCH_SIZE', '500'))
+EMAIL_MAX_ATTEMPTS = 3
+EMAIL_RETRY_DELAY = int(os.getenv('EMAIL_RETRY_DELAY', '3600'))  # seconds before the 1st retry, doubling
+EMAIL_SEND_LEASE = int(os.getenv('EMAIL_SEND_LEASE', '900'))  # seconds a 'sending' claim is held
+
+# Free-tier usage keys at or past 80% of their limit (95% is the second warning)
+# One pass over free domain_access rows; new (user, domain, action, threshold,
+# month) keys are queued into email_sends, existing ones are skipped
+QUEUE_LIMIT_WARNINGS_SQL = """
+    WITH usage AS (
+        SELECT
+            da.user_id,
+            da.domain,
+            u.key AS action,
+            (u.value #>> '{}')::numeric AS current_usage,
+            CASE
+                WHEN jsonb_typeof(da.feature_flags -> (u.key || '_limit')) = 'number'
+                THEN (da.feature_flags ->> (u.key || '_limit'))::numeric
+                WHEN jsonb_typeof(da.feature_flags -> (u.key || '_per_month')) = 'number'
+                THEN (da.feature_flags ->> (u.key || '_per_month'))::numeric
+                ELSE 0
+            END AS usage_limit
+        FROM domain_access da
+        CROSS JOIN LATERAL jsonb_each(da.usage_current_month) AS u
+        WHERE da.tier = 'free'
+        AND da.usage_current_month <> '{}'::jsonb
+        AND (da.usage_reset_date IS NULL OR da.usage_reset_date > NOW())
+        AND jsonb_typeof(u.value) = 'number'
+    )
+    INSERT INTO email_sends (user_id, kind, domain, action, threshold, period, metadata)
+    SELECT
+        user_id, 'limit_warning', domain, action,
+        CASE WHEN current_usage * 100 >= usage_limit * 95 THEN 95 ELSE 80 END,
+        to_char(NOW(), 'YYYY-MM'),
+        jsonb_build_object('usage', current_usage, 'limit', usage_limit)
+    FROM usage
+    WHERE usage_limit > 0
+    AND current_usage * 100 >= usage_limit * 80
+    AND current_usage < usage_limit
+    ON CONFLICT (user_id, kind, domain, action, threshold, period) DO NOTHING
+"""
+
+QUEUE_TRIAL_ENDING_SQL = """
+    INSERT INTO email_sends (user_id, kind, domain, period, metadata)
+    SELECT
+        s.user_id, 'trial_ending', s.domain, to_char(s.trial_end, 'YYYY-MM-DD'),
+        jsonb_build_object('days_remaining', EXTRACT(DAY FROM s.trial_end - NOW())::int)
+    FROM subscriptions s
+    WHERE s.status = 'trialing'
+    AND s.trial_end BETWEEN NOW() AND NOW() + INTERVAL '3 days'
+    ON CONFLICT (user_id, kind, domain, action, threshold, period) DO NOTHING
+"""
+
+# Claim a batch of due emails: queued ones, failed ones whose backoff has
+# passed, and 'sending' ones whose lease ran out (the run that claimed them
+# died; they are sent again, so delivery is at-least-once). SKIP LOCKED lets
+# overlapping runs split the work; rows this run already claimed are skipped
+# so a failing address gets one attempt per run.
+CLAIM_EMAILS_SQL = """
+    UPDATE email_sends es
+    SET status = 'sending', attempts = es.attempts + 1, claimed_at = NOW()
+    FROM users u
+    WHERE es.id IN (
+        SELECT id FROM email_sends
+        WHERE (
+            (status IN ('queued', 'failed') AND next_attempt_at <= NOW())
+            OR (status = 'sending' AND claimed_at < NOW() - make_interval(secs => %(lease)s))
+        )
+        AND attempts < %(max_attempts)s
+        AND (claimed_at IS NULL OR claimed_at < %(run_started)s)
+        ORDER BY id
+        LIMIT %(limit)s
+        FOR UPDATE SKIP LOCKED
+    )
+    AND u.id = es.user_id
+    RETURNING es.id, es.user_id, es.kind, es.domain, es.action, es.threshold,
+              es.metadata, es.attempts, u.email, u.full_name
+"""
+
+# Abandoned claims with no attempts left end as failed instead of 'sending' forever
+EXPIRE_EMAIL_CLAIMS_SQL = """
+    UPDATE email_sends
+    SET status = 'failed'
+    WHERE status = 'sending'
+    AND claimed_at < NOW() - make_interval(secs => %s)
+    AND attempts >= %s
+"""
 
 class ConversionFunnelSystem:
     """
@@ -36,7 +119,7 @@ class ConversionFunnelSystem:
     """
 
     def __init__(self):
-        self.db_conn = psycopg2.connect(DATABASE_URL)
+        self.db_conn = get_connection()
 
     def _get_cursor(self):
         return self.db_conn.cursor(cursor_factory=RealDictCursor)
@@ -73,7 +156,10 @@ class ConversionFunnelSystem:
 
         # Get limits for current tier
         features = access['feature_flags']
-        usage = access['usage_current_month'] or {}
+        # Persisted usage plus counts still buffered in this process
+        usage = get_usage_meter().usage_for(
+            user_id, domain, access['usage_current_month'], access['usage_reset_date']
+        )
 
         # Check specific action limit
         limit_key = f'{action}_limit'
@@ -143,46 +229,27 @@ class ConversionFunnelSystem:
         Shows what user would unlock
         """
 
-        tier_hierarchy = ['free', 'pro', 'pro_plus', 'enterprise']
-        current_index = tier_hierarchy.index(current_tier)
-
-        if current_index >= len(tier_hierarchy) - 1:
-            # Already at highest tier
-            return {}
-
-        next_tier = tier_hierarchy[current_index + 1]
-
-        # Get tier details
-        cursor = self._get_cursor()
-        cursor.execute("""
-            SELECT tier, name, price_monthly, price_annual, features
-            FROM subscription_tiers
-            WHERE domain = %s AND tier IN (%s, %s)
-        """, (domain, current_tier, next_tier))
-
-        tiers = cursor.fetchall()
-        current = next((t for t in tiers if t['tier'] == current_tier), None)
-        upgraded = next((t for t in tiers if t['tier'] == next_tier), None)
+        catalog = get_catalog()
+        current = catalog.get(domain, current_tier)
+        upgraded = catalog.next_tier(domain, current_tier)
 
         if not current or not upgraded:
+            # Unknown tier, or already at the highest tier this domain sells
             return {}
 
         return {
             'current': {
-                'tier': current['tier'],
-                'name': current['name'],
-                'price': 0 if current_tier == 'free' else float(current['price_monthly'])
+                'tier': current.tier,
+                'name': current.name,
+                'price': current.monthly_price
             },
             'upgrade_to': {
-                'tier': upgraded['tier'],
-                'name': upgraded['name'],
-                'price_monthly': float(upgraded['price_monthly']),
-                'price_annual': float(upgraded['price_annual']),
-                'features_unlocked': self._get_unlocked_features(
-                    current.get('features', {}),
-                    upgraded.get('features', {})
-                ),
-                'savings_annual': float(upgraded['price_monthly'] * 12 - upgraded['price_annual'])
+                'tier': upgraded.tier,
+                'name': upgraded.name,
+                'price_monthly': upgraded.monthly_price,
+                'price_annual': upgraded.annual_price,
+                'features_unlocked': self._get_unlocked_features(current.features, upgraded.features),
+                'savings_annual': round(upgraded.monthly_price * 12 - upgraded.annual_price, 2)
             }
         }
 
@@ -283,13 +350,22 @@ class ConversionFunnelSystem:
 
         tier_comparison = self._get_tier_comparison(domain, current_tier)
 
+        subject, html_content = self._render_limit_warning(
+            user_id, user['full_name'], domain, action, usage, limit, tier_comparison
+        )
+        self._send_email(user['email'], subject, html_content)
+
+    def _render_limit_warning(self, user_id: int, full_name: str, domain: str, action: str,
+                              usage: int, limit: int, tier_comparison: Dict):
+        """Subject and HTML for the usage limit warning"""
+
         # Email content
         subject = f"You're almost at your {domain.title()} limit"
 
         html_content = f"""
         <html>
         <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-            <h2>Hey {user['full_name'] or 'there'},</h2>
+            <h2>Hey {full_name or 'there'},</h2>
 
             <p>You've used <strong>{usage} of {limit}</strong> {action.replace('_', ' ')} this month.</p>
 
@@ -327,7 +403,7 @@ class ConversionFunnelSystem:
         </html>
         """
 
-        self._send_email(user['email'], subject, html_content)
+        return subject, html_content
 
     def send_trial_ending_email(self, user_id: int, domain: str, days_remaining: int):
         """Send email as trial period ends"""
@@ -336,12 +412,18 @@ class ConversionFunnelSystem:
         cursor.execute("SELECT email, full_name FROM users WHERE id = %s", (user_id,))
         user = cursor.fetchone()
 
+        subject, html_content = self._render_trial_ending(user_id, user['full_name'], domain, days_remaining)
+        self._send_email(user['email'], subject, html_content)
+
+    def _render_trial_ending(self, user_id: int, full_name: str, domain: str, days_remaining: int):
+        """Subject and HTML for the trial ending reminder"""
+
         subject = f"Your {domain.title()} trial ends in {days_remaining} days"
 
         html_content = f"""
         <html>
         <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-            <h2>Hey {user['full_name'] or 'there'},</h2>
+            <h2>Hey {full_name or 'there'},</h2>
 
             <p>Your {domain.title()} Domain trial ends in <strong>{days_remaining} days</strong>.</p>
 
@@ -369,7 +451,7 @@ class ConversionFunnelSystem:
         </html>
         """
 
-        self._send_email(user['email'], subject, html_content)
+        return subject, html_content
 
     def _send_conversion_email(self, user_id: int, domain: str, tier: str):
         """Send celebration email after successful conversion"""
@@ -413,80 +495,97 @@ class ConversionFunnelSystem:
         self._send_email(user['email'], subject, html_content)
 
     def _send_email(self, to_email: str, subject: str, html_content: str):
-        """Send email via SMTP"""
-
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = FROM_EMAIL
-        msg['To'] = to_email
-
-        html_part = MIMEText(html_content, 'html')
-        msg.attach(html_part)
-
-        try:
-            with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-                server.starttls()
-                server.login(SMTP_USER, SMTP_PASSWORD)
-                server.send_message(msg)
-        except Exception as e:
-            # Log error but don't break flow
-            print(f"Failed to send email: {e}")
+        """Send one email via SMTP (failures are logged, not raised)"""
+        send_email(to_email, subject, html_content)
 
     # =====================================================
     # AUTOMATED TRIGGERS
     # =====================================================
 
-    def run_automated_triggers(self):
+    def run_automated_triggers(self) -> Dict:
         """
         Run periodic checks for conversion opportunities
         Call this via cron job every hour
+
+        1. Queue new limit warnings and trial reminders (two set-based
+           INSERT ... SELECTs; email_sends makes each one send at most once)
+        2. Claim queued emails in batches, render, send over reused
+           rate-limited SMTP connections, record sent/failed per email;
+           a failed email is retried on a later run after its backoff
         """
 
         cursor = self._get_cursor()
+        cursor.execute(QUEUE_LIMIT_WARNINGS_SQL)
+        queued = cursor.rowcount
+        cursor.execute(QUEUE_TRIAL_ENDING_SQL)
+        queued += cursor.rowcount
+        cursor.execute(EXPIRE_EMAIL_CLAIMS_SQL, (EMAIL_SEND_LEASE, EMAIL_MAX_ATTEMPTS))
+        cursor.execute("SELECT NOW() AS run_started")
+        run_started = cursor.fetchone()['run_started']
+        self.db_conn.commit()
 
-        # Find users approaching limits (80-99% usage)
-        cursor.execute("""
-            SELECT DISTINCT da.user_id, da.domain, da.tier,
-                   da.feature_flags, da.usage_current_month
-            FROM domain_access da
-            WHERE da.tier = 'free'
-            AND da.usage_current_month IS NOT NULL
-        """)
-
-        users_to_check = cursor.fetchall()
-
-        for user in users_to_check:
-            usage = user['usage_current_month']
-            features = user['feature_flags']
-
-            # Check each usage metric
-            for action, current_usage in usage.items():
-                limit_key = f'{action}_limit'
-                limit = features.get(limit_key, features.get(f'{action}_per_month', 0))
-
-                if limit > 0:
-                    usage_percent = (current_usage / limit * 100)
-
-                    # Send warning email at 80% and 95%
-                    if 80 <= usage_percent < 85:
-                        self.send_limit_warning_email(
-                            user['user_id'], user['domain'], action,
-                            current_usage, limit
+        tier_comparisons = {}
+        sent = failed = 0
+
+        while True:
+            cursor.execute(CLAIM_EMAILS_SQL, {
+                'lease': EMAIL_SEND_LEASE,
+                'max_attempts': EMAIL_MAX_ATTEMPTS,
+                'run_started': run_started,
+                'limit': EMAIL_BATCH_SIZE
+            })
+            claimed = cursor.fetchall()
+            self.db_conn.commit()
+
+            if not claimed:
+                break
+
+            messages = []
+            renderable = []
+            for row in claimed:
+                metadata = row['metadata'] or {}
+                try:
+                    if row['kind'] == 'limit_warning':
+                        if row['domain'] not in tier_comparisons:
+                            tier_comparisons[row['domain']] = self._get_tier_comparison(row['domain'], 'free')
+                        subject, html_content = self._render_limit_warning(
+                            row['user_id'], row['full_name'], row['domain'], row['action'],
+                            int(metadata.get('usage', 0)), int(metadata.get('limit', 0)),
+                            tier_comparisons[row['domain']]
                         )
-
-        # Find trial periods ending soon
-        cursor.execute("""
-            SELECT s.user_id, s.domain, s.trial_end
-            FROM subscriptions s
-            WHERE s.status = 'trialing'
-            AND s.trial_end BETWEEN NOW() AND NOW() + INTERVAL '3 days'
-        """)
-
-        trials_ending = cursor.fetchall()
-
-        for trial in trials_ending:
-            days_remaining = (trial['trial_end'] - datetime.now()).days
-            self.send_trial_ending_email(trial['user_id'], trial['domain'], days_remaining)
+                    else:
+                        subject, html_content = self._render_trial_ending(
+                            row['user_id'], row['full_name'], row['domain'], metadata.get('days_remaining', 0)
+                        )
+                except (KeyError, TypeError) as e:
+                    # e.g. no upgrade tier configured for the domain
+                    print(f"Cannot render {row['kind']} email {row['id']}: {e}")
+                    renderable.append(False)
+                    continue
+                renderable.append(True)
+                messages.append({'to': row['email'], 'subject': subject, 'html': html_content})
+
+            results = iter(send_batch(messages))
+            delivered = [ok and next(results) for ok in renderable]
+
+            # Failures back off exponentially (EMAIL_RETRY_DELAY, then x2 per attempt)
+            execute_values(cursor, """
+                UPDATE email_sends es
+                SET status = d.status,
+                    sent_at = CASE WHEN d.status = 'sent' THEN NOW() ELSE es.sent_at END,
+                    next_attempt_at = NOW() + make_interval(secs => d.retry_delay)
+                FROM (VALUES %s) AS d(id, status, retry_delay)
+                WHERE es.id = d.id
+            """, [
+                (row['id'], 'sent' if ok else 'failed', EMAIL_RETRY_DELAY * 2 ** (row['attempts'] - 1))
+                for row, ok in zip(claimed, delivered)
+            ])
+            self.db_conn.commit()
+
+            sent += sum(delivered)
+            failed += len(delivered) - sum(delivered)
+
+        return {'queued': queued, 'sent': sent, 'failed': failed}
 
     # =====================================================
     # ANALYTICS & OPTIMIZATION
@@ -606,6 +705,7 @@ class ConversionFunnelSystem:
 # =====================================================
 
 app = Flask(__name__)
+init_app(app)
 conversion = ConversionFunnelSystem()
 
 # Import auth
@@ -35,6 +35,9 @@ CREATE TABLE users (
     utm_source VARCHAR(100),
     utm_campaign VARCHAR(100),
 
+    -- Creator Payouts (Stripe Connect Express)
+    stripe_connect_id VARCHAR(255),
+
     -- Metadata
     metadata JSONB DEFAULT '{}'::jsonb,
 
@@ -165,6 +168,7 @@ CREATE TABLE marketplace_items (
     creator_id INTEGER NOT NULL REFERENCES users(id),
 
     -- Item Details
+    domain VARCHAR(50) NOT NULL, -- music, intelligence, etc.
     type VARCHAR(50) NOT NULL, -- korpak, module, data_crystal, course, template
     title VARCHAR(255) NOT NULL,
     description TEXT,
@@ -177,10 +181,12 @@ CREATE TABLE marketplace_items (
 
     -- Content
     file_url TEXT,
+    file_urls JSONB DEFAULT '[]'::jsonb, -- delivered on purchase
     preview_url TEXT,
     demo_url TEXT,
 
     -- Stats
+    sales_count INTEGER DEFAULT 0, -- incremented per purchase (browse 'popular')
     total_sales INTEGER DEFAULT 0,
     total_revenue DECIMAL(10,2) DEFAULT 0,
     average_rating DECIMAL(3,2),
@@ -189,6 +195,12 @@ CREATE TABLE marketplace_items (
     -- Status
     status VARCHAR(20) DEFAULT 'draft', -- draft, pending_review, published, suspended
     published_at TIMESTAMP,
+    active BOOLEAN DEFAULT TRUE, -- listed in browse (set by creators)
+
+    -- Search
+    search_vector tsvector GENERATED ALWAYS AS (
+        to_tsvector('english', COALESCE(title, '') || ' ' || COALESCE(description, ''))
+    ) STORED,
 
     -- Timestamps
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -256,11 +268,32 @@ CREATE TABLE creator_payouts (
     items_count INTEGER,
     metadata JSONB DEFAULT '{}'::jsonb,
 
+    UNIQUE(creator_id, period_start), -- one payout per creator per month
+
     INDEX idx_creator_id (creator_id),
     INDEX idx_status (status),
     INDEX idx_period_end (period_end)
 );
 
+-- Monthly payout job checkpoint (see payout_engine.py)
+CREATE TABLE payout_runs (
+    period_start DATE PRIMARY KEY,
+    period_end DATE NOT NULL,
+
+    -- Progress (committed with each chunk of payouts)
+    last_creator_id INTEGER DEFAULT 0,
+    creators_paid INTEGER DEFAULT 0,
+    total_amount DECIMAL(12,2) DEFAULT 0,
+    creators_pending INTEGER DEFAULT 0, -- no Stripe Connect account yet (settled later)
+    pending_amount DECIMAL(12,2) DEFAULT 0,
+    chunks INTEGER DEFAULT 0,
+    status VARCHAR(20) DEFAULT 'running', -- running, completed
+
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
 -- =====================================================
 -- KORPAK SYSTEM (Autonomous Work Generation)
 -- =====================================================
@@ -272,6 +305,9 @@ CREATE TABLE korpaks (
     name VARCHAR(255) NOT NULL,
     mission TEXT NOT NULL,
     category VARCHAR(100), -- revenue, product, marketing, operations
+    type VARCHAR(50), -- conversion, retention, expansion, creator_acquisition, viral_growth, content_creation
+    priority VARCHAR(20) DEFAULT 'medium',
+    active BOOLEAN DEFAULT TRUE,
 
     -- Configuration
     steps JSONB NOT NULL, -- [{"step": 1, "action": "...", "ai_executable": true}, ...]
@@ -284,6 +320,8 @@ CREATE TABLE korpaks (
 
     -- Success Criteria
     success_metrics JSONB, -- {"mrr_target": 10000, "user_target": 100}
+    estimated_revenue DECIMAL(10,2) DEFAULT 0,
+    target_completion_date TIMESTAMP,
 
     -- Marketplace
     is_public BOOLEAN DEFAULT FALSE,
@@ -291,13 +329,14 @@ CREATE TABLE korpaks (
     price DECIMAL(10,2),
 
     -- Stats
-    times_executed INTEGER DEFAULT 0,
+    times_executed INTEGER NOT NULL DEFAULT 0, -- incremented per execution
     success_rate DECIMAL(5,2),
     average_completion_days DECIMAL(5,1),
 
     -- Timestamps
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_executed_at TIMESTAMP,
 
     -- Metadata
     metadata JSONB DEFAULT '{}'::jsonb,
@@ -343,6 +382,38 @@ CREATE TABLE korpak_executions (
     INDEX idx_started_at (started_at)
 );
 
+-- Execution counts per KORPAK per day, maintained with each execution
+-- (by start day; the dashboard reads only this and korpaks.times_executed)
+CREATE TABLE korpak_execution_daily (
+    korpak_id INTEGER NOT NULL REFERENCES korpaks(id),
+    day DATE NOT NULL,
+
+    executions INTEGER NOT NULL DEFAULT 0,
+    successful INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (korpak_id, day),
+    INDEX idx_day (day)
+);
+
+-- One-time backfill from existing executions
+INSERT INTO korpak_execution_daily (korpak_id, day, executions, successful, failed)
+SELECT
+    korpak_id,
+    started_at::date,
+    COUNT(*),
+    COUNT(*) FILTER (WHERE status = 'completed'),
+    COUNT(*) FILTER (WHERE status = 'failed')
+FROM korpak_executions
+GROUP BY korpak_id, started_at::date
+ON CONFLICT (korpak_id, day) DO NOTHING;
+
+-- times_executed was never incremented before; count existing executions
+UPDATE korpaks k SET times_executed = (
+    SELECT COUNT(*) FROM korpak_executions e WHERE e.korpak_id = k.id
+);
+ALTER TABLE korpaks ALTER COLUMN times_executed SET NOT NULL;
+
 -- =====================================================
 -- REVENUE ANALYTICS
 -- =====================================================
@@ -388,6 +459,26 @@ CREATE TABLE revenue_snapshots (
     INDEX idx_period_date (period_date DESC)
 );
 
+-- Daily per-domain rollups (maintained by revenue_rollups.py)
+-- Today's rows are refreshed on subscription changes; past days are final
+CREATE TABLE revenue_daily_rollups (
+    day DATE NOT NULL,
+    domain VARCHAR(50) NOT NULL,
+
+    -- End-of-day state
+    mrr DECIMAL(10,2) DEFAULT 0,
+    active_subscriptions INTEGER DEFAULT 0,
+    paying_customers INTEGER DEFAULT 0,
+
+    -- Changes during the day
+    new_subscriptions INTEGER DEFAULT 0,
+    churned_subscriptions INTEGER DEFAULT 0,
+
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (day, domain)
+);
+
 -- =====================================================
 -- FREEMIUM CONVERSION TRACKING
 -- =====================================================
@@ -495,6 +586,67 @@ CREATE TABLE system_alerts (
     INDEX idx_created_at (created_at DESC)
 );
 
+-- Stripe webhook queue (webhook_queue.py): stored on receipt, processed by workers
+CREATE TABLE webhook_events (
+    seq BIGSERIAL PRIMARY KEY,
+    event_id VARCHAR(255) NOT NULL UNIQUE, -- Stripe event.id (dedup key)
+    event_type VARCHAR(100) NOT NULL,
+    customer_key VARCHAR(255) NOT NULL, -- events for one customer run in order
+    payload TEXT NOT NULL, -- raw verified body
+
+    -- Processing
+    status VARCHAR(20) NOT NULL DEFAULT 'pending', -- pending, retry, processing, done, dead
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    locked_at TIMESTAMP, -- claim lease while 'processing'
+    applied_at TIMESTAMP, -- handler's changes committed (same transaction; retries skip)
+    last_error TEXT,
+
+    received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    processed_at TIMESTAMP
+);
+
+CREATE INDEX idx_webhook_events_open ON webhook_events(seq) WHERE status IN ('pending', 'retry', 'processing');
+CREATE INDEX idx_webhook_events_customer ON webhook_events(customer_key, seq) WHERE status IN ('pending', 'retry', 'processing');
+
+-- Events that failed every retry
+CREATE TABLE webhook_dead_letters (
+    event_id VARCHAR(255) PRIMARY KEY,
+    event_type VARCHAR(100) NOT NULL,
+    customer_key VARCHAR(255) NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    last_error TEXT,
+    failed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Automated emails (one row per user/kind/threshold/period = sent at most once)
+CREATE TABLE email_sends (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id),
+
+    -- Idempotency Key
+    kind VARCHAR(50) NOT NULL, -- limit_warning, trial_ending
+    domain VARCHAR(50) NOT NULL,
+    action VARCHAR(100) NOT NULL DEFAULT '',
+    threshold INTEGER NOT NULL DEFAULT 0, -- usage percent crossed (80, 95)
+    period VARCHAR(10) NOT NULL, -- YYYY-MM, or trial end date
+
+    -- Delivery
+    status VARCHAR(20) DEFAULT 'queued', -- queued, sending, sent, failed
+    attempts INTEGER DEFAULT 0,
+    next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, -- retry backoff
+    claimed_at TIMESTAMP, -- lease of the run sending it
+    metadata JSONB DEFAULT '{}'::jsonb, -- values rendered into the email
+
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP,
+
+    UNIQUE(user_id, kind, domain, action, threshold, period)
+);
+
+CREATE INDEX idx_email_sends_pending ON email_sends(id) WHERE status IN ('queued', 'failed', 'sending');
+
 -- =====================================================
 -- MUSIC DOMAIN SPECIFIC TABLES
 -- =====================================================
@@ -621,8 +773,20 @@ CREATE TRIGGER update_korpaks_updated_at BEFORE UPDATE ON korpaks
 
 -- Composite indexes for common queries
 CREATE INDEX idx_active_subscriptions ON subscriptions(user_id, status) WHERE status = 'active';
+CREATE INDEX idx_subscriptions_domain_status ON subscriptions(domain, status);
+CREATE INDEX idx_free_tier_usage ON domain_access(user_id) WHERE tier = 'free';
 CREATE INDEX idx_recent_transactions ON transactions(user_id, created_at DESC);
-CREATE INDEX idx_published_marketplace ON marketplace_items(status, created_at DESC) WHERE status = 'published';
+CREATE INDEX idx_active_korpaks_executed ON korpaks(times_executed DESC) WHERE active = TRUE;
+CREATE INDEX idx_completed_purchases_creator ON marketplace_purchases(creator_id, purchased_at) INCLUDE (creator_earnings) WHERE status = 'completed';
+
+-- Marketplace browse: one keyset index per sort, over listed items only (see marketplace_browse.py)
+CREATE INDEX idx_browse_popular ON marketplace_items(sales_count DESC, id DESC) WHERE active = TRUE;
+CREATE INDEX idx_browse_recent ON marketplace_items(created_at DESC, id DESC) WHERE active = TRUE;
+CREATE INDEX idx_browse_price ON marketplace_items(price, id) WHERE active = TRUE; -- price_low forward, price_high backward
+CREATE INDEX idx_browse_domain_popular ON marketplace_items(domain, sales_count DESC, id DESC) WHERE active = TRUE;
+CREATE INDEX idx_browse_domain_recent ON marketplace_items(domain, created_at DESC, id DESC) WHERE active = TRUE;
+CREATE INDEX idx_browse_domain_price ON marketplace_items(domain, price, id) WHERE active = TRUE;
+CREATE INDEX idx_browse_search ON marketplace_items USING GIN (search_vector) WHERE active = TRUE;
 
 -- =====================================================
 -- INITIAL DATA SETUP
@@ -639,19 +803,28 @@ CREATE TABLE subscription_tiers (
     stripe_price_id_monthly VARCHAR(255),
     stripe_price_id_annual VARCHAR(255),
     active BOOLEAN DEFAULT TRUE,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, -- tier_catalog.py reloads when this changes
 
     UNIQUE(domain, tier_name)
 );
 
+CREATE TRIGGER update_subscription_tiers_updated_at BEFORE UPDATE ON subscription_tiers
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
 -- Seed subscription tiers
 INSERT INTO subscription_tiers (domain, tier_name, monthly_price, annual_price, features) VALUES
-('music', 'free', 0, 0, '{"streams_tracking": true, "basic_analytics": true, "monthly_limit": 100}'),
-('music', 'pro', 29.99, 299.99, '{"streams_tracking": true, "advanced_analytics": true, "sync_licensing": true, "unlimited": true}'),
-('music', 'pro_plus', 49.99, 499.99, '{"everything_in_pro": true, "team_collaboration": true, "api_access": true, "priority_support": true}'),
+('music', 'free', 0, 0, '{"streaming_tracking": true, "track_limit": 100, "basic_analytics": true, "distribution_service": false, "nft_marketplace": false, "sample_packs": false, "producer_tools": false, "courses_access": false, "coaching_sessions": 0}'),
+('music', 'pro', 29.99, 299.99, '{"streaming_tracking": true, "track_limit": -1, "basic_analytics": true, "advanced_analytics": true, "distribution_service": true, "nft_marketplace": false, "sample_packs": false, "producer_tools": true, "courses_access": true, "coaching_sessions": 0}'),
+('music', 'pro_plus', 49.99, 499.99, '{"streaming_tracking": true, "track_limit": -1, "basic_analytics": true, "advanced_analytics": true, "distribution_service": true, "nft_marketplace": true, "sample_packs": true, "producer_tools": true, "courses_access": true, "coaching_sessions": 1}'),
+('music', 'enterprise', 99.99, 999.99, '{"streaming_tracking": true, "track_limit": -1, "basic_analytics": true, "advanced_analytics": true, "distribution_service": true, "nft_marketplace": true, "sample_packs": true, "producer_tools": true, "courses_access": true, "coaching_sessions": 4, "priority_support": true, "white_label": true}'),
 ('intelligence', 'free', 0, 0, '{"ai_actions_per_month": 25, "basic_models": true}'),
 ('intelligence', 'pro', 49.99, 499.99, '{"ai_actions_unlimited": true, "advanced_models": true, "trinity_access": true}'),
 ('tools', 'free', 0, 0, '{"modules_limit": 5, "basic_features": true}'),
-('tools', 'pro', 97, 970, '{"modules_unlimited": true, "all_features": true, "priority_builds": true}');
+('tools', 'pro', 97, 970, '{"modules_unlimited": true, "all_features": true, "priority_builds": true}'),
+('education', 'free', 0, 0, '{"courses_limit": 1, "basic_content": true}'),
+('commerce', 'free', 0, 0, '{"store_access": true}'),
+('communication', 'free', 0, 0, '{"oib_access": true}'),
+('community', 'free', 0, 0, '{"forum_access": true}');
 
 -- =====================================================
 -- DATABASE SCHEMA COMPLETE
@@ -0,0 +1,318 @@
+"""
+Database Pool
+One bounded, thread-safe Postgres pool shared by every BACKEND service
+
+Services keep their `self.db_conn` / `_get_cursor()` code, but db_conn is
+now a RequestConnection: each thread (each Flask request) checks out its
+own pooled connection on first use and gives it back at teardown. Work a
+request did not commit is rolled back on release, so one failed
+transaction no longer poisons the connection for everyone else.
+
+Pool behaviour:
+- up to DB_POOL_SIZE kept-open connections, plus DB_POOL_OVERFLOW extra
+  ones under load that are closed as soon as they are returned
+- callers wait up to DB_POOL_TIMEOUT seconds for a free connection
+- connections idle longer than DB_POOL_CHECK_AFTER seconds are pinged
+  before reuse and transparently reopened if the server dropped them
+- get_stats(): in-use, idle, overflow, wait time, timeouts, reconnects
+
+Usage:
+    self.db_conn = get_connection()     # in a service __init__
+    init_app(app)                       # once per Flask app
+
+Run this file against DATABASE_URL for a parallel load check.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict
+
+import psycopg2
+import psycopg2.extensions
+
+DATABASE_URL = os.getenv('DATABASE_URL', 'postgresql://localhost/consciousness_revolution')
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+POOL_OVERFLOW = int(os.getenv('DB_POOL_OVERFLOW', '10'))
+POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+POOL_CHECK_AFTER = float(os.getenv('DB_POOL_CHECK_AFTER', '30'))
+
+
+class PoolTimeout(Exception):
+    """No connection became free within the pool timeout"""
+
+
+class ConnectionPool:
+    """
+    Bounded psycopg2 connection pool with overflow and health checks
+    """
+
+    def __init__(self, dsn: str, size: int = POOL_SIZE, overflow: int = POOL_OVERFLOW,
+                 timeout: float = POOL_TIMEOUT, check_after: float = POOL_CHECK_AFTER):
+        self.dsn = dsn
+        self.size = size
+        self.overflow = overflow
+        self.timeout = timeout
+        self.check_after = check_after
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # (connection, returned_at)
+        self._open = 0
+        self._in_use = 0
+
+        self.stats = {
+            'checkouts': 0,
+            'wait_total': 0.0,
+            'wait_max': 0.0,
+            'timeouts': 0,
+            'reconnects': 0,
+            'discarded': 0,
+            'overflow_peak': 0
+        }
+
+    # =====================================================
+    # CHECKOUT / RETURN
+    # =====================================================
+
+    def getconn(self):
+        """Check out a healthy connection (waits up to timeout)"""
+        started = time.monotonic()
+        deadline = started + self.timeout
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    break
+                if self._open < self.size + self.overflow:
+                    # Reserve a slot; connect outside the lock
+                    self._open += 1
+                    conn, returned_at = None, None
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats['timeouts'] += 1
+                    raise PoolTimeout(f'No database connection free after {self.timeout}s')
+                self._cond.wait(remaining)
+
+            self._in_use += 1
+            self.stats['overflow_peak'] = max(self.stats['overflow_peak'], self._open - self.size)
+
+        try:
+            if conn is None:
+                conn = psycopg2.connect(self.dsn)
+            elif conn.closed or (time.monotonic() - returned_at > self.check_after and not self._is_healthy(conn)):
+                conn = self._reconnect(conn)
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        waited = time.monotonic() - started
+        with self._cond:
+            self.stats['checkouts'] += 1
+            self.stats['wait_total'] += waited
+            self.stats['wait_max'] = max(self.stats['wait_max'], waited)
+
+        return conn
+
+    def putconn(self, conn):
+        """Return a connection; uncommitted work is rolled back"""
+        keep = not conn.closed
+        if keep and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                keep = False
+
+        with self._cond:
+            self._in_use -= 1
+            if keep and self._open <= self.size:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                # Broken, or an overflow connection: close instead of keeping
+                self._open -= 1
+                self.stats['discarded'] += 1
+                keep = False
+            self._cond.notify()
+
+        if not keep and not conn.closed:
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        """Scoped checkout: `with pool.connection() as conn:`"""
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    # =====================================================
+    # HEALTH
+    # =====================================================
+
+    def _is_healthy(self, conn) -> bool:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _reconnect(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        with self._cond:
+            self.stats['reconnects'] += 1
+        return psycopg2.connect(self.dsn)
+
+    def close_all(self):
+        """Close idle connections (checked-out ones close when returned)"""
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._open -= len(idle)
+        for conn, _ in idle:
+            conn.close()
+
+    def get_stats(self) -> Dict:
+        with self._cond:
+            checkouts = self.stats['checkouts']
+            return {
+                'size': self.size,
+                'max_overflow': self.overflow,
+                'open': self._open,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'overflow': max(0, self._open - self.size),
+                'overflow_peak': max(0, self.stats['overflow_peak']),
+                'checkouts': checkouts,
+                'avg_wait_ms': round(self.stats['wait_total'] / checkouts * 1000, 3) if checkouts else 0,
+                'max_wait_ms': round(self.stats['wait_max'] * 1000, 3),
+                'timeouts': self.stats['timeouts'],
+                'reconnects': self.stats['reconnects'],
+                'discarded': self.stats['discarded']
+            }
+
+
+class RequestConnection:
+    """
+    Connection-shaped handle that gives each thread its own pooled connection
+    Checked out on first use, returned by release() (Flask teardown)
+    """
+
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self.pool.getconn()
+        return conn
+
+    def cursor(self, *args, **kwargs):
+        return self._conn().cursor(*args, **kwargs)
+
+    def commit(self):
+        self._conn().commit()
+
+    def rollback(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.rollback()
+
+    @contextmanager
+    def transaction(self):
+        """Commit on success, roll back on error"""
+        conn = self._conn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def release(self):
+        """Give this thread's connection back to the pool"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.conn = None
+            self.pool.putconn(conn)
+
+
+_pool = None
+_connection = None
+_init_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Process-wide pool for DATABASE_URL"""
+    global _pool
+    if _pool is None:
+        with _init_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DATABASE_URL)
+    return _pool
+
+
+def get_connection() -> RequestConnection:
+    """Process-wide per-thread connection handle (use as a service's db_conn)"""
+    global _connection
+    if _connection is None:
+        pool = get_pool()
+        with _init_lock:
+            if _connection is None:
+                _connection = RequestConnection(pool)
+    return _connection
+
+
+def init_app(app):
+    """Release the request's connection when each Flask request ends"""
+    @app.teardown_request
+    def _release_db_connection(exc):
+        get_connection().release()
+
+
+if __name__ == '__main__':
+    # Parallel load check: many more concurrent "requests" than connections
+    from concurrent.futures import ThreadPoolExecutor
+
+    REQUESTS = 500
+    db = get_connection()
+
+    def fake_request(i):
+        try:
+            cursor = db.cursor()
+            cursor.execute('SELECT %s, pg_sleep(0.01)', (i,))
+            value = cursor.fetchone()[0]
+            if i % 50 == 0:
+                # A failing request must not leak its aborted transaction
+                cursor.execute('SELECT 1 / 0')
+            return value == i
+        except psycopg2.DataError:
+            return True
+        finally:
+            db.release()
+
+    print(f"🧪 {REQUESTS} parallel requests over a pool of {POOL_SIZE} (+{POOL_OVERFLOW} overflow)")
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=100) as executor:
+        results = list(executor.map(fake_request, range(REQUESTS)))
+    elapsed = time.monotonic() - started
+
+    stats = get_pool().get_stats()
+    print(f"   {sum(results)}/{REQUESTS} ok in {elapsed:.2f}s")
+    print(f"   {stats}")
+    assert all(results)
+    assert stats['in_use'] == 0
+    assert stats['open'] <= POOL_SIZE
+    print("✅ Pool healthy")
@@ -0,0 +1,137 @@
+"""
+Email Sender
+Batched SMTP delivery with connection reuse and a shared rate limit
+
+- each worker keeps ONE SMTP connection open for its share of a batch
+  (reconnecting if the server drops it), instead of one session per email
+- all workers share a send rate limit (SMTP_RATE_PER_SEC) so providers
+  do not throttle or block the account
+- send_batch() returns which messages were delivered, so callers can
+  record outcomes (see conversion_funnel_system.run_automated_triggers)
+"""
+
+import os
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Dict, List
+
+SMTP_HOST = os.getenv('SMTP_HOST', 'smtp.gmail.com')
+SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
+SMTP_USER = os.getenv('SMTP_USER')
+SMTP_PASSWORD = os.getenv('SMTP_PASSWORD')
+SMTP_WORKERS = int(os.getenv('SMTP_WORKERS', '4'))
+SMTP_RATE_PER_SEC = float(os.getenv('SMTP_RATE_PER_SEC', '10'))
+FROM_EMAIL = 'hello@conciousnessrevolution.io'
+
+
+def build_message(to_email: str, subject: str, html_content: str):
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = FROM_EMAIL
+    msg['To'] = to_email
+    msg.attach(MIMEText(html_content, 'html'))
+    return msg
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across all threads"""
+
+    def __init__(self, rate_per_sec: float):
+        self.interval = 1.0 / rate_per_sec if rate_per_sec > 0 else 0
+        self.lock = threading.Lock()
+        self.next_at = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_at, now)
+            self.next_at = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class SMTPConnection:
+    """One reusable SMTP session (context manager)"""
+
+    def __init__(self, host: str = SMTP_HOST, port: int = SMTP_PORT,
+                 user: str = SMTP_USER, password: str = SMTP_PASSWORD):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.server = None
+
+    def _connect(self):
+        self.server = smtplib.SMTP(self.host, self.port, timeout=30)
+        self.server.starttls()
+        if self.user:
+            self.server.login(self.user, self.password)
+
+    def send(self, msg) -> bool:
+        for attempt in range(2):
+            try:
+                if self.server is None:
+                    self._connect()
+                self.server.send_message(msg)
+                return True
+            except smtplib.SMTPServerDisconnected:
+                # Dropped idle session: reconnect once and retry
+                self.server = None
+            except Exception as e:
+                print(f"Failed to send email to {msg['To']}: {e}")
+                return False
+        return False
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except Exception:
+                pass
+            self.server = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_rate_limiter = RateLimiter(SMTP_RATE_PER_SEC)
+
+
+def send_email(to_email: str, subject: str, html_content: str) -> bool:
+    """Send one email (own session; use send_batch for many)"""
+    _rate_limiter.wait()
+    with SMTPConnection() as connection:
+        return connection.send(build_message(to_email, subject, html_content))
+
+
+def send_batch(messages: List[Dict], workers: int = SMTP_WORKERS) -> List[bool]:
+    """
+    Send [{'to', 'subject', 'html'}, ...]
+    Returns a delivered flag per message, in order
+    """
+    if not messages:
+        return []
+
+    results = [False] * len(messages)
+    workers = max(1, min(workers, len(messages)))
+
+    def _worker(offset):
+        with SMTPConnection() as connection:
+            for i in range(offset, len(messages), workers):
+                message = messages[i]
+                _rate_limiter.wait()
+                results[i] = connection.send(build_message(message['to'], message['subject'], message['html']))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(_worker, range(workers)))
+
+    return results
@@ -19,20 +19,48 @@ Features:
 - Success metric tracking and optimization
 - Self-improvement through pattern recognition
 - Cross-domain coordination
+
+Execution stats are kept per KORPAK per day in korpak_execution_daily
+(plus korpaks.times_executed), updated in the same transaction as each
+execution, so the dashboard never scans korpak_executions.
 """
 
 import os
 import json
+import threading
+import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from decimal import Decimal
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 from flask import Flask, request, jsonify
 import requests
 
+from db_pool import get_connection, init_app
+
 # Configuration
 DATABASE_URL = os.getenv('DATABASE_URL', 'postgresql://localhost/consciousness_revolution')
+DASHBOARD_CACHE_TTL = float(os.getenv('KORPAK_DASHBOARD_TTL', '5'))
+
+# Bump one KORPAK's counters for one day (started / finished executions)
+RECORD_EXECUTION_SQL = """
+    INSERT INTO korpak_execution_daily (korpak_id, day, executions, successful, failed)
+    VALUES (%s, %s, %s, %s, %s)
+    ON CONFLICT (korpak_id, day) DO UPDATE SET
+        executions = korpak_execution_daily.executions + EXCLUDED.executions,
+        successful = korpak_execution_daily.successful + EXCLUDED.successful,
+        failed = korpak_execution_daily.failed + EXCLUDED.failed
+"""
+
+INSERT_KORPAKS_SQL = """
+    INSERT INTO korpaks (
+        name, mission, type, priority,
+        steps, success_metrics, estimated_revenue,
+        target_completion_date, active
+    ) VALUES %s
+    RETURNING id, name, type
+"""
 
 class KorpakAutonomousEngine:
     """
@@ -40,7 +68,9 @@ class KorpakAutonomousEngine:
     """
 
     def __init__(self):
-        self.db_conn = psycopg2.connect(DATABASE_URL)
+        self.db_conn = get_connection()
+        self._dashboard_lock = threading.Lock()
+        self._dashboard_cache = (0.0, None)  # (expires_at, dashboard)
 
     def _get_cursor(self):
         return self.db_conn.cursor(cursor_factory=RealDictCursor)
@@ -219,34 +249,51 @@ class KorpakAutonomousEngine:
         Create new KORPAK mission
         """
 
-        cursor = self._get_cursor()
+        return self.create_korpaks([korpak_data])[0]
 
-        cursor.execute("""
-            INSERT INTO korpaks (
-                name, mission, type, priority,
-                steps, success_metrics, estimated_revenue,
-                target_completion_date, active
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, TRUE)
-            RETURNING id
-        """, (
-            korpak_data['name'],
-            korpak_data.get('mission', korpak_data['name']),
-            korpak_data['type'],
-            korpak_data.get('priority', 'medium'),
-            psycopg2.extras.Json(korpak_data['steps']),
-            psycopg2.extras.Json(korpak_data.get('success_metric', {})),
-            korpak_data.get('estimated_revenue', 0),
-            datetime.now() + timedelta(days=7),  # 7 days default
-        ))
+    def create_korpaks(self, korpaks: List[Dict]) -> List[Dict]:
+        """
+        Create many KORPAK missions in one INSERT and one commit
+        """
+
+        if not korpaks:
+            return []
+
+        cursor = self._get_cursor()
+        target_date = datetime.now() + timedelta(days=7)  # 7 days default
+
+        rows = [
+            (
+                korpak_data['name'],
+                korpak_data.get('mission', korpak_data['name']),
+                korpak_data['type'],
+                korpak_data.get('priority', 'medium'),
+                psycopg2.extras.Json(korpak_data['steps']),
+                psycopg2.extras.Json(korpak_data.get('success_metric', {})),
+                korpak_data.get('estimated_revenue', 0),
+                target_date,
+                True
+            )
+            for korpak_data in korpaks
+        ]
 
-        korpak_id = cursor.fetchone()['id']
+        inserted = execute_values(cursor, INSERT_KORPAKS_SQL, rows, page_size=len(rows), fetch=True)
         self.db_conn.commit()
 
-        return {
-            'success': True,
-            'korpak_id': korpak_id,
-            'message': f'KORPAK #{korpak_id} created: {korpak_data["name"]}'
-        }
+        # RETURNING order is not guaranteed: match ids back by (name, type)
+        ids_by_key = {}
+        for row in inserted:
+            ids_by_key.setdefault((row['name'], row['type']), []).append(row['id'])
+
+        results = []
+        for korpak_data in korpaks:
+            korpak_id = ids_by_key[(korpak_data['name'], korpak_data['type'])].pop()
+            results.append({
+                'success': True,
+                'korpak_id': korpak_id,
+                'message': f'KORPAK #{korpak_id} created: {korpak_data["name"]}'
+            })
+        return results
 
     # =====================================================
     # MISSION EXECUTION
@@ -269,15 +316,20 @@ class KorpakAutonomousEngine:
         if not korpak:
             return {'success': False, 'message': 'KORPAK not found or inactive'}
 
-        # Create execution record
+        # Create execution record (and count it in today's stats)
         cursor.execute("""
             INSERT INTO korpak_executions (
                 korpak_id, status, started_at
             ) VALUES (%s, 'running', NOW())
-            RETURNING id
+            RETURNING id, started_at::date as day
         """, (korpak_id,))
 
-        execution_id = cursor.fetchone()['id']
+        execution = cursor.fetchone()
+        execution_id = execution['id']
+        cursor.execute(RECORD_EXECUTION_SQL, (korpak_id, execution['day'], 1, 0, 0))
+        cursor.execute("""
+            UPDATE korpaks SET times_executed = times_executed + 1 WHERE id = %s
+        """, (korpak_id,))
         self.db_conn.commit()
 
         # Execute based on type
@@ -296,6 +348,13 @@ class KorpakAutonomousEngine:
             execution_id
         ))
 
+        # Outcome counts against the day the execution started
+        cursor.execute(RECORD_EXECUTION_SQL, (
+            korpak_id, execution['day'], 0,
+            1 if result['success'] else 0,
+            0 if result['success'] else 1
+        ))
+
         # Update KORPAK metrics
         if result['success'] and 'metrics' in result:
             cursor.execute("""
@@ -456,10 +515,8 @@ class KorpakAutonomousEngine:
             return []
 
         # Generate 10 sub-missions based on parent
-        sub_missions = []
-
-        for i, step in enumerate(korpak['steps'][:10]):
-            sub_mission = {
+        sub_missions = [
+            {
                 'name': f"{korpak['name']} - Step {i+1}",
                 'mission': step,
                 'type': korpak['type'],
@@ -468,11 +525,10 @@ class KorpakAutonomousEngine:
                 'success_metric': {},
                 'parent_korpak_id': korpak_id
             }
+            for i, step in enumerate(korpak['steps'][:10])
+        ]
 
-            result = self.create_korpak(sub_mission)
-            sub_missions.append(result)
-
-        return sub_missions
+        return self.create_korpaks(sub_missions)
 
     # =====================================================
     # ANALYTICS & REPORTING
@@ -482,8 +538,19 @@ class KorpakAutonomousEngine:
         """
         KORPAK execution dashboard
         Shows active missions, completion rate, impact
+        Cached for DASHBOARD_CACHE_TTL seconds
         """
 
+        with self._dashboard_lock:
+            expires_at, dashboard = self._dashboard_cache
+            if dashboard is not None and time.monotonic() < expires_at:
+                return dashboard
+
+            dashboard = self._build_korpak_dashboard()
+            self._dashboard_cache = (time.monotonic() + DASHBOARD_CACHE_TTL, dashboard)
+            return dashboard
+
+    def _build_korpak_dashboard(self) -> Dict:
         cursor = self._get_cursor()
 
         # Active KORPAKs
@@ -497,31 +564,29 @@ class KorpakAutonomousEngine:
 
         active = cursor.fetchone()
 
-        # Completed executions (last 30 days)
+        # Executions (last 30 days) from the daily stats
         cursor.execute("""
             SELECT
-                COUNT(*) as total_executions,
-                COUNT(CASE WHEN status = 'completed' THEN 1 END) as successful,
-                COUNT(CASE WHEN status = 'failed' THEN 1 END) as failed
-            FROM korpak_executions
-            WHERE started_at >= NOW() - INTERVAL '30 days'
+                COALESCE(SUM(executions), 0) as total_executions,
+                COALESCE(SUM(successful), 0) as successful,
+                COALESCE(SUM(failed), 0) as failed
+            FROM korpak_execution_daily
+            WHERE day >= CURRENT_DATE - 30
         """)
 
         executions = cursor.fetchone()
 
         success_rate = (executions['successful'] / executions['total_executions'] * 100) if executions['total_executions'] > 0 else 0
 
-        # Top performing KORPAKs
+        # Top performing KORPAKs (running execution counter)
         cursor.execute("""
             SELECT
-                k.id, k.name, k.type,
-                COUNT(ke.id) as execution_count,
-                k.success_metrics
-            FROM korpaks k
-            LEFT JOIN korpak_executions ke ON ke.korpak_id = k.id
-            WHERE k.active = TRUE
-            GROUP BY k.id
-            ORDER BY execution_count DESC
+                id, name, type,
+                times_executed as execution_count,
+                success_metrics
+            FROM korpaks
+            WHERE active = TRUE
+            ORDER BY times_executed DESC
             LIMIT 5
         """)
 
@@ -531,10 +596,10 @@ class KorpakAutonomousEngine:
             'active_missions': active['active_korpaks'],
             'total_potential_revenue': float(active['total_potential_revenue'] or 0),
             'execution_stats': {
-                'total_executions_30d': executions['total_executions'],
-                'successful': executions['successful'],
-                'failed': executions['failed'],
-                'success_rate': round(success_rate, 2)
+                'total_executions_30d': int(executions['total_executions']),
+                'successful': int(executions['successful']),
+                'failed': int(executions['failed']),
+                'success_rate': round(float(success_rate), 2)
             },
             'top_korpaks': [
                 {
@@ -555,19 +620,18 @@ class KorpakAutonomousEngine:
         """
 
         # Generate revenue missions
-        revenue_missions = self.generate_revenue_missions()
-        for mission in revenue_missions:
-            self.create_korpak(mission)
+        missions = self.generate_revenue_missions()
 
         # Generate growth missions (weekly)
         if datetime.now().weekday() == 0:  # Monday
-            growth_missions = self.generate_growth_missions()
-            for mission in growth_missions:
-                self.create_korpak(mission)
+            missions += self.generate_growth_missions()
+
+        # One INSERT for everything generated today
+        created = self.create_korpaks(missions)
 
         return {
             'success': True,
-            'missions_created': len(revenue_missions)
+            'missions_created': len(created)
         }
 
 
@@ -576,6 +640,7 @@ class KorpakAutonomousEngine:
 # =====================================================
 
 app = Flask(__name__)
+init_app(app)
 korpak = KorpakAutonomousEngine()
 
 @app.route('/api/korpak/generate/revenue', methods=['POST'])
@@ -586,7 +651,7 @@ def api_generate_revenue_missions():
     Generate revenue optimization missions
     """
     missions = korpak.generate_revenue_missions()
-    created = [korpak.create_korpak(m) for m in missions]
+    created = korpak.create_korpaks(missions)
     return jsonify({'missions_created': len(created), 'missions': created})
 
 @app.route('/api/korpak/generate/growth', methods=['POST'])
@@ -597,7 +662,7 @@ def api_generate_growth_missions():
     Generate growth acceleration missions
     """
     missions = korpak.generate_growth_missions()
-    created = [korpak.create_korpak(m) for m in missions]
+    created = korpak.create_korpaks(missions)
     return jsonify({'missions_created': len(created), 'missions': created})
 
 @app.route('/api/korpak/create', methods=['POST'])
@@ -0,0 +1,295 @@
+"""
+Marketplace Browse
+Keyset-paginated, cached listing and search for marketplace_items
+
+- every sort mode orders by (sort column, id), so a page is fetched with
+  `WHERE (col, id) < (last_col, last_id)` on a matching partial index
+  (WHERE active = TRUE) instead of OFFSET: page 5000 costs the same as page 1
+- next_cursor is an opaque token for the last row of the page
+- q= runs a full-text search on search_vector (title + description, GIN
+  indexed) and adds a 'relevance' sort
+- pages are cached for BROWSE_CACHE_TTL seconds keyed by
+  (domain, type, sort, q, cursor, limit); creating or updating an item
+  drops that domain's entries in this process
+
+Run this file against DATABASE_URL for a 1M-item benchmark (it seeds and
+drops its own scratch schema).
+"""
+
+import base64
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Optional
+
+BROWSE_CACHE_TTL = float(os.getenv('BROWSE_CACHE_TTL', '15'))
+BROWSE_CACHE_SIZE = int(os.getenv('BROWSE_CACHE_SIZE', '5000'))
+MAX_PAGE_SIZE = 100
+
+_RANK_SQL = "ts_rank(mi.search_vector, websearch_to_tsquery('english', %(q)s))"
+
+# sort -> (sort expression, direction, cursor value cast)
+SORTS = {
+    'popular': ('mi.sales_count', 'DESC', 'integer'),
+    'recent': ('mi.created_at', 'DESC', 'timestamp'),
+    'price_low': ('mi.price', 'ASC', 'numeric'),
+    'price_high': ('mi.price', 'DESC', 'numeric'),
+    'relevance': (_RANK_SQL, 'DESC', 'real')
+}
+
+
+class InvalidCursor(ValueError):
+    """Cursor token is malformed or belongs to another sort"""
+
+
+def encode_cursor(sort: str, value, item_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    elif isinstance(value, Decimal):
+        value = str(value)
+    raw = json.dumps([sort, value, item_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str, sort: str):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        cursor_sort, value, item_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise InvalidCursor('Malformed cursor')
+    if cursor_sort != sort:
+        raise InvalidCursor('Cursor was issued for a different sort')
+    return value, int(item_id)
+
+
+def build_query(domain: str = None, item_type: str = None, sort: str = 'popular',
+                q: str = None, after=None, limit: int = 20):
+    """SQL + params for one page (limit + 1 rows, to detect a next page)"""
+    sort_sql, direction, cast = SORTS[sort]
+
+    filters = ["mi.active = TRUE"]
+    params = {'limit': limit + 1, 'q': q}
+
+    if domain:
+        filters.append("mi.domain = %(domain)s")
+        params['domain'] = domain
+
+    if item_type:
+        filters.append("mi.type = %(type)s")
+        params['type'] = item_type
+
+    if q:
+        filters.append("mi.search_vector @@ websearch_to_tsquery('english', %(q)s)")
+
+    if after is not None:
+        operator = '<' if direction == 'DESC' else '>'
+        filters.append(f"({sort_sql}, mi.id) {operator} (%(after_value)s::{cast}, %(after_id)s)")
+        params['after_value'], params['after_id'] = after
+
+    sql = f"""
+        SELECT
+            mi.id, mi.title, mi.description, mi.type, mi.domain,
+            mi.price, mi.preview_url, mi.sales_count, mi.created_at,
+            u.full_name as creator_name,
+            {_RANK_SQL if q else 'NULL'} as rank
+        FROM marketplace_items mi
+        JOIN users u ON u.id = mi.creator_id
+        WHERE {' AND '.join(filters)}
+        ORDER BY {sort_sql} {direction}, mi.id {direction}
+        LIMIT %(limit)s
+    """
+    return sql, params
+
+
+def browse(cursor, domain: str = None, item_type: str = None, sort: str = 'popular',
+           q: str = None, page_cursor: str = None, limit: int = 20) -> Dict:
+    """One page: {'items': [...], 'next_cursor': token or None}"""
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    if sort not in SORTS or (sort == 'relevance' and not q):
+        sort = 'popular'
+
+    after = decode_cursor(page_cursor, sort) if page_cursor else None
+    sql, params = build_query(domain, item_type, sort, q, after, limit)
+    cursor.execute(sql, params)
+    rows = cursor.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        sort_value = {
+            'popular': last['sales_count'],
+            'recent': last['created_at'],
+            'price_low': last['price'],
+            'price_high': last['price'],
+            'relevance': last['rank']
+        }[sort]
+        next_cursor = encode_cursor(sort, sort_value, last['id'])
+
+    items = [
+        {
+            'id': item['id'],
+            'title': item['title'],
+            'description': item['description'],
+            'type': item['type'],
+            'domain': item['domain'],
+            'price': float(item['price']),
+            'preview_url': item['preview_url'],
+            'sales_count': item['sales_count'],
+            'creator_name': item['creator_name'],
+            'created_at': item['created_at'].isoformat()
+        }
+        for item in rows
+    ]
+
+    return {'items': items, 'next_cursor': next_cursor}
+
+
+class BrowseCache:
+    """
+    Short-TTL LRU of browse pages, droppable per domain
+    """
+
+    def __init__(self, ttl: float = BROWSE_CACHE_TTL, max_size: int = BROWSE_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (expires_at, page)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> Optional[Dict]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                self.entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, page: Dict):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, page)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, domain: str = None):
+        """Drop pages that can include `domain` (all pages if None)"""
+        with self.lock:
+            if domain is None:
+                self.entries.clear()
+                return
+            for key in [k for k in self.entries if k[0] in (domain, None)]:
+                del self.entries[key]
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return {'size': len(self.entries), 'hits': self.hits, 'misses': self.misses, 'ttl': self.ttl}
+
+
+browse_cache = BrowseCache()
+
+
+def cached_browse(cursor, domain: str = None, item_type: str = None, sort: str = 'popular',
+                  q: str = None, page_cursor: str = None, limit: int = 20) -> Dict:
+    """browse() through browse_cache"""
+    key = (domain, item_type, sort, q, page_cursor, limit)
+    page = browse_cache.get(key)
+    if page is None:
+        page = browse(cursor, domain, item_type, sort, q, page_cursor, limit)
+        browse_cache.put(key, page)
+    return page
+
+
+if __name__ == '__main__':
+    # 1M-item benchmark in a scratch schema: keyset vs OFFSET, search, cache
+    import psycopg2
+    from psycopg2.extras import RealDictCursor
+
+    ITEMS = int(os.getenv('BROWSE_BENCH_ITEMS', '1000000'))
+    DEEP_PAGE = 2000
+    conn = psycopg2.connect(os.getenv('DATABASE_URL', 'postgresql://localhost/consciousness_revolution'))
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+    print(f"🌱 Seeding {ITEMS:,} items into schema browse_bench...")
+    cursor.execute("""
+        DROP SCHEMA IF EXISTS browse_bench CASCADE;
+        CREATE SCHEMA browse_bench;
+        CREATE TABLE browse_bench.users (LIKE public.users INCLUDING ALL);
+        CREATE TABLE browse_bench.marketplace_items (LIKE public.marketplace_items INCLUDING ALL);
+        SET search_path TO browse_bench;
+
+        INSERT INTO users (id, email, password_hash, full_name)
+        SELECT g, 'creator' || g || '@bench.local', 'x', 'Creator ' || g
+        FROM generate_series(1, 1000) g;
+
+        INSERT INTO marketplace_items (
+            id, creator_id, domain, type, title, description, price,
+            sales_count, active, created_at
+        )
+        SELECT
+            g,
+            1 + g % 1000,
+            (ARRAY['music','intelligence','tools','education','commerce','communication','community'])[1 + g % 7],
+            (ARRAY['korpak','module','sample_pack','course','template'])[1 + g % 5],
+            'Item ' || g || ' ' || (ARRAY['lofi','synth','automation','instagram','meditation'])[1 + g % 5],
+            'Bench item number ' || g || ' for ' || (ARRAY['producers','founders','coaches'])[1 + g % 3],
+            (1 + g % 500)::numeric,
+            (g * 7919) % 10000,
+            g % 20 <> 0,
+            NOW() - (g % 100000) * INTERVAL '1 minute'
+        FROM generate_series(1, %s) g;
+
+        ANALYZE users;
+        ANALYZE marketplace_items;
+    """, (ITEMS,))
+    conn.commit()
+
+    def timed(label, fn, runs=20):
+        started = time.monotonic()
+        for _ in range(runs):
+            result = fn()
+        print(f"   {label:<42} {(time.monotonic() - started) / runs * 1000:8.2f} ms")
+        return result
+
+    try:
+        for sort in ('popular', 'recent', 'price_low', 'price_high'):
+            print(f"📄 sort={sort}")
+            page = timed('first page', lambda: browse(cursor, sort=sort))
+
+            # Walk to a deep page once, then time fetching it by cursor
+            token = page['next_cursor']
+            for _ in range(DEEP_PAGE - 1):
+                token = browse(cursor, sort=sort, page_cursor=token)['next_cursor']
+            timed(f'page {DEEP_PAGE} (keyset)', lambda: browse(cursor, sort=sort, page_cursor=token))
+
+            sort_sql, direction, _ = SORTS[sort]
+            timed(f'page {DEEP_PAGE} (OFFSET, old style)', lambda: cursor.execute(f"""
+                SELECT mi.id FROM marketplace_items mi JOIN users u ON u.id = mi.creator_id
+                WHERE mi.active = TRUE ORDER BY {sort_sql} {direction}
+                OFFSET %s LIMIT 20
+            """, (DEEP_PAGE * 20,)) or cursor.fetchall(), runs=5)
+
+            timed('domain=music first page', lambda: browse(cursor, domain='music', sort=sort))
+
+        print("🔎 search")
+        page = timed("q='synth producers' relevance", lambda: browse(cursor, q='synth producers', sort='relevance'))
+        timed('relevance page 2', lambda: browse(cursor, q='synth producers', sort='relevance',
+                                                page_cursor=page['next_cursor']))
+
+        print("⚡ cache")
+        cached_browse(cursor, domain='music')
+        timed('cached first page', lambda: cached_browse(cursor, domain='music'), runs=1000)
+        print(f"   {browse_cache.get_stats()}")
+    finally:
+        conn.rollback()
+        cursor.execute("DROP SCHEMA browse_bench CASCADE")
+        conn.commit()
+        conn.close()
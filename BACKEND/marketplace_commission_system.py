@@ -16,12 +16,16 @@ Handles:
 import os
 import stripe
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, Optional
 from decimal import Decimal
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from flask import Flask, request, jsonify
 
+from db_pool import get_connection, init_app
+from payout_engine import run_payouts, settle_pending_payouts, get_run, previous_month, month_bounds
+from marketplace_browse import cached_browse, browse_cache, InvalidCursor
+
 # Configuration
 DATABASE_URL = os.getenv('DATABASE_URL', 'postgresql://localhost/consciousness_revolution')
 STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY')
@@ -33,7 +37,7 @@ class MarketplaceCommissionSystem:
     """
 
     def __init__(self):
-        self.db_conn = psycopg2.connect(DATABASE_URL)
+        self.db_conn = get_connection()
 
     def _get_cursor(self):
         return self.db_conn.cursor(cursor_factory=RealDictCursor)
@@ -214,6 +218,7 @@ class MarketplaceCommissionSystem:
 
         item_id = cursor.fetchone()['id']
         self.db_conn.commit()
+        browse_cache.invalidate(item_data['domain'])
 
         return {
             'success': True,
@@ -233,7 +238,7 @@ class MarketplaceCommissionSystem:
 
         # Verify ownership
         cursor.execute("""
-            SELECT creator_id FROM marketplace_items WHERE id = %s
+            SELECT creator_id, domain FROM marketplace_items WHERE id = %s
         """, (item_id,))
 
         item = cursor.fetchone()
@@ -267,6 +272,7 @@ class MarketplaceCommissionSystem:
         """, values)
 
         self.db_conn.commit()
+        browse_cache.invalidate(item['domain'])
 
         return {'success': True, 'message': 'Item updated'}
 
@@ -391,66 +397,40 @@ class MarketplaceCommissionSystem:
     # CREATOR PAYOUTS
     # =====================================================
 
-    def process_monthly_payouts(self):
+    def process_monthly_payouts(self, month: str = None):
         """
-        Process monthly creator payouts
-        Run via cron at beginning of each month
+        Process monthly creator payouts (last month, or 'YYYY-MM')
+        Run via cron at beginning of each month; safe to re-run after a crash
         """
 
-        cursor = self._get_cursor()
-
-        # Get creators with earnings to payout
-        cursor.execute("""
-            SELECT
-                creator_id,
-                SUM(creator_earnings) as total_earnings,
-                COUNT(*) as sales_count
-            FROM marketplace_purchases
-            WHERE status = 'completed'
-            AND created_at >= DATE_TRUNC('month', CURRENT_DATE - INTERVAL '1 month')
-            AND created_at < DATE_TRUNC('month', CURRENT_DATE)
-            AND creator_id NOT IN (
-                SELECT creator_id FROM creator_payouts
-                WHERE payout_month = DATE_TRUNC('month', CURRENT_DATE - INTERVAL '1 month')
-            )
-            GROUP BY creator_id
-            HAVING SUM(creator_earnings) > 0
-        """)
-
-        creators = cursor.fetchall()
-
-        for creator in creators:
-            # Get Stripe Connect ID
-            cursor.execute("""
-                SELECT stripe_connect_id, email, full_name
-                FROM users WHERE id = %s
-            """, (creator['creator_id'],))
+        period_start, period_end = month_bounds(month) if month else previous_month()
 
-            user = cursor.fetchone()
+        # Earlier months' creators who have connected an account since
+        settled = settle_pending_payouts(self.db_conn)
+        if settled['creators_paid']:
+            print(f"💸 Settled {settled['creators_paid']} pending payouts, ${settled['amount']:,.2f}")
 
-            if not user or not user['stripe_connect_id']:
-                continue
+        creators_paid = 0
+        total_amount = 0.0
 
-            # Stripe automatically transfers to Connect accounts
-            # Just record the payout in our system
-            cursor.execute("""
-                INSERT INTO creator_payouts (
-                    creator_id, payout_month, amount, sales_count,
-                    status, processed_at
-                ) VALUES (%s, DATE_TRUNC('month', CURRENT_DATE - INTERVAL '1 month'),
-                         %s, %s, 'completed', NOW())
-            """, (
-                creator['creator_id'],
-                creator['total_earnings'],
-                creator['sales_count']
-            ))
+        for chunk in run_payouts(self.db_conn, period_start, period_end):
+            creators_paid += chunk['creators_paid']
+            total_amount += chunk['amount']
+            print(f"💸 Payouts {period_start:%Y-%m}: through creator {chunk['last_creator_id']}, "
+                  f"{creators_paid} paid, ${total_amount:,.2f}")
 
-        self.db_conn.commit()
+        # Totals include chunks committed by an earlier, interrupted run
+        run = get_run(self._get_cursor(), period_start)
 
         return {
             'success': True,
-            'creators_paid': len(creators),
-            'total_amount': sum(c['total_earnings'] for c in creators)
+            'period_start': period_start.isoformat(),
+            'creators_paid': run['creators_paid'],
+            'total_amount': float(run['total_amount']),
+            'creators_pending': run['creators_pending'],
+            'pending_amount': float(run['pending_amount']),
+            'settled': settled,
+            'chunks': run['chunks']
         }
 
     # =====================================================
@@ -513,10 +493,11 @@ class MarketplaceCommissionSystem:
 
         # Recent payouts
         cursor.execute("""
-            SELECT payout_month, amount, sales_count, processed_at
+            SELECT period_start as payout_month, amount,
+                   items_count as sales_count, paid_at as processed_at
             FROM creator_payouts
             WHERE creator_id = %s
-            ORDER BY payout_month DESC
+            ORDER BY period_start DESC
             LIMIT 6
         """, (creator_id,))
 
@@ -561,66 +542,14 @@ class MarketplaceCommissionSystem:
     # =====================================================
 
     def browse_marketplace(self, domain: str = None, item_type: str = None,
-                          sort: str = 'popular', limit: int = 20) -> List[Dict]:
+                          sort: str = 'popular', limit: int = 20,
+                          q: str = None, cursor: str = None) -> Dict:
         """
         Browse marketplace items
-        Filters and sorting
+        Filters, sorting, search (q) and keyset paging (cursor = previous next_cursor)
         """
 
-        cursor = self._get_cursor()
-
-        # Build query
-        filters = ["active = TRUE"]
-        params = []
-
-        if domain:
-            filters.append("domain = %s")
-            params.append(domain)
-
-        if item_type:
-            filters.append("type = %s")
-            params.append(item_type)
-
-        where_clause = " AND ".join(filters)
-
-        # Sort options
-        sort_clause = {
-            'popular': 'sales_count DESC',
-            'recent': 'created_at DESC',
-            'price_low': 'price ASC',
-            'price_high': 'price DESC'
-        }.get(sort, 'sales_count DESC')
-
-        params.append(limit)
-
-        cursor.execute(f"""
-            SELECT
-                mi.id, mi.title, mi.description, mi.type, mi.domain,
-                mi.price, mi.preview_url, mi.sales_count, mi.created_at,
-                u.full_name as creator_name
-            FROM marketplace_items mi
-            JOIN users u ON u.id = mi.creator_id
-            WHERE {where_clause}
-            ORDER BY {sort_clause}
-            LIMIT %s
-        """, params)
-
-        items = []
-        for item in cursor.fetchall():
-            items.append({
-                'id': item['id'],
-                'title': item['title'],
-                'description': item['description'],
-                'type': item['type'],
-                'domain': item['domain'],
-                'price': float(item['price']),
-                'preview_url': item['preview_url'],
-                'sales_count': item['sales_count'],
-                'creator_name': item['creator_name'],
-                'created_at': item['created_at'].isoformat()
-            })
-
-        return items
+        return cached_browse(self._get_cursor(), domain, item_type, sort, q, cursor, limit)
 
 
 # =====================================================
@@ -628,6 +557,7 @@ class MarketplaceCommissionSystem:
 # =====================================================
 
 app = Flask(__name__)
+init_app(app)
 marketplace = MarketplaceCommissionSystem()
 
 # Import auth
@@ -730,14 +660,21 @@ def api_creator_dashboard():
 def api_browse():
     """
     GET /api/marketplace/browse?domain=music&type=sample_pack&sort=popular&limit=20
+    Search: &q=lofi synth (adds sort=relevance)
+    Next page: &cursor=<next_cursor from the previous page>
     """
-    items = marketplace.browse_marketplace(
-        domain=request.args.get('domain'),
-        item_type=request.args.get('type'),
-        sort=request.args.get('sort', 'popular'),
-        limit=int(request.args.get('limit', 20))
-    )
-    return jsonify({'items': items})
+    try:
+        page = marketplace.browse_marketplace(
+            domain=request.args.get('domain'),
+            item_type=request.args.get('type'),
+            sort=request.args.get('sort', 'popular'),
+            limit=int(request.args.get('limit', 20)),
+            q=request.args.get('q') or None,
+            cursor=request.args.get('cursor')
+        )
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(page)
 
 
 if __name__ == '__main__':
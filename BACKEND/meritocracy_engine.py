@@ -2,20 +2,27 @@
 🏆 MERITOCRACY ENGINE - Automatic Builder Ranking System
 Best builders rise to the top automatically based on contributions
 No voting, no politics - just pure output measurement
+
+State lives in meritocracy_store (running totals + score index, persisted
+as an append-only log with periodic snapshots); no request re-reads or
+re-writes the whole data file.
 """
 
-import json
+import atexit
 import os
-from datetime import datetime
-from typing import Dict, List, Optional
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 
+from meritocracy_store import MeritocracyStore
+
 app = Flask(__name__)
 CORS(app)
 
-# Data file
+# Data directory (log + snapshot); DATA_FILE is the pre-log format, imported once
 DATA_FILE = "C:/Users/dwrek/100X_DEPLOYMENT/DATA/meritocracy_data.json"
+DATA_DIR = os.path.dirname(DATA_FILE)
+LEADERBOARD_PAGE_SIZE = 100
+LEADERBOARD_MAX_PAGE_SIZE = 500
 
 # Rank thresholds
 RANKS = {
@@ -52,28 +59,6 @@ CONTRIBUTION_TYPES = {
     "collaboration": {"points": 7, "category": "growth"}
 }
 
-def ensure_data_file():
-    """Ensure data directory and file exist"""
-    os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
-    if not os.path.exists(DATA_FILE):
-        with open(DATA_FILE, 'w') as f:
-            json.dump({
-                "builders": {},
-                "contributions": [],
-                "ranks": RANKS
-            }, f, indent=2)
-
-def load_data():
-    """Load meritocracy data"""
-    ensure_data_file()
-    with open(DATA_FILE, 'r') as f:
-        return json.load(f)
-
-def save_data(data):
-    """Save meritocracy data"""
-    with open(DATA_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
-
 def get_rank_for_score(score):
     """Get rank based on score"""
     rank = RANKS[0]  # Default to Observer
@@ -82,47 +67,18 @@ def get_rank_for_score(score):
             return {**rank_data, "threshold": threshold}
     return {**rank, "threshold": 0}
 
-def calculate_builder_stats(builder_data):
-    """Calculate detailed stats for a builder"""
-    contributions = builder_data.get("contributions", [])
-
-    # Category scores
-    categories = {
-        "builder": 0,
-        "teacher": 0,
-        "visionary": 0,
-        "growth": 0
-    }
-
-    for contrib in contributions:
-        contrib_type = CONTRIBUTION_TYPES.get(contrib["type"], {})
-        category = contrib_type.get("category", "builder")
-        points = contrib.get("points", 0)
-        categories[category] += points
-
-    # Total score
-    total_score = sum(categories.values())
-
-    # Specialization (highest category)
-    specialization = max(categories.items(), key=lambda x: x[1])[0] if total_score > 0 else "none"
-
-    return {
-        "total_score": total_score,
-        "categories": categories,
-        "specialization": specialization,
-        "contribution_count": len(contributions),
-        "rank": get_rank_for_score(total_score)
-    }
+store = MeritocracyStore(DATA_DIR, CONTRIBUTION_TYPES, get_rank_for_score, legacy_file=DATA_FILE)
+atexit.register(store.close)
 
 @app.route('/meritocracy/status', methods=['GET'])
 def status():
     """Get system status"""
-    data = load_data()
+    stats = store.global_stats()
 
     return jsonify({
         "status": "operational",
-        "total_builders": len(data["builders"]),
-        "total_contributions": len(data["contributions"]),
+        "total_builders": stats["total_builders"],
+        "total_contributions": stats["total_contributions"],
         "contribution_types": list(CONTRIBUTION_TYPES.keys()),
         "ranks": RANKS
     })
@@ -130,40 +86,21 @@ def status():
 @app.route('/meritocracy/builder/<builder_id>', methods=['GET'])
 def get_builder(builder_id):
     """Get builder profile"""
-    data = load_data()
+    builder = store.get_builder(builder_id)
 
-    if builder_id not in data["builders"]:
+    if builder is None:
         return jsonify({"error": "Builder not found"}), 404
 
-    builder = data["builders"][builder_id]
-    stats = calculate_builder_stats(builder)
-
-    return jsonify({
-        "id": builder_id,
-        "name": builder.get("name", builder_id),
-        "joined": builder.get("joined"),
-        "stats": stats,
-        "contributions": builder.get("contributions", [])
-    })
+    return jsonify(builder)
 
 @app.route('/meritocracy/builder/<builder_id>/register', methods=['POST'])
 def register_builder(builder_id):
     """Register a new builder"""
-    data = load_data()
+    body = request.json or {}
 
-    if builder_id in data["builders"]:
+    if store.register(builder_id, body.get("name", builder_id)) is None:
         return jsonify({"error": "Builder already exists"}), 400
 
-    body = request.json
-
-    data["builders"][builder_id] = {
-        "name": body.get("name", builder_id),
-        "joined": datetime.now().isoformat(),
-        "contributions": []
-    }
-
-    save_data(data)
-
     return jsonify({
         "success": True,
         "builder_id": builder_id,
@@ -173,7 +110,6 @@ def register_builder(builder_id):
 @app.route('/meritocracy/contribution', methods=['POST'])
 def add_contribution():
     """Add a contribution"""
-    data = load_data()
     body = request.json
 
     builder_id = body.get("builder_id")
@@ -187,40 +123,14 @@ def add_contribution():
     if contrib_type not in CONTRIBUTION_TYPES:
         return jsonify({"error": f"Unknown contribution type: {contrib_type}"}), 400
 
-    # Ensure builder exists
-    if builder_id not in data["builders"]:
-        data["builders"][builder_id] = {
-            "name": builder_id,
-            "joined": datetime.now().isoformat(),
-            "contributions": []
-        }
-
     # Calculate points (can be modified by quality multiplier)
     base_points = CONTRIBUTION_TYPES[contrib_type]["points"]
     quality_multiplier = body.get("quality_multiplier", 1.0)  # 0.5 to 2.0
     points = int(base_points * quality_multiplier)
 
-    # Create contribution record
-    contribution = {
-        "id": len(data["contributions"]) + 1,
-        "builder_id": builder_id,
-        "type": contrib_type,
-        "description": description,
-        "evidence": evidence,
-        "points": points,
-        "timestamp": datetime.now().isoformat()
-    }
-
-    # Add to global contributions
-    data["contributions"].append(contribution)
-
-    # Add to builder's contributions
-    data["builders"][builder_id]["contributions"].append(contribution)
-
-    save_data(data)
-
-    # Get updated stats
-    stats = calculate_builder_stats(data["builders"][builder_id])
+    # Record (registers unknown builders) and get updated stats
+    contribution = store.add_contribution(builder_id, contrib_type, points, description, evidence)
+    stats = store.stats(builder_id)
 
     # Check for rank up
     old_rank = body.get("old_rank", 0)
@@ -237,81 +147,31 @@ def add_contribution():
 
 @app.route('/meritocracy/leaderboard', methods=['GET'])
 def leaderboard():
-    """Get ranked leaderboard"""
-    data = load_data()
-
-    # Calculate stats for all builders
-    builders_with_stats = []
-    for builder_id, builder_data in data["builders"].items():
-        stats = calculate_builder_stats(builder_data)
-        builders_with_stats.append({
-            "id": builder_id,
-            "name": builder_data.get("name", builder_id),
-            "score": stats["total_score"],
-            "rank": stats["rank"],
-            "specialization": stats["specialization"],
-            "contribution_count": stats["contribution_count"]
-        })
-
-    # Sort by score
-    builders_with_stats.sort(key=lambda x: x["score"], reverse=True)
-
-    # Add rank position
-    for i, builder in enumerate(builders_with_stats):
-        builder["position"] = i + 1
+    """Get ranked leaderboard (one page: ?offset=&limit=)"""
+    offset = max(0, request.args.get('offset', 0, type=int))
+    limit = max(0, min(request.args.get('limit', LEADERBOARD_PAGE_SIZE, type=int), LEADERBOARD_MAX_PAGE_SIZE))
 
     return jsonify({
-        "leaderboard": builders_with_stats,
-        "total_builders": len(builders_with_stats)
+        "leaderboard": store.leaderboard(offset, limit),
+        "offset": offset,
+        "limit": limit,
+        "total_builders": len(store.builders)
     })
 
 @app.route('/meritocracy/contributions/recent', methods=['GET'])
 def recent_contributions():
     """Get recent contributions"""
-    data = load_data()
     limit = request.args.get('limit', 50, type=int)
 
-    # Get recent contributions
-    recent = data["contributions"][-limit:]
-    recent.reverse()  # Most recent first
-
     return jsonify({
-        "contributions": recent,
-        "total": len(data["contributions"])
+        "contributions": store.recent_contributions(limit),
+        "total": store.contribution_count
     })
 
 @app.route('/meritocracy/stats', methods=['GET'])
 def global_stats():
     """Get global statistics"""
-    data = load_data()
-
-    # Calculate category totals
-    category_totals = {
-        "builder": 0,
-        "teacher": 0,
-        "visionary": 0,
-        "growth": 0
-    }
-
-    for contrib in data["contributions"]:
-        contrib_type = CONTRIBUTION_TYPES.get(contrib["type"], {})
-        category = contrib_type.get("category", "builder")
-        category_totals[category] += contrib.get("points", 0)
-
-    # Rank distribution
-    rank_distribution = {}
-    for builder_data in data["builders"].values():
-        stats = calculate_builder_stats(builder_data)
-        rank_name = stats["rank"]["name"]
-        rank_distribution[rank_name] = rank_distribution.get(rank_name, 0) + 1
-
-    return jsonify({
-        "total_builders": len(data["builders"]),
-        "total_contributions": len(data["contributions"]),
-        "total_points": sum(category_totals.values()),
-        "category_distribution": category_totals,
-        "rank_distribution": rank_distribution
-    })
+    return jsonify(store.global_stats())
 
 if __name__ == "__main__":
     print("="*60)
@@ -321,7 +181,7 @@ if __name__ == "__main__":
     print("No voting, no politics - pure output measurement")
     print("="*60)
 
-    ensure_data_file()
+    print(f"\n📒 {len(store.builders)} builders, {store.contribution_count} contributions loaded from {DATA_DIR}")
 
     print("\n🚀 Starting Meritocracy API server on port 8000...")
     print("Status: http://localhost:8000/meritocracy/status")
@@ -0,0 +1,545 @@
+"""
+Meritocracy Store
+In-memory leaderboard state backed by an append-only log and snapshots
+
+- every builder keeps running category totals, updated per contribution
+  (no re-summing of contribution lists)
+- ScoreIndex, an indexable skiplist ordered by (score desc, join order),
+  gives O(log n) rank lookups and O(log n + k) leaderboard pages
+- writes append one JSON line to meritocracy_log.jsonl; every
+  SNAPSHOT_EVERY events the state (plus the log offset it covers) is
+  written atomically to meritocracy_snapshot.json by a background thread.
+  Builder records are replaced, never mutated, so the snapshot copies the
+  builder dict under the lock and serializes it outside. Startup loads the
+  snapshot and replays only the log tail behind it.
+- a builder's contribution history stays in the log: each contribution
+  line carries the offset of the builder's previous one ('prev'), and the
+  store keeps only the latest ('last'), so memory and snapshots do not grow
+  with history. A profile walks that chain back through the log.
+
+The first start imports an existing meritocracy_data.json into the log.
+Run this file for a leaderboard latency check from 100 to 1M builders.
+"""
+
+import json
+import math
+import os
+import random
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+SNAPSHOT_EVERY = int(os.getenv('MERITOCRACY_SNAPSHOT_EVERY', '5000'))
+RECENT_KEEP = 1000
+CATEGORIES = ("builder", "teacher", "visionary", "growth")
+
+
+# =====================================================
+# SCORE INDEX (indexable skiplist)
+# =====================================================
+
+class _End:
+    """Sentinel that sorts after every key"""
+
+    def __lt__(self, other):
+        return False
+
+    def __le__(self, other):
+        return False
+
+
+class _Node:
+    __slots__ = ('key', 'next', 'width')
+
+    def __init__(self, key, next_nodes, widths):
+        self.key = key
+        self.next = next_nodes
+        self.width = widths
+
+
+class ScoreIndex:
+    """
+    Sorted keys with positional access
+    Each link stores how many level-0 steps it skips, so rank and k-th
+    lookups walk down the levels in O(log n)
+    """
+
+    def __init__(self, max_levels: int = 24, seed: int = None):
+        self.max_levels = max_levels
+        self._nil = _Node(_End(), [], [])
+        self._head = _Node(None, [self._nil] * max_levels, [1] * max_levels)
+        self._random = random.Random(seed)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def insert(self, key):
+        chain = [None] * self.max_levels
+        steps_at_level = [0] * self.max_levels
+        node = self._head
+        for level in reversed(range(self.max_levels)):
+            while node.next[level].key <= key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        height = min(self.max_levels, 1 - int(math.log(1.0 - self._random.random(), 2.0)))
+        new_node = _Node(key, [None] * height, [None] * height)
+        steps = 0
+        for level in range(height):
+            prev = chain[level]
+            new_node.next[level] = prev.next[level]
+            prev.next[level] = new_node
+            new_node.width[level] = prev.width[level] - steps
+            prev.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(height, self.max_levels):
+            chain[level].width[level] += 1
+        self.size += 1
+
+    def remove(self, key):
+        chain = [None] * self.max_levels
+        node = self._head
+        for level in reversed(range(self.max_levels)):
+            while node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        if target is self._nil or target.key != key:
+            raise KeyError(key)
+        for level in range(len(target.next)):
+            prev = chain[level]
+            prev.width[level] += target.width[level] - 1
+            prev.next[level] = target.next[level]
+        for level in range(len(target.next), self.max_levels):
+            chain[level].width[level] -= 1
+        self.size -= 1
+
+    def rank(self, key) -> int:
+        """0-based position of key"""
+        position = 0
+        node = self._head
+        for level in reversed(range(self.max_levels)):
+            while node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        return position
+
+    def page(self, offset: int, limit: int) -> List:
+        """Keys at positions offset .. offset + limit - 1"""
+        if offset >= self.size or limit <= 0:
+            return []
+        remaining = offset + 1
+        node = self._head
+        for level in reversed(range(self.max_levels)):
+            while node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+
+        keys = []
+        while node is not self._nil and len(keys) < limit:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+
+# =====================================================
+# STORE
+# =====================================================
+
+class MeritocracyStore:
+    """
+    Builders, running totals and the score index, persisted as log + snapshot
+    """
+
+    def __init__(self, data_dir: str, contribution_types: Dict, get_rank,
+                 snapshot_every: int = SNAPSHOT_EVERY, legacy_file: str = None):
+        self.contribution_types = contribution_types
+        self.get_rank = get_rank  # score -> rank dict (with 'name', 'threshold')
+        self.snapshot_every = snapshot_every
+
+        os.makedirs(data_dir, exist_ok=True)
+        self.log_path = os.path.join(data_dir, 'meritocracy_log.jsonl')
+        self.snapshot_path = os.path.join(data_dir, 'meritocracy_snapshot.json')
+
+        self.lock = threading.RLock()
+        self.snapshot_lock = threading.Lock()  # one snapshot write at a time
+        self.builders = {}  # id -> {name, joined, seq, categories, count, last} (replaced on change)
+        self._seq_ids = []  # seq -> builder id (builders are never removed, so seq is a list index)
+        self.index = ScoreIndex()
+        self.contribution_count = 0
+        self.category_totals = dict.fromkeys(CATEGORIES, 0)
+        self.rank_distribution = {}
+        self.recent = deque(maxlen=RECENT_KEEP)
+        self.events_since_snapshot = 0
+        self._snapshot_thread = None
+
+        self._load()
+        if legacy_file and os.path.exists(legacy_file) and not self.builders and self._log_size() == 0:
+            self._import_legacy(legacy_file)
+
+        self._log = open(self.log_path, 'ab')
+
+    # =====================================================
+    # WRITES
+    # =====================================================
+
+    def register(self, builder_id: str, name: str = None, joined: str = None) -> Optional[Dict]:
+        """Add a builder; None if the id is taken"""
+        with self.lock:
+            if builder_id in self.builders:
+                return None
+            event = {
+                'op': 'register',
+                'builder_id': builder_id,
+                'name': name or builder_id,
+                'joined': joined or datetime.now().isoformat()
+            }
+            self._write(event)
+            self._maybe_snapshot()
+            return self.builders[builder_id]
+
+    def add_contribution(self, builder_id: str, contrib_type: str, points: int,
+                         description: str = "", evidence: str = "", timestamp: str = None) -> Dict:
+        """Record a contribution (registers unknown builders); returns the record"""
+        with self.lock:
+            if builder_id not in self.builders:
+                event = {'op': 'register', 'builder_id': builder_id, 'name': builder_id,
+                         'joined': datetime.now().isoformat()}
+                self._write(event)
+
+            contribution = {
+                'op': 'contribution',
+                'id': self.contribution_count + 1,
+                'builder_id': builder_id,
+                'type': contrib_type,
+                'description': description,
+                'evidence': evidence,
+                'points': points,
+                'timestamp': timestamp or datetime.now().isoformat()
+            }
+            self._write(contribution)
+            self._maybe_snapshot()
+            return _public(contribution)
+
+    def _write(self, event: Dict):
+        """Log an event (linked to the builder's previous contribution) and apply it"""
+        if event['op'] == 'contribution':
+            event['prev'] = self.builders[event['builder_id']]['last']
+        self._apply(event, self._append(event))
+
+    def _append(self, event: Dict) -> int:
+        """Write one log line; returns its byte offset"""
+        log = getattr(self, '_log', None)
+        if log is None:
+            # Import before the writer is open
+            with open(self.log_path, 'ab') as f:
+                offset = f.tell()
+                f.write(json.dumps(event).encode('utf-8') + b'\n')
+            return offset
+        offset = log.tell()
+        log.write(json.dumps(event).encode('utf-8') + b'\n')
+        log.flush()
+        return offset
+
+    def _apply(self, event: Dict, offset: int):
+        """Fold one event into memory (live writes and log replay)"""
+        builder_id = event['builder_id']
+
+        if event['op'] == 'register':
+            if builder_id in self.builders:
+                return
+            builder = self.builders[builder_id] = {
+                'name': event['name'],
+                'joined': event['joined'],
+                'seq': len(self._seq_ids),
+                'categories': dict.fromkeys(CATEGORIES, 0),
+                'count': 0,
+                'last': None
+            }
+            self._seq_ids.append(builder_id)
+            self.index.insert(self._key(builder))
+            self._count_rank(builder, 1)
+            self.events_since_snapshot += 1
+            return
+
+        old = self.builders[builder_id]
+        category = self.contribution_types.get(event['type'], {}).get('category', 'builder')
+
+        self.index.remove(self._key(old))
+        self._count_rank(old, -1)
+        # New record: a snapshot in progress may still hold the old one
+        categories = dict(old['categories'])
+        categories[category] += event['points']
+        builder = self.builders[builder_id] = dict(old, categories=categories, count=old['count'] + 1, last=offset)
+        self.index.insert(self._key(builder))
+        self._count_rank(builder, 1)
+
+        self.category_totals[category] += event['points']
+        self.contribution_count = max(self.contribution_count, event['id'])
+        self.recent.append(_public(event))
+        self.events_since_snapshot += 1
+
+    @staticmethod
+    def _key(builder: Dict):
+        return (-sum(builder['categories'].values()), builder['seq'])
+
+    def _count_rank(self, builder: Dict, delta: int):
+        name = self.get_rank(sum(builder['categories'].values()))['name']
+        self.rank_distribution[name] = self.rank_distribution.get(name, 0) + delta
+        if not self.rank_distribution[name]:
+            del self.rank_distribution[name]
+
+    # =====================================================
+    # READS
+    # =====================================================
+
+    def stats(self, builder_id: str) -> Optional[Dict]:
+        with self.lock:
+            builder = self.builders.get(builder_id)
+            if builder is None:
+                return None
+            return self._stats(builder)
+
+    def _stats(self, builder: Dict) -> Dict:
+        categories = dict(builder['categories'])
+        total_score = sum(categories.values())
+        return {
+            "total_score": total_score,
+            "categories": categories,
+            "specialization": max(categories.items(), key=lambda x: x[1])[0] if total_score > 0 else "none",
+            "contribution_count": builder['count'],
+            "rank": self.get_rank(total_score),
+            "position": self.index.rank(self._key(builder)) + 1
+        }
+
+    def get_builder(self, builder_id: str) -> Optional[Dict]:
+        """Profile with stats and full contribution history (read from the log)"""
+        with self.lock:
+            builder = self.builders.get(builder_id)
+            if builder is None:
+                return None
+            stats = self._stats(builder)
+
+        # Newest first along the 'prev' chain
+        contributions = []
+        offset = builder['last']
+        if offset is not None:
+            with open(self.log_path, 'rb') as f:
+                while offset is not None:
+                    f.seek(offset)
+                    event = json.loads(f.readline())
+                    contributions.append(_public(event))
+                    offset = event.get('prev')
+            contributions.reverse()
+
+        return {
+            "id": builder_id,
+            "name": builder['name'],
+            "joined": builder['joined'],
+            "stats": stats,
+            "contributions": contributions
+        }
+
+    def leaderboard(self, offset: int = 0, limit: int = 100) -> List[Dict]:
+        with self.lock:
+            keys = self.index.page(offset, limit)
+            by_seq = self._seq_ids
+            page = []
+            for position, (neg_score, seq) in enumerate(keys, start=offset + 1):
+                builder_id = by_seq[seq]
+                builder = self.builders[builder_id]
+                categories = builder['categories']
+                page.append({
+                    "id": builder_id,
+                    "name": builder['name'],
+                    "score": -neg_score,
+                    "rank": self.get_rank(-neg_score),
+                    "specialization": max(categories.items(), key=lambda x: x[1])[0] if neg_score else "none",
+                    "contribution_count": builder['count'],
+                    "position": position
+                })
+            return page
+
+    def recent_contributions(self, limit: int = 50) -> List[Dict]:
+        with self.lock:
+            return list(self.recent)[-limit:][::-1] if limit > 0 else []
+
+    def global_stats(self) -> Dict:
+        with self.lock:
+            return {
+                "total_builders": len(self.builders),
+                "total_contributions": self.contribution_count,
+                "total_points": sum(self.category_totals.values()),
+                "category_distribution": dict(self.category_totals),
+                "rank_distribution": dict(self.rank_distribution)
+            }
+
+    # =====================================================
+    # PERSISTENCE
+    # =====================================================
+
+    def _log_size(self) -> int:
+        return os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+
+    def _load(self):
+        offset = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path) as f:
+                snapshot = json.load(f)
+            offset = snapshot['log_offset']
+            self.contribution_count = snapshot['contribution_count']
+            self.recent.extend(snapshot.get('recent', []))
+            # Builders were saved in seq order
+            for builder_id, builder in snapshot['builders'].items():
+                builder['seq'] = len(self._seq_ids)
+                self.builders[builder_id] = builder
+                self._seq_ids.append(builder_id)
+                for category, points in builder['categories'].items():
+                    self.category_totals[category] += points
+                self._count_rank(builder, 1)
+            for key in sorted(self._key(b) for b in self.builders.values()):
+                self.index.insert(key)
+
+        # Replay the log tail written after the snapshot
+        if self._log_size() > offset:
+            with open(self.log_path, 'rb') as f:
+                f.seek(offset)
+                while True:
+                    position = f.tell()
+                    line = f.readline()
+                    if not line:
+                        break
+                    if not line.endswith(b'\n'):
+                        # Torn final write: drop it so new events start on a clean line
+                        with open(self.log_path, 'r+b') as log:
+                            log.truncate(position)
+                        break
+                    self._apply(json.loads(line), position)
+
+    def _import_legacy(self, legacy_file: str):
+        with open(legacy_file) as f:
+            legacy = json.load(f)
+        for builder_id, builder in legacy.get('builders', {}).items():
+            event = {'op': 'register', 'builder_id': builder_id,
+                     'name': builder.get('name', builder_id), 'joined': builder.get('joined')}
+            self._write(event)
+        for contribution in legacy.get('contributions', []):
+            event = dict(contribution, op='contribution')
+            if event['builder_id'] not in self.builders:
+                register = {'op': 'register', 'builder_id': event['builder_id'],
+                            'name': event['builder_id'], 'joined': event.get('timestamp')}
+                self._write(register)
+            self._write(event)
+        print(f"📥 Imported {len(self.builders)} builders, {self.contribution_count} contributions from {legacy_file}")
+        self.snapshot()
+
+    def _maybe_snapshot(self):
+        """Start a background snapshot once enough events piled up (caller holds the lock)"""
+        if not self.snapshot_every or self.events_since_snapshot < self.snapshot_every:
+            return
+        if self._snapshot_thread and self._snapshot_thread.is_alive():
+            return
+        self._snapshot_thread = threading.Thread(target=self.snapshot, name='meritocracy-snapshot', daemon=True)
+        self._snapshot_thread.start()
+
+    def _capture(self) -> Dict:
+        """State to snapshot (caller holds the lock): O(builders) pointer copies, no serialization"""
+        log = getattr(self, '_log', None)
+        self.events_since_snapshot = 0
+        return {
+            'log_offset': log.tell() if log else self._log_size(),
+            'contribution_count': self.contribution_count,
+            'recent': list(self.recent),
+            'builders': dict(self.builders)
+        }
+
+    def snapshot(self):
+        """Write state + covered log offset atomically (temp file + rename), outside the lock"""
+        with self.snapshot_lock:
+            with self.lock:
+                state = self._capture()
+            state['builders'] = {
+                builder_id: {k: v for k, v in builder.items() if k != 'seq'}
+                for builder_id, builder in state['builders'].items()
+            }
+            tmp_path = self.snapshot_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(state, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+
+    def close(self):
+        if self._snapshot_thread:
+            self._snapshot_thread.join()
+        self.snapshot()
+        with self.lock:
+            self._log.close()
+
+
+def _public(event: Dict) -> Dict:
+    return {k: v for k, v in event.items() if k not in ('op', 'prev')}
+
+
+if __name__ == '__main__':
+    # Leaderboard page latency from 100 to 1M builders (temporary directory)
+    import tempfile
+    import time
+
+    types = {'code_commit': {'points': 5, 'category': 'builder'},
+             'docs_written': {'points': 8, 'category': 'teacher'}}
+
+    def rank(score):
+        return {'name': 'Commander' if score >= 1000 else 'Builder', 'threshold': 1000 if score >= 1000 else 0}
+
+    def timed(fn, runs=200):
+        started = time.perf_counter()
+        for _ in range(runs):
+            fn()
+        return (time.perf_counter() - started) / runs * 1000
+
+    for builders in (100, 10_000, 100_000, 1_000_000):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = MeritocracyStore(tmp, types, rank, snapshot_every=0)
+            started = time.perf_counter()
+            for i in range(builders):
+                store.add_contribution(f'b{i}', 'code_commit' if i % 3 else 'docs_written', (i * 7919) % 2000)
+            load_s = time.perf_counter() - started
+
+            first = timed(lambda: store.leaderboard(0, 100))
+            middle = timed(lambda: store.leaderboard(builders // 2, 100))
+            position = timed(lambda: store.stats(f'b{builders // 3}'))
+            write = timed(lambda: store.add_contribution(f'b{builders // 4}', 'code_commit', 5), runs=1000)
+            # Steady registrations: each one followed by a leaderboard read
+            joiners = iter(range(1000))
+            churn = timed(lambda: (store.register(f'new{next(joiners)}'), store.leaderboard(0, 100)), runs=1000)
+
+            # Lock hold of a snapshot (the write itself runs outside the lock)
+            with store.lock:
+                started = time.perf_counter()
+                store._capture()
+                capture_ms = (time.perf_counter() - started) * 1000
+            started = time.perf_counter()
+            store.snapshot()
+            snapshot_s = time.perf_counter() - started
+
+            page = store.leaderboard(0, builders)
+            assert all(a['score'] >= b['score'] for a, b in zip(page, page[1:]))
+            history = store.get_builder(f'b{builders // 4}')['contributions']
+            assert len(history) == 1001 and [c['id'] for c in history] == sorted(c['id'] for c in history)
+            print(f"👥 {builders:>9,} builders (built in {load_s:.1f}s): "
+                  f"top page {first:.3f} ms, middle page {middle:.3f} ms, "
+                  f"rank lookup {position:.3f} ms, contribution {write:.3f} ms, "
+                  f"register + top page {churn:.3f} ms, "
+                  f"snapshot {snapshot_s:.2f}s ({capture_ms:.1f} ms under the lock)")
+            store._log.close()
+
+            # Reload: snapshot + log tail give the same board and history
+            reloaded = MeritocracyStore(tmp, types, rank, snapshot_every=0)
+            assert reloaded.leaderboard(0, 100) == store.leaderboard(0, 100)
+            assert reloaded.get_builder(f'b{builders // 4}')['contributions'] == history
+            reloaded._log.close()
@@ -23,6 +23,11 @@ from psycopg2.extras import RealDictCursor
 from flask import Flask, request, jsonify
 from functools import wraps
 
+from auth_cache import invalidate_access
+from db_pool import get_connection, init_app
+from tier_catalog import get_catalog, get_entitlements
+from usage_meter import get_usage_meter
+
 # Configuration
 DATABASE_URL = os.getenv('DATABASE_URL', 'postgresql://localhost/consciousness_revolution')
 SPOTIFY_CLIENT_ID = os.getenv('SPOTIFY_CLIENT_ID')
@@ -37,7 +42,7 @@ class MusicDomainService:
     """
 
     def __init__(self):
-        self.db_conn = psycopg2.connect(DATABASE_URL)
+        self.db_conn = get_connection()
 
     def _get_cursor(self):
         return self.db_conn.cursor(cursor_factory=RealDictCursor)
@@ -79,81 +84,30 @@ class MusicDomainService:
             profile_id = profile['id']
 
         # Update domain access to new tier
+        features = self._get_tier_features(tier)
         cursor.execute("""
             UPDATE domain_access
             SET tier = %s, feature_flags = %s, upgraded_at = NOW()
             WHERE user_id = %s AND domain = 'music'
         """, (
             tier,
-            psycopg2.extras.Json(self._get_tier_features(tier)),
+            psycopg2.extras.Json(features),
             user_id
         ))
 
         self.db_conn.commit()
+        invalidate_access(user_id, 'music')
 
         return {
             'success': True,
             'tier': tier,
             'profile_id': profile_id,
-            'features': self._get_tier_features(tier)
+            'features': features
         }
 
     def _get_tier_features(self, tier: str) -> Dict:
-        """Get feature flags for tier"""
-
-        features = {
-            'free': {
-                'streaming_tracking': True,
-                'track_limit': 100,
-                'basic_analytics': True,
-                'distribution_service': False,
-                'nft_marketplace': False,
-                'sample_packs': False,
-                'producer_tools': False,
-                'courses_access': False,
-                'coaching_sessions': 0
-            },
-            'pro': {
-                'streaming_tracking': True,
-                'track_limit': -1,  # Unlimited
-                'basic_analytics': True,
-                'advanced_analytics': True,
-                'distribution_service': True,
-                'nft_marketplace': False,
-                'sample_packs': False,
-                'producer_tools': True,
-                'courses_access': True,
-                'coaching_sessions': 0
-            },
-            'pro_plus': {
-                'streaming_tracking': True,
-                'track_limit': -1,
-                'basic_analytics': True,
-                'advanced_analytics': True,
-                'distribution_service': True,
-                'nft_marketplace': True,
-                'sample_packs': True,
-                'producer_tools': True,
-                'courses_access': True,
-                'coaching_sessions': 1  # 1 session/month
-            },
-            'enterprise': {
-                'streaming_tracking': True,
-                'track_limit': -1,
-                'basic_analytics': True,
-                'advanced_analytics': True,
-                'distribution_service': True,
-                'nft_marketplace': True,
-                'sample_packs': True,
-                'producer_tools': True,
-                'courses_access': True,
-                'coaching_sessions': 4,  # 1 session/week
-                'priority_support': True,
-                'white_label': True
-            }
-        }
-
-        return features.get(tier, features['free'])
+        """Get feature flags for tier (from the shared tier catalog)"""
+        return get_catalog().features('music', tier)
 
     # =====================================================
     # STREAMING ANALYTICS (Revenue Stream #1)
@@ -519,6 +473,7 @@ class MusicDomainService:
         """, (psycopg2.extras.Json(usage), user_id))
 
         self.db_conn.commit()
+        invalidate_access(user_id, 'music')
 
         return {
             'success': True,
@@ -532,38 +487,20 @@ class MusicDomainService:
     # =====================================================
 
     def _check_feature_access(self, user_id: int, feature: str) -> Dict:
-        """Check if user has access to feature"""
+        """Check if user has access to feature (compiled entitlements, no query per gate)"""
 
-        cursor = self._get_cursor()
-        cursor.execute("""
-            SELECT tier, feature_flags
-            FROM domain_access
-            WHERE user_id = %s AND domain = 'music'
-        """, (user_id,))
-
-        access = cursor.fetchone()
-        if not access:
+        entitlements = get_entitlements(self._get_cursor, user_id, 'music')
+        if entitlements.row is None:
             return {
                 'has_access': False,
                 'required_tier': 'pro',
                 'current_tier': None
             }
 
-        features = access['feature_flags']
-        has_access = features.get(feature, False)
-
-        # Determine required tier for this feature
-        tier_map = {
-            'distribution_service': 'pro',
-            'nft_marketplace': 'pro_plus',
-            'sample_packs': 'pro_plus',
-            'coaching_sessions': 'pro_plus'
-        }
-
         return {
-            'has_access': has_access,
-            'current_tier': access['tier'],
-            'required_tier': tier_map.get(feature, 'pro')
+            'has_access': entitlements.has(feature),
+            'current_tier': entitlements.tier,
+            'required_tier': entitlements.required_tier(feature)
         }
 
     def get_user_dashboard(self, user_id: int) -> Dict:
@@ -572,15 +509,13 @@ class MusicDomainService:
         Shows subscription status, analytics, available features
         """
 
-        cursor = self._get_cursor()
+        # Subscription info (cached access row + unflushed usage)
+        subscription = get_entitlements(self._get_cursor, user_id, 'music').row
+        usage = get_usage_meter().usage_for(
+            user_id, 'music', subscription['usage_current_month'], subscription['usage_reset_date']
+        ) if subscription else {}
 
-        # Get subscription info
-        cursor.execute("""
-            SELECT tier, feature_flags, usage_current_month
-            FROM domain_access
-            WHERE user_id = %s AND domain = 'music'
-        """, (user_id,))
-        subscription = cursor.fetchone()
+        cursor = self._get_cursor()
 
         # Get music profile
         cursor.execute("""
@@ -602,7 +537,7 @@ class MusicDomainService:
             'subscription': {
                 'tier': subscription['tier'] if subscription else 'free',
                 'features': subscription['feature_flags'] if subscription else {},
-                'usage': subscription['usage_current_month'] if subscription else {}
+                'usage': usage
             },
             'profile': {
                 'artist_name': profile['artist_name'] if profile else None,
@@ -623,6 +558,7 @@ class MusicDomainService:
 # =====================================================
 
 app = Flask(__name__)
+init_app(app)
 music_service = MusicDomainService()
 
 # Import auth system for authentication decorator
@@ -736,7 +672,40 @@ def api_activate_subscription():
     return jsonify(result)
 
 
+def bench_dashboard(user_id: int, requests_count: int = 2000) -> Dict:
+    """
+    Latency of GET /api/music/dashboard in-process (Flask test client)
+    python music_domain_service.py --bench <user_id>
+    """
+    import time
+    from auth_system import auth
+
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {auth._generate_token(user_id, "bench@local")}'}
+    client.get('/api/music/dashboard', headers=headers)  # warm catalog, caches, pool
+
+    timings = []
+    for _ in range(requests_count):
+        started = time.perf_counter()
+        response = client.get('/api/music/dashboard', headers=headers)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.status_code
+
+    timings.sort()
+    return {
+        'requests': requests_count,
+        'p50_ms': round(timings[len(timings) // 2], 3),
+        'p95_ms': round(timings[int(len(timings) * 0.95)], 3),
+        'p99_ms': round(timings[int(len(timings) * 0.99)], 3),
+        'max_ms': round(timings[-1], 3)
+    }
+
+
 if __name__ == '__main__':
+    if '--bench' in sys.argv:
+        print(bench_dashboard(int(sys.argv[sys.argv.index('--bench') + 1])))
+        sys.exit(0)
+
     # Development server
     app.run(host='0.0.0.0', port=5001, debug=True)
 
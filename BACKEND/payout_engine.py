@@ -0,0 +1,208 @@
+"""
+Payout Engine
+Chunked, resumable monthly creator payouts
+
+One payout month is worked through in creator_id order, PAYOUT_CHUNK_SIZE
+creators at a time. Each chunk is ONE statement: aggregate that slice of
+marketplace_purchases, join users for stripe_connect_id, and insert the
+payout rows. The chunk's payouts and the checkpoint in payout_runs
+(last_creator_id, running totals) commit together, so a crash resumes
+after the last committed creator and never pays anyone twice
+(creator_payouts is also unique per creator and period).
+
+A creator with earnings but no Stripe Connect account yet gets a
+'pending' payout row instead of being skipped, so checkpointing past them
+loses nothing; settle_pending_payouts() pays those rows (any month) once
+the creator has connected an account.
+
+run_payouts() is a generator yielding one summary per chunk; nothing
+holds more than one chunk in memory however many creators there are.
+"""
+
+import os
+from datetime import date, timedelta
+from typing import Dict, Iterator, Optional, Tuple
+
+from psycopg2.extras import RealDictCursor
+
+PAYOUT_CHUNK_SIZE = int(os.getenv('PAYOUT_CHUNK_SIZE', '2000'))
+
+_START_RUN_SQL = """
+    INSERT INTO payout_runs (period_start, period_end)
+    VALUES (%s, %s)
+    ON CONFLICT (period_start) DO NOTHING
+"""
+
+_CHUNK_SQL = """
+    WITH chunk AS (
+        SELECT
+            creator_id,
+            SUM(creator_earnings) as total_earnings,
+            COUNT(*) as sales_count
+        FROM marketplace_purchases
+        WHERE status = 'completed'
+        AND purchased_at >= %(start)s
+        AND purchased_at < %(end)s
+        AND creator_id > %(after)s
+        GROUP BY creator_id
+        ORDER BY creator_id
+        LIMIT %(limit)s
+    ),
+    paid AS (
+        INSERT INTO creator_payouts (
+            creator_id, amount, stripe_connect_account_id, status,
+            period_start, period_end, items_count, paid_at
+        )
+        SELECT
+            c.creator_id, c.total_earnings, u.stripe_connect_id,
+            CASE WHEN u.stripe_connect_id IS NULL THEN 'pending' ELSE 'paid' END,
+            %(start)s, %(end)s::date - 1, c.sales_count,
+            CASE WHEN u.stripe_connect_id IS NULL THEN NULL ELSE NOW() END
+        FROM chunk c
+        JOIN users u ON u.id = c.creator_id
+        WHERE c.total_earnings > 0
+        ON CONFLICT (creator_id, period_start) DO NOTHING
+        RETURNING amount, status
+    )
+    SELECT
+        (SELECT COUNT(*) FROM chunk) as creators_scanned,
+        (SELECT MAX(creator_id) FROM chunk) as last_creator_id,
+        (SELECT COUNT(*) FROM paid WHERE status = 'paid') as creators_paid,
+        (SELECT COALESCE(SUM(amount), 0) FROM paid WHERE status = 'paid') as amount,
+        (SELECT COUNT(*) FROM paid WHERE status = 'pending') as creators_pending,
+        (SELECT COALESCE(SUM(amount), 0) FROM paid WHERE status = 'pending') as pending_amount
+"""
+
+_CHECKPOINT_SQL = """
+    UPDATE payout_runs
+    SET last_creator_id = %(last)s,
+        creators_paid = creators_paid + %(paid)s,
+        total_amount = total_amount + %(amount)s,
+        creators_pending = creators_pending + %(pending)s,
+        pending_amount = pending_amount + %(pending_amount)s,
+        chunks = chunks + 1,
+        status = CASE WHEN %(done)s THEN 'completed' ELSE 'running' END,
+        finished_at = CASE WHEN %(done)s THEN NOW() END,
+        updated_at = NOW()
+    WHERE period_start = %(start)s
+"""
+
+# Pending payouts whose creator now has a Connect account, moved into their run's paid totals
+_SETTLE_SQL = """
+    WITH settled AS (
+        UPDATE creator_payouts cp
+        SET status = 'paid', stripe_connect_account_id = u.stripe_connect_id, paid_at = NOW()
+        FROM users u
+        WHERE u.id = cp.creator_id
+        AND cp.status = 'pending'
+        AND u.stripe_connect_id IS NOT NULL
+        RETURNING cp.period_start, cp.amount
+    ),
+    totals AS (
+        SELECT period_start, COUNT(*) as creators, SUM(amount) as amount
+        FROM settled
+        GROUP BY period_start
+    )
+    UPDATE payout_runs r
+    SET creators_paid = r.creators_paid + t.creators,
+        total_amount = r.total_amount + t.amount,
+        creators_pending = r.creators_pending - t.creators,
+        pending_amount = r.pending_amount - t.amount,
+        updated_at = NOW()
+    FROM totals t
+    WHERE r.period_start = t.period_start
+    RETURNING t.creators, t.amount
+"""
+
+
+def previous_month(today: Optional[date] = None) -> Tuple[date, date]:
+    """[start, end) of the month before `today`"""
+    today = today or date.today()
+    end = today.replace(day=1)
+    start = (end - timedelta(days=1)).replace(day=1)
+    return start, end
+
+
+def month_bounds(month: str) -> Tuple[date, date]:
+    """[start, end) for 'YYYY-MM'"""
+    start = date.fromisoformat(f"{month}-01")
+    end = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start, end
+
+
+def get_run(cursor, period_start: date) -> Optional[Dict]:
+    cursor.execute("SELECT * FROM payout_runs WHERE period_start = %s", (period_start,))
+    return cursor.fetchone()
+
+
+def settle_pending_payouts(conn) -> Dict:
+    """Pay every pending payout (any month) whose creator has connected a Stripe account"""
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute(_SETTLE_SQL)
+        rows = cursor.fetchall()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return {
+        'creators_paid': sum(row['creators'] for row in rows),
+        'amount': float(sum(row['amount'] for row in rows))
+    }
+
+
+def run_payouts(conn, period_start: date, period_end: date,
+                chunk_size: int = PAYOUT_CHUNK_SIZE) -> Iterator[Dict]:
+    """
+    Pay every creator with earnings in [period_start, period_end)
+    Resumes from the period's checkpoint; yields a summary per committed chunk
+    conn: a psycopg2 connection or a db_pool RequestConnection
+    """
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+    cursor.execute(_START_RUN_SQL, (period_start, period_end))
+    run = get_run(cursor, period_start)
+    conn.commit()
+
+    if run['status'] == 'completed':
+        return
+    after = run['last_creator_id'] or 0
+
+    while True:
+        try:
+            cursor.execute(_CHUNK_SQL, {
+                'start': period_start,
+                'end': period_end,
+                'after': after,
+                'limit': chunk_size
+            })
+            chunk = cursor.fetchone()
+            done = chunk['creators_scanned'] < chunk_size
+            last = chunk['last_creator_id'] or after
+
+            cursor.execute(_CHECKPOINT_SQL, {
+                'start': period_start,
+                'last': last,
+                'paid': chunk['creators_paid'],
+                'amount': chunk['amount'],
+                'pending': chunk['creators_pending'],
+                'pending_amount': chunk['pending_amount'],
+                'done': done
+            })
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        after = last
+        yield {
+            'last_creator_id': last,
+            'creators_scanned': chunk['creators_scanned'],
+            'creators_paid': chunk['creators_paid'],
+            'amount': float(chunk['amount']),
+            'creators_pending': chunk['creators_pending'],
+            'done': done
+        }
+
+        if done:
+            return
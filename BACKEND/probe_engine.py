@@ -0,0 +1,224 @@
+"""
+Probe Engine
+Concurrent health probes with deadlines and latency time series
+
+- run() starts every check at once on a shared worker pool and waits for
+  each only until its own deadline, so a full health check takes as long
+  as the slowest probe (or its deadline), not the sum of all of them
+- HTTP probes reuse one requests.Session per worker thread (keep-alive),
+  instead of a new connection per probe
+- every probe's latency and outcome goes into per-minute histograms kept
+  for SERIES_RETENTION minutes; series() returns them oldest first
+
+A probe that misses its deadline is reported as failed right away; its
+thread finishes in the background (HTTP probes time out at the deadline).
+
+Probes submitted from inside a running probe (a check that fans out, like
+the payment health check) go to a separate inner pool. A parent blocked
+waiting on its children then never holds a worker those children need,
+however many parents run at once.
+"""
+
+import bisect
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+PROBE_WORKERS = int(os.getenv('PROBE_WORKERS', '32'))
+PROBE_DEADLINE = float(os.getenv('PROBE_DEADLINE', '5'))
+SERIES_BUCKET_SECONDS = int(os.getenv('PROBE_SERIES_BUCKET_SECONDS', '60'))
+SERIES_RETENTION = int(os.getenv('PROBE_SERIES_RETENTION', '1440'))  # buckets (24h of minutes)
+
+# Histogram bucket upper bounds in ms (last bucket is everything above)
+LATENCY_BOUNDS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram for one probe over one time bucket"""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BOUNDS_MS) + 1)
+        self.total = 0
+        self.failures = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, latency_ms: float, healthy: bool):
+        self.counts[bisect.bisect_left(LATENCY_BOUNDS_MS, latency_ms)] += 1
+        self.total += 1
+        self.sum_ms += latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+        if not healthy:
+            self.failures += 1
+
+    def percentile(self, pct: float) -> float:
+        """Upper bound of the bucket holding the pct-th sample (capped at the max seen)"""
+        if not self.total:
+            return 0.0
+        rank = pct / 100 * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                bound = LATENCY_BOUNDS_MS[i] if i < len(LATENCY_BOUNDS_MS) else self.max_ms
+                return round(min(float(bound), self.max_ms), 2)
+        return round(self.max_ms, 2)
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.total,
+            'failures': self.failures,
+            'avg_ms': round(self.sum_ms / self.total, 2) if self.total else 0,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'max_ms': round(self.max_ms, 2),
+            'buckets': dict(zip([str(b) for b in LATENCY_BOUNDS_MS] + ['inf'], self.counts))
+        }
+
+
+class ProbeSeries:
+    """Per-probe ring of (bucket_start, histogram), plus the latest result"""
+
+    def __init__(self, bucket_seconds: int = SERIES_BUCKET_SECONDS, retention: int = SERIES_RETENTION):
+        self.bucket_seconds = bucket_seconds
+        self.lock = threading.Lock()
+        self.probes = OrderedDict()  # name -> deque[(bucket_start, LatencyHistogram)]
+        self.latest = {}  # name -> last result dict
+        self.retention = retention
+
+    def record(self, name: str, latency_ms: float, healthy: bool, result: Dict):
+        bucket = int(time.time()) // self.bucket_seconds * self.bucket_seconds
+        with self.lock:
+            ring = self.probes.get(name)
+            if ring is None:
+                ring = self.probes[name] = deque(maxlen=self.retention)
+            if not ring or ring[-1][0] != bucket:
+                ring.append((bucket, LatencyHistogram()))
+            ring[-1][1].add(latency_ms, healthy)
+            self.latest[name] = dict(result, checked_at=datetime.now().isoformat())
+
+    def series(self, name: str, minutes: int = 60) -> List[Dict]:
+        since = time.time() - minutes * 60
+        with self.lock:
+            ring = list(self.probes.get(name, ()))
+            return [
+                dict(histogram.to_dict(), t=datetime.fromtimestamp(bucket).isoformat())
+                for bucket, histogram in ring
+                if bucket + self.bucket_seconds > since
+            ]
+
+    def summary(self, minutes: int = 60) -> Dict:
+        """Every probe: latest result plus a histogram merged over the window"""
+        since = time.time() - minutes * 60
+        with self.lock:
+            out = {}
+            for name, ring in self.probes.items():
+                merged = LatencyHistogram()
+                for bucket, histogram in ring:
+                    if bucket + self.bucket_seconds <= since:
+                        continue
+                    merged.counts = [a + b for a, b in zip(merged.counts, histogram.counts)]
+                    merged.total += histogram.total
+                    merged.failures += histogram.failures
+                    merged.sum_ms += histogram.sum_ms
+                    merged.max_ms = max(merged.max_ms, histogram.max_ms)
+                out[name] = {'latest': self.latest.get(name), 'window': merged.to_dict()}
+            return out
+
+
+class ProbeEngine:
+    """
+    Shared worker pool that runs probes concurrently under deadlines
+    """
+
+    def __init__(self, workers: int = PROBE_WORKERS, cleanup: Optional[Callable[[], None]] = None):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='probe')
+        self.inner_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='probe-inner')
+        self.cleanup = cleanup  # per-thread teardown after each probe (db connection release)
+        self.series = ProbeSeries()
+        self._local = threading.local()
+
+    # =====================================================
+    # HTTP
+    # =====================================================
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=4, max_retries=0)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        return session
+
+    def http_check(self, method: str, url: str, timeout: float = PROBE_DEADLINE,
+                   ok_statuses=(200, 401)) -> Dict:
+        """One HTTP probe on this thread's keep-alive session"""
+        response = self._session().request(method, url, timeout=timeout)
+        response.close()
+        return {'healthy': response.status_code in ok_statuses, 'status_code': response.status_code}
+
+    # =====================================================
+    # RUNNING PROBES
+    # =====================================================
+
+    def _timed(self, name: str, check: Callable[[], Dict]) -> Tuple[Dict, float]:
+        started = time.monotonic()
+        self._local.depth = getattr(self._local, 'depth', 0) + 1
+        try:
+            result = check()
+            if not isinstance(result, dict):
+                result = {'healthy': bool(result)}
+        except Exception as e:
+            result = {'healthy': False, 'error': str(e)}
+        finally:
+            self._local.depth -= 1
+            if self.cleanup:
+                self.cleanup()
+        latency_ms = (time.monotonic() - started) * 1000
+        self.series.record(name, latency_ms, result.get('healthy', True), _flat(result))
+        return result, latency_ms
+
+    def submit(self, name: str, check: Callable[[], Dict]):
+        """Start one probe now; future resolves to (result, latency_ms)"""
+        nested = getattr(self._local, 'depth', 0) > 0
+        executor = self.inner_executor if nested else self.executor
+        return executor.submit(self._timed, name, check)
+
+    def run(self, checks: Dict[str, Tuple[Callable[[], Dict], float]]) -> Dict[str, Dict]:
+        """
+        Run {name: (check, deadline_seconds)} concurrently
+        Returns {name: result} with response_time_ms; late probes fail with an error
+        """
+        started = time.monotonic()
+        futures = {name: (self.submit(name, check), deadline) for name, (check, deadline) in checks.items()}
+
+        results = {}
+        for name, (future, deadline) in futures.items():
+            remaining = started + deadline - time.monotonic()
+            try:
+                result, latency_ms = future.result(timeout=max(0, remaining))
+                results[name] = dict(result, response_time_ms=round(latency_ms, 2))
+            except FutureTimeout:
+                results[name] = {'healthy': False, 'error': f'deadline of {deadline}s exceeded'}
+        return results
+
+    def result(self, future, deadline: float, default: Dict) -> Dict:
+        """Wait for one submitted probe up to deadline seconds"""
+        try:
+            return future.result(timeout=deadline)[0]
+        except FutureTimeout:
+            return default
+
+
+def _flat(result: Dict) -> Dict:
+    """Top-level scalars of a result (what the latest-value view keeps)"""
+    return {k: v for k, v in result.items() if not isinstance(v, (dict, list))}
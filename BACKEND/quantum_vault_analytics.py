@@ -13,24 +13,46 @@ Tracks:
 """
 
 import os
+import sys
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from decimal import Decimal
-import psycopg2
 from psycopg2.extras import RealDictCursor
 from flask import Flask, request, jsonify
 import json
 
+from db_pool import get_connection, init_app
+from revenue_rollups import (
+    DOMAINS, MRR_SQL, ensure_today, refresh_daily_rollup, get_rollup_days, get_rollup_domains
+)
+
 # Configuration
 DATABASE_URL = os.getenv('DATABASE_URL', 'postgresql://localhost/consciousness_revolution')
 
+# Round trips per endpoint once today's rollup rows exist (checked by running this file)
+DASHBOARD_QUERIES = 5
+ENDPOINT_QUERIES = {
+    '/api/vault/dashboard': DASHBOARD_QUERIES,
+    '/api/vault/mrr': 2,
+    '/api/vault/mrr?domain=music': 2,
+    '/api/vault/arr': 2,
+    '/api/vault/domains': 2,
+    '/api/vault/growth?days=30': 2,
+    '/api/vault/fibonacci': 4,
+    '/api/vault/ltv-cac': 2,
+    '/api/vault/churn?days=30': 2,
+    '/api/vault/marketplace': 1,
+    '/api/vault/subscription-health': 1,
+    '/api/vault/history?days=90': 1
+}
+
 class QuantumVaultAnalytics:
     """
     Real-time revenue analytics and intelligence
     """
 
     def __init__(self):
-        self.db_conn = psycopg2.connect(DATABASE_URL)
+        self.db_conn = get_connection()
 
     def _get_cursor(self):
         return self.db_conn.cursor(cursor_factory=RealDictCursor)
@@ -39,47 +61,37 @@ class QuantumVaultAnalytics:
     # CORE REVENUE METRICS
     # =====================================================
 
-    def get_mrr(self, domain: str = None) -> Dict:
+    def _get_today_rollups(self) -> Dict[str, Dict]:
+        """Today's per-domain rollup rows (built on first read of the day)"""
+        rollups = get_rollup_domains(self._get_cursor())
+        self.db_conn.commit()
+        return rollups
+
+    def get_mrr(self, domain: str = None, rollups: Dict = None) -> Dict:
         """
         Calculate Monthly Recurring Revenue
         Optionally filter by domain
         """
 
-        cursor = self._get_cursor()
-
-        domain_filter = "AND domain = %s" if domain else ""
-        params = [domain] if domain else []
-
-        cursor.execute(f"""
-            SELECT
-                COALESCE(SUM(
-                    CASE
-                        WHEN billing_period = 'monthly' THEN price_monthly
-                        WHEN billing_period = 'annual' THEN price_annual / 12
-                    END
-                ), 0) as mrr,
-                COUNT(*) as active_subscriptions,
-                COUNT(DISTINCT user_id) as paying_customers
-            FROM subscriptions
-            WHERE status = 'active'
-            {domain_filter}
-        """, params)
-
-        result = cursor.fetchone()
+        rollups = rollups if rollups is not None else self._get_today_rollups()
+        if domain:
+            rows = [rollups[domain]] if domain in rollups else []
+        else:
+            rows = list(rollups.values())
 
         return {
-            'mrr': float(result['mrr']),
-            'active_subscriptions': result['active_subscriptions'],
-            'paying_customers': result['paying_customers'],
+            'mrr': float(sum(row['mrr'] for row in rows)),
+            'active_subscriptions': sum(row['active_subscriptions'] for row in rows),
+            'paying_customers': sum(row['paying_customers'] for row in rows),
             'domain': domain or 'all'
         }
 
-    def get_arr(self, domain: str = None) -> Dict:
+    def get_arr(self, domain: str = None, rollups: Dict = None) -> Dict:
         """
         Calculate Annual Recurring Revenue
         """
 
-        mrr_data = self.get_mrr(domain)
+        mrr_data = self.get_mrr(domain, rollups)
 
         return {
             'arr': mrr_data['mrr'] * 12,
@@ -87,22 +99,58 @@ class QuantumVaultAnalytics:
             'domain': domain or 'all'
         }
 
-    def get_revenue_by_domain(self) -> List[Dict]:
+    def _get_subscription_summary(self) -> Dict:
+        """
+        One pass over subscriptions for the breakdowns rollups do not keep
+        GROUPING SETS: per status, per tier, per billing period, overall
+        """
+
+        cursor = self._get_cursor()
+
+        cursor.execute(f"""
+            SELECT
+                status, tier, billing_period,
+                GROUPING(status) = 0 AS by_status,
+                GROUPING(tier) = 0 AS by_tier,
+                GROUPING(billing_period) = 0 AS by_billing_period,
+                COUNT(*) AS total_count,
+                COUNT(DISTINCT user_id) AS unique_users,
+                COUNT(*) FILTER (WHERE status = 'active') AS active_subscriptions,
+                COALESCE(SUM({MRR_SQL}) FILTER (WHERE status = 'active'), 0) AS mrr
+            FROM subscriptions
+            GROUP BY GROUPING SETS ((status), (tier), (billing_period), ())
+        """)
+
+        summary = {'statuses': {}, 'tiers': {}, 'billing_periods': {}, 'overall': None}
+        for row in cursor.fetchall():
+            if row['by_status']:
+                summary['statuses'][row['status']] = row
+            elif row['by_tier']:
+                summary['tiers'][row['tier']] = row
+            elif row['by_billing_period']:
+                summary['billing_periods'][row['billing_period']] = row
+            else:
+                summary['overall'] = row
+
+        return summary
+
+    def get_revenue_by_domain(self, rollups: Dict = None) -> Dict:
         """
         Get MRR breakdown by each of 7 domains
+        (today's rollup rows; pass them in to reuse a read)
         """
 
-        domains = ['music', 'intelligence', 'tools', 'education',
-                  'commerce', 'communication', 'community']
+        rollups = rollups if rollups is not None else self._get_today_rollups()
 
         results = []
-        for domain in domains:
-            mrr_data = self.get_mrr(domain)
+        for domain in DOMAINS:
+            row = rollups.get(domain)
+            mrr = float(row['mrr']) if row else 0.0
             results.append({
                 'domain': domain,
-                'mrr': mrr_data['mrr'],
-                'arr': mrr_data['mrr'] * 12,
-                'subscribers': mrr_data['paying_customers']
+                'mrr': mrr,
+                'arr': mrr * 12,
+                'subscribers': row['paying_customers'] if row else 0
             })
 
         # Sort by MRR descending
@@ -121,36 +169,34 @@ class QuantumVaultAnalytics:
             }
         }
 
-    def get_revenue_growth(self, days: int = 30) -> Dict:
+    def _get_history_days(self, days: int, ensure: bool = True) -> List[Dict]:
+        """
+        Daily rollup totals for the window
+        Makes sure today is included unless the caller just did (ensure=False)
+        """
+        if ensure and ensure_today(self._get_cursor()):
+            self.db_conn.commit()
+        return get_rollup_days(self._get_cursor(), days)
+
+    def _window(self, history: List[Dict], days: int) -> List[Dict]:
+        start = datetime.now().date() - timedelta(days=days)
+        return [row for row in history if row['day'] >= start]
+
+    def get_revenue_growth(self, days: int = 30, history: List[Dict] = None) -> Dict:
         """
         Calculate revenue growth over time period
         Returns growth rate and trend
         """
 
-        cursor = self._get_cursor()
+        window = self._window(history, days) if history else self._get_history_days(days)
 
-        # Get MRR at start and end of period
-        cursor.execute("""
-            SELECT
-                (SELECT calculate_mrr()) as current_mrr,
-                (
-                    SELECT COALESCE(SUM(
-                        CASE
-                            WHEN s.billing_period = 'monthly' THEN s.price_monthly
-                            WHEN s.billing_period = 'annual' THEN s.price_annual / 12
-                        END
-                    ), 0)
-                    FROM revenue_snapshots rs
-                    WHERE rs.created_at >= NOW() - INTERVAL '%s days'
-                    ORDER BY rs.created_at ASC
-                    LIMIT 1
-                ) as period_start_mrr
-        """, (days,))
+        current_mrr = float(window[-1]['mrr']) if window else 0.0
+        start_mrr = window[0]['mrr'] if window else None
 
-        result = cursor.fetchone()
+        return self._build_growth(days, current_mrr, start_mrr)
 
-        current_mrr = float(result['current_mrr'])
-        start_mrr = float(result['period_start_mrr']) if result['period_start_mrr'] else current_mrr
+    def _build_growth(self, days: int, current_mrr: float, period_start_mrr) -> Dict:
+        start_mrr = float(period_start_mrr) if period_start_mrr else current_mrr
 
         # Calculate growth
         growth_amount = current_mrr - start_mrr
@@ -169,13 +215,14 @@ class QuantumVaultAnalytics:
     # FIBONACCI PROGRESSION TRACKING
     # =====================================================
 
-    def get_fibonacci_progression(self) -> Dict:
+    def get_fibonacci_progression(self, current_mrr: float = None, growth_30d: Dict = None) -> Dict:
         """
         Track progress through Fibonacci revenue milestones
         $1K → $10K → $100K → $1M → $10M MRR
         """
 
-        current_mrr = self.get_mrr()['mrr']
+        if current_mrr is None:
+            current_mrr = self.get_mrr()['mrr']
 
         milestones = [
             {'level': 1, 'target': 1000, 'name': '$1K MRR'},
@@ -215,7 +262,7 @@ class QuantumVaultAnalytics:
             progress_percent = 100
 
         # Estimate time to next milestone based on growth rate
-        growth_30d = self.get_revenue_growth(30)
+        growth_30d = growth_30d or self.get_revenue_growth(30)
         monthly_growth_rate = growth_30d['growth_percent'] / 100
 
         if next_milestone and monthly_growth_rate > 0:
@@ -243,43 +290,28 @@ class QuantumVaultAnalytics:
     # CONVERSION METRICS
     # =====================================================
 
-    def get_ltv_cac_ratio(self) -> Dict:
+    def get_ltv_cac_ratio(self, mrr_data: Dict = None) -> Dict:
         """
         Calculate Lifetime Value to Customer Acquisition Cost ratio
         Target: 3:1 minimum, 24:1 for hypergrowth (from Quantum Vault blueprint)
         """
 
-        cursor = self._get_cursor()
+        mrr_data = mrr_data or self.get_mrr()
 
         # Calculate average LTV (simplified - real calculation needs churn data)
-        cursor.execute("""
-            SELECT
-                AVG(
-                    CASE
-                        WHEN billing_period = 'monthly' THEN price_monthly * 12
-                        WHEN billing_period = 'annual' THEN price_annual
-                    END
-                ) as avg_annual_value
-            FROM subscriptions
-            WHERE status = 'active'
-        """)
+        active = mrr_data['active_subscriptions']
+        avg_annual_value = mrr_data['mrr'] * 12 / active if active else None
+
+        return self._build_ltv_cac(avg_annual_value)
 
-        avg_ltv = cursor.fetchone()['avg_annual_value']
-        avg_ltv = float(avg_ltv) if avg_ltv else 0
+    def _build_ltv_cac(self, avg_annual_value) -> Dict:
+        avg_ltv = float(avg_annual_value) if avg_annual_value else 0
 
         # Assume 24-month average customer lifespan (would calculate from churn)
         ltv = avg_ltv * 2
 
-        # Calculate CAC from marketing spend (simplified)
-        cursor.execute("""
-            SELECT COUNT(DISTINCT user_id) as new_customers
-            FROM users
-            WHERE created_at >= NOW() - INTERVAL '30 days'
-        """)
-
-        new_customers = cursor.fetchone()['new_customers']
-
-        # Assume $50 CAC per customer (would track actual marketing spend)
+        # Assume $50 CAC per customer (would track actual marketing spend;
+        # new-customer counts are not used until then)
         cac = 50
 
         # Calculate ratio
@@ -293,33 +325,21 @@ class QuantumVaultAnalytics:
             'meets_hypergrowth_target': ratio >= 24
         }
 
-    def get_churn_rate(self, days: int = 30) -> Dict:
+    def get_churn_rate(self, days: int = 30, history: List[Dict] = None) -> Dict:
         """
         Calculate customer churn rate
         Lower is better - target < 5% monthly
         """
 
-        cursor = self._get_cursor()
+        window = self._window(history, days) if history else self._get_history_days(days)
 
-        cursor.execute("""
-            SELECT
-                COUNT(DISTINCT user_id) as customers_start_period
-            FROM subscriptions
-            WHERE status = 'active'
-            AND created_at < NOW() - INTERVAL '%s days'
-        """, (days,))
-
-        customers_start = cursor.fetchone()['customers_start_period']
-
-        cursor.execute("""
-            SELECT COUNT(*) as churned_customers
-            FROM subscriptions
-            WHERE status = 'cancelled'
-            AND cancelled_at >= NOW() - INTERVAL '%s days'
-        """, (days,))
+        # Active subscriptions at the start of the window vs cancellations since
+        customers_start = window[0]['active_subscriptions'] if window else 0
+        churned = sum(row['churned_subscriptions'] for row in window[1:])
 
-        churned = cursor.fetchone()['churned_customers']
+        return self._build_churn(days, int(customers_start), int(churned))
 
+    def _build_churn(self, days: int, customers_start: int, churned: int) -> Dict:
         churn_rate = (churned / customers_start * 100) if customers_start > 0 else 0
 
         return {
@@ -360,7 +380,7 @@ class QuantumVaultAnalytics:
         result = cursor.fetchone()
 
         gmv = float(result['gmv'] or 0)
-        platform_revenue = float(result['platform_commission'] or 0)
+        platform_revenue = float(result['platform_revenue'] or 0)
         creator_payouts = float(result['creator_payouts'] or 0)
 
         # Verify 70/30 split
@@ -388,70 +408,40 @@ class QuantumVaultAnalytics:
     # SUBSCRIPTION HEALTH
     # =====================================================
 
-    def get_subscription_health(self) -> Dict:
+    def get_subscription_health(self, summary: Dict = None) -> Dict:
         """
         Overall subscription health metrics
+        (status, tier and billing breakdowns all come from one grouped pass)
         """
 
-        cursor = self._get_cursor()
+        summary = summary or self._get_subscription_summary()
 
         # Subscription status breakdown
-        cursor.execute("""
-            SELECT
-                status,
-                COUNT(*) as count,
-                COUNT(DISTINCT user_id) as unique_users
-            FROM subscriptions
-            GROUP BY status
-        """)
-
         status_breakdown = {}
-        for row in cursor.fetchall():
-            status_breakdown[row['status']] = {
-                'count': row['count'],
+        for status, row in summary['statuses'].items():
+            status_breakdown[status] = {
+                'count': row['total_count'],
                 'unique_users': row['unique_users']
             }
 
-        # Tier distribution
-        cursor.execute("""
-            SELECT
-                tier,
-                COUNT(*) as count,
-                SUM(
-                    CASE
-                        WHEN billing_period = 'monthly' THEN price_monthly
-                        WHEN billing_period = 'annual' THEN price_annual / 12
-                    END
-                ) as tier_mrr
-            FROM subscriptions
-            WHERE status = 'active'
-            GROUP BY tier
-        """)
-
+        # Tier distribution (active only)
         tier_distribution = {}
-        for row in cursor.fetchall():
-            tier_distribution[row['tier']] = {
-                'count': row['count'],
-                'mrr': float(row['tier_mrr'])
-            }
-
-        # Billing period preference
-        cursor.execute("""
-            SELECT
-                billing_period,
-                COUNT(*) as count,
-                ROUND(COUNT(*)::NUMERIC / SUM(COUNT(*)) OVER () * 100, 2) as percentage
-            FROM subscriptions
-            WHERE status = 'active'
-            GROUP BY billing_period
-        """)
-
+        for tier, row in summary['tiers'].items():
+            if row['active_subscriptions']:
+                tier_distribution[tier] = {
+                    'count': row['active_subscriptions'],
+                    'mrr': float(row['mrr'])
+                }
+
+        # Billing period preference (active only)
+        total_active = summary['overall']['active_subscriptions'] if summary['overall'] else 0
         billing_periods = {}
-        for row in cursor.fetchall():
-            billing_periods[row['billing_period']] = {
-                'count': row['count'],
-                'percentage': float(row['percentage'])
-            }
+        for period, row in summary['billing_periods'].items():
+            if row['active_subscriptions']:
+                billing_periods[period] = {
+                    'count': row['active_subscriptions'],
+                    'percentage': round(row['active_subscriptions'] / total_active * 100, 2)
+                }
 
         return {
             'status_breakdown': status_breakdown,
@@ -466,24 +456,32 @@ class QuantumVaultAnalytics:
     def get_quantum_vault_dashboard(self) -> Dict:
         """
         Complete revenue dashboard
-        All metrics in one call
+        All metrics in one call, from DASHBOARD_QUERIES round trips:
+        today's completeness check, today's rollups, 90 days of rollups,
+        subscription summary, marketplace
         """
 
+        rollups = self._get_today_rollups()
+        history = self._get_history_days(90, ensure=False)
+
+        mrr_data = self.get_mrr(rollups=rollups)
+        growth_30 = self.get_revenue_growth(30, history)
+
         return {
             'timestamp': datetime.now().isoformat(),
             'core_metrics': {
-                'mrr': self.get_mrr(),
-                'arr': self.get_arr(),
-                'revenue_by_domain': self.get_revenue_by_domain()
+                'mrr': mrr_data,
+                'arr': self.get_arr(rollups=rollups),
+                'revenue_by_domain': self.get_revenue_by_domain(rollups)
             },
             'growth': {
-                '30_day': self.get_revenue_growth(30),
-                '90_day': self.get_revenue_growth(90),
-                'fibonacci_progression': self.get_fibonacci_progression()
+                '30_day': growth_30,
+                '90_day': self.get_revenue_growth(90, history),
+                'fibonacci_progression': self.get_fibonacci_progression(mrr_data['mrr'], growth_30)
             },
             'conversion': {
-                'ltv_cac': self.get_ltv_cac_ratio(),
-                'churn': self.get_churn_rate(30)
+                'ltv_cac': self.get_ltv_cac_ratio(mrr_data),
+                'churn': self.get_churn_rate(30, history)
             },
             'marketplace': self.get_marketplace_revenue(),
             'subscription_health': self.get_subscription_health()
@@ -497,32 +495,49 @@ class QuantumVaultAnalytics:
         """
         Create snapshot of current revenue state
         Run daily via cron to build historical data
+        Refreshes today's domain rollups, then upserts the daily snapshot row
         """
 
         cursor = self._get_cursor()
+        refresh_daily_rollup(cursor)
 
-        # Get current metrics
-        mrr = self.get_mrr()['mrr']
-        arr = self.get_arr()['arr']
-        paying_customers = self.get_mrr()['paying_customers']
-
-        # Get conversion metrics
-        ltv_cac = self.get_ltv_cac_ratio()
-        churn = self.get_churn_rate(30)
+        rollups = get_rollup_domains(cursor)
+        history = get_rollup_days(cursor, 30)
 
-        # Get marketplace
+        mrr_data = self.get_mrr(rollups=rollups)
+        ltv_cac = self.get_ltv_cac_ratio(mrr_data)
+        churn = self.get_churn_rate(30, history)
         marketplace = self.get_marketplace_revenue()
+        today = history[-1] if history else {}
 
         cursor.execute("""
             INSERT INTO revenue_snapshots (
-                mrr, arr, paying_customers, ltv, cac,
-                churn_rate, marketplace_gmv, created_at
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, NOW())
+                period_type, period_date, mrr, arr, one_time_revenue,
+                total_customers, new_customers, churned_customers, churn_rate,
+                customer_lifetime_value, customer_acquisition_cost, ltv_cac_ratio,
+                revenue_by_domain
+            ) VALUES ('daily', CURRENT_DATE, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (period_type, period_date) DO UPDATE SET
+                mrr = EXCLUDED.mrr,
+                arr = EXCLUDED.arr,
+                one_time_revenue = EXCLUDED.one_time_revenue,
+                total_customers = EXCLUDED.total_customers,
+                new_customers = EXCLUDED.new_customers,
+                churned_customers = EXCLUDED.churned_customers,
+                churn_rate = EXCLUDED.churn_rate,
+                customer_lifetime_value = EXCLUDED.customer_lifetime_value,
+                customer_acquisition_cost = EXCLUDED.customer_acquisition_cost,
+                ltv_cac_ratio = EXCLUDED.ltv_cac_ratio,
+                revenue_by_domain = EXCLUDED.revenue_by_domain,
+                created_at = NOW()
         """, (
-            mrr, arr, paying_customers,
-            ltv_cac['ltv'], ltv_cac['cac'],
+            mrr_data['mrr'], mrr_data['mrr'] * 12, marketplace['gmv'],
+            mrr_data['paying_customers'],
+            today.get('new_subscriptions', 0),
+            today.get('churned_subscriptions', 0),
             churn['churn_rate'],
-            marketplace['gmv']
+            ltv_cac['ltv'], ltv_cac['cac'], ltv_cac['ratio'],
+            json.dumps({domain: float(row['mrr']) for domain, row in rollups.items()})
         ))
 
         self.db_conn.commit()
@@ -530,18 +545,20 @@ class QuantumVaultAnalytics:
     def get_revenue_history(self, days: int = 90) -> List[Dict]:
         """
         Get historical revenue snapshots
-        For charting growth over time
+        For charting growth over time (one range scan on period_type, period_date)
         """
 
         cursor = self._get_cursor()
         cursor.execute("""
             SELECT
-                DATE(created_at) as date,
-                mrr, arr, paying_customers,
-                ltv, cac, churn_rate, marketplace_gmv
+                period_date as date,
+                mrr, arr, total_customers,
+                customer_lifetime_value, customer_acquisition_cost,
+                churn_rate, one_time_revenue
             FROM revenue_snapshots
-            WHERE created_at >= NOW() - INTERVAL '%s days'
-            ORDER BY created_at ASC
+            WHERE period_type = 'daily'
+            AND period_date >= CURRENT_DATE - %s
+            ORDER BY period_date ASC
         """, (days,))
 
         history = []
@@ -550,11 +567,11 @@ class QuantumVaultAnalytics:
                 'date': row['date'].isoformat(),
                 'mrr': float(row['mrr']),
                 'arr': float(row['arr']),
-                'paying_customers': row['paying_customers'],
-                'ltv': float(row['ltv'] or 0),
-                'cac': float(row['cac'] or 0),
+                'paying_customers': row['total_customers'],
+                'ltv': float(row['customer_lifetime_value'] or 0),
+                'cac': float(row['customer_acquisition_cost'] or 0),
                 'churn_rate': float(row['churn_rate'] or 0),
-                'marketplace_gmv': float(row['marketplace_gmv'] or 0)
+                'marketplace_gmv': float(row['one_time_revenue'] or 0)
             })
 
         return history
@@ -565,6 +582,7 @@ class QuantumVaultAnalytics:
 # =====================================================
 
 app = Flask(__name__)
+init_app(app)
 analytics = QuantumVaultAnalytics()
 
 @app.route('/api/vault/dashboard', methods=['GET'])
@@ -693,7 +711,57 @@ def api_create_snapshot():
     return jsonify({'success': True, 'message': 'Snapshot created'})
 
 
+class QueryCounter:
+    """Connection wrapper that counts execute() calls on every cursor it hands out"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.queries = 0
+
+    def cursor(self, *args, **kwargs):
+        return _CountingCursor(self, self.conn.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+
+class _CountingCursor:
+    def __init__(self, counter: QueryCounter, cursor):
+        self._counter = counter
+        self._cursor = cursor
+
+    def execute(self, *args, **kwargs):
+        self._counter.queries += 1
+        return self._cursor.execute(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def check_query_counts():
+    """Round trips per endpoint against DATABASE_URL (fails on any regression)"""
+    counter = analytics.db_conn = QueryCounter(analytics.db_conn)
+    client = app.test_client()
+    analytics.get_quantum_vault_dashboard()  # today's rollup rows exist from here on
+
+    failed = []
+    for path, expected in ENDPOINT_QUERIES.items():
+        counter.queries = 0
+        response = client.get(path)
+        assert response.status_code == 200, (path, response.status_code)
+        print(f"   {path}: {counter.queries} queries (expected {expected})")
+        if counter.queries != expected:
+            failed.append(path)
+
+    assert not failed, f"query count changed: {failed}"
+    print("✅ Query counts fixed")
+
+
 if __name__ == '__main__':
+    if '--check-queries' in sys.argv:
+        check_query_counts()
+        sys.exit(0)
+
     app.run(host='0.0.0.0', port=5003, debug=True)
 
 
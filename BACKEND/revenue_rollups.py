@@ -0,0 +1,146 @@
+"""
+Revenue Rollups
+Daily per-domain revenue rows maintained as subscriptions change
+
+revenue_daily_rollups (day, domain):
+- mrr, active_subscriptions, paying_customers   state at the end of the day
+- new_subscriptions, churned_subscriptions      changes during the day
+
+Today's rows are refreshed for one domain whenever a subscription in that
+domain changes (stripe_payment_system, self_healing_monitoring) and for
+every domain by the daily snapshot (quantum_vault_analytics). The first
+refresh of a day always covers every domain and seeds a row for each of
+DOMAINS, so a day never holds only the domains that happened to change.
+Past days are never rewritten, so any history window is one range scan on
+the (day, domain) primary key.
+"""
+
+from typing import Dict, List, Optional
+
+# Monthly value of one subscription row
+MRR_SQL = """
+    CASE
+        WHEN billing_period = 'monthly' THEN price_monthly
+        WHEN billing_period = 'annual' THEN price_annual / 12
+    END
+"""
+
+DOMAINS = ['music', 'intelligence', 'tools', 'education',
+           'commerce', 'communication', 'community']
+
+_REFRESH_SQL = f"""
+    INSERT INTO revenue_daily_rollups (
+        day, domain, mrr, active_subscriptions, paying_customers,
+        new_subscriptions, churned_subscriptions, updated_at
+    )
+    SELECT
+        CURRENT_DATE,
+        domain,
+        COALESCE(SUM({MRR_SQL}) FILTER (WHERE status = 'active'), 0),
+        COUNT(*) FILTER (WHERE status = 'active'),
+        COUNT(DISTINCT user_id) FILTER (WHERE status = 'active'),
+        COUNT(*) FILTER (WHERE created_at >= CURRENT_DATE),
+        COUNT(*) FILTER (WHERE status = 'canceled' AND canceled_at >= CURRENT_DATE),
+        NOW()
+    FROM subscriptions
+    {{where}}
+    GROUP BY domain
+    ON CONFLICT (day, domain) DO UPDATE SET
+        mrr = EXCLUDED.mrr,
+        active_subscriptions = EXCLUDED.active_subscriptions,
+        paying_customers = EXCLUDED.paying_customers,
+        new_subscriptions = EXCLUDED.new_subscriptions,
+        churned_subscriptions = EXCLUDED.churned_subscriptions,
+        updated_at = EXCLUDED.updated_at
+"""
+
+
+# Zero rows for every domain, so domains without subscriptions count as 0, not missing
+_SEED_SQL = """
+    INSERT INTO revenue_daily_rollups (day, domain, updated_at)
+    SELECT CURRENT_DATE, domain, NOW() FROM unnest(%s::text[]) AS domain
+    ON CONFLICT (day, domain) DO NOTHING
+"""
+
+_TODAY_COMPLETE_SQL = """
+    SELECT 1 FROM revenue_daily_rollups
+    WHERE day = CURRENT_DATE AND domain = ANY(%s)
+    HAVING COUNT(*) = %s
+"""
+
+
+def _today_complete(cursor) -> bool:
+    """True once today has a row for every domain"""
+    cursor.execute(_TODAY_COMPLETE_SQL, (DOMAINS, len(DOMAINS)))
+    return cursor.fetchone() is not None
+
+
+def ensure_today(cursor) -> bool:
+    """
+    Build today's rows for every domain unless they all exist
+    Returns True if it refreshed; caller commits
+    """
+    if _today_complete(cursor):
+        return False
+    refresh_daily_rollup(cursor)
+    return True
+
+
+def refresh_daily_rollup(cursor, domain: Optional[str] = None):
+    """
+    Recompute today's rollup rows (one domain, or all of them)
+    A one-domain refresh covers every domain on the day's first refresh
+    Caller commits
+    """
+    if domain and _today_complete(cursor):
+        cursor.execute(_REFRESH_SQL.format(where='WHERE domain = %s'), (domain,))
+    else:
+        cursor.execute(_SEED_SQL, (DOMAINS,))
+        cursor.execute(_REFRESH_SQL.format(where=''))
+
+
+def refresh_for_subscription(cursor, stripe_subscription_id: str):
+    """Refresh today's row for the domain of one subscription (webhook path)"""
+    if not _today_complete(cursor):
+        refresh_daily_rollup(cursor)
+        return
+    cursor.execute(
+        _REFRESH_SQL.format(where="""
+            WHERE domain = (
+                SELECT domain FROM subscriptions WHERE stripe_subscription_id = %s LIMIT 1
+            )
+        """),
+        (stripe_subscription_id,)
+    )
+
+
+def get_rollup_days(cursor, days: int, domain: Optional[str] = None) -> List[Dict]:
+    """
+    Per-day totals from today back `days` days, oldest first
+    (one range scan on the primary key)
+    """
+    cursor.execute("""
+        SELECT
+            day,
+            SUM(mrr) as mrr,
+            SUM(active_subscriptions) as active_subscriptions,
+            SUM(paying_customers) as paying_customers,
+            SUM(new_subscriptions) as new_subscriptions,
+            SUM(churned_subscriptions) as churned_subscriptions
+        FROM revenue_daily_rollups
+        WHERE day >= CURRENT_DATE - %s
+          AND (%s IS NULL OR domain = %s)
+        GROUP BY day
+        ORDER BY day ASC
+    """, (days, domain, domain))
+
+    return cursor.fetchall()
+
+
+def get_rollup_domains(cursor) -> Dict[str, Dict]:
+    """Today's rows keyed by domain (every domain refreshed first if any is missing)"""
+    ensure_today(cursor)
+    cursor.execute("SELECT * FROM revenue_daily_rollups WHERE day = CURRENT_DATE")
+    rows = cursor.fetchall()
+
+    return {row['domain']: row for row in rows}
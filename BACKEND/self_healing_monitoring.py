@@ -11,6 +11,10 @@ Monitors:
 - Failed payment recovery
 - Webhook delivery
 
+All checks run concurrently on a probe engine (probe_engine.py) with
+per-check deadlines; latencies are kept as per-minute histograms and
+served as time series from /api/monitoring/series.
+
 Auto-heals:
 - Retry failed payments
 - Restart stuck subscriptions
@@ -20,8 +24,9 @@ Auto-heals:
 """
 
 import os
-import requests
 import smtplib
+import threading
+import time
 from email.mime.text import MIMEText
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
@@ -31,6 +36,10 @@ from psycopg2.extras import RealDictCursor
 from flask import Flask, request, jsonify
 import stripe
 
+from db_pool import get_connection, get_pool, init_app
+from probe_engine import ProbeEngine, PROBE_DEADLINE
+from revenue_rollups import refresh_for_subscription
+
 # Configuration
 DATABASE_URL = os.getenv('DATABASE_URL', 'postgresql://localhost/consciousness_revolution')
 STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY')
@@ -39,6 +48,7 @@ SMTP_HOST = os.getenv('SMTP_HOST', 'smtp.gmail.com')
 SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
 SMTP_USER = os.getenv('SMTP_USER')
 SMTP_PASSWORD = os.getenv('SMTP_PASSWORD')
+MONITOR_INTERVAL = int(os.getenv('MONITOR_INTERVAL', '300'))  # background full check, seconds (0 = off)
 
 stripe.api_key = STRIPE_SECRET_KEY
 
@@ -47,8 +57,27 @@ class SelfHealingMonitoring:
     Autonomous revenue system monitoring with self-healing
     """
 
+    # Per-check deadlines (seconds)
+    DEADLINES = {
+        'payments': 15,
+        'subscriptions': 20,
+        'api_endpoints': PROBE_DEADLINE + 1,
+        'database': 10,
+        'revenue_anomalies': 15
+    }
+
+    ENDPOINTS = [
+        {'name': 'Auth API', 'url': 'http://localhost:5000/api/auth/verify', 'method': 'GET'},
+        {'name': 'Music API', 'url': 'http://localhost:5001/api/music/dashboard', 'method': 'GET'},
+        {'name': 'Conversion API', 'url': 'http://localhost:5002/api/conversion/metrics', 'method': 'GET'},
+        {'name': 'Vault API', 'url': 'http://localhost:5003/api/vault/mrr', 'method': 'GET'},
+        {'name': 'Marketplace API', 'url': 'http://localhost:5004/api/marketplace/browse', 'method': 'GET'}
+    ]
+
     def __init__(self):
-        self.db_conn = psycopg2.connect(DATABASE_URL)
+        self.db_conn = get_connection()
+        # Probe threads give their pooled connection back after every check
+        self.probes = ProbeEngine(cleanup=self.db_conn.release)
 
     def _get_cursor(self):
         return self.db_conn.cursor(cursor_factory=RealDictCursor)
@@ -63,6 +92,9 @@ class SelfHealingMonitoring:
         Detect failures, retries needed, Stripe API issues
         """
 
+        # Stripe round trip runs alongside the queries below
+        stripe_probe = self.probes.submit('stripe_api', self._check_stripe_api)
+
         cursor = self._get_cursor()
 
         # Check recent payment success rate
@@ -90,7 +122,7 @@ class SelfHealingMonitoring:
         needs_retry = cursor.fetchall()
 
         # Check Stripe API health
-        stripe_healthy = self._check_stripe_api()
+        stripe_healthy = self.probes.result(stripe_probe, PROBE_DEADLINE, {'healthy': False})['healthy']
 
         health_status = {
             'healthy': success_rate >= 95 and stripe_healthy,
@@ -254,6 +286,7 @@ class SelfHealingMonitoring:
                     SET status = %s, updated_at = NOW()
                     WHERE id = %s
                 """, (stripe_sub.status, sub['id']))
+                refresh_for_subscription(cursor, sub['stripe_subscription_id'])
 
                 self.db_conn.commit()
 
@@ -271,45 +304,16 @@ class SelfHealingMonitoring:
         Check all critical endpoints
         """
 
-        endpoints = [
-            {'name': 'Auth API', 'url': 'http://localhost:5000/api/auth/verify', 'method': 'GET'},
-            {'name': 'Music API', 'url': 'http://localhost:5001/api/music/dashboard', 'method': 'GET'},
-            {'name': 'Conversion API', 'url': 'http://localhost:5002/api/conversion/metrics', 'method': 'GET'},
-            {'name': 'Vault API', 'url': 'http://localhost:5003/api/vault/mrr', 'method': 'GET'},
-            {'name': 'Marketplace API', 'url': 'http://localhost:5004/api/marketplace/browse', 'method': 'GET'}
-        ]
-
-        results = []
-        all_healthy = True
-
-        for endpoint in endpoints:
-            try:
-                response = requests.request(
-                    endpoint['method'],
-                    endpoint['url'],
-                    timeout=5
-                )
-
-                healthy = response.status_code in [200, 401]  # 401 is ok (auth required)
-                response_time = response.elapsed.total_seconds()
-
-                results.append({
-                    'name': endpoint['name'],
-                    'healthy': healthy,
-                    'status_code': response.status_code,
-                    'response_time_ms': round(response_time * 1000, 2)
-                })
-
-                if not healthy:
-                    all_healthy = False
+        probes = self.probes.run({
+            endpoint['name']: (
+                lambda endpoint=endpoint: self.probes.http_check(endpoint['method'], endpoint['url']),
+                PROBE_DEADLINE
+            )
+            for endpoint in self.ENDPOINTS
+        })
 
-            except Exception as e:
-                results.append({
-                    'name': endpoint['name'],
-                    'healthy': False,
-                    'error': str(e)
-                })
-                all_healthy = False
+        results = [dict(probes[endpoint['name']], name=endpoint['name']) for endpoint in self.ENDPOINTS]
+        all_healthy = all(result['healthy'] for result in results)
 
         health_status = {
             'healthy': all_healthy,
@@ -365,7 +369,8 @@ class SelfHealingMonitoring:
             'healthy': connections < 50 and slow_queries == 0,
             'active_connections': connections,
             'slow_queries': slow_queries,
-            'database_size': db_size
+            'database_size': db_size,
+            'pool': get_pool().get_stats()
         }
 
         # Alert if unhealthy
@@ -453,18 +458,46 @@ class SelfHealingMonitoring:
         Return complete system status
         """
 
+        started = datetime.now()
+        checks = self.probes.run({
+            'payments': (self.check_payment_health, self.DEADLINES['payments']),
+            'subscriptions': (self.check_subscription_health, self.DEADLINES['subscriptions']),
+            'api_endpoints': (self.check_api_health, self.DEADLINES['api_endpoints']),
+            'database': (self.check_database_health, self.DEADLINES['database']),
+            'revenue_anomalies': (self.check_revenue_anomalies, self.DEADLINES['revenue_anomalies'])
+        })
+
         return {
-            'timestamp': datetime.now().isoformat(),
-            'overall_healthy': True,  # Will update based on checks
-            'checks': {
-                'payments': self.check_payment_health(),
-                'subscriptions': self.check_subscription_health(),
-                'api_endpoints': self.check_api_health(),
-                'database': self.check_database_health(),
-                'revenue_anomalies': self.check_revenue_anomalies()
-            }
+            'timestamp': started.isoformat(),
+            'overall_healthy': all(check.get('healthy') for check in checks.values()),
+            'duration_ms': round((datetime.now() - started).total_seconds() * 1000, 2),
+            'checks': checks
         }
 
+    def get_health_series(self, probe: str = None, minutes: int = 60) -> Dict:
+        """
+        Probe latency/outcome history
+        One probe: per-minute histograms; otherwise latest result + window summary per probe
+        """
+        if probe:
+            return {'probe': probe, 'minutes': minutes, 'series': self.probes.series.series(probe, minutes)}
+        return {'minutes': minutes, 'probes': self.probes.series.summary(minutes)}
+
+    def start_background_checks(self, interval: int = MONITOR_INTERVAL):
+        """Run the full check every `interval` seconds so the series fill without callers"""
+        if interval <= 0:
+            return
+
+        def _loop():
+            while True:
+                try:
+                    self.run_comprehensive_health_check()
+                except Exception as e:
+                    print(f"❌ Background health check failed: {e}")
+                time.sleep(interval)
+
+        threading.Thread(target=_loop, name='health-checks', daemon=True).start()
+
     # =====================================================
     # ALERTING SYSTEM
     # =====================================================
@@ -590,6 +623,7 @@ class SelfHealingMonitoring:
 # =====================================================
 
 app = Flask(__name__)
+init_app(app)
 monitoring = SelfHealingMonitoring()
 
 @app.route('/api/monitoring/health', methods=['GET'])
@@ -652,6 +686,20 @@ def api_revenue_anomalies():
     anomalies = monitoring.check_revenue_anomalies()
     return jsonify(anomalies)
 
+@app.route('/api/monitoring/series', methods=['GET'])
+def api_health_series():
+    """
+    GET /api/monitoring/series?minutes=60
+    GET /api/monitoring/series?probe=Music API&minutes=60
+
+    Probe latency histograms over time
+    """
+    series = monitoring.get_health_series(
+        probe=request.args.get('probe'),
+        minutes=int(request.args.get('minutes', 60))
+    )
+    return jsonify(series)
+
 @app.route('/api/monitoring/alerts', methods=['GET'])
 def api_get_alerts():
     """
@@ -677,7 +725,8 @@ def api_resolve_alert(alert_id):
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5005, debug=True)
+    monitoring.start_background_checks()
+    app.run(host='0.0.0.0', port=5005, debug=True, use_reloader=False)
 
 
 # =====================================================
@@ -695,7 +744,8 @@ if __name__ == '__main__':
 # ✅ Sync stuck subscriptions
 # ✅ Alert on critical issues
 #
-# Run health checks via cron:
+# The service runs the full check every MONITOR_INTERVAL seconds itself;
+# without the service, run health checks via cron:
 # */5 * * * * python -c "from self_healing_monitoring import SelfHealingMonitoring; SelfHealingMonitoring().run_comprehensive_health_check()"
 #
 # Ready for deployment
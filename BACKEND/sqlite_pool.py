@@ -0,0 +1,150 @@
+"""
+SQLite Pool
+Kept-open, tuned SQLite connections for file-backed services
+
+Opening a connection per request re-reads the schema and throws away the
+page cache and every prepared statement. SQLitePool keeps connections
+open and hands each thread one of them, the same way db_pool does for
+Postgres: a thread (a Flask request) checks out a connection on first
+use, keeps it for the rest of the request and gives it back at teardown
+(init_app). Long-lived threads simply keep theirs.
+
+Every connection is opened once with:
+- WAL journal, synchronous=NORMAL, busy_timeout, larger page cache,
+  in-memory temp tables and mmap reads (DEFAULT_PRAGMAS)
+- sqlite3's statement cache (cached_statements), so module-level SQL
+  constants are compiled once per connection, not once per request
+- autocommit mode; transaction() runs BEGIN IMMEDIATE so a writer takes
+  the database write lock up front instead of failing to upgrade a read
+  lock mid-transaction
+
+SQLite allows one writer at a time. Writers in this process first queue
+on a mutex (write_lock) and then take the database lock, so they wait
+their turn instead of busy-polling each other; busy_timeout only covers
+writers in other processes. Readers never wait for either (WAL).
+
+Usage:
+    db = SQLitePool('service.db')
+    init_app(app, db)
+    rows = db.connection().execute(SQL, params).fetchall()
+    with db.transaction() as conn:
+        conn.execute(...)
+
+Outside Flask (no teardown), wrap each call in `with db.borrow():` so the
+connection goes back to the pool when the call ends.
+"""
+
+import sqlite3
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 10000,  # ms
+    'cache_size': -16000,  # KiB (16 MB)
+    'temp_store': 'MEMORY',
+    'mmap_size': 268435456
+}
+
+
+class SQLitePool:
+    """
+    Kept-open connections to one database file, one checked out per thread
+    """
+
+    def __init__(self, path: str, size: int = 16, pragmas: Dict = None, cached_statements: int = 256):
+        self.path = str(path)
+        self.size = size  # idle connections kept open
+        self.pragmas = dict(DEFAULT_PRAGMAS, **(pragmas or {}))
+        self.cached_statements = cached_statements
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.write_lock = threading.Lock()
+        self.stats = {'opened': 0, 'reused': 0, 'closed': 0, 'transactions': 0, 'rollbacks': 0}
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            isolation_level=None,
+            check_same_thread=False,  # connections move between threads via the pool
+            cached_statements=self.cached_statements
+        )
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """This thread's connection (checked out on first use)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+                self.stats['reused' if conn else 'opened'] += 1
+            if conn is None:
+                conn = self._open()
+            self._local.conn = conn
+        return conn
+
+    def release(self):
+        """Return this thread's connection (teardown); an open transaction is rolled back"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return
+        self._local.conn = None
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+            self.stats['closed'] += 1
+        conn.close()
+
+    @contextmanager
+    def borrow(self):
+        """
+        This thread's connection for one call
+        Released afterwards unless the thread already held one (nested calls, requests)
+        """
+        held = getattr(self._local, 'conn', None) is not None
+        conn = self.connection()
+        try:
+            yield conn
+        finally:
+            if not held:
+                self.release()
+
+    @contextmanager
+    def transaction(self):
+        """BEGIN IMMEDIATE ... COMMIT on this thread's connection (rollback on error)"""
+        conn = self.connection()
+        with self.write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                self.stats['rollbacks'] += 1
+                raise
+            conn.execute("COMMIT")
+            self.stats['transactions'] += 1
+
+    def close_all(self):
+        with self._lock:
+            while self._idle:
+                self._idle.pop().close()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return dict(self.stats, idle=len(self._idle))
+
+
+def init_app(app, pool: SQLitePool):
+    """Release the request's connection when each Flask request ends"""
+    @app.teardown_request
+    def _release_sqlite_connection(exc):
+        pool.release()
@@ -4,6 +4,8 @@ Complete subscription & payment processing for all 7 domains
 """
 
 import os
+import json
+import atexit
 import stripe
 import psycopg2
 from psycopg2.extras import RealDictCursor
@@ -11,10 +13,17 @@ from datetime import datetime, timedelta
 from decimal import Decimal
 from typing import Dict, List, Optional
 
+from auth_cache import invalidate_access
+from db_pool import get_connection, get_pool, init_app
+from revenue_rollups import refresh_daily_rollup, refresh_for_subscription
+from tier_catalog import get_catalog
+from webhook_queue import WebhookQueue, PostgresWebhookStore
+
 # Configuration
 stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
 DATABASE_URL = os.getenv('DATABASE_URL', 'postgresql://localhost/consciousness_revolution')
 WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET')
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', '4'))
 
 class StripePaymentSystem:
     """
@@ -23,7 +32,14 @@ class StripePaymentSystem:
     """
 
     def __init__(self):
-        self.db_conn = psycopg2.connect(DATABASE_URL)
+        self.db_conn = get_connection()
+        # Webhooks are stored on receipt and processed by these workers
+        self.webhook_queue = WebhookQueue(
+            PostgresWebhookStore(get_pool()),
+            self.process_webhook_event,
+            workers=WEBHOOK_WORKERS,
+            cleanup=self.db_conn.release
+        )
 
     def _get_cursor(self):
         return self.db_conn.cursor(cursor_factory=RealDictCursor)
@@ -55,13 +71,7 @@ class StripePaymentSystem:
         cursor = self._get_cursor()
 
         # Get tier configuration
-        cursor.execute("""
-            SELECT monthly_price, annual_price, stripe_price_id_monthly, stripe_price_id_annual
-            FROM subscription_tiers
-            WHERE domain = %s AND tier_name = %s AND active = TRUE
-        """, (domain, tier))
-
-        tier_config = cursor.fetchone()
+        tier_config = get_catalog().get(domain, tier)
 
         if not tier_config:
             return {'success': False, 'message': f'Invalid tier: {domain}/{tier}'}
@@ -71,11 +81,11 @@ class StripePaymentSystem:
 
         # Determine price
         if billing_period == 'monthly':
-            price = tier_config['monthly_price']
-            stripe_price_id = tier_config['stripe_price_id_monthly']
+            price = tier_config.monthly_price
+            stripe_price_id = tier_config.stripe_price_id_monthly
         else:
-            price = tier_config['annual_price']
-            stripe_price_id = tier_config['stripe_price_id_annual']
+            price = tier_config.annual_price
+            stripe_price_id = tier_config.stripe_price_id_annual
 
         try:
             # Create Stripe subscription
@@ -103,8 +113,8 @@ class StripePaymentSystem:
                 subscription.id,
                 customer_id,
                 stripe_price_id,
-                tier_config['monthly_price'] if billing_period == 'monthly' else None,
-                tier_config['annual_price'] if billing_period == 'annual' else None,
+                tier_config.monthly_price if billing_period == 'monthly' else None,
+                tier_config.annual_price if billing_period == 'annual' else None,
                 billing_period,
                 'incomplete',  # Will be updated by webhook
                 datetime.fromtimestamp(subscription.current_period_start),
@@ -112,6 +122,7 @@ class StripePaymentSystem:
             ))
 
             subscription_id = cursor.fetchone()['id']
+            refresh_daily_rollup(cursor, domain)
             self.db_conn.commit()
 
             # Track conversion event
@@ -159,6 +170,7 @@ class StripePaymentSystem:
                     SET status = 'canceled', canceled_at = NOW()
                     WHERE stripe_subscription_id = %s
                 """, (subscription_id,))
+                refresh_for_subscription(cursor, subscription_id)
             else:
                 cursor.execute("""
                     UPDATE subscriptions
@@ -223,6 +235,7 @@ class StripePaymentSystem:
                 SET tier = %s, stripe_price_id = %s
                 WHERE stripe_subscription_id = %s
             """, (new_tier, new_price_id, subscription_id))
+            refresh_for_subscription(cursor, subscription_id)
 
             self.db_conn.commit()
 
@@ -462,15 +475,8 @@ class StripePaymentSystem:
 
     def handle_webhook(self, payload: str, sig_header: str) -> Dict:
         """
-        Handle Stripe webhooks
-
-        Critical events:
-        - payment_intent.succeeded
-        - payment_intent.payment_failed
-        - customer.subscription.updated
-        - customer.subscription.deleted
-        - invoice.payment_succeeded
-        - invoice.payment_failed
+        Verify a Stripe webhook and queue it (processing is asynchronous)
+        Redeliveries of an already-queued event.id are acknowledged and dropped
         """
 
         try:
@@ -482,50 +488,89 @@ class StripePaymentSystem:
         except stripe.error.SignatureVerificationError as e:
             return {'success': False, 'error': 'Invalid signature'}
 
-        # Handle event
-        if event.type == 'payment_intent.succeeded':
-            self._handle_payment_succeeded(event.data.object)
+        raw = payload.decode('utf-8') if isinstance(payload, bytes) else payload
+        queued = self.webhook_queue.enqueue(json.loads(raw), raw)
+
+        return {'success': True, 'event_id': event.id, 'duplicate': not queued}
+
+    def process_webhook_event(self, event_data: Dict):
+        """
+        Apply one queued Stripe event (webhook worker thread)
+        Raising makes the queue retry it with backoff
 
-        elif event.type == 'payment_intent.payment_failed':
-            self._handle_payment_failed(event.data.object)
+        A handler's changes commit in one transaction together with the
+        event's applied_at, so a retry of an event that already applied
+        (e.g. the worker died before marking it done) changes nothing.
 
-        elif event.type == 'customer.subscription.updated':
-            self._handle_subscription_updated(event.data.object)
+        Critical events:
+        - payment_intent.succeeded
+        - payment_intent.payment_failed
+        - customer.subscription.updated
+        - customer.subscription.deleted
+        - invoice.payment_succeeded
+        - invoice.payment_failed
+        """
 
-        elif event.type == 'customer.subscription.deleted':
-            self._handle_subscription_deleted(event.data.object)
+        event = stripe.Event.construct_from(event_data, stripe.api_key)
+        handler = {
+            'payment_intent.succeeded': self._handle_payment_succeeded,
+            'payment_intent.payment_failed': self._handle_payment_failed,
+            'customer.subscription.updated': self._handle_subscription_updated,
+            'customer.subscription.deleted': self._handle_subscription_deleted,
+            'invoice.payment_succeeded': self._handle_invoice_paid,
+            'invoice.payment_failed': self._handle_invoice_failed
+        }.get(event.type)
+        if handler is None:
+            return
 
-        elif event.type == 'invoice.payment_succeeded':
-            self._handle_invoice_paid(event.data.object)
+        cursor = self._get_cursor()
+        try:
+            # Row lock: a second worker on the same event waits, then sees applied_at
+            cursor.execute(
+                "SELECT applied_at FROM webhook_events WHERE event_id = %s FOR UPDATE",
+                (event.id,)
+            )
+            row = cursor.fetchone()
+            if row and row['applied_at']:
+                self.db_conn.rollback()
+                return
+
+            changed_access = handler(cursor, event.data.object)
+            cursor.execute(
+                "UPDATE webhook_events SET applied_at = NOW() WHERE event_id = %s",
+                (event.id,)
+            )
+            self.db_conn.commit()
+        except Exception:
+            self.db_conn.rollback()
+            raise
 
-        elif event.type == 'invoice.payment_failed':
-            self._handle_invoice_failed(event.data.object)
+        for user_id, domain in changed_access:
+            invalidate_access(user_id, domain)
 
-        return {'success': True}
+    # Handlers run inside process_webhook_event's transaction (no commits)
+    # and return the (user_id, domain) access entries they changed
 
-    def _handle_payment_succeeded(self, payment_intent):
+    def _handle_payment_succeeded(self, cursor, payment_intent) -> List:
         """Update transaction status when payment succeeds"""
-        cursor = self._get_cursor()
         cursor.execute("""
             UPDATE transactions
             SET status = 'succeeded', paid_at = NOW()
             WHERE stripe_payment_intent_id = %s
         """, (payment_intent.id,))
-        self.db_conn.commit()
+        return []
 
-    def _handle_payment_failed(self, payment_intent):
+    def _handle_payment_failed(self, cursor, payment_intent) -> List:
         """Update transaction status when payment fails"""
-        cursor = self._get_cursor()
         cursor.execute("""
             UPDATE transactions
             SET status = 'failed', failure_reason = %s
             WHERE stripe_payment_intent_id = %s
         """, (payment_intent.last_payment_error.message if payment_intent.last_payment_error else 'Unknown', payment_intent.id))
-        self.db_conn.commit()
+        return []
 
-    def _handle_subscription_updated(self, subscription):
+    def _handle_subscription_updated(self, cursor, subscription) -> List:
         """Update subscription status"""
-        cursor = self._get_cursor()
         cursor.execute("""
             UPDATE subscriptions
             SET status = %s, current_period_start = %s, current_period_end = %s
@@ -536,7 +581,7 @@ class StripePaymentSystem:
             datetime.fromtimestamp(subscription.current_period_end),
             subscription.id
         ))
-        self.db_conn.commit()
+        refresh_for_subscription(cursor, subscription.id)
 
         # Update domain access if subscription becomes active
         if subscription.status == 'active':
@@ -548,16 +593,17 @@ class StripePaymentSystem:
 
             sub = cursor.fetchone()
             if sub:
-                self._upgrade_domain_access(sub['user_id'], sub['domain'], sub['tier'])
+                return self._upgrade_domain_access(cursor, sub['user_id'], sub['domain'], sub['tier'])
+        return []
 
-    def _handle_subscription_deleted(self, subscription):
+    def _handle_subscription_deleted(self, cursor, subscription) -> List:
         """Handle subscription cancellation"""
-        cursor = self._get_cursor()
         cursor.execute("""
             UPDATE subscriptions
             SET status = 'canceled', canceled_at = NOW()
             WHERE stripe_subscription_id = %s
         """, (subscription.id,))
+        refresh_for_subscription(cursor, subscription.id)
 
         # Downgrade to free tier
         cursor.execute("""
@@ -566,13 +612,11 @@ class StripePaymentSystem:
 
         sub = cursor.fetchone()
         if sub:
-            self._downgrade_to_free(sub['user_id'], sub['domain'])
+            return self._downgrade_to_free(cursor, sub['user_id'], sub['domain'])
+        return []
 
-        self.db_conn.commit()
-
-    def _handle_invoice_paid(self, invoice):
+    def _handle_invoice_paid(self, cursor, invoice) -> List:
         """Record successful subscription payment"""
-        cursor = self._get_cursor()
 
         # Get subscription
         cursor.execute("""
@@ -593,12 +637,10 @@ class StripePaymentSystem:
                 Decimal(invoice.amount_paid) / 100,
                 invoice.id
             ))
+        return []
 
-            self.db_conn.commit()
-
-    def _handle_invoice_failed(self, invoice):
+    def _handle_invoice_failed(self, cursor, invoice) -> List:
         """Handle failed subscription payment"""
-        cursor = self._get_cursor()
 
         # Mark subscription as past_due
         cursor.execute("""
@@ -606,10 +648,10 @@ class StripePaymentSystem:
             SET status = 'past_due'
             WHERE stripe_subscription_id = %s
         """, (invoice.subscription,))
-
-        self.db_conn.commit()
+        refresh_for_subscription(cursor, invoice.subscription)
 
         # TODO: Send email to user about failed payment
+        return []
 
     # =====================================================
     # HELPER METHODS
@@ -640,44 +682,34 @@ class StripePaymentSystem:
 
         return customer.id
 
-    def _upgrade_domain_access(self, user_id: int, domain: str, tier: str):
-        """Upgrade user's domain access tier"""
-        cursor = self._get_cursor()
+    def _upgrade_domain_access(self, cursor, user_id: int, domain: str, tier: str) -> List:
+        """Upgrade user's domain access tier (caller commits, then invalidates)"""
 
         # Get tier features
-        cursor.execute("""
-            SELECT features FROM subscription_tiers WHERE domain = %s AND tier_name = %s
-        """, (domain, tier))
-
-        tier_config = cursor.fetchone()
+        tier_config = get_catalog().get(domain, tier)
 
         if tier_config:
             cursor.execute("""
                 UPDATE domain_access
                 SET tier = %s, feature_flags = %s
                 WHERE user_id = %s AND domain = %s
-            """, (tier, tier_config['features'], user_id, domain))
+            """, (tier, psycopg2.extras.Json(dict(tier_config.features)), user_id, domain))
+            return [(user_id, domain)]
+        return []
 
-            self.db_conn.commit()
+    def _downgrade_to_free(self, cursor, user_id: int, domain: str) -> List:
+        """Downgrade user to free tier (caller commits, then invalidates)"""
 
-    def _downgrade_to_free(self, user_id: int, domain: str):
-        """Downgrade user to free tier"""
-        cursor = self._get_cursor()
-
-        cursor.execute("""
-            SELECT features FROM subscription_tiers WHERE domain = %s AND tier_name = 'free'
-        """, (domain,))
-
-        free_tier = cursor.fetchone()
+        free_tier = get_catalog().get(domain, 'free')
 
         if free_tier:
             cursor.execute("""
                 UPDATE domain_access
                 SET tier = 'free', feature_flags = %s
                 WHERE user_id = %s AND domain = %s
-            """, (free_tier['features'], user_id, domain))
-
-            self.db_conn.commit()
+            """, (psycopg2.extras.Json(dict(free_tier.features)), user_id, domain))
+            return [(user_id, domain)]
+        return []
 
     def _track_conversion(self, user_id: int, event_type: str, from_tier: str, to_tier: str, domain: str):
         """Track conversion events"""
@@ -696,7 +728,10 @@ class StripePaymentSystem:
 from flask import Flask, request, jsonify
 
 app = Flask(__name__)
+init_app(app)
 payments = StripePaymentSystem()
+payments.webhook_queue.start()
+atexit.register(payments.webhook_queue.stop)
 
 @app.route('/api/subscribe', methods=['POST'])
 def api_subscribe():
@@ -723,9 +758,19 @@ def webhook():
 
     return jsonify(result), 200 if result['success'] else 400
 
+@app.route('/api/webhooks/stats', methods=['GET'])
+def webhook_stats():
+    """Webhook queue depth, retries and dead letters"""
+    return jsonify(payments.webhook_queue.get_stats())
+
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5001, debug=True)
+    app.run(
+        host='0.0.0.0',
+        port=5001,
+        debug=True,
+        use_reloader=False  # the reloader's second process would run a second set of queue workers
+    )
 
 
 # =====================================================
@@ -0,0 +1,303 @@
+"""
+Tier Catalog
+One immutable, versioned view of subscription_tiers shared by every service
+
+- get_catalog() returns the current TierCatalog. It is loaded once, then
+  re-checked at most every CATALOG_CHECK_INTERVAL seconds with a cheap
+  fingerprint query (row count + MAX(updated_at)); on change a new
+  catalog is built and swapped in with version + 1. Readers never see a
+  half-built catalog and never need a lock.
+- every feature key gets a bit; each tier's features compile to a
+  bitmap once, at load time
+- get_entitlements(user_id, domain) compiles the user's domain_access
+  feature flags into the same bits, once per request (flask.g), so
+  feature gates are `bits & mask` instead of a query per gate. Rows come
+  from auth_cache.access_cache (shared with AuthSystem.check_access).
+
+Run this file for an in-memory gate benchmark.
+"""
+
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, List, NamedTuple, Optional
+
+CATALOG_CHECK_INTERVAL = float(os.getenv('TIER_CATALOG_CHECK_INTERVAL', '30'))
+
+# Tier order, lowest first (upgrade path)
+TIER_ORDER = ['free', 'pro', 'pro_plus', 'enterprise']
+
+_ACCESS_SQL = """
+    SELECT tier, feature_flags, usage_current_month, usage_reset_date, active
+    FROM domain_access
+    WHERE user_id = %s AND domain = %s AND active = TRUE
+"""
+
+
+class Tier(NamedTuple):
+    domain: str
+    tier: str
+    name: str
+    monthly_price: float
+    annual_price: float
+    features: MappingProxyType
+    bits: int
+    stripe_price_id_monthly: Optional[str]
+    stripe_price_id_annual: Optional[str]
+
+
+def _enabled(value) -> bool:
+    """A flag grants its feature if true or a non-zero allowance (-1 = unlimited)"""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return value != 0
+    return bool(value)
+
+
+class TierCatalog:
+    """
+    Immutable snapshot of subscription_tiers
+    """
+
+    def __init__(self, rows: List[Dict], version: int = 1, fingerprint=None):
+        self.version = version
+        self.fingerprint = fingerprint
+
+        # Bit per feature key, in first-seen order across all tiers
+        feature_bits = {}
+        for row in rows:
+            for key in (row['features'] or {}):
+                feature_bits.setdefault(key, 1 << len(feature_bits))
+        self.feature_bits = MappingProxyType(feature_bits)
+
+        tiers = {}
+        for row in rows:
+            features = dict(row['features'] or {})
+            tiers[(row['domain'], row['tier_name'])] = Tier(
+                domain=row['domain'],
+                tier=row['tier_name'],
+                name=row['tier_name'].replace('_', ' ').title(),
+                monthly_price=float(row['monthly_price']),
+                annual_price=float(row['annual_price']),
+                features=MappingProxyType(features),
+                bits=self.compile(features),
+                stripe_price_id_monthly=row.get('stripe_price_id_monthly'),
+                stripe_price_id_annual=row.get('stripe_price_id_annual')
+            )
+        self.tiers = MappingProxyType(tiers)
+
+        # Lowest tier per (domain, feature), for "requires X tier" messages
+        required = {}
+        for (domain, tier_name), tier in sorted(tiers.items(), key=lambda item: _rank(item[0][1])):
+            for key, value in tier.features.items():
+                if _enabled(value):
+                    required.setdefault((domain, key), tier_name)
+        self._required = MappingProxyType(required)
+
+    # =====================================================
+    # LOOKUPS
+    # =====================================================
+
+    def get(self, domain: str, tier: str) -> Optional[Tier]:
+        return self.tiers.get((domain, tier))
+
+    def features(self, domain: str, tier: str) -> Dict:
+        """Feature flags for a tier (the domain's free tier if unknown), as a new dict"""
+        found = self.get(domain, tier) or self.get(domain, 'free')
+        return dict(found.features) if found else {}
+
+    def domains(self) -> List[str]:
+        return sorted({domain for domain, _ in self.tiers})
+
+    def domain_tiers(self, domain: str) -> List[Tier]:
+        """A domain's tiers, lowest first"""
+        return sorted((t for (d, _), t in self.tiers.items() if d == domain), key=lambda t: _rank(t.tier))
+
+    def next_tier(self, domain: str, tier: str) -> Optional[Tier]:
+        """The next tier up that this domain sells, if any"""
+        rank = _rank(tier)
+        for candidate in self.domain_tiers(domain):
+            if _rank(candidate.tier) > rank:
+                return candidate
+        return None
+
+    def required_tier(self, domain: str, feature: str, default: str = 'pro') -> str:
+        return self._required.get((domain, feature), default)
+
+    # =====================================================
+    # BITMAPS
+    # =====================================================
+
+    def mask(self, *features: str) -> int:
+        """Bits for the given features (unknown features map to 0 = never granted)"""
+        bits = 0
+        for feature in features:
+            bits |= self.feature_bits.get(feature, 0)
+        return bits
+
+    def compile(self, feature_flags: Optional[Dict]) -> int:
+        bits = 0
+        for key, value in (feature_flags or {}).items():
+            bit = self.feature_bits.get(key)
+            if bit and _enabled(value):
+                bits |= bit
+        return bits
+
+
+def _rank(tier: str) -> int:
+    return TIER_ORDER.index(tier) if tier in TIER_ORDER else len(TIER_ORDER)
+
+
+class Entitlements:
+    """
+    One user's compiled access to one domain
+    """
+
+    __slots__ = ('catalog', 'domain', 'row', 'tier', 'features', 'bits')
+
+    def __init__(self, catalog: TierCatalog, domain: str, row: Optional[Dict]):
+        self.catalog = catalog
+        self.domain = domain
+        self.row = row
+        self.tier = row['tier'] if row else None
+        self.features = (row['feature_flags'] or {}) if row else {}
+        self.bits = catalog.compile(self.features)
+
+    def has(self, feature: str) -> bool:
+        bit = self.catalog.feature_bits.get(feature)
+        return bool(bit) and bool(self.bits & bit)
+
+    def value(self, feature: str, default=None):
+        return self.features.get(feature, default)
+
+    def required_tier(self, feature: str) -> str:
+        return self.catalog.required_tier(self.domain, feature)
+
+
+# =====================================================
+# PROCESS-WIDE CATALOG
+# =====================================================
+
+_catalog = None
+_checked_at = 0.0
+_load_lock = threading.Lock()
+
+
+def _fingerprint(cursor):
+    cursor.execute("SELECT COUNT(*), MAX(updated_at) FROM subscription_tiers")
+    return tuple(cursor.fetchone())
+
+
+def _load(fingerprint, version: int) -> TierCatalog:
+    from psycopg2.extras import RealDictCursor
+    from db_pool import get_pool
+
+    with get_pool().connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute("""
+                SELECT domain, tier_name, monthly_price, annual_price, features,
+                       stripe_price_id_monthly, stripe_price_id_annual
+                FROM subscription_tiers
+                WHERE active = TRUE
+            """)
+            rows = cursor.fetchall()
+    return TierCatalog(rows, version=version, fingerprint=fingerprint)
+
+
+def get_catalog() -> TierCatalog:
+    """Current catalog (loaded on first use, reloaded when subscription_tiers changes)"""
+    global _catalog, _checked_at
+
+    if _catalog is not None and time.monotonic() - _checked_at < CATALOG_CHECK_INTERVAL:
+        return _catalog
+
+    with _load_lock:
+        if _catalog is not None and time.monotonic() - _checked_at < CATALOG_CHECK_INTERVAL:
+            return _catalog
+
+        from db_pool import get_pool
+        with get_pool().connection() as conn:
+            with conn.cursor() as cursor:
+                fingerprint = _fingerprint(cursor)
+
+        if _catalog is None or fingerprint != _catalog.fingerprint:
+            version = _catalog.version + 1 if _catalog else 1
+            _catalog = _load(fingerprint, version)
+            print(f"📚 Tier catalog v{version}: {len(_catalog.tiers)} tiers, {len(_catalog.feature_bits)} features")
+        _checked_at = time.monotonic()
+        return _catalog
+
+
+def reload_catalog() -> TierCatalog:
+    """Force a re-check on the next get_catalog() (e.g. right after editing tiers)"""
+    global _checked_at
+    _checked_at = 0.0
+    return get_catalog()
+
+
+def get_entitlements(cursor_factory, user_id: int, domain: str) -> Entitlements:
+    """
+    The user's entitlements for a domain, compiled once per request
+    cursor_factory: the service's _get_cursor (used only on an access_cache miss)
+    """
+    from auth_cache import access_cache
+
+    request_cache = _request_cache()
+    key = (user_id, domain)
+    if request_cache is not None and key in request_cache:
+        return request_cache[key]
+
+    generation = access_cache.generation  # before the read (see auth_cache)
+    hit, row = access_cache.get(user_id, domain)
+    if not hit:
+        cursor = cursor_factory()
+        cursor.execute(_ACCESS_SQL, (user_id, domain))
+        row = cursor.fetchone()
+        access_cache.put(user_id, domain, row, generation)
+
+    entitlements = Entitlements(get_catalog(), domain, row)
+    if request_cache is not None:
+        request_cache[key] = entitlements
+    return entitlements
+
+
+def _request_cache() -> Optional[Dict]:
+    try:
+        from flask import g, has_request_context
+    except ImportError:
+        return None
+    if not has_request_context():
+        return None
+    if not hasattr(g, 'entitlements'):
+        g.entitlements = {}
+    return g.entitlements
+
+
+if __name__ == '__main__':
+    # Gate cost: compiled bitmap test vs dict lookups on the raw flags
+    rows = [
+        {'domain': 'music', 'tier_name': 'free', 'monthly_price': 0, 'annual_price': 0,
+         'features': {'streaming_tracking': True, 'track_limit': 100, 'basic_analytics': True,
+                      'distribution_service': False, 'coaching_sessions': 0}},
+        {'domain': 'music', 'tier_name': 'pro', 'monthly_price': 29.99, 'annual_price': 299.99,
+         'features': {'streaming_tracking': True, 'track_limit': -1, 'advanced_analytics': True,
+                      'distribution_service': True, 'coaching_sessions': 0}},
+        {'domain': 'music', 'tier_name': 'pro_plus', 'monthly_price': 49.99, 'annual_price': 499.99,
+         'features': {'distribution_service': True, 'nft_marketplace': True, 'sample_packs': True,
+                      'coaching_sessions': 1}},
+    ]
+    catalog = TierCatalog(rows)
+    entitlements = Entitlements(catalog, 'music', {'tier': 'pro', 'feature_flags': dict(rows[1]['features'])})
+
+    assert entitlements.has('distribution_service') and not entitlements.has('nft_marketplace')
+    assert catalog.required_tier('music', 'nft_marketplace') == 'pro_plus'
+    assert catalog.next_tier('music', 'pro').tier == 'pro_plus'
+
+    N = 1_000_000
+    started = time.perf_counter()
+    for _ in range(N):
+        entitlements.has('distribution_service')
+    per_gate = (time.perf_counter() - started) / N * 1e9
+    print(f"✅ {N:,} feature gates: {per_gate:.0f} ns each (no query)")
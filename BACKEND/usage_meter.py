@@ -0,0 +1,280 @@
+"""
+Usage Meter
+Buffered, atomic usage counting for freemium limits
+
+record() only bumps an in-memory counter per (user, domain, action).
+A background thread flushes every FLUSH_INTERVAL seconds (or sooner once
+FLUSH_THRESHOLD keys are pending) with ONE statement per flush that adds
+each delta to domain_access.usage_current_month inside Postgres, so
+concurrent writers (threads or processes) never lose increments.
+
+The 30-day usage reset also happens in that statement: a row whose
+usage_reset_date has passed starts again from {} and gets a new date.
+
+Limit checks read persisted usage plus this process's pending counts
+(see usage_for). Other processes see the counts after the next flush.
+
+Run this file for an in-memory throughput / lost-count check.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from psycopg2.extras import execute_values
+
+FLUSH_INTERVAL = float(os.getenv('USAGE_FLUSH_INTERVAL', '1.0'))
+FLUSH_THRESHOLD = int(os.getenv('USAGE_FLUSH_THRESHOLD', '5000'))
+
+# Usage the row still counts (reset once usage_reset_date has passed)
+_BASE_USAGE_SQL = """
+    CASE
+        WHEN da.usage_reset_date IS NULL OR NOW() > da.usage_reset_date THEN '{}'::jsonb
+        ELSE COALESCE(da.usage_current_month, '{}'::jsonb)
+    END
+"""
+
+_FLUSH_SQL = f"""
+    UPDATE domain_access da
+    SET usage_current_month = (
+            SELECT jsonb_object_agg(
+                key,
+                COALESCE((b.usage ->> key)::bigint, 0) + COALESCE((d.delta ->> key)::bigint, 0)
+            )
+            FROM (SELECT {_BASE_USAGE_SQL} AS usage) b,
+                 jsonb_object_keys(b.usage || d.delta) AS key
+        ),
+        usage_reset_date = CASE
+            WHEN da.usage_reset_date IS NULL OR NOW() > da.usage_reset_date
+            THEN NOW() + INTERVAL '30 days'
+            ELSE da.usage_reset_date
+        END
+    FROM (VALUES %s) AS d(user_id, domain, delta)
+    WHERE da.user_id = d.user_id AND da.domain = d.domain
+"""
+
+
+class UsageMeter:
+    """
+    In-memory usage counters with periodic atomic flushes
+    """
+
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL, flush_threshold: int = FLUSH_THRESHOLD,
+                 pool=None, on_flush=None):
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.pool = pool
+        self.on_flush = on_flush  # callback(keys) after a successful write, before inflight clears
+
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.pending = {}  # (user_id, domain) -> {action: count}
+        self.inflight = {}  # batch being written (still counted by readers)
+        self.stats = {'recorded': 0, 'flushed': 0, 'flushes': 0, 'errors': 0}
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    # =====================================================
+    # WRITE PATH
+    # =====================================================
+
+    def record(self, user_id: int, domain: str, action: str, count: int = 1):
+        """Count usage (no database round trip)"""
+        with self.lock:
+            actions = self.pending.setdefault((user_id, domain), {})
+            actions[action] = actions.get(action, 0) + count
+            self.stats['recorded'] += count
+            if len(self.pending) >= self.flush_threshold:
+                self.wake.set()
+
+    def flush(self) -> int:
+        """Write all pending counts in one statement; returns rows updated"""
+        with self.flush_lock:
+            with self.lock:
+                batch, self.pending = self.pending, {}
+                self.inflight = batch
+            if not batch:
+                return 0
+
+            rows = [(user_id, domain, json.dumps(actions)) for (user_id, domain), actions in batch.items()]
+
+            try:
+                self._write(rows)
+            except Exception as e:
+                # Put the counts back so the next flush retries them
+                self._restore(batch)
+                self.stats['errors'] += 1
+                print(f"❌ Usage flush failed ({len(rows)} keys): {e}")
+                return 0
+
+            # Drop cached rows while readers still count the batch as inflight,
+            # so no reader ever sees an old row without these counts
+            if self.on_flush:
+                self.on_flush(list(batch))
+            with self.lock:
+                self.inflight = {}
+            self.stats['flushes'] += 1
+            self.stats['flushed'] += sum(sum(actions.values()) for actions in batch.values())
+
+        return len(rows)
+
+    def _write(self, rows):
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                execute_values(cursor, _FLUSH_SQL, rows, template='(%s, %s, %s::jsonb)', page_size=len(rows))
+            conn.commit()
+
+    def _restore(self, batch: Dict):
+        with self.lock:
+            self.inflight = {}
+            for key, actions in batch.items():
+                pending = self.pending.setdefault(key, {})
+                for action, count in actions.items():
+                    pending[action] = pending.get(action, 0) + count
+
+    # =====================================================
+    # READ PATH
+    # =====================================================
+
+    def pending_for(self, user_id: int, domain: str) -> Dict[str, int]:
+        """Counts not yet committed (pending plus any batch being flushed)"""
+        key = (user_id, domain)
+        with self.lock:
+            counts = dict(self.pending.get(key, {}))
+            for action, count in self.inflight.get(key, {}).items():
+                counts[action] = counts.get(action, 0) + count
+        return counts
+
+    def usage_for(self, user_id: int, domain: str, usage_current_month: Optional[Dict],
+                  usage_reset_date: Optional[datetime] = None) -> Dict[str, int]:
+        """Persisted usage (reset-aware, like the flush) plus pending counts"""
+        if usage_reset_date is not None and datetime.now() > usage_reset_date:
+            usage = {}
+        else:
+            usage = dict(usage_current_month or {})
+
+        for action, count in self.pending_for(user_id, domain).items():
+            usage[action] = usage.get(action, 0) + count
+        return usage
+
+    # =====================================================
+    # BACKGROUND FLUSHER
+    # =====================================================
+
+    def start(self):
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name='usage-meter', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            self.flush()
+
+    def close(self):
+        """Stop the flusher and write whatever is still pending"""
+        self._stop.set()
+        self.wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return dict(self.stats, pending_keys=len(self.pending))
+
+
+_meter = None
+_meter_lock = threading.Lock()
+
+
+def get_usage_meter() -> UsageMeter:
+    """Process-wide meter on the shared pool (flusher started on first use)"""
+    global _meter
+    if _meter is None:
+        with _meter_lock:
+            if _meter is None:
+                from auth_cache import access_cache
+                from db_pool import get_pool
+
+                def _invalidate(keys):
+                    # Cached domain_access rows now hold old usage
+                    for user_id, domain in keys:
+                        access_cache.invalidate(user_id, domain)
+
+                _meter = UsageMeter(pool=get_pool(), on_flush=_invalidate)
+                _meter.start()
+    return _meter
+
+
+if __name__ == '__main__':
+    # Throughput and lost-count check of the buffer (no flushing)
+    from concurrent.futures import ThreadPoolExecutor
+
+    THREADS = 16
+    PER_THREAD = 50000
+    meter = UsageMeter()
+
+    def worker(n):
+        for i in range(PER_THREAD):
+            meter.record(i % 100, 'intelligence', 'ai_actions')
+
+    print(f"🧪 {THREADS * PER_THREAD:,} usage records from {THREADS} threads")
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        list(executor.map(worker, range(THREADS)))
+    elapsed = time.monotonic() - started
+
+    total = sum(meter.pending_for(user, 'intelligence').get('ai_actions', 0) for user in range(100))
+    print(f"   {THREADS * PER_THREAD / elapsed:,.0f} records/s, {total:,} counted")
+    assert total == THREADS * PER_THREAD
+    print("✅ No lost counts")
+
+    # A cache-miss read interleaved with a flush (in-memory table for domain_access)
+    from auth_cache import AccessCache
+
+    KEY = (1, 'intelligence')
+    table = {KEY: {'ai_actions': 0}}
+    cache = AccessCache()
+    seen_at_invalidate = []
+
+    class TableMeter(UsageMeter):
+        def _write(self, rows):
+            for user_id, domain, actions in rows:
+                for action, count in json.loads(actions).items():
+                    table[(user_id, domain)][action] = table[(user_id, domain)].get(action, 0) + count
+
+    def invalidate(keys):
+        seen_at_invalidate.append(meter.pending_for(*KEY).get('ai_actions', 0))
+        for user_id, domain in keys:
+            cache.invalidate(user_id, domain)
+
+    meter = TableMeter(on_flush=invalidate)
+    meter.record(*KEY, 'ai_actions', 7)
+
+    # Reader: generation, then a row read before the flush commits...
+    generation = cache.generation
+    stale_row = dict(table[KEY])
+    meter.flush()
+    # ...cached only after the flush invalidated the key
+    cache.put(*KEY, stale_row, generation)
+    hit, _ = cache.get(*KEY)
+    assert not hit, 'row read before the flush was cached'
+    # The batch was still counted (inflight) when the cache entry was dropped
+    assert seen_at_invalidate == [7], seen_at_invalidate
+
+    generation = cache.generation
+    cache.put(*KEY, dict(table[KEY]), generation)
+    _, row = cache.get(*KEY)
+    assert meter.usage_for(*KEY, row)['ai_actions'] == 7
+    print("✅ Reads racing a flush never cache or count old usage")
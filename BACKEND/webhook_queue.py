@@ -0,0 +1,382 @@
+"""
+Webhook Queue
+Durable, idempotent processing of Stripe webhooks off the request path
+
+The webhook route verifies the signature, calls enqueue() and returns 200.
+enqueue() stores the raw event keyed by event.id, so a redelivery of an
+event Stripe already handed us is a no-op (dedup).
+
+A dispatcher thread claims stored events and hands them to a worker pool:
+- claiming: claim() marks events 'processing' with a lease (locked_at) in
+  one atomic statement, so any number of processes can run workers
+  against the same tables without handling an event twice; an event whose
+  lease runs out (its process died) is claimed again
+- ordering: per customer, events run one at a time in arrival order; a
+  later event is not claimed while an earlier one is open, processing or
+  backing off
+- retry: a failing event is retried with exponential backoff + jitter
+- dead letter: after max_attempts it is copied to the dead-letter table
+  and stops blocking that customer
+
+Two stores share the same schema:
+- PostgresWebhookStore   BACKEND services (db_pool)
+- SqliteWebhookStore     standalone servers (WEBHOOK_SERVER.py)
+
+Replay recorded payloads at high rate with WEBHOOK_REPLAY.py.
+"""
+
+import json
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+
+def customer_key(event: Dict) -> str:
+    """Ordering key: the Stripe customer, else the object id, else the event id"""
+    obj = (event.get('data') or {}).get('object') or {}
+    customer = obj.get('customer')
+    if isinstance(customer, dict):
+        customer = customer.get('id')
+    return customer or obj.get('customer_email') or obj.get('id') or event['id']
+
+
+# =====================================================
+# STORES
+# =====================================================
+
+# Earliest open event per customer: due (or its lease expired) and nothing earlier still open
+CLAIMABLE_WHERE = """
+    ((e.status IN ('pending', 'retry') AND e.next_attempt_at <= {now})
+     OR (e.status = 'processing' AND e.locked_at <= {lease_cutoff}))
+    AND NOT EXISTS (
+        SELECT 1 FROM webhook_events p
+        WHERE p.customer_key = e.customer_key AND p.seq < e.seq
+          AND p.status IN ('pending', 'retry', 'processing')
+    )
+"""
+
+
+class SqliteWebhookStore:
+    """
+    Queue tables in a local SQLite file (WAL, one connection per call)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript("""
+                PRAGMA journal_mode = WAL;
+                CREATE TABLE IF NOT EXISTS webhook_events (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    event_id TEXT NOT NULL UNIQUE,
+                    event_type TEXT NOT NULL,
+                    customer_key TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL DEFAULT 0,
+                    locked_at REAL,
+                    last_error TEXT,
+                    received_at TEXT NOT NULL,
+                    processed_at TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_webhook_events_open
+                    ON webhook_events(status, seq);
+                CREATE INDEX IF NOT EXISTS idx_webhook_events_customer
+                    ON webhook_events(customer_key, seq);
+                CREATE TABLE IF NOT EXISTS webhook_dead_letters (
+                    event_id TEXT PRIMARY KEY,
+                    event_type TEXT NOT NULL,
+                    customer_key TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    last_error TEXT,
+                    failed_at TEXT NOT NULL
+                );
+            """)
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(webhook_events)")}
+            if 'locked_at' not in columns:
+                # Queue files created before claiming existed
+                conn.execute("ALTER TABLE webhook_events ADD COLUMN locked_at REAL")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def insert(self, event_id: str, event_type: str, customer: str, payload: str) -> bool:
+        with self._connect() as conn:
+            cursor = conn.execute("""
+                INSERT INTO webhook_events (event_id, event_type, customer_key, payload, received_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (event_id) DO NOTHING
+            """, (event_id, event_type, customer, payload, datetime.now().isoformat()))
+            return cursor.rowcount == 1
+
+    def claim(self, limit: int, lease: float) -> List[Dict]:
+        """Mark up to `limit` ready events 'processing' and return them"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            # IMMEDIATE: the select and the update run under the write lock
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute("""
+                SELECT e.seq, e.event_id, e.event_type, e.customer_key, e.payload, e.attempts
+                FROM webhook_events e
+                WHERE """ + CLAIMABLE_WHERE.format(now='?', lease_cutoff='?') + """
+                ORDER BY e.seq
+                LIMIT ?
+            """, (now, now - lease, limit)).fetchall()
+            conn.executemany("""
+                UPDATE webhook_events SET status = 'processing', locked_at = ? WHERE seq = ?
+            """, [(now, row['seq']) for row in rows])
+            conn.commit()
+        finally:
+            conn.close()
+        return [dict(row) for row in rows]
+
+    def mark_done(self, event_id: str):
+        with self._connect() as conn:
+            conn.execute("""
+                UPDATE webhook_events SET status = 'done', processed_at = ?, locked_at = NULL
+                WHERE event_id = ?
+            """, (datetime.now().isoformat(), event_id))
+
+    def mark_retry(self, event_id: str, attempts: int, next_attempt_at: float, error: str):
+        with self._connect() as conn:
+            conn.execute("""
+                UPDATE webhook_events
+                SET status = 'retry', attempts = ?, next_attempt_at = ?, last_error = ?, locked_at = NULL
+                WHERE event_id = ?
+            """, (attempts, next_attempt_at, error, event_id))
+
+    def dead_letter(self, event: Dict, attempts: int, error: str):
+        with self._connect() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO webhook_dead_letters
+                    (event_id, event_type, customer_key, payload, attempts, last_error, failed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (event['event_id'], event['event_type'], event['customer_key'], event['payload'],
+                  attempts, error, datetime.now().isoformat()))
+            conn.execute("""
+                UPDATE webhook_events SET status = 'dead', attempts = ?, last_error = ?, locked_at = NULL
+                WHERE event_id = ?
+            """, (attempts, error, event['event_id']))
+
+    def counts(self) -> Dict:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM webhook_events GROUP BY status").fetchall()
+            dead = conn.execute("SELECT COUNT(*) FROM webhook_dead_letters").fetchone()[0]
+        counts = {row['status']: row['n'] for row in rows}
+        counts['dead_letters'] = dead
+        return counts
+
+
+class PostgresWebhookStore:
+    """
+    Queue tables in Postgres (webhook_events / webhook_dead_letters in database_schema.sql)
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def _execute(self, sql: str, params=(), fetch: bool = False):
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(sql, params)
+                result = cursor.fetchall() if fetch else cursor.rowcount
+            conn.commit()
+        return result
+
+    def insert(self, event_id: str, event_type: str, customer: str, payload: str) -> bool:
+        return self._execute("""
+            INSERT INTO webhook_events (event_id, event_type, customer_key, payload)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (event_id) DO NOTHING
+        """, (event_id, event_type, customer, payload)) == 1
+
+    def claim(self, limit: int, lease: float) -> List[Dict]:
+        """
+        Mark up to `limit` ready events 'processing' and return them
+        SKIP LOCKED: concurrent claimers (other processes) pass over each other's rows
+        """
+        rows = self._execute("""
+            UPDATE webhook_events
+            SET status = 'processing', locked_at = NOW()
+            WHERE seq IN (
+                SELECT e.seq FROM webhook_events e
+                WHERE """ + CLAIMABLE_WHERE.format(
+                    now='NOW()', lease_cutoff="NOW() - make_interval(secs => %s)") + """
+                ORDER BY e.seq
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING seq, event_id, event_type, customer_key, payload, attempts
+        """, (lease, limit), fetch=True)
+        columns = ('seq', 'event_id', 'event_type', 'customer_key', 'payload', 'attempts')
+        return sorted((dict(zip(columns, row)) for row in rows), key=lambda event: event['seq'])
+
+    def mark_done(self, event_id: str):
+        self._execute("""
+            UPDATE webhook_events SET status = 'done', processed_at = NOW(), locked_at = NULL
+            WHERE event_id = %s
+        """, (event_id,))
+
+    def mark_retry(self, event_id: str, attempts: int, next_attempt_at: float, error: str):
+        self._execute("""
+            UPDATE webhook_events
+            SET status = 'retry', attempts = %s, next_attempt_at = to_timestamp(%s), last_error = %s,
+                locked_at = NULL
+            WHERE event_id = %s
+        """, (attempts, next_attempt_at, error, event_id))
+
+    def dead_letter(self, event: Dict, attempts: int, error: str):
+        self._execute("""
+            WITH dead AS (
+                UPDATE webhook_events
+                SET status = 'dead', attempts = %s, last_error = %s, locked_at = NULL
+                WHERE event_id = %s
+                RETURNING event_id, event_type, customer_key, payload, attempts, last_error
+            )
+            INSERT INTO webhook_dead_letters (event_id, event_type, customer_key, payload, attempts, last_error)
+            SELECT * FROM dead
+            ON CONFLICT (event_id) DO UPDATE SET
+                attempts = EXCLUDED.attempts, last_error = EXCLUDED.last_error, failed_at = NOW()
+        """, (attempts, error, event['event_id']))
+
+    def counts(self) -> Dict:
+        rows = self._execute("""
+            SELECT status, COUNT(*) FROM webhook_events GROUP BY status
+            UNION ALL
+            SELECT 'dead_letters', COUNT(*) FROM webhook_dead_letters
+        """, fetch=True)
+        return {status: n for status, n in rows}
+
+
+# =====================================================
+# QUEUE
+# =====================================================
+
+class WebhookQueue:
+    """
+    Durable event queue with a per-customer-ordered worker pool
+    """
+
+    def __init__(self, store, handler: Callable[[Dict], None], workers: int = 4,
+                 max_attempts: int = 8, base_delay: float = 2.0, max_delay: float = 3600.0,
+                 poll_interval: float = 0.5, lease: float = 300.0,
+                 cleanup: Optional[Callable[[], None]] = None):
+        self.store = store
+        self.handler = handler  # handler(event_dict)
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.lease = lease  # seconds a claimed event stays ours before another process may retake it
+        self.cleanup = cleanup  # called after every event on the worker thread
+
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.in_flight = set()  # event ids claimed by this process
+        self.stats = {'enqueued': 0, 'duplicates': 0, 'processed': 0, 'retried': 0, 'dead': 0}
+
+        self._executor = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def enqueue(self, event: Dict, raw_payload: str = None) -> bool:
+        """Durably store a verified event; False if event.id was already queued"""
+        payload = raw_payload if raw_payload is not None else json.dumps(event)
+        inserted = self.store.insert(event['id'], event['type'], customer_key(event), payload)
+
+        with self.lock:
+            self.stats['enqueued' if inserted else 'duplicates'] += 1
+        if inserted:
+            self.wake.set()
+        return inserted
+
+    # =====================================================
+    # DISPATCH
+    # =====================================================
+
+    def start(self):
+        if self._thread:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='webhook-worker')
+        self._thread = threading.Thread(target=self._dispatch_loop, name='webhook-dispatcher', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 30):
+        self._stop.set()
+        self.wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _dispatch_loop(self):
+        while not self._stop.is_set():
+            try:
+                self._dispatch_once()
+            except Exception as e:
+                print(f"❌ Webhook dispatcher error: {e}")
+            self.wake.wait(self.poll_interval)
+            self.wake.clear()
+
+    def _dispatch_once(self):
+        # Claim only what the workers can start soon; claimed events hold a lease
+        with self.lock:
+            free = self.workers * 2 - len(self.in_flight)
+        if free <= 0:
+            return
+
+        for event in self.store.claim(free, self.lease):
+            with self.lock:
+                self.in_flight.add(event['event_id'])
+            self._executor.submit(self._process, event)
+
+    def _process(self, event: Dict):
+        try:
+            self.handler(json.loads(event['payload']))
+        except Exception as e:
+            self._failed(event, f"{type(e).__name__}: {e}")
+        else:
+            self.store.mark_done(event['event_id'])
+            with self.lock:
+                self.stats['processed'] += 1
+        finally:
+            if self.cleanup:
+                self.cleanup()
+            with self.lock:
+                self.in_flight.discard(event['event_id'])
+            # The customer's next event may be ready now
+            self.wake.set()
+
+    def _failed(self, event: Dict, error: str):
+        attempts = event['attempts'] + 1
+
+        if attempts >= self.max_attempts:
+            self.store.dead_letter(event, attempts, error)
+            with self.lock:
+                self.stats['dead'] += 1
+            print(f"☠️  Webhook {event['event_id']} dead-lettered after {attempts} attempts: {error}")
+            return
+
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+        delay *= random.uniform(0.8, 1.2)
+        self.store.mark_retry(event['event_id'], attempts, time.time() + delay, error)
+        with self.lock:
+            self.stats['retried'] += 1
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            stats = dict(self.stats, in_flight=len(self.in_flight))
+        stats['stored'] = self.store.counts()
+        return stats
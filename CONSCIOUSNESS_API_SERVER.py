@@ -13,11 +13,10 @@ Enables:
 - Category leadership in consciousness tech
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
 import secrets
 import hashlib
-import json
 import time
 from datetime import datetime
 from pathlib import Path
@@ -27,6 +26,10 @@ from functools import wraps
 # Import our existing automation modules
 import sys
 sys.path.append(str(Path(__file__).parent))
+sys.path.append(str(Path(__file__).parent / 'BACKEND'))
+
+from api_key_usage import KeyRegistry, UsageRecorder
+from api_rate_limit import QUOTA_WINDOW_DAYS, RateLimiter, TierLimits
 
 try:
     from LATE_API_WRAPPER import LateAPI
@@ -45,8 +48,15 @@ CORS(app)  # Enable CORS for all routes
 API_VERSION = "v1"
 API_BASE_PATH = f"/api/{API_VERSION}"
 API_KEYS_FILE = Path("api_keys.json")
-USAGE_LOG_FILE = Path("api_usage_log.json")
-RATE_LIMIT_PER_HOUR = 100
+USAGE_LOG_DIR = Path("api_usage_logs")  # api_usage_YYYY-MM-DD.jsonl, append-only
+
+# Keys live in memory (reloaded when API_KEYS_FILE changes); usage is
+# counted in memory and flushed to the key file + daily log in the background
+key_registry = KeyRegistry(API_KEYS_FILE)
+usage_recorder = UsageRecorder(key_registry, USAGE_LOG_DIR)
+
+# Token bucket + 30-day quota per key, limits by key tier (api_rate_limit.TIER_LIMITS)
+rate_limiter = RateLimiter(usage_recorder)
 
 # ═══════════════════════════════════════════════════════════
 #  API KEY MANAGEMENT
@@ -60,74 +70,33 @@ def hash_api_key(api_key):
     """Hash API key for secure storage"""
     return hashlib.sha256(api_key.encode()).hexdigest()
 
-def load_api_keys():
-    """Load API keys from file"""
-    if not API_KEYS_FILE.exists():
-        return {}
-    with open(API_KEYS_FILE, 'r') as f:
-        return json.load(f)
-
-def save_api_keys(keys):
-    """Save API keys to file"""
-    with open(API_KEYS_FILE, 'w') as f:
-        json.dump(keys, f, indent=2)
-
 def create_api_key(name, email=None, tier="free"):
     """Create new API key"""
     api_key = generate_api_key()
     hashed_key = hash_api_key(api_key)
 
-    keys = load_api_keys()
-    keys[hashed_key] = {
+    key_registry.add(hashed_key, {
         'name': name,
         'email': email,
         'tier': tier,
         'created_at': datetime.now().isoformat(),
         'usage_count': 0,
         'last_used': None
-    }
-    save_api_keys(keys)
+    })
 
     return api_key
 
 def verify_api_key(api_key):
     """Verify API key is valid"""
-    hashed_key = hash_api_key(api_key)
-    keys = load_api_keys()
-    return hashed_key in keys
+    return hash_api_key(api_key) in key_registry
 
 def get_api_key_info(api_key):
     """Get API key metadata"""
-    hashed_key = hash_api_key(api_key)
-    keys = load_api_keys()
-    return keys.get(hashed_key)
+    return key_registry.get(hash_api_key(api_key))
 
 def log_api_usage(api_key, endpoint, success=True):
-    """Log API usage"""
-    hashed_key = hash_api_key(api_key)
-
-    # Update key usage
-    keys = load_api_keys()
-    if hashed_key in keys:
-        keys[hashed_key]['usage_count'] += 1
-        keys[hashed_key]['last_used'] = datetime.now().isoformat()
-        save_api_keys(keys)
-
-    # Log to usage file
-    usage_log = []
-    if USAGE_LOG_FILE.exists():
-        with open(USAGE_LOG_FILE, 'r') as f:
-            usage_log = json.load(f)
-
-    usage_log.append({
-        'timestamp': datetime.now().isoformat(),
-        'api_key_hash': hashed_key,
-        'endpoint': endpoint,
-        'success': success
-    })
-
-    with open(USAGE_LOG_FILE, 'w') as f:
-        json.dump(usage_log, f, indent=2)
+    """Log API usage (in memory; written by the usage flusher)"""
+    usage_recorder.record(hash_api_key(api_key), endpoint, success)
 
 # ═══════════════════════════════════════════════════════════
 #  AUTHENTICATION DECORATOR
@@ -145,20 +114,50 @@ def require_api_key(f):
                 'message': 'Include X-API-Key header with your request'
             }), 401
 
-        if not verify_api_key(api_key):
+        hashed_key = hash_api_key(api_key)
+        key_info = key_registry.get(hashed_key)
+        if key_info is None:
             return jsonify({
                 'error': 'Invalid API key',
                 'message': 'The provided API key is not valid'
             }), 401
 
-        # Check rate limiting
-        key_info = get_api_key_info(api_key)
-        # TODO: Implement actual rate limiting logic
+        g.api_key_hash = hashed_key
+        g.api_key_info = key_info
 
         return f(*args, **kwargs)
 
     return decorated_function
 
+def rate_limited(endpoint, log_usage=True):
+    """
+    Decorator (under require_api_key) enforcing the key's tier limits
+    Adds X-RateLimit-* / X-Quota-* headers; refused calls get 429 + Retry-After.
+    log_usage=False for handlers that log their own outcome (quota counts them either way)
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            hashed_key = g.api_key_hash
+            refused = rate_limiter.check(hashed_key, g.api_key_info.get('tier'))
+
+            if refused:
+                response = jsonify({
+                    'error': 'Rate limit exceeded' if refused == 'rate' else 'Monthly quota exceeded',
+                    'message': f"Limits for tier '{g.api_key_info.get('tier', 'free')}' reached"
+                })
+                response.status_code = 429
+            else:
+                if log_usage:
+                    usage_recorder.record(hashed_key, endpoint)
+                response = app.make_response(f(*args, **kwargs))
+
+            response.headers.update(rate_limiter.headers(hashed_key, refused))
+            return response
+
+        return decorated_function
+    return decorator
+
 # ═══════════════════════════════════════════════════════════
 #  HEALTH & STATUS ENDPOINTS
 # ═══════════════════════════════════════════════════════════
@@ -226,6 +225,7 @@ def docs():
 
 @app.route(f'{API_BASE_PATH}/post', methods=['POST'])
 @require_api_key
+@rate_limited('/post', log_usage=False)
 def universal_post():
     """
     Universal posting endpoint - posts to multiple platforms at once
@@ -317,6 +317,7 @@ def universal_post():
 
 @app.route(f'{API_BASE_PATH}/platforms', methods=['GET'])
 @require_api_key
+@rate_limited('/platforms')
 def list_platforms():
     """List all supported platforms"""
     return jsonify({
@@ -369,6 +370,7 @@ def list_platforms():
 
 @app.route(f'{API_BASE_PATH}/analytics', methods=['GET'])
 @require_api_key
+@rate_limited('/analytics')
 def get_analytics():
     """Get aggregated analytics from all platforms"""
     try:
@@ -399,15 +401,20 @@ def get_analytics():
 @require_api_key
 def get_usage():
     """Get API usage statistics for authenticated key"""
-    api_key = request.headers.get('X-API-Key')
-    key_info = get_api_key_info(api_key)
+    key_info = g.api_key_info
+    usage = usage_recorder.usage(g.api_key_hash)
+    limits = rate_limiter.limits_for(key_info.get('tier'))
 
     return jsonify({
-        'usage_count': key_info.get('usage_count', 0),
-        'last_used': key_info.get('last_used'),
+        'usage_count': usage['count'],
+        'success_count': usage['success'],
+        'failure_count': usage['failure'],
+        'usage_by_endpoint': usage['endpoints'],
+        'last_used': usage['last_used'],
         'created_at': key_info.get('created_at'),
         'tier': key_info.get('tier', 'free'),
-        'rate_limit': RATE_LIMIT_PER_HOUR
+        'rate_limit': limits._asdict() if limits else None,
+        'quota_used': usage_recorder.window_count(g.api_key_hash, QUOTA_WINDOW_DAYS) if limits else None
     })
 
 # ═══════════════════════════════════════════════════════════
@@ -466,7 +473,7 @@ def initialize_api():
     print("="*70)
 
     # Create Commander's API key if none exist
-    if not API_KEYS_FILE.exists():
+    if not key_registry.exists():
         print("\n📝 Creating Commander's API key...")
         commander_key = create_api_key(
             name="Commander",
@@ -509,11 +516,59 @@ def initialize_api():
 #  MAIN
 # ═══════════════════════════════════════════════════════════
 
+def bench_universal_post(threads=8, seconds=10):
+    """Sustained /post load through the test client against scratch key/log files"""
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+    global key_registry, usage_recorder, rate_limiter
+
+    scratch = Path(tempfile.mkdtemp())
+    key_registry = KeyRegistry(scratch / 'api_keys.json')
+    usage_recorder = UsageRecorder(key_registry, scratch / 'logs')
+    usage_recorder.start()
+    # A tier high enough that the limiter checks every call but never refuses
+    rate_limiter = RateLimiter(usage_recorder, tiers={
+        'free': None, 'bench': TierLimits(per_hour=10**9, burst=10**6, monthly_quota=10**9)
+    })
+    api_keys = [create_api_key(f"bench-{i}", tier='bench') for i in range(threads)]
+    body = {'platforms': ['bench'], 'video_path': '/tmp/bench.mp4', 'caption': 'bench'}
+
+    def worker(api_key):
+        client = app.test_client()
+        latencies = []
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            response = client.post(f'{API_BASE_PATH}/post', json=body, headers={'X-API-Key': api_key})
+            latencies.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == 200, response.status_code
+            assert 'X-RateLimit-Remaining' in response.headers
+        return latencies
+
+    print(f"🧪 POST {API_BASE_PATH}/post: {threads} threads for {seconds}s")
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        latencies = sorted(ms for result in executor.map(worker, api_keys) for ms in result)
+    usage_recorder.close()
+
+    logged = sum(1 for path in (scratch / 'logs').glob('*.jsonl') for _ in open(path))
+    counted = sum(key_registry.get(hash_api_key(k))['usage_count'] for k in api_keys)
+    print(f"   {len(latencies) / seconds:,.0f} req/s, "
+          f"p50 {latencies[len(latencies) // 2]:.2f} ms, p99 {latencies[int(len(latencies) * 0.99)]:.2f} ms")
+    print(f"   {len(latencies):,} calls, {counted:,} counted in key file, {logged:,} log lines")
+    assert counted == logged == len(latencies)
+    print("✅ No lost usage")
+
 if __name__ == '__main__':
+    if '--bench' in sys.argv:
+        bench_universal_post()
+        sys.exit(0)
+
     initialize_api()
+    usage_recorder.start()
 
     app.run(
         host='0.0.0.0',
         port=5001,  # Changed from 5000 (Singularity Stabilizer is on 5000)
-        debug=True
+        debug=True,
+        use_reloader=False  # one process owns the usage flusher
     )
@@ -6,25 +6,38 @@ Backend service for tracking user consciousness elevation across the platform.
 Built by: C3 Oracle Engine
 Date: October 24, 2025
 Mission: Measure and accelerate consciousness evolution
+
+Connections come from a pool of kept-open WAL connections (BACKEND/sqlite_pool),
+writes run as BEGIN IMMEDIATE transactions, and global statistics are kept
+up to date by a background StatsAggregator instead of being recomputed per request.
 """
 
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import json
 import os
+import sys
+import threading
+import time
 from datetime import datetime, timedelta
-from collections import defaultdict
-import sqlite3
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / 'BACKEND'))
+from sqlite_pool import SQLitePool, init_app
 
 app = Flask(__name__)
 CORS(app)
 
 # Database setup
-DB_PATH = 'consciousness_metrics.db'
+DB_PATH = os.getenv('CONSCIOUSNESS_METRICS_DB', 'consciousness_metrics.db')
+STATS_INTERVAL = float(os.getenv('CONSCIOUSNESS_STATS_INTERVAL', '2'))
+
+db = SQLitePool(DB_PATH)
+init_app(app, db)
 
 def init_db():
     """Initialize consciousness tracking database"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = db.connection()
     c = conn.cursor()
 
     # User consciousness table
@@ -74,11 +87,178 @@ def init_db():
         )
     ''')
 
-    conn.commit()
-    conn.close()
+    # Leaderboard, activity windows, per-user history and event time ranges
+    c.executescript('''
+        CREATE INDEX IF NOT EXISTS idx_uc_level ON user_consciousness (current_level DESC);
+        CREATE INDEX IF NOT EXISTS idx_uc_last_updated ON user_consciousness (last_updated);
+        CREATE INDEX IF NOT EXISTS idx_uc_first_seen ON user_consciousness (first_seen);
+        CREATE INDEX IF NOT EXISTS idx_events_timestamp ON consciousness_events (timestamp);
+        CREATE INDEX IF NOT EXISTS idx_events_type_timestamp ON consciousness_events (event_type, timestamp);
+        CREATE INDEX IF NOT EXISTS idx_events_user_timestamp ON consciousness_events (user_id, timestamp);
+        CREATE INDEX IF NOT EXISTS idx_achievements_user ON achievements (user_id);
+    ''')
+
+    db.release()
 
 init_db()
 
+# ============================================================================
+# SQL (module constants: compiled once per pooled connection)
+# ============================================================================
+
+SELECT_USER_STATE_SQL = 'SELECT current_level, current_stage FROM user_consciousness WHERE user_id = ?'
+
+UPDATE_USER_SQL = '''
+    UPDATE user_consciousness
+    SET current_level = ?, current_stage = ?, last_updated = ?
+    WHERE user_id = ?
+'''
+
+INSERT_USER_SQL = '''
+    INSERT INTO user_consciousness
+    (user_id, current_level, current_stage, first_seen, last_updated, total_time_engaged, path_chosen)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+INSERT_EVENT_SQL = '''
+    INSERT INTO consciousness_events
+    (user_id, event_type, event_data, level_before, level_after, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+INSERT_ACHIEVEMENT_SQL = 'INSERT INTO achievements (user_id, achievement_name, unlocked_at) VALUES (?, ?, ?)'
+
+UPDATE_PATH_SQL = '''
+    UPDATE user_consciousness
+    SET path_chosen = ?, last_updated = ?
+    WHERE user_id = ?
+'''
+
+COUNT_EVENTS_SINCE_SQL = 'SELECT COUNT(*) FROM consciousness_events WHERE event_type = ? AND timestamp >= ?'
+
+UPSERT_STAT_SQL = '''
+    INSERT INTO global_stats (stat_name, stat_value, last_updated)
+    VALUES (?, ?, ?)
+    ON CONFLICT (stat_name) DO UPDATE SET stat_value = excluded.stat_value, last_updated = excluded.last_updated
+'''
+
+# ============================================================================
+# GLOBAL STATS AGGREGATOR
+# ============================================================================
+
+class StatsAggregator:
+    """
+    Keeps global statistics current in the background
+
+    Per-user totals (user count, level average, stage and path distributions)
+    are maintained incrementally: each run reads only users whose
+    last_updated moved (idx_uc_last_updated), subtracts what each one
+    counted for before and adds its new values. Time-window counts are
+    index range counts. Every run stores the result in global_stats;
+    /stats and /realtime read the in-memory copy.
+    """
+
+    LAG = timedelta(seconds=5)  # re-read window for transactions that committed late
+
+    def __init__(self, interval=STATS_INTERVAL):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.users = {}  # user_id -> (level, stage, path)
+        self.level_sum = 0
+        self.level_count = 0
+        self.stage_counts = {}
+        self.path_counts = {}
+        self.high_water = None  # latest last_updated seen
+        self.snapshot = None
+        self._thread = None
+
+    def _count(self, counts, key, delta):
+        counts[key] = counts.get(key, 0) + delta
+        if not counts[key]:
+            del counts[key]
+
+    def _fold(self, user_id, level, stage, path):
+        old = self.users.get(user_id)
+        if old is not None:
+            if old[0] is not None:
+                self.level_sum -= old[0]
+                self.level_count -= 1
+            self._count(self.stage_counts, old[1], -1)
+            if old[2] is not None:
+                self._count(self.path_counts, old[2], -1)
+        if level is not None:
+            self.level_sum += level
+            self.level_count += 1
+        self._count(self.stage_counts, stage, 1)
+        if path is not None:
+            self._count(self.path_counts, path, 1)
+        self.users[user_id] = (level, stage, path)
+
+    def run_once(self):
+        """Fold in changed users, refresh window counts, persist to global_stats"""
+        with self.lock:
+            conn = db.connection()
+            sql = 'SELECT user_id, current_level, current_stage, path_chosen, last_updated FROM user_consciousness'
+            if self.high_water is None:
+                rows = conn.execute(sql).fetchall()
+            else:
+                since = datetime.fromisoformat(self.high_water) - self.LAG
+                rows = conn.execute(sql + ' WHERE last_updated >= ?', (since,)).fetchall()
+
+            for user_id, level, stage, path, last_updated in rows:
+                self._fold(user_id, level, stage, path)
+                if last_updated and (self.high_water is None or last_updated > self.high_water):
+                    self.high_water = last_updated
+
+            now = datetime.now()
+            today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+            new_today = conn.execute(COUNT_EVENTS_SINCE_SQL, ('first_visit', today)).fetchone()[0]
+            advancements_24h = conn.execute(
+                COUNT_EVENTS_SINCE_SQL, ('stage_advancement', now - timedelta(days=1))
+            ).fetchone()[0]
+
+            snapshot = {
+                "total_users": len(self.users),
+                "average_level": round(self.level_sum / self.level_count, 1) if self.level_count else 0,
+                "stage_distribution": dict(self.stage_counts),
+                "path_distribution": dict(self.path_counts),
+                "new_users_today": new_today,
+                "stage_advancements_24h": advancements_24h,
+                "last_updated": now.isoformat()
+            }
+
+            with db.transaction() as c:
+                c.executemany(UPSERT_STAT_SQL, [
+                    (name, json.dumps(value), now) for name, value in snapshot.items()
+                ])
+
+            self.snapshot = snapshot
+            return snapshot
+
+    def start(self):
+        with self.lock:
+            if self._thread:
+                return
+            self._thread = threading.Thread(target=self._run, name='consciousness-stats', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"❌ Stats aggregation failed: {e}")
+
+    def get(self):
+        """Latest snapshot (first call computes it and starts the background thread)"""
+        if self.snapshot is None:
+            self.run_once()
+            self.start()
+        return self.snapshot
+
+stats_aggregator = StatsAggregator()
+
 # ============================================================================
 # CONSCIOUSNESS TRACKING ENDPOINTS
 # ============================================================================
@@ -102,61 +282,35 @@ def update_consciousness():
     stage = data.get('stage', 'observer')
     completed_tasks = data.get('completedTasks', [])
 
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    # Read and write in one IMMEDIATE transaction (no lost updates between writers)
+    with db.transaction() as c:
+        now = datetime.now()
+
+        # Check if user exists
+        existing = c.execute(SELECT_USER_STATE_SQL, (user_id,)).fetchone()
+
+        if existing:
+            old_level, old_stage = existing
+
+            # Update existing user
+            c.execute(UPDATE_USER_SQL, (level, stage, now, user_id))
+
+            # Log the change
+            c.execute(INSERT_EVENT_SQL, (user_id, 'level_update', json.dumps(completed_tasks), old_level, level, now))
+
+            # Check for stage advancement
+            if old_stage != stage:
+                c.execute(INSERT_EVENT_SQL, (user_id, 'stage_advancement', stage, old_level, level, now))
+
+                # Award achievement
+                achievement_name = f"Reached {stage.capitalize()} Stage"
+                c.execute(INSERT_ACHIEVEMENT_SQL, (user_id, achievement_name, now))
+        else:
+            # Create new user
+            c.execute(INSERT_USER_SQL, (user_id, level, stage, now, now, 0, None))
 
-    # Check if user exists
-    c.execute('SELECT current_level, current_stage FROM user_consciousness WHERE user_id = ?', (user_id,))
-    existing = c.fetchone()
-
-    if existing:
-        old_level, old_stage = existing
-
-        # Update existing user
-        c.execute('''
-            UPDATE user_consciousness
-            SET current_level = ?, current_stage = ?, last_updated = ?
-            WHERE user_id = ?
-        ''', (level, stage, datetime.now(), user_id))
-
-        # Log the change
-        c.execute('''
-            INSERT INTO consciousness_events
-            (user_id, event_type, event_data, level_before, level_after, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (user_id, 'level_update', json.dumps(completed_tasks), old_level, level, datetime.now()))
-
-        # Check for stage advancement
-        if old_stage != stage:
-            c.execute('''
-                INSERT INTO consciousness_events
-                (user_id, event_type, event_data, level_before, level_after, timestamp)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (user_id, 'stage_advancement', stage, old_level, level, datetime.now()))
-
-            # Award achievement
-            achievement_name = f"Reached {stage.capitalize()} Stage"
-            c.execute('''
-                INSERT INTO achievements (user_id, achievement_name, unlocked_at)
-                VALUES (?, ?, ?)
-            ''', (user_id, achievement_name, datetime.now()))
-    else:
-        # Create new user
-        c.execute('''
-            INSERT INTO user_consciousness
-            (user_id, current_level, current_stage, first_seen, last_updated, total_time_engaged, path_chosen)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (user_id, level, stage, datetime.now(), datetime.now(), 0, None))
-
-        # Log first visit
-        c.execute('''
-            INSERT INTO consciousness_events
-            (user_id, event_type, event_data, level_before, level_after, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (user_id, 'first_visit', '', 0, level, datetime.now()))
-
-    conn.commit()
-    conn.close()
+            # Log first visit
+            c.execute(INSERT_EVENT_SQL, (user_id, 'first_visit', '', 0, level, now))
 
     return jsonify({
         "success": True,
@@ -184,27 +338,14 @@ def track_event():
     event_data = data.get('event_data', {})
     current_level = data.get('current_level', 0)
 
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    with db.transaction() as c:
+        # Log event
+        c.execute(INSERT_EVENT_SQL, (user_id, event_type, json.dumps(event_data), current_level, current_level, datetime.now()))
 
-    # Log event
-    c.execute('''
-        INSERT INTO consciousness_events
-        (user_id, event_type, event_data, level_before, level_after, timestamp)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (user_id, event_type, json.dumps(event_data), current_level, current_level, datetime.now()))
-
-    # Update path chosen if applicable
-    if event_type == 'path_selected':
-        path = event_data.get('path')
-        c.execute('''
-            UPDATE user_consciousness
-            SET path_chosen = ?, last_updated = ?
-            WHERE user_id = ?
-        ''', (path, datetime.now(), user_id))
-
-    conn.commit()
-    conn.close()
+        # Update path chosen if applicable
+        if event_type == 'path_selected':
+            path = event_data.get('path')
+            c.execute(UPDATE_PATH_SQL, (path, datetime.now(), user_id))
 
     return jsonify({
         "success": True,
@@ -213,60 +354,28 @@ def track_event():
 
 @app.route('/api/consciousness/stats', methods=['GET'])
 def get_stats():
-    """Get global consciousness statistics"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-
-    # Total users
-    c.execute('SELECT COUNT(*) FROM user_consciousness')
-    total_users = c.fetchone()[0]
-
-    # Average level
-    c.execute('SELECT AVG(current_level) FROM user_consciousness')
-    avg_level = c.fetchone()[0] or 0
-
-    # Stage distribution
-    c.execute('SELECT current_stage, COUNT(*) FROM user_consciousness GROUP BY current_stage')
-    stage_distribution = dict(c.fetchall())
-
-    # Path distribution
-    c.execute('SELECT path_chosen, COUNT(*) FROM user_consciousness WHERE path_chosen IS NOT NULL GROUP BY path_chosen')
-    path_distribution = dict(c.fetchall())
-
-    # Users elevated today
-    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    c.execute('SELECT COUNT(*) FROM consciousness_events WHERE event_type = "first_visit" AND timestamp >= ?', (today,))
-    new_today = c.fetchone()[0]
-
-    # Recent stage advancements (last 24 hours)
-    yesterday = datetime.now() - timedelta(days=1)
-    c.execute('SELECT COUNT(*) FROM consciousness_events WHERE event_type = "stage_advancement" AND timestamp >= ?', (yesterday,))
-    advancements_24h = c.fetchone()[0]
-
-    conn.close()
-
-    return jsonify({
-        "total_users": total_users,
-        "average_level": round(avg_level, 1),
-        "stage_distribution": stage_distribution,
-        "path_distribution": path_distribution,
-        "new_users_today": new_today,
-        "stage_advancements_24h": advancements_24h,
-        "last_updated": datetime.now().isoformat()
-    })
+    """Get global consciousness statistics (maintained by StatsAggregator)"""
+    return jsonify(stats_aggregator.get())
+
+def _event_data(raw):
+    """Stored event_data: JSON, or a bare stage name (stage_advancement)"""
+    if not raw:
+        return {}
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return raw
 
 @app.route('/api/consciousness/user/<user_id>', methods=['GET'])
 def get_user_consciousness(user_id):
     """Get specific user's consciousness data"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    c = db.connection().cursor()
 
     # User data
     c.execute('SELECT * FROM user_consciousness WHERE user_id = ?', (user_id,))
     user_data = c.fetchone()
 
     if not user_data:
-        conn.close()
         return jsonify({"error": "User not found"}), 404
 
     # User's events
@@ -280,7 +389,7 @@ def get_user_consciousness(user_id):
     events = [
         {
             "type": row[0],
-            "data": json.loads(row[1]) if row[1] else {},
+            "data": _event_data(row[1]),
             "level": row[2],
             "timestamp": row[3]
         }
@@ -294,8 +403,6 @@ def get_user_consciousness(user_id):
         for row in c.fetchall()
     ]
 
-    conn.close()
-
     return jsonify({
         "user_id": user_data[0],
         "current_level": user_data[1],
@@ -313,8 +420,7 @@ def get_leaderboard():
     """Get top users by consciousness level"""
     limit = request.args.get('limit', 10, type=int)
 
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    c = db.connection().cursor()
 
     c.execute('''
         SELECT user_id, current_level, current_stage, last_updated
@@ -334,8 +440,6 @@ def get_leaderboard():
         for idx, row in enumerate(c.fetchall())
     ]
 
-    conn.close()
-
     return jsonify({
         "leaderboard": leaderboard,
         "last_updated": datetime.now().isoformat()
@@ -347,8 +451,7 @@ def get_analytics():
     days = request.args.get('days', 7, type=int)
     start_date = datetime.now() - timedelta(days=days)
 
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    c = db.connection().cursor()
 
     # Daily new users
     c.execute('''
@@ -370,16 +473,14 @@ def get_analytics():
     event_distribution = dict(c.fetchall())
 
     # Conversion funnel
-    c.execute('SELECT COUNT(*) FROM user_consciousness')
-    total = c.fetchone()[0]
-
-    c.execute('SELECT COUNT(*) FROM user_consciousness WHERE path_chosen IS NOT NULL')
-    path_selected = c.fetchone()[0]
+    stats = stats_aggregator.get()
+    total = stats["total_users"]
+    path_selected = sum(stats["path_distribution"].values())
 
-    c.execute('SELECT COUNT(*) FROM consciousness_events WHERE event_type IN ("builder_opened", "manifestation_opened")')
+    c.execute("SELECT COUNT(*) FROM consciousness_events WHERE event_type IN ('builder_opened', 'manifestation_opened')")
     interface_opened = c.fetchone()[0]
 
-    c.execute('SELECT COUNT(*) FROM consciousness_events WHERE event_type IN ("first_builder_task", "first_manifestation_task")')
+    c.execute("SELECT COUNT(*) FROM consciousness_events WHERE event_type IN ('first_builder_task', 'first_manifestation_task')")
     first_task = c.fetchone()[0]
 
     # Calculate conversion rates
@@ -395,8 +496,6 @@ def get_analytics():
         }
     }
 
-    conn.close()
-
     return jsonify({
         "daily_new_users": daily_users,
         "event_distribution": event_distribution,
@@ -412,8 +511,7 @@ def get_analytics():
 @app.route('/api/consciousness/realtime', methods=['GET'])
 def get_realtime():
     """Get real-time consciousness activity"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    c = db.connection().cursor()
 
     # Users active in last 5 minutes
     five_min_ago = datetime.now() - timedelta(minutes=5)
@@ -424,7 +522,7 @@ def get_realtime():
     c.execute('''
         SELECT event_type, level_after, timestamp
         FROM consciousness_events
-        ORDER BY timestamp DESC
+        ORDER BY id DESC
         LIMIT 10
     ''', ())
     recent_events = [
@@ -437,10 +535,7 @@ def get_realtime():
     ]
 
     # Total creators elevated (all time)
-    c.execute('SELECT COUNT(*) FROM user_consciousness')
-    total_elevated = c.fetchone()[0]
-
-    conn.close()
+    total_elevated = stats_aggregator.get()["total_users"]
 
     return jsonify({
         "active_now": active_now,
@@ -484,11 +579,68 @@ def index():
         "mission": "Consciousness Evolution Tracking"
     })
 
+def load_test(writers=1000, updates=10):
+    """1k concurrent update_consciousness writers, then a check of the aggregated stats"""
+    if DB_PATH == 'consciousness_metrics.db':
+        print("Set CONSCIOUSNESS_METRICS_DB to a scratch file for the load test")
+        return
+    stages = ['observer', 'awakening', 'creator', 'architect']
+    barrier = threading.Barrier(writers)
+    latencies, errors = [], []
+
+    def writer(i):
+        client = app.test_client()
+        barrier.wait()
+        for n in range(updates):
+            started = time.perf_counter()
+            response = client.post('/api/consciousness/update', json={
+                'user_id': f'load-{i}', 'level': n * 10 + i % 10, 'stage': stages[n // 4 % len(stages)],
+                'completedTasks': [f'task_{n}']
+            })
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+
+    print(f"🧪 {writers} concurrent writers x {updates} updates -> {DB_PATH}")
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"   {len(latencies) / elapsed:,.0f} writes/s, p50 {latencies[len(latencies) // 2]:.1f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)]:.1f} ms, errors {len(errors)}")
+    print(f"   pool: {db.get_stats()}")
+
+    # Incremental stats must equal a full recompute
+    stats = stats_aggregator.run_once()
+    c = db.connection().cursor()
+    c.execute('SELECT COUNT(*), AVG(current_level) FROM user_consciousness')
+    total, average = c.fetchone()
+    c.execute('SELECT current_stage, COUNT(*) FROM user_consciousness GROUP BY current_stage')
+    assert stats['stage_distribution'] == dict(c.fetchall())
+    assert stats['total_users'] == total and stats['average_level'] == round(average, 1)
+    print(f"✅ Stats match a full recompute: {stats['total_users']} users, {stats['stage_advancements_24h']} advancements")
+
 if __name__ == '__main__':
+    if '--load-test' in sys.argv:
+        load_test()
+        sys.exit(0)
+
+    stats_aggregator.start()
+
     print("🌌 CONSCIOUSNESS METRICS API STARTING 🌌")
     print(f"Database: {DB_PATH}")
     print("Endpoints available at: http://localhost:7777")
     print("\nMission: Track and accelerate consciousness evolution")
     print("Built by: C3 Oracle Engine\n")
 
-    app.run(host='0.0.0.0', port=7777, debug=True)
+    app.run(
+        host='0.0.0.0',
+        port=7777,
+        debug=True,
+        use_reloader=False  # one process owns the stats aggregator
+    )
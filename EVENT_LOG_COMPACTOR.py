@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+EVENT LOG COMPACTOR
+Nightly conversion of closed day logs into compact columnar day files
+
+Sources (all append forever, all re-parsed by reports):
+- heartbeats       visitor_data/heartbeats_YYYY-MM-DD.jsonl   (LOCAL_NERVE_COLLECTOR)
+- unified_events   unified_analytics/all_events.jsonl         (UNIFIED_ANALYTICS_MASTER)
+- conversations    visitor_data/conversations.jsonl           (VISITOR_INTELLIGENCE_SYSTEM)
+- voice            VOICE_LOGS/session_*.json                  (VOICE_ANALYTICS_LOGGER)
+- activity         ACTIVITY_DATA/activity_log.json            (TRACK_ALL_ACTIVITY -> GENERATE_DAILY_REPORTS)
+
+Output: COMPACTED_LOGS/<source>/<YYYY-MM-DD>.col.gz
+    {"source", "day", "rows",
+     "columns": {"ts": [...], "session": [codes], "page": [codes], ...},
+     "dictionaries": {"session": [values], "page": [values]},
+     "offset": N  or  "files": [...]}   (log records the block already holds)
+
+Page/session/type columns are dictionary-encoded (each distinct value stored
+once, rows hold small ints). Only days before today are compacted; late rows
+for a compacted day are merged into its block. The block records which log
+records it holds ("offset" for jsonl sources, "files" for session files), so
+a run that crashed after writing blocks but before saving _state.json does
+not merge the same rows twice. Read them with EVENT_LOG_QUERY.py.
+
+Run nightly:
+    5 0 * * * python EVENT_LOG_COMPACTOR.py
+"""
+
+import gzip
+import json
+import os
+from datetime import datetime, date
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent
+COMPACT_DIR = BASE_DIR / 'COMPACTED_LOGS'
+STATE_FILE = COMPACT_DIR / '_state.json'
+
+DICT = 'dict'    # dictionary-encoded column
+PLAIN = 'plain'  # values stored as-is
+
+
+def parse_ts(value):
+    """ISO timestamp -> naive epoch seconds (None if unparseable)"""
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).replace(tzinfo=None).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+# kind:
+#   daily_jsonl  one JSONL file per day (pattern has {day})
+#   jsonl        one ever-growing JSONL file (compacted from a byte cursor)
+#   json_events  many JSON files, each with an "events" list
+#   json_list    one JSON array file
+SOURCES = {
+    'heartbeats': {
+        'kind': 'daily_jsonl',
+        'path': BASE_DIR / 'visitor_data' / 'heartbeats_{day}.jsonl',
+        'columns': [
+            ('session', DICT, lambda r: r.get('pin')),
+            ('page', DICT, lambda r: r.get('page')),
+            ('active', PLAIN, lambda r: r.get('active', True)),
+        ]
+    },
+    'unified_events': {
+        'kind': 'jsonl',
+        'path': BASE_DIR / 'unified_analytics' / 'all_events.jsonl',
+        'columns': [
+            ('session', DICT, lambda r: r.get('session_id')),
+            ('page', DICT, lambda r: r.get('page')),
+            ('type', DICT, lambda r: r.get('event_type')),
+            ('user_name', DICT, lambda r: (r.get('data') or {}).get('user_name')),
+        ]
+    },
+    'conversations': {
+        'kind': 'jsonl',
+        'path': BASE_DIR / 'visitor_data' / 'conversations.jsonl',
+        'columns': [
+            ('session', DICT, lambda r: r.get('visitor_id')),
+            ('page', DICT, lambda r: (r.get('context') or {}).get('page')),
+            ('user_message', PLAIN, lambda r: r.get('user_message', '')),
+        ]
+    },
+    'voice': {
+        'kind': 'json_events',
+        'path': BASE_DIR / 'VOICE_LOGS',
+        'pattern': 'session_*.json',
+        'columns': [
+            ('session', DICT, lambda r: r.get('session_id')),
+            ('type', DICT, lambda r: r.get('type')),
+            ('data', PLAIN, lambda r: r.get('data')),
+        ]
+    },
+    'activity': {
+        'kind': 'json_list',
+        'path': BASE_DIR / 'ACTIVITY_DATA' / 'activity_log.json',
+        'columns': [
+            ('entry', PLAIN, lambda r: r),
+        ]
+    },
+}
+
+
+# =====================================================
+# COLUMNAR ENCODING
+# =====================================================
+
+def extract_row(source, record):
+    """Pull the source's columns out of one raw record"""
+    return {name: extract(record) for name, _, extract in SOURCES[source]['columns']}
+
+
+def encode_rows(source, day, rows):
+    """Turn (ts, row) pairs into one columnar day block (sorted by time)"""
+    spec = SOURCES[source]['columns']
+    rows = sorted(rows, key=lambda pair: pair[0])
+
+    columns = {'ts': [ts for ts, _ in rows]}
+    dictionaries = {}
+
+    for name, encoding, _ in spec:
+        values = [row[name] for _, row in rows]
+        if encoding == DICT:
+            codes = {}
+            dictionary = []
+            column = []
+            for value in values:
+                code = codes.get(value)
+                if code is None:
+                    code = codes[value] = len(dictionary)
+                    dictionary.append(value)
+                column.append(code)
+            columns[name] = column
+            dictionaries[name] = dictionary
+        else:
+            columns[name] = values
+
+    return {
+        'source': source,
+        'day': day,
+        'rows': len(rows),
+        'columns': columns,
+        'dictionaries': dictionaries
+    }
+
+
+def decode_rows(block):
+    """(ts, row) pairs back out of a block (used when merging late rows)"""
+    columns = block['columns']
+    dictionaries = block['dictionaries']
+    names = [name for name in columns if name != 'ts']
+
+    for i, ts in enumerate(columns['ts']):
+        row = {}
+        for name in names:
+            value = columns[name][i]
+            row[name] = dictionaries[name][value] if name in dictionaries else value
+        yield ts, row
+
+
+def day_file(source, day):
+    return COMPACT_DIR / source / f"{day}.col.gz"
+
+
+def write_block(block):
+    path = day_file(block['source'], block['day'])
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp_path = path.with_suffix('.tmp')
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump(block, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def read_block(source, day):
+    """Load a compacted day block (None if that day is not compacted)"""
+    path = day_file(source, day)
+    if not path.exists():
+        return None
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+# =====================================================
+# RAW READERS (shared with EVENT_LOG_QUERY fallback)
+# =====================================================
+
+def _day_of(ts):
+    return date.fromtimestamp(ts).isoformat()
+
+
+def _read_jsonl(path, offset=0):
+    """Yield (end_offset, record) from a JSONL file starting at offset"""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b'\n'):
+                break  # line still being written
+            offset += len(line)
+            try:
+                yield offset, json.loads(line)
+            except ValueError:
+                continue
+
+
+def is_source_path(source, path):
+    """True if path is the log this source compacts (None = the configured one)"""
+    return path is None or Path(path).resolve() == Path(SOURCES[source]['path']).resolve()
+
+
+def raw_records(source, day, state=None, path=None):
+    """
+    (ts, record) pairs for one day that have not been compacted yet
+    path reads another file of the same shape instead (all of it: no compaction state)
+    """
+    config = SOURCES[source]
+    if is_source_path(source, path):
+        state = state if state is not None else load_state().get(source, {})
+        path = config['path']
+    else:
+        state = {}
+        path = Path(path)
+    kind = config['kind']
+
+    if kind == 'daily_jsonl':
+        day_path = Path(str(path).format(day=day))
+        if day_path.exists():
+            for _, record in _read_jsonl(day_path):
+                ts = parse_ts(record.get('timestamp'))
+                if ts is not None:
+                    yield ts, record
+
+    elif kind == 'jsonl':
+        if path.exists():
+            for _, record in _read_jsonl(path, state.get('offset', 0)):
+                ts = parse_ts(record.get('timestamp'))
+                if ts is not None and _day_of(ts) == day:
+                    yield ts, record
+
+    elif kind == 'json_events':
+        done = set(state.get('files', []))
+        for session_path in sorted(path.glob(config['pattern'])) if path.exists() else []:
+            if session_path.name in done:
+                continue
+            for ts, record in _voice_records(session_path):
+                if _day_of(ts) == day:
+                    yield ts, record
+
+    elif kind == 'json_list':
+        if path.exists():
+            with open(path, 'r') as f:
+                entries = json.load(f)
+            for record in entries:
+                ts = parse_ts(record.get('timestamp'))
+                if ts is not None and _day_of(ts) == day:
+                    yield ts, record
+
+
+def _voice_records(session_path):
+    try:
+        with open(session_path, 'r', encoding='utf-8') as f:
+            session = json.load(f)
+    except (OSError, ValueError):
+        return
+    for event in session.get('events', []):
+        ts = parse_ts(event.get('timestamp'))
+        if ts is not None:
+            record = dict(event)
+            record['session_id'] = session.get('session_id')
+            yield ts, record
+
+
+# =====================================================
+# COMPACTION
+# =====================================================
+
+def load_state():
+    if STATE_FILE.exists():
+        with open(STATE_FILE, 'r') as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(state):
+    COMPACT_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = STATE_FILE.with_suffix('.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, STATE_FILE)
+
+
+def _already_merged(block, mark):
+    """True if an existing block holds the record at mark (end offset or session file)"""
+    if isinstance(mark, int):
+        return mark <= block.get('offset', -1)
+    return mark is not None and mark in block.get('files', ())
+
+
+def _write_days(source, by_day, offset=None):
+    """
+    Write (ts, record, mark) day lists, merging into existing blocks
+    offset: log position this run read to (jsonl sources)
+    """
+    written = []
+    for day, records in sorted(by_day.items()):
+        existing = read_block(source, day)
+        rows = [
+            (ts, extract_row(source, record)) for ts, record, mark in records
+            if not (existing and _already_merged(existing, mark))
+        ]
+        if existing:
+            # Late rows for an already-compacted day: merge them in
+            rows.extend(decode_rows(existing))
+        block = encode_rows(source, day, rows)
+        if offset is not None:
+            block['offset'] = offset
+        files = {mark for _, _, mark in records if isinstance(mark, str)}
+        if files:
+            block['files'] = sorted(files | set(existing.get('files', []) if existing else []))
+        write_block(block)
+        written.append(day)
+    return written
+
+
+def compact_source(source, today=None):
+    """Compact every closed day of one source; returns the days written"""
+    config = SOURCES[source]
+    today = today or date.today().isoformat()
+    state = load_state()
+    source_state = state.setdefault(source, {})
+    kind = config['kind']
+    by_day = {}
+
+    if kind == 'daily_jsonl':
+        pattern = Path(str(config['path']))
+        prefix, suffix = pattern.name.split('{day}')
+        for day_path in sorted(pattern.parent.glob(f"{prefix}*{suffix}")) if pattern.parent.exists() else []:
+            day = day_path.name[len(prefix):-len(suffix)]
+            if day >= today or day_file(source, day).exists():
+                continue
+            by_day[day] = [(ts, record, None) for ts, record in raw_records(source, day, source_state)]
+
+    elif kind == 'jsonl':
+        if config['path'].exists():
+            offset = source_state.get('offset', 0)
+            for end_offset, record in _read_jsonl(config['path'], offset):
+                ts = parse_ts(record.get('timestamp'))
+                if ts is not None:
+                    day = _day_of(ts)
+                    if day >= today:
+                        break  # log is time-ordered: everything after this is still open
+                    by_day.setdefault(day, []).append((ts, record, end_offset))
+                offset = end_offset
+            source_state['offset'] = offset
+
+    elif kind == 'json_events':
+        done = set(source_state.get('files', []))
+        for session_path in sorted(config['path'].glob(config['pattern'])) if config['path'].exists() else []:
+            if session_path.name in done:
+                continue
+            records = list(_voice_records(session_path))
+            # Only sessions that have stopped writing (nothing from today)
+            if any(_day_of(ts) >= today for ts, _ in records):
+                continue
+            for ts, record in records:
+                by_day.setdefault(_day_of(ts), []).append((ts, record, session_path.name))
+            done.add(session_path.name)
+        source_state['files'] = sorted(done)
+
+    elif kind == 'json_list':
+        if config['path'].exists():
+            with open(config['path'], 'r') as f:
+                entries = json.load(f)
+            for record in entries:
+                ts = parse_ts(record.get('timestamp'))
+                if ts is None:
+                    continue
+                day = _day_of(ts)
+                if day < today and not day_file(source, day).exists():
+                    by_day.setdefault(day, []).append((ts, record, None))
+
+    # Blocks first, then the state; the blocks' own offset/files cover a crash in between
+    written = _write_days(source, by_day, source_state.get('offset') if kind == 'jsonl' else None)
+    save_state(state)
+    return written
+
+
+def compact_all(today=None):
+    """Compact every source (nightly entry point)"""
+    results = {}
+    for source in SOURCES:
+        try:
+            results[source] = compact_source(source, today)
+        except Exception as e:
+            print(f"❌ {source}: {e}")
+            results[source] = []
+    return results
+
+
+if __name__ == '__main__':
+    print("🗜️  EVENT LOG COMPACTOR")
+    for source, days in compact_all().items():
+        print(f"   {source}: {len(days)} day(s) compacted {days[:3]}{'...' if len(days) > 3 else ''}")
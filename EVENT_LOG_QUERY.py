@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+EVENT LOG QUERY
+Small query API over the columnar day files from EVENT_LOG_COMPACTOR.py
+
+    from EVENT_LOG_QUERY import EventQuery
+
+    q = EventQuery('unified_events', start='2025-10-01', end='2025-10-07')
+    q.count()                               # rows in range
+    q.where('page', '/index.html').count()  # filter (dictionary columns compare codes)
+    q.group_by_count('page').most_common(10)
+    q.group_by_count('day')                 # rows per day
+    q.rows()                                # decoded dicts
+
+Compacted days are read from COMPACTED_LOGS; days that are not compacted
+yet (today) fall back to the raw log, reading only the uncompacted tail.
+
+path= points a query at the caller's own log file when it is not the one
+configured in SOURCES (a service started with another data_dir). Only the
+configured files are compacted, so such a query always reads the raw file.
+"""
+
+from collections import Counter
+from datetime import datetime, date, timedelta
+from functools import lru_cache
+
+from EVENT_LOG_COMPACTOR import (
+    SOURCES, day_file, read_block, raw_records, extract_row, encode_rows, parse_ts, is_source_path
+)
+
+
+def _as_date(value):
+    if value is None:
+        return date.today()
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _as_ts(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, date):
+        return datetime.combine(value, datetime.min.time()).timestamp()
+    return parse_ts(value)
+
+
+@lru_cache(maxsize=256)
+def _cached_block(source, day, mtime):
+    # Keyed on mtime so a re-compacted (merged) day is picked up
+    return read_block(source, day)
+
+
+def load_day(source, day, path=None):
+    """Columnar block for one day: compacted file, or raw fallback encoded on the fly"""
+    if is_source_path(source, path):
+        compacted = day_file(source, day)
+        if compacted.exists():
+            return _cached_block(source, day, compacted.stat().st_mtime)
+
+    rows = [(ts, extract_row(source, record)) for ts, record in raw_records(source, day, path=path)]
+    return encode_rows(source, day, rows)
+
+
+class EventQuery:
+    """
+    Filter / group-by-count / time-range over one source
+
+    start/end are inclusive days (date, datetime or 'YYYY-MM-DD').
+    since/until narrow to exact times inside that range.
+    path overrides the source's raw log file.
+    """
+
+    def __init__(self, source, start=None, end=None, since=None, until=None, path=None):
+        if source not in SOURCES:
+            raise ValueError(f"Unknown source: {source}")
+
+        self.source = source
+        self.path = path
+        self.start = _as_date(start or since)
+        self.end = _as_date(end or until)
+        self.since = _as_ts(since)
+        self.until = _as_ts(until)
+        self.filters = []  # (column, value-or-predicate)
+
+    def where(self, column, value):
+        """Keep rows where column == value (or predicate(value) is true)"""
+        query = EventQuery.__new__(EventQuery)
+        query.__dict__.update(self.__dict__)
+        query.filters = self.filters + [(column, value)]
+        return query
+
+    def time_range(self, since=None, until=None):
+        """Narrow to since <= ts < until"""
+        query = EventQuery.__new__(EventQuery)
+        query.__dict__.update(self.__dict__)
+        query.since = _as_ts(since) if since is not None else self.since
+        query.until = _as_ts(until) if until is not None else self.until
+        return query
+
+    # =====================================================
+    # EXECUTION
+    # =====================================================
+
+    def _days(self):
+        day = self.start
+        while day <= self.end:
+            yield day.isoformat()
+            day += timedelta(days=1)
+
+    def _matching(self, block):
+        """Row indexes in a block that pass the time range and filters"""
+        columns = block['columns']
+        dictionaries = block['dictionaries']
+        indexes = range(block['rows'])
+
+        if self.since is not None or self.until is not None:
+            ts = columns['ts']
+            since = self.since if self.since is not None else float('-inf')
+            until = self.until if self.until is not None else float('inf')
+            indexes = [i for i in indexes if since <= ts[i] < until]
+
+        for column, value in self.filters:
+            values = columns[column]
+            if column in dictionaries:
+                # Resolve the filter against the dictionary once, then compare ints
+                dictionary = dictionaries[column]
+                if callable(value):
+                    codes = {code for code, v in enumerate(dictionary) if value(v)}
+                else:
+                    codes = {code for code, v in enumerate(dictionary) if v == value}
+                indexes = [i for i in indexes if values[i] in codes]
+            elif callable(value):
+                indexes = [i for i in indexes if value(values[i])]
+            else:
+                indexes = [i for i in indexes if values[i] == value]
+
+        return indexes
+
+    def _blocks(self):
+        for day in self._days():
+            block = load_day(self.source, day, self.path)
+            if block and block['rows']:
+                yield block, self._matching(block)
+
+    def count(self):
+        """Number of matching rows"""
+        return sum(len(indexes) for _, indexes in self._blocks())
+
+    def group_by_count(self, column):
+        """Counter of column value -> matching rows ('day' groups by day)"""
+        counts = Counter()
+        for block, indexes in self._blocks():
+            if column == 'day':
+                counts[block['day']] += len(indexes)
+                continue
+
+            values = block['columns'][column]
+            dictionary = block['dictionaries'].get(column)
+            if dictionary is not None:
+                # Count codes first, decode once per distinct value
+                for code, n in Counter(values[i] for i in indexes).items():
+                    counts[dictionary[code]] += n
+            else:
+                counts.update(values[i] for i in indexes)
+        return counts
+
+    def distinct(self, column):
+        """Set of distinct values of column among matching rows"""
+        return set(self.group_by_count(column))
+
+    def column(self, name):
+        """Decoded values of one column for the matching rows, in time order"""
+        values = []
+        for block, indexes in self._blocks():
+            column = block['columns'][name]
+            dictionary = block['dictionaries'].get(name)
+            if dictionary is not None:
+                values.extend(dictionary[column[i]] for i in indexes)
+            else:
+                values.extend(column[i] for i in indexes)
+        return values
+
+    def rows(self):
+        """Decoded matching rows as dicts (includes 'ts')"""
+        rows = []
+        for block, indexes in self._blocks():
+            columns = block['columns']
+            dictionaries = block['dictionaries']
+            for i in indexes:
+                row = {}
+                for name, values in columns.items():
+                    row[name] = dictionaries[name][values[i]] if name in dictionaries else values[i]
+                rows.append(row)
+        return rows
@@ -9,6 +9,9 @@ from datetime import datetime, timedelta
 from pathlib import Path
 from collections import defaultdict
 
+# Columnar day files (EVENT_LOG_COMPACTOR.py); closed days skip the full log parse
+from EVENT_LOG_QUERY import EventQuery
+
 # Configuration
 ACTIVITY_LOG = r"C:\Users\dwrek\100X_DEPLOYMENT\ACTIVITY_DATA\activity_log.json"
 DAILY_REPORTS_DIR = r"C:\Users\dwrek\100X_DEPLOYMENT\DAILY_REPORTS"
@@ -28,47 +31,9 @@ def load_beta_users():
         return {}
 
 
-def load_activity_log():
-    """Load activity log"""
-    try:
-        with open(ACTIVITY_LOG, 'r') as f:
-            return json.load(f)
-    except:
-        return []
-
-
-def get_todays_activity(activity_log):
-    """Get all activity from today"""
-    today = datetime.now().date()
-    todays_entries = []
-
-    for entry in activity_log:
-        try:
-            entry_date = datetime.fromisoformat(entry['timestamp']).date()
-            if entry_date == today:
-                todays_entries.append(entry)
-        except:
-            continue
-
-    return todays_entries
-
-
-def get_date_activity(activity_log, target_date):
-    """Get activity from specific date"""
-    if isinstance(target_date, str):
-        target_date = datetime.fromisoformat(target_date).date()
-
-    date_entries = []
-
-    for entry in activity_log:
-        try:
-            entry_date = datetime.fromisoformat(entry['timestamp']).date()
-            if entry_date == target_date:
-                date_entries.append(entry)
-        except:
-            continue
-
-    return date_entries
+def load_date_activity(target_date):
+    """Activity entries for one day via the compacted day file (raw log for today)"""
+    return EventQuery('activity', target_date, target_date, path=ACTIVITY_LOG).column('entry')
 
 
 def categorize_files_by_creator(entries):
@@ -398,13 +363,12 @@ def generate_todays_report():
     """Generate report for today"""
     print("📊 GENERATING DAILY REPORT FOR TODAY...")
 
-    activity_log = load_activity_log()
-    if not activity_log:
+    if not os.path.exists(ACTIVITY_LOG):
         print("❌ No activity log found. Run TRACK_ALL_ACTIVITY.py first.")
         return None
 
     today = datetime.now().date()
-    todays_entries = get_todays_activity(activity_log)
+    todays_entries = load_date_activity(today)
 
     if not todays_entries:
         print(f"📭 No activity recorded for {today}")
@@ -459,12 +423,11 @@ def generate_date_report(date_string):
 
     print(f"📊 GENERATING REPORT FOR {target_date}...")
 
-    activity_log = load_activity_log()
-    if not activity_log:
+    if not os.path.exists(ACTIVITY_LOG):
         print("❌ No activity log found.")
         return None
 
-    date_entries = get_date_activity(activity_log, target_date)
+    date_entries = load_date_activity(target_date)
 
     if not date_entries:
         print(f"📭 No activity recorded for {target_date}")
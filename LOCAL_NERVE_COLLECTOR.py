@@ -10,8 +10,23 @@ from flask_cors import CORS
 from datetime import datetime
 import json
 from pathlib import Path
+import os
 from collections import defaultdict
 import sys
+import threading
+import queue
+import atexit
+import time
+import heapq
+from collections import deque
+
+# Shared batch parsing (BACKEND/batch_ingest.py)
+sys.path.append(str(Path(__file__).parent / 'BACKEND'))
+from batch_ingest import read_batch, batch_response
+from approx_counting import HyperLogLog, HeavyHitters
+
+# Fixed-memory page counting (count-min + top-k, HLL for distinct pages)
+APPROX_COUNTING = os.getenv('APPROX_COUNTING', '').lower() in ('1', 'true', 'yes')
 
 # Import Instagram automation
 try:
@@ -30,10 +45,97 @@ CORS(app)
 VISITOR_DATA_DIR = Path(__file__).parent / 'visitor_data'
 VISITOR_DATA_DIR.mkdir(exist_ok=True)
 
+VISITOR_TTL = 30  # Seconds without a heartbeat before a visitor is stale
+
+class SecondRing:
+    """
+    Fixed ring of per-second counters
+    record() and count() are O(1) in traffic (count is O(window) at most)
+    """
+
+    def __init__(self, size=60):
+        self.size = size
+        self.seconds = [0] * size  # which epoch second each slot currently holds
+        self.counts = [0] * size
+
+    def record(self, now=None, n=1):
+        second = int(now if now is not None else time.time())
+        slot = second % self.size
+        if self.seconds[slot] != second:
+            # Slot still holds an old second: recycle it
+            self.seconds[slot] = second
+            self.counts[slot] = 0
+        self.counts[slot] += n
+
+    def count(self, window=None, now=None):
+        """Events in the last `window` seconds (including the current one)"""
+        window = min(window or self.size, self.size)
+        second = int(now if now is not None else time.time())
+        oldest = second - window
+        return sum(c for s, c in zip(self.seconds, self.counts) if oldest < s <= second)
+
+class VisitorExpiry:
+    """
+    Min-heap expiry index over active_visitors
+
+    One heap entry per pin. A heartbeat only updates last_seen; when an entry
+    comes due and the pin has been seen since, it is pushed back with its new
+    deadline instead of being evicted. Eviction is amortized over writes and
+    the sweeper thread, so readers never pay for it.
+    """
+
+    def __init__(self, ttl=VISITOR_TTL):
+        self.ttl = ttl
+        self.heap = []       # (expires_at, pin)
+        self.last_seen = {}  # pin -> monotonic seconds
+
+    def touch(self, pin, now=None):
+        now = now if now is not None else time.monotonic()
+        if pin not in self.last_seen:
+            heapq.heappush(self.heap, (now + self.ttl, pin))
+        self.last_seen[pin] = now
+
+    def expire(self, now=None, limit=None):
+        """Pop pins whose deadline has passed; returns the evicted pins"""
+        now = now if now is not None else time.monotonic()
+        evicted = []
+        while self.heap and self.heap[0][0] <= now:
+            if limit is not None and len(evicted) >= limit:
+                break
+            _, pin = heapq.heappop(self.heap)
+            seen = self.last_seen.get(pin)
+            if seen is None:
+                continue
+            if seen + self.ttl > now:
+                heapq.heappush(self.heap, (seen + self.ttl, pin))
+            else:
+                del self.last_seen[pin]
+                evicted.append(pin)
+        return evicted
+
 # Live nerve state (in memory)
 active_visitors = {}  # pin -> visitor_data
-page_nerves = defaultdict(int)  # page -> visitor_count
-heartbeat_log = []  # Last 1000 heartbeats
+page_nerves = defaultdict(int)  # page -> visitor_count (exact mode)
+page_hitters = HeavyHitters(k=20) if APPROX_COUNTING else None  # approximate mode
+page_distinct = HyperLogLog() if APPROX_COUNTING else None
+heartbeat_log = deque(maxlen=1000)  # Last 1000 heartbeats
+heartbeat_rate = SecondRing(60)  # Heartbeats per second, last minute
+visitor_expiry = VisitorExpiry()
+nerve_lock = threading.Lock()
+
+def evict_stale_visitors(limit=None):
+    """Drop visitors with no heartbeat in VISITOR_TTL seconds"""
+    with nerve_lock:
+        for pin in visitor_expiry.expire(limit=limit):
+            active_visitors.pop(pin, None)
+            print(f"⏱️  Removed stale visitor: {pin}")
+
+def _sweep_stale_visitors():
+    while True:
+        time.sleep(1)
+        evict_stale_visitors()
+
+threading.Thread(target=_sweep_stale_visitors, name='visitor-sweeper', daemon=True).start()
 
 @app.route('/health', methods=['GET'])
 def health():
@@ -41,7 +143,7 @@ def health():
     return jsonify({
         'status': 'CONNECTED',
         'active_visitors': len(active_visitors),
-        'pages_active': len(page_nerves),
+        'pages_active': count_pages(),
         'heartbeats_logged': len(heartbeat_log)
     })
 
@@ -50,85 +152,151 @@ def receive_heartbeat():
     """Receive visitor heartbeat (like a nerve firing)"""
     data = request.json
 
+    record = apply_heartbeat(data)
+
+    # Write to local file (persistent)
+    write_heartbeats_to_file([record])
+
+    print(f"💓 HEARTBEAT: {record['pin']} on {record['page']} ({len(active_visitors)} active)")
+
+    return jsonify({'status': 'received', 'active_count': len(active_visitors)})
+
+def validate_visitor_event(event):
+    """Per-event check for /api/visitor/batch"""
+    if event.get('type', 'heartbeat') not in ('heartbeat', 'inactive'):
+        return f"unknown event type: {event.get('type')}"
+    return None
+
+@app.route('/api/visitor/batch', methods=['POST'])
+def receive_visitor_batch():
+    """
+    Receive many visitor events in one request
+    Body: JSON array, {"events": [...]}, or NDJSON
+    Each event has "type": "heartbeat" (default) or "inactive"
+    """
+    try:
+        accepted, results = read_batch(request, validate_visitor_event)
+    except ValueError as e:
+        return jsonify({'status': 'rejected', 'error': str(e)}), 400
+
+    records = []
+    for _, event in accepted:
+        if event.get('type', 'heartbeat') == 'inactive':
+            mark_inactive(event.get('pin', 'anonymous'))
+        else:
+            records.append(apply_heartbeat(event))
+
+    # One buffered append for all heartbeats in the batch
+    write_heartbeats_to_file(records)
+
+    print(f"💓 BATCH: {len(records)} heartbeats ({len(active_visitors)} active)")
+
+    return jsonify(batch_response(results, status='received', active_count=len(active_visitors)))
+
+def apply_heartbeat(data):
+    """Update live nerve state for one heartbeat, return its log record"""
     pin = data.get('pin', 'anonymous')
     page = data.get('page', '/')
     timestamp = data.get('timestamp', datetime.now().isoformat())
 
-    # Store in active visitors (live nerve state)
-    active_visitors[pin] = {
-        'pin': pin,
-        'name': data.get('name', 'Guest'),
-        'page': page,
-        'timestamp': timestamp,
-        'timeOnPage': data.get('timeOnPage', 0),
-        'isActive': data.get('isActive', True),
-        'userAgent': data.get('userAgent', ''),
-        'referrer': data.get('referrer', '')
-    }
+    with nerve_lock:
+        # Store in active visitors (live nerve state)
+        active_visitors[pin] = {
+            'pin': pin,
+            'name': data.get('name', 'Guest'),
+            'page': page,
+            'timestamp': timestamp,
+            'timeOnPage': data.get('timeOnPage', 0),
+            'isActive': data.get('isActive', True),
+            'userAgent': data.get('userAgent', ''),
+            'referrer': data.get('referrer', '')
+        }
+        visitor_expiry.touch(pin)
+
+        # Track page nerve activity
+        record_page(page)
+
+        # Log heartbeat (deque keeps only the last 1000)
+        heartbeat_log.append({
+            'pin': pin,
+            'page': page,
+            'timestamp': timestamp,
+            'active': data.get('isActive', True)
+        })
+        heartbeat_rate.record()
 
-    # Track page nerve activity
-    page_nerves[page] += 1
+    # Amortized eviction: each write retires a few expired visitors
+    evict_stale_visitors(limit=8)
 
-    # Log heartbeat
-    heartbeat_log.append({
+    return {
+        'timestamp': timestamp,
         'pin': pin,
         'page': page,
-        'timestamp': timestamp,
         'active': data.get('isActive', True)
-    })
-
-    # Keep only last 1000 heartbeats
-    if len(heartbeat_log) > 1000:
-        heartbeat_log.pop(0)
-
-    # Write to local file (persistent)
-    write_heartbeat_to_file(data)
-
-    print(f"💓 HEARTBEAT: {pin} on {page} ({len(active_visitors)} active)")
-
-    return jsonify({'status': 'received', 'active_count': len(active_visitors)})
+    }
 
 @app.route('/api/visitor/active', methods=['GET'])
 def get_active_visitors():
     """Get currently active visitors (live nerve state)"""
-    # Remove stale visitors (no heartbeat in last 30 seconds)
-    now = datetime.now()
-    stale_pins = []
-
-    for pin, visitor in active_visitors.items():
-        visitor_time = datetime.fromisoformat(visitor['timestamp'].replace('Z', '+00:00'))
-        age = (now - visitor_time.replace(tzinfo=None)).total_seconds()
+    # Stale visitors are evicted by the expiry index, not here
+    with nerve_lock:
+        visitors = list(active_visitors.values())
 
-        if age > 30:  # 30 seconds = stale
-            stale_pins.append(pin)
-
-    for pin in stale_pins:
-        del active_visitors[pin]
-        print(f"⏱️  Removed stale visitor: {pin}")
-
-    return jsonify(list(active_visitors.values()))
+    return jsonify(visitors)
 
 @app.route('/api/nerves/pages', methods=['GET'])
 def get_page_nerves():
     """Get page nerve activity (which pages are hot)"""
-    sorted_nerves = sorted(page_nerves.items(), key=lambda x: x[1], reverse=True)
-
     return jsonify([
         {'page': page, 'hits': hits}
-        for page, hits in sorted_nerves[:20]  # Top 20 hottest pages
+        for page, hits in top_pages(20)  # Top 20 hottest pages
     ])
 
+@app.route('/api/nerves/sketch', methods=['GET'])
+def get_page_sketch():
+    """Serialized page sketches, for merging across days and machines"""
+    if not APPROX_COUNTING:
+        return jsonify({'error': 'Approximate counting disabled (set APPROX_COUNTING=1)'}), 404
+
+    with nerve_lock:
+        return jsonify({
+            'timestamp': datetime.now().isoformat(),
+            'pages': page_hitters.to_dict(),
+            'distinct_pages': page_distinct.to_dict()
+        })
+
+def record_page(page):
+    """Count one hit for page (caller holds nerve_lock)"""
+    if APPROX_COUNTING:
+        page_hitters.add(page)
+        page_distinct.add(page)
+    else:
+        page_nerves[page] += 1
+
+def top_pages(n):
+    """Hottest pages as (page, hits), highest first"""
+    with nerve_lock:
+        if APPROX_COUNTING:
+            return page_hitters.top(n)
+        return sorted(page_nerves.items(), key=lambda x: x[1], reverse=True)[:n]
+
+def count_pages():
+    """Number of distinct pages seen"""
+    return page_distinct.count() if APPROX_COUNTING else len(page_nerves)
+
 @app.route('/api/nerves/stats', methods=['GET'])
 def get_nerve_stats():
     """Get overall nerve statistics"""
     now = datetime.now()
     today_file = VISITOR_DATA_DIR / f"daily_report_{now.strftime('%Y-%m-%d')}.json"
 
+    hottest = top_pages(1)
     stats = {
         'active_visitors': len(active_visitors),
-        'total_pages': len(page_nerves),
-        'heartbeats_per_minute': len([h for h in heartbeat_log if (now - datetime.fromisoformat(h['timestamp'].replace('Z', '+00:00')).replace(tzinfo=None)).total_seconds() < 60]),
-        'hottest_page': max(page_nerves.items(), key=lambda x: x[1])[0] if page_nerves else None
+        'total_pages': count_pages(),
+        'heartbeats_per_minute': heartbeat_rate.count(60),
+        'hottest_page': hottest[0][0] if hottest else None,
+        'writer': heartbeat_writer.get_stats()
     }
 
     # Load today's persistent data
@@ -139,31 +307,119 @@ def get_nerve_stats():
 
     return jsonify(stats)
 
-def write_heartbeat_to_file(data):
-    """Write heartbeat to local JSONL file (persistent log)"""
-    now = datetime.now()
-    log_file = VISITOR_DATA_DIR / f"heartbeats_{now.strftime('%Y-%m-%d')}.jsonl"
-
-    with open(log_file, 'a') as f:
-        f.write(json.dumps({
-            'timestamp': data.get('timestamp', now.isoformat()),
-            'pin': data.get('pin', 'anonymous'),
-            'page': data.get('page', '/'),
-            'active': data.get('isActive', True)
-        }) + '\n')
+class HeartbeatWriter:
+    """
+    Background group-commit writer for heartbeats_YYYY-MM-DD.jsonl
+
+    Records are queued by the request threads and appended by one writer
+    thread, flushed when FLUSH_SIZE records are waiting or FLUSH_INTERVAL
+    seconds have passed. Each record is tagged with its day at enqueue time,
+    so a flush that spans midnight still lands every record in the right file.
+    """
+
+    MAX_QUEUE = 50000
+    FLUSH_SIZE = 500
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.queue = queue.Queue(maxsize=self.MAX_QUEUE)
+        self.stopping = threading.Event()
+        self.stats = {
+            'records_written': 0,
+            'records_dropped': 0,
+            'flushes': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0
+        }
+        self.thread = threading.Thread(target=self._run, name='heartbeat-writer', daemon=True)
+        self.thread.start()
+
+    def enqueue(self, records):
+        """Queue records for the next flush (never touches the disk)"""
+        day = datetime.now().strftime('%Y-%m-%d')
+        for record in records:
+            try:
+                self.queue.put_nowait((day, record))
+            except queue.Full:
+                # Writer can't keep up; shed load rather than stall requests
+                self.stats['records_dropped'] += 1
+
+    def _run(self):
+        pending = []
+        deadline = time.monotonic() + self.FLUSH_INTERVAL
+
+        while not (self.stopping.is_set() and self.queue.empty()):
+            try:
+                pending.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                pass
+
+            if len(pending) >= self.FLUSH_SIZE or time.monotonic() >= deadline:
+                self._flush(pending)
+                pending = []
+                deadline = time.monotonic() + self.FLUSH_INTERVAL
+
+        self._flush(pending)
+
+    def _flush(self, pending):
+        if not pending:
+            return
+
+        started = time.perf_counter()
+
+        by_day = defaultdict(list)
+        for day, record in pending:
+            by_day[day].append(json.dumps(record) + '\n')
+
+        for day, lines in by_day.items():
+            with open(self.data_dir / f"heartbeats_{day}.jsonl", 'a') as f:
+                f.write(''.join(lines))
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.stats['records_written'] += len(pending)
+        self.stats['flushes'] += 1
+        self.stats['last_flush_ms'] = round(elapsed_ms, 3)
+        self.stats['max_flush_ms'] = round(max(self.stats['max_flush_ms'], elapsed_ms), 3)
+        self.stats['total_flush_ms'] += elapsed_ms
+
+    def close(self):
+        """Drain the queue and flush (called at shutdown)"""
+        self.stopping.set()
+        self.thread.join(timeout=10)
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['queue_depth'] = self.queue.qsize()
+        stats['avg_flush_ms'] = round(stats.pop('total_flush_ms') / stats['flushes'], 3) if stats['flushes'] else 0.0
+        return stats
+
+heartbeat_writer = HeartbeatWriter(VISITOR_DATA_DIR)
+atexit.register(heartbeat_writer.close)
+
+def write_heartbeats_to_file(records):
+    """Queue heartbeat records for the local JSONL file (persistent log)"""
+    if records:
+        heartbeat_writer.enqueue(records)
 
 @app.route('/api/visitor/inactive', methods=['POST'])
 def visitor_inactive():
     """Mark visitor as inactive (tab hidden)"""
     data = request.json
-    pin = data.get('pin', 'anonymous')
-
-    if pin in active_visitors:
-        active_visitors[pin]['isActive'] = False
-        print(f"😴 INACTIVE: {pin}")
+    mark_inactive(data.get('pin', 'anonymous'))
 
     return jsonify({'status': 'marked_inactive'})
 
+def mark_inactive(pin):
+    """Flag a visitor's tab as hidden"""
+    with nerve_lock:
+        visitor = active_visitors.get(pin)
+        if visitor is not None:
+            visitor['isActive'] = False
+    if visitor is not None:
+        print(f"😴 INACTIVE: {pin}")
+
 # ==========================================
 # INSTAGRAM INTEGRATION ENDPOINTS
 # ==========================================
@@ -256,7 +512,77 @@ def poll_intercom_messages(pin):
 
     return jsonify(messages)
 
+def bench_visitors(pins=50000, threads=8, rounds=3, batch=500):
+    """
+    50k concurrent PINs through /api/visitor/batch, with a reader polling
+    /api/nerves/stats, then eviction left to the sweeper alone
+    """
+    import contextlib
+    import io
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+    global heartbeat_writer, visitor_expiry
+
+    heartbeat_writer = HeartbeatWriter(Path(tempfile.mkdtemp()))
+    visitor_expiry = VisitorExpiry(ttl=2)
+    active_visitors.clear()
+
+    def sender(worker):
+        client = app.test_client()
+        mine = [f"PIN-{i}" for i in range(worker, pins, threads)]
+        for _ in range(rounds):
+            for start in range(0, len(mine), batch):
+                events = [{'pin': pin, 'page': f"/page-{i % 50}"} for i, pin in enumerate(mine[start:start + batch])]
+                events += [{'type': 'inactive', 'pin': pin} for pin in mine[start:start + batch:5]]
+                response = client.post('/api/visitor/batch', json=events)
+                assert response.status_code == 200, response.status_code
+
+    stats_ms = []
+    done = threading.Event()
+
+    def reader():
+        client = app.test_client()
+        while not done.is_set():
+            started = time.perf_counter()
+            assert client.get('/api/nerves/stats').status_code == 200
+            stats_ms.append((time.perf_counter() - started) * 1000)
+
+    print(f"🧪 {pins:,} PINs x {rounds} rounds, {threads} sender threads")
+    with contextlib.redirect_stdout(io.StringIO()):
+        polling = threading.Thread(target=reader)
+        polling.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(sender, range(threads)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        polling.join()
+
+        active = len(active_visitors)
+        hidden = sum(1 for v in active_visitors.values() if not v['isActive'])
+
+        # No reads from here on: the sweeper alone must empty the index
+        deadline = time.monotonic() + visitor_expiry.ttl + 5
+        while (active_visitors or visitor_expiry.last_seen) and time.monotonic() < deadline:
+            time.sleep(0.25)
+    heartbeat_writer.close()
+
+    stats_ms.sort()
+    print(f"   {pins * rounds / elapsed:,.0f} heartbeats/s, "
+          f"/api/nerves/stats p50 {stats_ms[len(stats_ms) // 2]:.2f} ms, p99 {stats_ms[int(len(stats_ms) * 0.99)]:.2f} ms")
+    print(f"   {active:,} active ({hidden:,} hidden), {len(active_visitors)} left after the TTL")
+    written, dropped = heartbeat_writer.stats['records_written'], heartbeat_writer.stats['records_dropped']
+    print(f"   {written:,} heartbeats logged, {dropped:,} shed by the writer queue")
+    assert active == pins and hidden == len(range(0, pins, 5))
+    assert not active_visitors and not visitor_expiry.last_seen
+    assert written + dropped == pins * rounds
+    print("✅ Every PIN tracked and expired without a read")
+
 if __name__ == '__main__':
+    if '--bench' in sys.argv:
+        bench_visitors()
+        sys.exit(0)
+
     print("="*60)
     print("🧠 LOCAL NERVE COLLECTOR STARTING")
     print("="*60)
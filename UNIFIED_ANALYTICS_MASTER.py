@@ -16,11 +16,18 @@ Features:
 from flask import Flask, request, jsonify, render_template_string
 from flask_cors import CORS
 from datetime import datetime, timedelta
-from collections import defaultdict
+from collections import defaultdict, deque, OrderedDict
 import json
 import os
 from pathlib import Path
 import hashlib
+import sys
+import threading
+
+# Shared batch parsing (BACKEND/batch_ingest.py) and pooled SQLite (BACKEND/sqlite_pool.py)
+sys.path.append(str(Path(__file__).parent / 'BACKEND'))
+from batch_ingest import read_batch, batch_response
+from sqlite_pool import SQLitePool, init_app
 
 app = Flask(__name__)
 CORS(app)
@@ -32,14 +39,49 @@ DATA_DIR.mkdir(exist_ok=True)
 # In-memory session tracking (for real-time)
 ACTIVE_SESSIONS = {}  # session_id -> session data
 USER_PROFILES = {}     # user_id -> profile data
-LIVE_ACTIVITY = []     # Recent activity (last 100 events)
+LIVE_ACTIVITY = deque(maxlen=100)  # Recent activity (last 100 events)
+
+ONLINE_WINDOW = timedelta(minutes=5)        # "Online now" cutoff
+SESSION_IDLE_TIMEOUT = timedelta(minutes=30)  # Idle sessions leave memory after this
+JOURNEY_CAP = 100  # Page views kept in memory per session (older ones live in all_events.jsonl)
+
+# Session -> byte offsets of its events in all_events.jsonl; indexed_to = log bytes covered
+OFFSET_INDEX_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS event_offsets (
+        session_id TEXT NOT NULL,
+        offset INTEGER NOT NULL,
+        PRIMARY KEY (session_id, offset)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS index_meta (
+        key TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    );
+"""
+INSERT_OFFSET_SQL = "INSERT OR IGNORE INTO event_offsets (session_id, offset) VALUES (?, ?)"
+SET_INDEXED_TO_SQL = "INSERT OR REPLACE INTO index_meta (key, value) VALUES ('indexed_to', ?)"
+GET_INDEXED_TO_SQL = "SELECT value FROM index_meta WHERE key = 'indexed_to'"
+SESSION_OFFSETS_SQL = "SELECT offset FROM event_offsets WHERE session_id = ? ORDER BY offset"
+SESSION_TAIL_SQL = """
+    SELECT offset FROM event_offsets WHERE session_id = ? ORDER BY offset DESC LIMIT ?
+"""
+SESSION_SUMMARY_SQL = "SELECT COUNT(*), MIN(offset) FROM event_offsets WHERE session_id = ?"
 
 class UnifiedAnalytics:
     def __init__(self):
         self.sessions_file = DATA_DIR / "all_sessions.jsonl"
         self.events_file = DATA_DIR / "all_events.jsonl"
+        self.index_file = DATA_DIR / "all_events.idx.db"
         self.users_file = DATA_DIR / "all_users.json"
 
+        self.lock = threading.RLock()
+        self.last_seen_index = OrderedDict()  # session_id -> last_seen epoch, least recent first
+
+        # Offset index on disk: memory stays bounded by the live sessions
+        self.offset_index = SQLitePool(self.index_file)
+        with self.offset_index.borrow() as conn:
+            conn.executescript(OFFSET_INDEX_SCHEMA)
+        self._catch_up_offset_index()
+
     def get_session_id(self, request):
         """Generate or retrieve session ID"""
         # Use IP + User-Agent hash as session ID
@@ -50,15 +92,137 @@ class UnifiedAnalytics:
 
     def track_page_view(self, session_id, page, data=None):
         """Track page view with full context"""
+        with self.lock:
+            session, record = self._record_page_view(session_id, page, data)
+
+            # Log to permanent storage
+            self._append_events([record])
+
+        return session
+
+    def track_page_views(self, session_id, events):
+        """Track a batch of page views with one append to permanent storage"""
+        session = None
+        records = []
+
+        with self.lock:
+            for data in events:
+                session, record = self._record_page_view(session_id, data.get('page', 'unknown'), data)
+                records.append(record)
+
+            self._append_events(records)
+
+        return session
+
+    # ==================== EVENT LOG + OFFSET INDEX ====================
+
+    def _catch_up_offset_index(self):
+        """Index log lines past indexed_to (whole log on first run, torn tail after a crash)"""
+        if not self.events_file.exists():
+            return
+
+        with self.offset_index.borrow() as conn:
+            row = conn.execute(GET_INDEXED_TO_SQL).fetchone()
+            offset = row[0] if row else 0
+            entries = []
+            with open(self.events_file, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break  # partial last line
+                    try:
+                        session_id = json.loads(line).get('session_id')
+                    except ValueError:
+                        session_id = None
+                    if session_id:
+                        entries.append((session_id, offset))
+                    offset += len(line)
+
+            with self.offset_index.transaction() as conn:
+                conn.executemany(INSERT_OFFSET_SQL, entries)
+                conn.execute(SET_INDEXED_TO_SQL, (offset,))
+
+    def _append_events(self, records):
+        """Append event records to all_events.jsonl in one write, indexing their offsets"""
+        if not records:
+            return
+
+        with self.lock:
+            with open(self.events_file, 'ab') as f:
+                offset = f.seek(0, os.SEEK_END)
+                lines = []
+                entries = []
+                for record in records:
+                    line = (json.dumps(record) + '\n').encode('utf-8')
+                    lines.append(line)
+                    entries.append((record['session_id'], offset))
+                    offset += len(line)
+                f.write(b''.join(lines))
+
+            with self.offset_index.borrow():
+                with self.offset_index.transaction() as conn:
+                    conn.executemany(INSERT_OFFSET_SQL, entries)
+                    conn.execute(SET_INDEXED_TO_SQL, (offset,))
+
+    def _read_offsets(self, offsets):
+        events = []
+        with open(self.events_file, 'rb') as f:
+            for offset in offsets:
+                f.seek(offset)
+                events.append(json.loads(f.readline()))
+        return events
+
+    def _read_logged_events(self, session_id):
+        """Read one session's events from all_events.jsonl by offset (no rescan)"""
+        with self.offset_index.borrow() as conn:
+            offsets = [row[0] for row in conn.execute(SESSION_OFFSETS_SQL, (session_id,))]
+        return self._read_offsets(offsets) if offsets else []
+
+    def _restore_session(self, session_id):
+        """Rebuild an evicted session from the log: first visit, true count, last JOURNEY_CAP views"""
+        with self.offset_index.borrow() as conn:
+            count, first_offset = conn.execute(SESSION_SUMMARY_SQL, (session_id,)).fetchone()
+            if not count:
+                return None
+            tail = [row[0] for row in conn.execute(SESSION_TAIL_SQL, (session_id, JOURNEY_CAP))]
+
+        first = self._read_offsets([first_offset])[0]
+        events = self._read_offsets(reversed(tail))
+        first_data = first.get('data') or {}
+        return {
+            'session_id': session_id,
+            'started': first['timestamp'],
+            'last_seen': events[-1]['timestamp'],
+            'pages_viewed': [
+                {'page': e['page'], 'timestamp': e['timestamp'], 'data': e.get('data') or {}}
+                for e in events
+            ],
+            'page_count': count,
+            'total_time': 0,
+            'user_name': first_data.get('user_name', 'Anonymous'),
+            'ip': first_data.get('ip', 'Unknown'),
+            'user_agent': first_data.get('user_agent', 'Unknown')
+        }
+
+    # ==================== SESSION STATE ====================
+
+    def _record_page_view(self, session_id, page, data=None):
+        """Update in-memory session state, return (session, log record)"""
         timestamp = datetime.now()
+        data = data or {}
 
-        # Update active session
+        # Update active session (a returning evicted session picks up its logged history)
+        if session_id not in ACTIVE_SESSIONS:
+            restored = self._restore_session(session_id)
+            if restored:
+                ACTIVE_SESSIONS[session_id] = restored
         if session_id not in ACTIVE_SESSIONS:
             ACTIVE_SESSIONS[session_id] = {
                 'session_id': session_id,
                 'started': timestamp.isoformat(),
                 'last_seen': timestamp.isoformat(),
                 'pages_viewed': [],
+                'page_count': 0,
                 'total_time': 0,
                 'user_name': data.get('user_name', 'Anonymous'),
                 'ip': data.get('ip', 'Unknown'),
@@ -67,13 +231,23 @@ class UnifiedAnalytics:
 
         session = ACTIVE_SESSIONS[session_id]
         session['last_seen'] = timestamp.isoformat()
+        session['page_count'] += 1
         session['pages_viewed'].append({
             'page': page,
             'timestamp': timestamp.isoformat(),
-            'data': data or {}
+            'data': data
         })
 
-        # Add to live activity feed
+        # Cap the in-memory journey; the full one stays reachable by offset
+        if len(session['pages_viewed']) > JOURNEY_CAP:
+            del session['pages_viewed'][:JOURNEY_CAP // 2]
+
+        # Move to the most-recent end of the last-seen index
+        self.last_seen_index[session_id] = timestamp.timestamp()
+        self.last_seen_index.move_to_end(session_id)
+        self._evict_idle_sessions(timestamp)
+
+        # Add to live activity feed (deque keeps the last 100)
         LIVE_ACTIVITY.append({
             'timestamp': timestamp.isoformat(),
             'session_id': session_id,
@@ -83,61 +257,87 @@ class UnifiedAnalytics:
             'data': data
         })
 
-        # Keep only last 100 events
-        if len(LIVE_ACTIVITY) > 100:
-            LIVE_ACTIVITY.pop(0)
-
-        # Log to permanent storage
-        with open(self.events_file, 'a') as f:
-            f.write(json.dumps({
-                'timestamp': timestamp.isoformat(),
-                'session_id': session_id,
-                'event_type': 'page_view',
-                'page': page,
-                'data': data
-            }) + '\n')
+        return session, {
+            'timestamp': timestamp.isoformat(),
+            'session_id': session_id,
+            'event_type': 'page_view',
+            'page': page,
+            'data': data
+        }
 
-        return session
+    def _evict_idle_sessions(self, now):
+        """Drop sessions idle past SESSION_IDLE_TIMEOUT (oldest first, amortized)"""
+        cutoff = (now - SESSION_IDLE_TIMEOUT).timestamp()
+        while self.last_seen_index:
+            session_id, last_seen = next(iter(self.last_seen_index.items()))
+            if last_seen >= cutoff:
+                break
+            self.last_seen_index.popitem(last=False)
+            ACTIVE_SESSIONS.pop(session_id, None)
 
     def get_online_now(self):
         """Get all users online in last 5 minutes"""
-        cutoff = datetime.now() - timedelta(minutes=5)
+        now = datetime.now()
+        cutoff = (now - ONLINE_WINDOW).timestamp()
 
         online = []
-        for session_id, session in ACTIVE_SESSIONS.items():
-            last_seen = datetime.fromisoformat(session['last_seen'])
-            if last_seen > cutoff:
-                # Calculate time on site
-                started = datetime.fromisoformat(session['started'])
-                time_on_site = (datetime.now() - started).total_seconds()
+        with self.lock:
+            # Walk the last-seen index from most recent; stop at the first stale session
+            for session_id in reversed(self.last_seen_index):
+                if self.last_seen_index[session_id] <= cutoff:
+                    break
 
+                session = ACTIVE_SESSIONS[session_id]
                 online.append({
                     'session_id': session_id,
                     'user_name': session['user_name'],
                     'current_page': session['pages_viewed'][-1]['page'] if session['pages_viewed'] else 'Unknown',
-                    'time_on_site': int(time_on_site),
-                    'pages_viewed': len(session['pages_viewed']),
+                    'pages_viewed': session['page_count'],
                     'last_seen': session['last_seen'],
                     'started': session['started']
                 })
 
-        return sorted(online, key=lambda x: x['last_seen'], reverse=True)
+        # Calculate time on site
+        for user in online:
+            started = datetime.fromisoformat(user['started'])
+            user['time_on_site'] = int((now - started).total_seconds())
+
+        return online
 
     def get_session_journey(self, session_id):
         """Get complete user journey for a session"""
-        if session_id not in ACTIVE_SESSIONS:
-            return None
-
-        session = ACTIVE_SESSIONS[session_id]
+        with self.lock:
+            session = ACTIVE_SESSIONS.get(session_id)
+            if session and session['page_count'] == len(session['pages_viewed']):
+                page_views = list(session['pages_viewed'])
+                info = {
+                    'user_name': session['user_name'],
+                    'started': session['started'],
+                    'last_seen': session['last_seen']
+                }
+            else:
+                # Evicted or truncated in memory: serve from the offset index
+                events = self._read_logged_events(session_id)
+                if not events:
+                    return None
+                page_views = [
+                    {'page': e['page'], 'timestamp': e['timestamp'], 'data': e.get('data') or {}}
+                    for e in events
+                ]
+                info = {
+                    'user_name': session['user_name'] if session else (page_views[0]['data'].get('user_name') or 'Anonymous'),
+                    'started': page_views[0]['timestamp'],
+                    'last_seen': page_views[-1]['timestamp']
+                }
 
         # Calculate time on each page
         pages_with_duration = []
-        for i, page_view in enumerate(session['pages_viewed']):
+        for i, page_view in enumerate(page_views):
             start_time = datetime.fromisoformat(page_view['timestamp'])
 
             # If there's a next page, calculate duration
-            if i + 1 < len(session['pages_viewed']):
-                end_time = datetime.fromisoformat(session['pages_viewed'][i + 1]['timestamp'])
+            if i + 1 < len(page_views):
+                end_time = datetime.fromisoformat(page_views[i + 1]['timestamp'])
                 duration = (end_time - start_time).total_seconds()
             else:
                 # Current page - calculate from now
@@ -152,13 +352,14 @@ class UnifiedAnalytics:
 
         return {
             'session_id': session_id,
-            'user_name': session['user_name'],
-            'started': session['started'],
-            'last_seen': session['last_seen'],
+            'user_name': info['user_name'],
+            'started': info['started'],
+            'last_seen': info['last_seen'],
             'journey': pages_with_duration
         }
 
 analytics = UnifiedAnalytics()
+init_app(app, analytics.offset_index)
 
 # ==================== API ENDPOINTS ====================
 
@@ -181,6 +382,31 @@ def track_event():
         'session': session
     })
 
+@app.route('/batch', methods=['POST'])
+def track_batch():
+    """
+    Track many events from one page in a single request
+    Body: JSON array, {"events": [...]}, or NDJSON
+    """
+    try:
+        accepted, results = read_batch(request)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    session_id = analytics.get_session_id(request)
+    ip = request.headers.get('X-Forwarded-For', request.remote_addr)
+    user_agent = request.headers.get('User-Agent', '')
+
+    events = []
+    for _, data in accepted:
+        data['ip'] = ip
+        data['user_agent'] = user_agent
+        events.append(data)
+
+    session = analytics.track_page_views(session_id, events)
+
+    return jsonify(batch_response(results, session_id=session_id, session=session))
+
 @app.route('/online', methods=['GET'])
 def get_online():
     """Get all users currently online"""
@@ -203,7 +429,7 @@ def get_session(session_id):
 def get_live_feed():
     """Get live activity feed (last 100 events)"""
     return jsonify({
-        'events': LIVE_ACTIVITY,
+        'events': list(LIVE_ACTIVITY),
         'count': len(LIVE_ACTIVITY)
     })
 
@@ -15,8 +15,12 @@
     'use strict';
 
     // Configuration
-    const ANALYTICS_URL = 'http://localhost:9000/track';  // Unified Analytics Master
+    const ANALYTICS_URL = 'http://localhost:9000/batch';  // Unified Analytics Master (batched)
     const UPDATE_INTERVAL = 5000;  // Send updates every 5 seconds
+    const MAX_QUEUE = 50;          // Flush early if this many events are waiting
+
+    // Events waiting to be sent in the next batch
+    let queue = [];
 
     // Session data
     let sessionData = {
@@ -41,18 +45,31 @@
         sendToAnalytics(data);
     }
 
-    // Send data to unified analytics
+    // Queue data for unified analytics (sent in batches)
     function sendToAnalytics(data) {
+        queue.push(data);
+        if (queue.length >= MAX_QUEUE) {
+            flushQueue();
+        }
+    }
+
+    // Send every queued event in one request
+    function flushQueue() {
+        if (queue.length === 0) return;
+
+        const body = JSON.stringify(queue);
+        queue = [];
+
         if (navigator.sendBeacon) {
             // Use sendBeacon for reliability (works even on page unload)
-            const blob = new Blob([JSON.stringify(data)], { type: 'application/json' });
+            const blob = new Blob([body], { type: 'application/json' });
             navigator.sendBeacon(ANALYTICS_URL, blob);
         } else {
             // Fallback to fetch
             fetch(ANALYTICS_URL, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(data),
+                body: body,
                 keepalive: true
             }).catch(err => console.log('Analytics error:', err));
         }
@@ -111,13 +128,17 @@
     function init() {
         // Track initial page view
         trackPageView();
+        flushQueue();
 
         // Track interactions
         document.addEventListener('click', trackClick, true);
         window.addEventListener('scroll', trackScroll, { passive: true });
 
-        // Send heartbeat every 5 seconds
-        setInterval(sendHeartbeat, UPDATE_INTERVAL);
+        // Send heartbeat (plus anything queued) every 5 seconds
+        setInterval(() => {
+            sendHeartbeat();
+            flushQueue();
+        }, UPDATE_INTERVAL);
 
         // Track when user leaves
         window.addEventListener('beforeunload', () => {
@@ -126,6 +147,7 @@
                 page_exit: true,
                 total_time: Math.round((new Date() - new Date(sessionData.started)) / 1000)
             });
+            flushQueue();
         });
 
         console.log('📊 Unified Analytics Tracking Active');
@@ -142,6 +164,7 @@
     window.UnifiedAnalytics = {
         setUserName: window.setAnalyticsUserName,
         track: sendToAnalytics,
+        flush: flushQueue,
         sessionData: sessionData
     };
 
@@ -17,6 +17,9 @@ from datetime import datetime, timedelta
 from collections import defaultdict, Counter
 from pathlib import Path
 
+# Columnar day files (EVENT_LOG_COMPACTOR.py) instead of re-parsing conversations.jsonl
+from EVENT_LOG_QUERY import EventQuery
+
 class VisitorIntelligence:
     def __init__(self, data_dir="C:/Users/dwrek/100X_DEPLOYMENT/visitor_data"):
         self.data_dir = Path(data_dir)
@@ -131,23 +134,15 @@ class VisitorIntelligence:
                 self.patterns[category] += 1
                 self.common_questions[category] += 1
 
-    def generate_daily_report(self):
+    def generate_daily_report(self, day=None):
         """Generate intelligence report on visitor behavior"""
         self.banner("GENERATING DAILY VISITOR INTELLIGENCE REPORT")
 
         print("\n📊 Analyzing visitor data...\n")
 
-        # Load all conversations from today
-        today = datetime.now().date()
-        conversations_today = []
-
-        if self.conversations_file.exists():
-            with open(self.conversations_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    conv = json.loads(line)
-                    conv_date = datetime.fromisoformat(conv['timestamp']).date()
-                    if conv_date == today:
-                        conversations_today.append(conv)
+        # Load all conversations from the day (compacted, or the raw tail for today)
+        today = day or datetime.now().date()
+        conversations_today = EventQuery('conversations', today, today, path=self.conversations_file).rows()
 
         # Generate report
         report = {
@@ -180,6 +175,32 @@ class VisitorIntelligence:
 
         return report
 
+    def generate_period_report(self, days=7):
+        """Multi-day report straight from the compacted conversation columns"""
+        end = datetime.now().date()
+        start = end - timedelta(days=days - 1)
+        query = EventQuery('conversations', start, end, path=self.conversations_file)
+
+        conversations = query.rows()
+        report = {
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'timestamp': datetime.now().isoformat(),
+            'summary': {
+                'total_conversations': len(conversations),
+                'unique_visitors': len(query.distinct('session')),
+            },
+            'conversations_per_day': dict(sorted(query.group_by_count('day').items())),
+            'top_pages': dict(query.group_by_count('page').most_common(10)),
+            'insights': self._generate_insights(conversations)
+        }
+
+        report_file = self.data_dir / f"period_report_{start}_{end}.json"
+        with open(report_file, 'w') as f:
+            json.dump(report, f, indent=2)
+
+        return report
+
     def _generate_insights(self, conversations):
         """Generate insights from conversation data"""
         insights = []
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+WEBHOOK REPLAY
+Fire recorded Stripe events at a webhook endpoint at high rate
+
+    python WEBHOOK_REPLAY.py events.jsonl --url http://localhost:5000/webhook/stripe \
+        --secret whsec_... --rate 200 --duplicates 0.2
+
+Payloads come from a JSONL file (one event per line) or, with --from-queue,
+from a webhook_queue.db written by WEBHOOK_SERVER.py. Each request is
+signed the way Stripe signs (t=<ts>,v1=HMAC-SHA256(secret, "<ts>.<body>")),
+so the endpoint's normal signature check runs.
+
+--duplicates re-sends that fraction of events (Stripe redelivery), which
+should come back as "duplicate" without being processed twice.
+
+Reports status counts and response latency percentiles; since the server
+only verifies and queues, latency should stay flat as the rate goes up.
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import random
+import sqlite3
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def load_jsonl(path):
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def load_queue(path):
+    with sqlite3.connect(path) as conn:
+        return [row[0] for row in conn.execute('SELECT payload FROM webhook_events ORDER BY seq')]
+
+
+def sign(payload: str, secret: str) -> str:
+    timestamp = int(time.time())
+    signature = hmac.new(secret.encode('utf-8'), f"{timestamp}.{payload}".encode('utf-8'), hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def replay(payloads, url, secret, rate=100.0, duplicates=0.0, workers=32, timeout=10.0):
+    """Send every payload (plus re-sent duplicates) at `rate` per second"""
+    sends = list(payloads)
+    sends += random.sample(payloads, int(len(payloads) * duplicates))
+    random.shuffle(sends)
+
+    statuses = Counter()
+    latencies = []
+    lock = threading.Lock()
+    local = threading.local()
+    interval = 1.0 / rate if rate > 0 else 0
+    started = time.monotonic()
+
+    def _send(i):
+        # Pace against the schedule, not the previous request
+        delay = started + i * interval - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+
+        payload = sends[i]
+        headers = {'Content-Type': 'application/json', 'Stripe-Signature': sign(payload, secret)}
+        sent_at = time.monotonic()
+        try:
+            response = session.post(url, data=payload.encode('utf-8'), headers=headers, timeout=timeout)
+            try:
+                key = f"{response.status_code} {response.json().get('status', '')}".strip()
+            except ValueError:
+                key = str(response.status_code)
+        except requests.RequestException as e:
+            key = f"error {type(e).__name__}"
+        elapsed = time.monotonic() - sent_at
+
+        with lock:
+            statuses[key] += 1
+            latencies.append(elapsed)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(_send, range(len(sends))))
+
+    total_time = time.monotonic() - started
+    latencies.sort()
+    return {
+        'sent': len(sends),
+        'unique': len(payloads),
+        'seconds': round(total_time, 2),
+        'achieved_rate': round(len(sends) / total_time, 1) if total_time else 0,
+        'statuses': dict(statuses),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50) * 1000, 1),
+            'p95': round(percentile(latencies, 95) * 1000, 1),
+            'p99': round(percentile(latencies, 99) * 1000, 1),
+            'max': round(latencies[-1] * 1000, 1) if latencies else 0
+        }
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Replay Stripe webhook payloads')
+    parser.add_argument('source', help='JSONL file of events, or webhook_queue.db with --from-queue')
+    parser.add_argument('--from-queue', action='store_true', help='read payloads from a webhook_queue.db')
+    parser.add_argument('--url', default='http://localhost:5000/webhook/stripe')
+    parser.add_argument('--secret', required=True, help='endpoint signing secret (whsec_...)')
+    parser.add_argument('--rate', type=float, default=100.0, help='requests per second')
+    parser.add_argument('--duplicates', type=float, default=0.0, help='fraction of events to send twice')
+    parser.add_argument('--workers', type=int, default=32)
+    args = parser.parse_args()
+
+    payloads = load_queue(args.source) if args.from_queue else load_jsonl(args.source)
+    print(f"🔁 Replaying {len(payloads)} events to {args.url} at {args.rate:g}/s "
+          f"({args.duplicates:.0%} duplicates)")
+
+    report = replay(payloads, args.url, args.secret, args.rate, args.duplicates, args.workers)
+    print(json.dumps(report, indent=2))
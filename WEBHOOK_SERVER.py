@@ -1,13 +1,24 @@
 """
 STRIPE WEBHOOK SERVER - AUTO-PROCESS PAYMENTS
 Receives payment notifications from Stripe, sends emails, tracks orders, triggers fulfillment
+
+The webhook route only verifies and queues (webhook_queue.db); order
+processing, emails and outbound calls run on queue workers, so Stripe gets
+its 200 immediately and redelivered events are processed once.
 """
 
 from flask import Flask, request, jsonify
 import stripe
 import json
 from datetime import datetime
+from pathlib import Path
 import requests
+import sys
+import threading
+import atexit
+
+sys.path.append(str(Path(__file__).parent / 'BACKEND'))
+from webhook_queue import WebhookQueue, SqliteWebhookStore
 
 app = Flask(__name__)
 
@@ -15,8 +26,13 @@ app = Flask(__name__)
 stripe.api_key = "sk_test_YOUR_SECRET_KEY_HERE"  # Same as setup script
 webhook_secret = "whsec_YOUR_WEBHOOK_SECRET"     # Get from Stripe dashboard after creating webhook
 
+WEBHOOK_QUEUE_DB = Path(__file__).parent / 'webhook_queue.db'
+HANDLED_EVENTS = {'checkout.session.completed'}
+
 # Store orders in memory (upgrade to database later)
 orders = []
+orders_lock = threading.Lock()
+order_steps = {}  # order_id -> steps already done; a retried event skips them
 order_stats = {
     "total_raised": 0,
     "total_orders": 0,
@@ -47,31 +63,46 @@ def stripe_webhook():
         print("❌ Invalid signature")
         return jsonify({"error": "Invalid signature"}), 400
 
-    # Handle successful payment
-    if event['type'] == 'checkout.session.completed':
-        session = event['data']['object']
+    if event['type'] not in HANDLED_EVENTS:
+        return jsonify({"status": "unhandled_event"}), 200
 
-        order_data = process_payment(session)
+    # Durably queue and acknowledge; workers do the rest
+    queued = webhook_queue.enqueue(json.loads(payload), payload.decode('utf-8'))
+
+    return jsonify({"status": "queued" if queued else "duplicate"}), 200
 
-        print(f"\n✅ NEW ORDER RECEIVED!")
-        print(f"   Product: {order_data['product_name']}")
-        print(f"   Amount: ${order_data['amount_paid']:.2f}")
-        print(f"   College Fund: ${order_data['college_fund_amount']:.2f}")
-        print(f"   Customer: {order_data['customer_email']}\n")
 
-        # Store order
-        orders.append(order_data)
-        update_stats(order_data)
+def process_webhook_event(event):
+    """Queue worker: handle one stored event (raising triggers a retry)"""
 
-        # Automation triggers
-        send_confirmation_email(order_data)
-        log_to_consciousness_system(order_data)
-        check_manufacturing_threshold(order_data)
-        check_milestone(order_data)
+    if event['type'] == 'checkout.session.completed':
+        session = event['data']['object']
 
-        return jsonify({"status": "success"}), 200
+        order_data = process_payment(session)
 
-    return jsonify({"status": "unhandled_event"}), 200
+        # Store order once (stats checks see a consistent total). It counts as
+        # recorded before the checks run, so a check that raises is not
+        # followed by a retry that appends the order again
+        with orders_lock:
+            done = order_steps.setdefault(order_data['order_id'], set())
+            if 'recorded' not in done:
+                print(f"\n✅ NEW ORDER RECEIVED!")
+                print(f"   Product: {order_data['product_name']}")
+                print(f"   Amount: ${order_data['amount_paid']:.2f}")
+                print(f"   College Fund: ${order_data['college_fund_amount']:.2f}")
+                print(f"   Customer: {order_data['customer_email']}\n")
+
+                orders.append(order_data)
+                update_stats(order_data)
+                done.add('recorded')
+                check_manufacturing_threshold(order_data)
+                check_milestone(order_data)
+
+        # Automation triggers (a retry only repeats the ones that failed)
+        for step, trigger in (('email', send_confirmation_email), ('consciousness', log_to_consciousness_system)):
+            if step not in done:
+                trigger(order_data)
+                done.add(step)
 
 
 def process_payment(session):
@@ -258,7 +289,14 @@ def get_stats():
 @app.route('/api/orders', methods=['GET'])
 def get_orders():
     """API endpoint to see all orders"""
-    return jsonify(orders)
+    with orders_lock:
+        return jsonify(list(orders))
+
+
+@app.route('/api/webhook-queue', methods=['GET'])
+def get_webhook_queue():
+    """API endpoint for queue depth, retries and dead letters"""
+    return jsonify(webhook_queue.get_stats())
 
 
 @app.route('/api/test', methods=['POST'])
@@ -279,24 +317,33 @@ def test_payment():
         "timestamp": datetime.now().isoformat()
     }
 
-    orders.append(test_order)
-    update_stats(test_order)
+    with orders_lock:
+        orders.append(test_order)
+        update_stats(test_order)
 
     print(f"✅ TEST ORDER CREATED")
 
     return jsonify({"status": "test_order_created", "order": test_order})
 
 
+# Workers start once every handler above is defined
+webhook_queue = WebhookQueue(SqliteWebhookStore(str(WEBHOOK_QUEUE_DB)), process_webhook_event)
+webhook_queue.start()
+atexit.register(webhook_queue.stop)
+
+
 if __name__ == "__main__":
     print("🚀 STRIPE WEBHOOK SERVER STARTING...\n")
     print("📡 Listening for payments on http://localhost:5000/webhook/stripe")
     print("📊 Stats available at: http://localhost:5000/api/stats")
     print("📋 Orders list at: http://localhost:5000/api/orders")
+    print("📬 Webhook queue at: http://localhost:5000/api/webhook-queue")
     print("\n🧪 Test with: POST http://localhost:5000/api/test\n")
 
     # Run server
     app.run(
         host='0.0.0.0',
         port=5000,
-        debug=True
+        debug=True,
+        use_reloader=False  # the reloader's second process would run a second set of queue workers
     )
@@ -385,10 +385,12 @@ class MarketplaceModule {
         return await this.sdk._request('/api/marketplace/creator/dashboard');
     }
 
-    async browse({ domain = null, type = null, sort = 'popular', limit = 20 } = {}) {
+    async browse({ domain = null, type = null, sort = 'popular', limit = 20, q = null, cursor = null } = {}) {
         const params = new URLSearchParams();
         if (domain) params.append('domain', domain);
         if (type) params.append('type', type);
+        if (q) params.append('q', q);
+        if (cursor) params.append('cursor', cursor);  // next_cursor from the previous page
         params.append('sort', sort);
         params.append('limit', limit);
 